@@ -1,9 +1,19 @@
-from rest_framework import generics, permissions, status
+import logging
+
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from rest_framework import generics, permissions, serializers, status
+from rest_framework.settings import api_settings
 from rest_framework.response import Response
 from rest_framework.authtoken.views import ObtainAuthToken
 from rest_framework.authtoken.models import Token
 from .models import User, Profile
 from .serializers import UserSerializer, ProfileSerializer
+from .hashers import check_password_cached, hash_passwords
+from .cached_auth import cache_token_user
+from .throttles import LoginIPThrottle, LoginUsernameThrottle
+
+logger = logging.getLogger(__name__)
 
 class RegisterView(generics.CreateAPIView):
     queryset = User.objects.all()
@@ -11,45 +21,46 @@ class RegisterView(generics.CreateAPIView):
     serializer_class = UserSerializer
 
     def create(self, request, *args, **kwargs):
+        username = request.data.get('username')
+        email = request.data.get('email')
+        password = request.data.get('password')
+        role = request.data.get('role', 'SEEKER')
+        gender = request.data.get('gender')
+        age = request.data.get('age')
+
+        if not username or not password:
+            return Response({'error': 'Username and password are required'},
+                          status=status.HTTP_400_BAD_REQUEST)
+
         try:
-            username = request.data.get('username')
-            email = request.data.get('email')
-            password = request.data.get('password')
-            role = request.data.get('role', 'SEEKER')
-            gender = request.data.get('gender')
-            age = request.data.get('age')
-            
-            print(f"Registration attempt - Username: {username}, Email: {email}, Role: {role}, Gender: {gender}, Age: {age}")
-            
-            if not username or not password:
-                return Response({'error': 'Username and password are required'}, 
-                              status=status.HTTP_400_BAD_REQUEST)
-            
-            if User.objects.filter(username=username).exists():
-                return Response({'error': 'Username already exists'}, 
+            age = int(age) if age else None
+        except (TypeError, ValueError):
+            return Response({'error': 'Age must be a number'},
+                          status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            # Hash on the pool, before opening the transaction so no locks are held while PBKDF2 runs
+            password_hash, = hash_passwords([password])
+
+            # One atomic unit - the unique constraint on username replaces the exists() pre-check
+            try:
+                with transaction.atomic():
+                    user = User.objects.create(
+                        username=User.normalize_username(username),
+                        email=User.objects.normalize_email(email or ''),
+                        password=password_hash
+                    )
+                    Profile.objects.create(
+                        user=user,
+                        role=role,
+                        gender=gender,
+                        age=age
+                    )
+                    token = Token.objects.create(user=user)
+            except IntegrityError:
+                return Response({'error': 'Username already exists'},
                               status=status.HTTP_400_BAD_REQUEST)
-            
-            # Create user
-            user = User.objects.create_user(
-                username=username,
-                email=email or '',
-                password=password
-            )
-            print(f"User created: {user.id}")
-            
-            # Create profile with role, gender, and age
-            profile = Profile.objects.create(
-                user=user,
-                role=role,
-                gender=gender,
-                age=int(age) if age else None
-            )
-            print(f"Profile created: {profile.id}")
-            
-            # Generate token
-            token, created = Token.objects.get_or_create(user=user)
-            print(f"Token created: {token.key[:10]}...")
-            
+
             return Response({
                 'token': token.key,
                 'user': {
@@ -58,22 +69,50 @@ class RegisterView(generics.CreateAPIView):
                     'email': user.email
                 }
             }, status=status.HTTP_201_CREATED)
-            
+
         except Exception as e:
-            print(f"Registration error: {type(e).__name__}: {str(e)}")
-            import traceback
-            traceback.print_exc()
+            logger.exception('Registration failed for username %r', username)
             return Response({'error': f'Registration failed: {str(e)}'}, 
                           status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 class CustomAuthToken(ObtainAuthToken):
+    """
+    Token login.
+
+    Throttled per IP and per username before any password hashing happens.
+    User, role and token come back in a single query, and the token auth
+    cache is warmed so the client's first authenticated call is free.
+    """
+    throttle_classes = [LoginIPThrottle, LoginUsernameThrottle]
+
     def post(self, request, *args, **kwargs):
-        serializer = self.serializer_class(data=request.data,
-                                           context={'request': request})
-        serializer.is_valid(raise_exception=True)
-        user = serializer.validated_data['user']
-        token, created = Token.objects.get_or_create(user=user)
-        
+        username = request.data.get('username')
+        password = request.data.get('password')
+        if not username or not password:
+            raise serializers.ValidationError({
+                api_settings.NON_FIELD_ERRORS_KEY: ['Must include "username" and "password".']
+            })
+
+        # One query: user + profile role + existing token
+        user = User.objects.select_related('auth_token').annotate(
+            role=F('profile__role')
+        ).filter(**{User.USERNAME_FIELD: username}).first()
+
+        if user is None:
+            # Run the hasher anyway so response time doesn't reveal whether the username exists
+            User().set_password(password)
+        if user is None or not check_password_cached(user, password) or not user.is_active:
+            raise serializers.ValidationError({
+                api_settings.NON_FIELD_ERRORS_KEY: ['Unable to log in with provided credentials.']
+            })
+
+        try:
+            token = user.auth_token
+        except Token.DoesNotExist:
+            token = Token.objects.create(user=user)
+
+        cache_token_user(token.key, user, user.role)
+
         response_data = {
             'token': token.key,
             'user': {
@@ -84,12 +123,7 @@ class CustomAuthToken(ObtainAuthToken):
                 'is_superuser': user.is_superuser
             }
         }
-        
-        # Use select_related to fetch profile in same query
-        try:
-            profile = Profile.objects.select_related('user').get(user=user)
-            response_data['user']['role'] = profile.role
-        except Profile.DoesNotExist:
-            pass
-            
+        if user.role is not None:
+            response_data['user']['role'] = user.role
+
         return Response(response_data)
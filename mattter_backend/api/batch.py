@@ -0,0 +1,256 @@
+"""
+Request batching: several API calls in one HTTP request (POST /api/batch/).
+
+    POST /api/batch/
+    {"requests": [
+        {"id": "me", "method": "GET", "path": "/api/profiles/me/"},
+        {"id": "pending", "path": "/api/bookings/pending/"},
+        {"path": "/api/bookings/", "query": {"status": "CONFIRMED,COMPLETED"}}
+    ]}
+
+    -> {"success": true, "duration_ms": .., "results": [
+           {"id": "me", "status": 200, "body": {..}, "headers": {"ETag": ..}, "duration_ms": ..}, ...]}
+
+Sub-requests are dispatched in-process to the views the router would pick,
+so they pay for TLS, CORS and authentication once. The batch's own
+authenticated user is handed to every sub-request. Consecutive reads (GET,
+HEAD) run concurrently on a thread pool, with one DB connection per
+thread. A write waits for everything before it and runs alone, so the
+batch keeps the order the client wrote it in. A failed sub-request does not
+stop the others; each result carries its own status.
+
+Limits: BATCH_MAX_REQUESTS sub-requests per batch, only paths under /api/,
+and no nesting. Sub-requests go through their views' own permissions and
+throttles. Counters (batches, sub-requests, errors, time) are kept in the
+cache; see stats().
+"""
+
+import json
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from threading import Lock
+from urllib.parse import urlencode, urlsplit
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.handlers.wsgi import WSGIRequest
+from django.db import close_old_connections
+from django.http import Http404
+from django.urls import Resolver404, resolve
+from rest_framework import permissions, status
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from .renderers import FAST_RENDERER_CLASSES
+
+logger = logging.getLogger(__name__)
+
+BATCH_PATH = '/api/batch/'
+READ_METHODS = ('GET', 'HEAD')
+METHODS = READ_METHODS + ('POST', 'PUT', 'PATCH', 'DELETE')
+# Headers a sub-request may set for itself; everything else comes from the batch request
+ITEM_HEADERS = ('If-None-Match', 'If-Modified-Since', 'Idempotency-Key', 'Accept-Language')
+RESPONSE_HEADERS = ('ETag', 'Last-Modified', 'Retry-After', 'Location')
+DEFAULT_MAX_REQUESTS = 20
+DEFAULT_WORKERS = 4
+STATS_KEYS = ('batches', 'requests', 'errors', 'total_ms')
+STATS_TIMEOUT = 60 * 60 * 24 * 7
+
+_executor = None
+_executor_lock = Lock()
+
+
+def _max_requests():
+    return getattr(settings, 'BATCH_MAX_REQUESTS', DEFAULT_MAX_REQUESTS)
+
+
+def parse_items(data):
+    """Validate the batch body. Returns normalized items; raises ValueError with a message for the client."""
+    items = data.get('requests') if isinstance(data, dict) else None
+    if not isinstance(items, list) or not items:
+        raise ValueError('requests must be a non-empty list')
+    if len(items) > _max_requests():
+        raise ValueError(f'At most {_max_requests()} requests per batch')
+
+    parsed = []
+    for index, item in enumerate(items):
+        if not isinstance(item, dict):
+            raise ValueError(f'requests[{index}] must be an object')
+        method = str(item.get('method', 'GET')).upper()
+        if method not in METHODS:
+            raise ValueError(f'requests[{index}]: method must be one of {", ".join(METHODS)}')
+        url = urlsplit(str(item.get('path', '')))
+        path = url.path
+        if not path.startswith('/api/') or path.startswith(BATCH_PATH):
+            raise ValueError(f'requests[{index}]: path must be an API path other than {BATCH_PATH}')
+        query = item.get('query') or {}
+        if not isinstance(query, dict):
+            raise ValueError(f'requests[{index}]: query must be an object')
+        headers = item.get('headers') or {}
+        if not isinstance(headers, dict) or any(name not in ITEM_HEADERS for name in headers):
+            raise ValueError(f'requests[{index}]: headers may only set {", ".join(ITEM_HEADERS)}')
+        query_string = '&'.join(part for part in (url.query, urlencode(query, doseq=True)) if part)
+        parsed.append({
+            'id': item.get('id', index),
+            'method': method,
+            'path': path,
+            'query_string': query_string,
+            'body': item.get('body'),
+            'headers': headers,
+        })
+    return parsed
+
+
+def _sub_request(request, item):
+    """A WSGIRequest for `item` that reuses the batch request's client details and user."""
+    body = b'' if item['body'] is None else json.dumps(item['body']).encode()
+    environ = {key: value for key, value in request.META.items()
+               if key.startswith('HTTP_') and key not in ('HTTP_CONTENT_TYPE', 'HTTP_CONTENT_LENGTH', 'HTTP_IF_NONE_MATCH',
+                                                          'HTTP_IF_MODIFIED_SINCE', 'HTTP_IDEMPOTENCY_KEY')}
+    for key in ('REMOTE_ADDR', 'SERVER_NAME', 'SERVER_PORT'):
+        if key in request.META:
+            environ[key] = request.META[key]
+    for name, value in item['headers'].items():
+        environ['HTTP_' + name.upper().replace('-', '_')] = str(value)
+    environ.update({
+        'REQUEST_METHOD': item['method'],
+        'PATH_INFO': item['path'],
+        'SCRIPT_NAME': '',
+        'QUERY_STRING': item['query_string'],
+        'CONTENT_TYPE': 'application/json',
+        'CONTENT_LENGTH': str(len(body)),
+        'wsgi.input': BytesIO(body),
+        'wsgi.url_scheme': request.scheme,
+    })
+    sub = WSGIRequest(environ)
+    # Read by DRF's Request: authentication already happened for the batch
+    sub._force_auth_user = request.user
+    sub._force_auth_token = request.auth
+    return sub
+
+
+def _body(response):
+    data = getattr(response, 'data', None)
+    if data is not None or isinstance(response, Response):
+        return data
+    content = getattr(response, 'content', b'')
+    if not content:
+        return None
+    if 'json' in response.get('Content-Type', ''):
+        return json.loads(content)
+    return content.decode(response.charset or 'utf-8', errors='replace')
+
+
+def execute(request, item):
+    """Run one sub-request. Never raises: failures become the item's status."""
+    started = time.perf_counter()
+    try:
+        match = resolve(item['path'])
+        response = match.func(_sub_request(request, item), *match.args, **match.kwargs)
+        result = {'status': response.status_code, 'body': _body(response)}
+        headers = {name: response[name] for name in RESPONSE_HEADERS if response.has_header(name)}
+        if headers:
+            result['headers'] = headers
+    except (Resolver404, Http404):
+        result = {'status': status.HTTP_404_NOT_FOUND, 'body': {'error': 'Not found'}}
+    except Exception:
+        logger.exception('Batch sub-request %s %s failed', item['method'], item['path'])
+        result = {'status': status.HTTP_500_INTERNAL_SERVER_ERROR, 'body': {'error': 'Internal server error'}}
+    result['id'] = item['id']
+    result['duration_ms'] = round((time.perf_counter() - started) * 1000, 2)
+    return result
+
+
+def _in_thread(request, item):
+    # Pool threads keep their own connections; drop ones past CONN_MAX_AGE or broken
+    close_old_connections()
+    try:
+        return execute(request, item)
+    finally:
+        close_old_connections()
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=getattr(settings, 'BATCH_WORKERS', DEFAULT_WORKERS),
+                                           thread_name_prefix='api-batch')
+    return _executor
+
+
+def run(request, items):
+    """Results in item order: runs of reads concurrently, writes one at a time."""
+    results = []
+    reads = []
+
+    def flush_reads():
+        if len(reads) > 1 and getattr(settings, 'BATCH_CONCURRENT', True):
+            executor = _get_executor()
+            results.extend(future.result() for future in [executor.submit(_in_thread, request, item) for item in reads])
+        else:
+            results.extend(execute(request, item) for item in reads)
+        reads.clear()
+
+    for item in items:
+        if item['method'] in READ_METHODS:
+            reads.append(item)
+            continue
+        flush_reads()
+        results.append(execute(request, item))
+    flush_reads()
+    return results
+
+
+# Metrics
+
+def _record(results, duration_ms):
+    values = {
+        'batches': 1,
+        'requests': len(results),
+        'errors': sum(1 for result in results if result['status'] >= 500),
+        'total_ms': int(duration_ms),
+    }
+    for name, value in values.items():
+        key = f'batch_stats_{name}'
+        if not cache.add(key, value, STATS_TIMEOUT):
+            try:
+                cache.incr(key, value)
+            except ValueError:
+                cache.set(key, value, STATS_TIMEOUT)
+
+
+def stats():
+    """Batch counters since they were last evicted (cache-backed, approximate)."""
+    values = cache.get_many([f'batch_stats_{name}' for name in STATS_KEYS])
+    counts = {name: values.get(f'batch_stats_{name}', 0) for name in STATS_KEYS}
+    counts['avg_requests'] = round(counts['requests'] / counts['batches'], 2) if counts['batches'] else 0
+    counts['avg_ms'] = round(counts['total_ms'] / counts['batches'], 2) if counts['batches'] else 0
+    return counts
+
+
+class BatchView(APIView):
+    """POST several API calls at once (see module docstring); GET returns batch metrics to staff."""
+    renderer_classes = FAST_RENDERER_CLASSES
+
+    def get_permissions(self):
+        if self.request.method == 'GET':
+            return [permissions.IsAdminUser()]
+        return [permissions.IsAuthenticated()]
+
+    def get(self, request):
+        return Response({'success': True, 'stats': stats()})
+
+    def post(self, request):
+        try:
+            items = parse_items(request.data)
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        started = time.perf_counter()
+        results = run(request, items)
+        duration_ms = (time.perf_counter() - started) * 1000
+        _record(results, duration_ms)
+        return Response({'success': True, 'duration_ms': round(duration_ms, 2), 'results': results})
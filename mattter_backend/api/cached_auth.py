@@ -8,45 +8,80 @@ database hits for token validation by caching the user data in memory.
 from rest_framework.authentication import TokenAuthentication
 from rest_framework.authtoken.models import Token
 from django.core.cache import cache
+from django.db.models import F
 from rest_framework import exceptions
 
 
+CACHE_TIMEOUT = 300  # 5 minutes
+
+
+def token_cache_key(key):
+    return f'token_auth_{key}'
+
+
+def cache_token_user(key, user, role):
+    """
+    Store the authenticated user and its role claim for a token.
+    Called on cache misses and by the login view to warm the cache.
+    """
+    cache.set(token_cache_key(key), {'user': user, 'role': role}, CACHE_TIMEOUT)
+
+
+def get_user_role(user):
+    """
+    Return the profile role for a user, using the role claim attached by
+    authentication when present instead of loading the profile.
+    """
+    role = getattr(user, 'role', None)
+    if role is not None:
+        return role
+    from .models import Profile
+    return Profile.objects.filter(user_id=user.pk).values_list('role', flat=True).first()
+
+
 class CachedTokenAuthentication(TokenAuthentication):
     """
     Token authentication with caching to reduce database round-trips.
-    
+
     Caches user objects for 5 minutes after successful token validation.
     This dramatically improves performance when using remote databases.
+    The cached payload carries the profile role so permission checks and
+    role-dependent querysets don't need to load the profile.
     """
-    
-    CACHE_TIMEOUT = 300  # 5 minutes
-    
+
+    CACHE_TIMEOUT = CACHE_TIMEOUT
+
     def authenticate_credentials(self, key):
         """
         Override to check cache before hitting the database.
         """
-        cache_key = f'token_auth_{key}'
-        
+        cache_key = token_cache_key(key)
+
         # Try to get from cache first
-        cached_user = cache.get(cache_key)
-        if cached_user is not None:
-            if cached_user == 'INVALID':
-                raise exceptions.AuthenticationFailed('Invalid token.')
-            return (cached_user, key)
-        
-        # Cache miss - query database
+        cached = cache.get(cache_key)
+        if cached == 'INVALID':
+            raise exceptions.AuthenticationFailed('Invalid token.')
+        if isinstance(cached, dict):
+            user = cached['user']
+            user.role = cached['role']
+            return (user, key)
+
+        # Cache miss - query database (user and role in one query)
         model = self.get_model()
         try:
-            token = model.objects.select_related('user').get(key=key)
+            token = model.objects.select_related('user').annotate(
+                role=F('user__profile__role')
+            ).get(key=key)
         except model.DoesNotExist:
             # Cache the invalid result to prevent repeated DB hits
             cache.set(cache_key, 'INVALID', self.CACHE_TIMEOUT)
             raise exceptions.AuthenticationFailed('Invalid token.')
-        
+
         if not token.user.is_active:
             raise exceptions.AuthenticationFailed('User inactive or deleted.')
-        
-        # Cache the user object
-        cache.set(cache_key, token.user, self.CACHE_TIMEOUT)
-        
+
+        # Cache the user object with its role claim
+        token.user.role = token.role
+        cache_token_user(key, token.user, token.role)
+
         return (token.user, token)
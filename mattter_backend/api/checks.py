@@ -0,0 +1,32 @@
+"""
+Deployment checks (`manage.py check --deploy`).
+"""
+
+from django.conf import settings
+from django.core.checks import Tags, Warning, register
+
+
+@register(Tags.caches, deploy=True)
+def check_shared_cache(app_configs, **kwargs):
+    backend = settings.CACHES['default']['BACKEND']
+    if backend.endswith('LocMemCache'):
+        return [Warning(
+            'The default cache is local to each process.',
+            hint='Set REDIS_URL. Presence (api.presence) only sees sockets held by the same process, '
+                 'and cache invalidation does not reach other processes.',
+            id='api.W001',
+        )]
+    return []
+
+
+@register(deploy=True)
+def check_shared_channel_layer(app_configs, **kwargs):
+    backend = settings.CHANNEL_LAYERS.get('default', {}).get('BACKEND', '')
+    if backend.endswith('InMemoryChannelLayer'):
+        return [Warning(
+            'The channel layer is local to each process.',
+            hint='Set REDIS_URL. Event and message pushes (api.events) sent from another web worker '
+                 'or from run_workers never reach the socket.',
+            id='api.W002',
+        )]
+    return []
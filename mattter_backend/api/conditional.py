@@ -0,0 +1,149 @@
+"""
+Cheap content versions for conditional GET (ETag / Last-Modified).
+
+Versions come from Profile.version and Profile.updated_at and are kept in
+the cache by api.signals. A request with a matching If-None-Match is
+answered with a 304 after one cache lookup, with no serialization and
+without loading the large JSON fields.
+
+Cache writes and invalidations wait for the surrounding transaction to
+commit: before that, a reader could cache the old rows under the new
+version, or see a version that is then rolled back.
+"""
+
+import hashlib
+import uuid
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, Max, Sum
+
+from .models import Profile
+
+VERSION_TIMEOUT = 3600  # 1 hour; entries are refreshed on every profile save
+CATALYST_MAP_KEY = 'catalyst_map_version'
+
+
+def _pk_key(pk):
+    return f'profile_version_{pk}'
+
+
+def _user_key(user_id):
+    return f'profile_version_user_{user_id}'
+
+
+def store_profile_version(profile):
+    value = (profile.pk, profile.version, profile.updated_at)
+    entries = {_pk_key(profile.pk): value, _user_key(profile.user_id): value}
+    transaction.on_commit(lambda: cache.set_many(entries, VERSION_TIMEOUT))
+
+
+def forget_profile_version(profile):
+    keys = [_pk_key(profile.pk), _user_key(profile.user_id)]
+    transaction.on_commit(lambda: cache.delete_many(keys))
+
+
+def invalidate_catalyst_map_version():
+    transaction.on_commit(lambda: cache.delete(CATALYST_MAP_KEY))
+
+
+def _wardrobe_key(owner_id):
+    return f'wardrobe_version_{owner_id}'
+
+
+def get_wardrobe_version(owner_id):
+    """
+    Opaque token that changes whenever any of an owner's wardrobe items
+    change. Used to key derived data (similarity index, outfits).
+    """
+    key = _wardrobe_key(owner_id)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, uuid.uuid4().hex[:12], VERSION_TIMEOUT)
+        version = cache.get(key)
+    return version
+
+
+def invalidate_wardrobe_versions(owner_ids):
+    keys = [_wardrobe_key(owner_id) for owner_id in owner_ids]
+    transaction.on_commit(lambda: cache.delete_many(keys))
+
+
+def get_profile_version(pk=None, user_id=None):
+    """Return (profile_id, version, updated_at) for a profile, or None if it doesn't exist."""
+    lookup = {'pk': pk} if pk is not None else {'user_id': user_id}
+    try:
+        int(next(iter(lookup.values())))
+    except (TypeError, ValueError):
+        return None
+
+    key = _pk_key(pk) if pk is not None else _user_key(user_id)
+    value = cache.get(key)
+    if value is None:
+        row = Profile.objects.filter(**lookup).values_list('pk', 'version', 'updated_at', 'user_id').first()
+        if row is None:
+            return None
+        value = row[:3]
+        cache.set_many({_pk_key(row[0]): value, _user_key(row[3]): value}, VERSION_TIMEOUT)
+    return value
+
+
+def get_catalyst_map_version():
+    """(count, version sum, last modified) over catalysts shown on the map."""
+    value = cache.get(CATALYST_MAP_KEY)
+    if value is None:
+        agg = Profile.objects.listed().filter(
+            role='CATALYST',
+            latitude__isnull=False,
+            longitude__isnull=False
+        ).aggregate(count=Count('id'), version_sum=Sum('version'), last_modified=Max('updated_at'))
+        value = (agg['count'], agg['version_sum'] or 0, agg['last_modified'])
+        cache.set(CATALYST_MAP_KEY, value, VERSION_TIMEOUT)
+    return value
+
+
+# ETag / Last-Modified callables for django.views.decorators.http.condition
+
+def profile_etag(request, pk=None):
+    version = get_profile_version(pk=pk)
+    return f'profile-{version[0]}-v{version[1]}' if version else None
+
+
+def reviews_etag(request, pk=None):
+    version = get_profile_version(pk=pk)
+    if not version:
+        return None
+    # Each cursor / page size is a different representation
+    query = hashlib.md5(request.META.get('QUERY_STRING', '').encode()).hexdigest()[:12]
+    return f'reviews-{version[0]}-v{version[1]}-{query}'
+
+
+def profile_last_modified(request, pk=None):
+    version = get_profile_version(pk=pk)
+    return version[2] if version else None
+
+
+def me_etag(request):
+    if not request.user.is_authenticated:
+        return None
+    version = get_profile_version(user_id=request.user.id)
+    if not version:
+        return None
+    # Staff flags are merged into the response, so they are part of the version
+    return f'me-{version[0]}-v{version[1]}-{int(request.user.is_staff)}{int(request.user.is_superuser)}'
+
+
+def me_last_modified(request):
+    if not request.user.is_authenticated:
+        return None
+    version = get_profile_version(user_id=request.user.id)
+    return version[2] if version else None
+
+
+def catalyst_map_etag(request):
+    count, version_sum, _ = get_catalyst_map_version()
+    return f'catalysts-{count}-{version_sum}'
+
+
+def catalyst_map_last_modified(request):
+    return get_catalyst_map_version()[2]
@@ -0,0 +1,152 @@
+"""
+WebSocket consumer for signed-in users (ws/?token=<auth token>).
+
+One socket per client carries everything pushed to that user. Each
+connection joins the user's group (user_group()), so anything sent to
+that group reaches every tab and device the user has open.
+
+Client -> server messages:
+    {"type": "heartbeat"}                                 every PRESENCE_HEARTBEAT_SECONDS
+    {"type": "typing", "booking": <id>, "typing": true}   in a booking conversation
+
+Server -> client messages:
+    {"type": "hello", "user_id": .., "heartbeat": <seconds>, "cursor": <newest event id>}
+    {"type": "event", "event": {"id": .., "type": .., "payload": {..}, "created_at": ..}}
+    {"type": "message", "message": {"id": .., "key": .., "booking": .., "sender_id": .., ...}}
+    {"type": "typing", "booking": .., "user_id": .., "typing": .., "expires_in": <seconds>}
+    {"type": "error", "error": ".."}
+
+Events (api.events) carry increasing ids. A client keeps the last id it
+has seen, starting from the hello cursor, and after a reconnect fetches
+GET /api/events/?after=<id> to catch up. The hello cursor and replay lag
+a couple of seconds behind pushes, so clients drop events by id they
+already have.
+
+Heartbeats only refresh cache entries (api.presence); nothing is written
+to the database while a socket is open.
+"""
+
+import time
+from datetime import timedelta
+
+from asgiref.sync import sync_to_async
+from channels.db import database_sync_to_async
+from channels.generic.websocket import AsyncJsonWebsocketConsumer
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+
+from . import presence
+from .models import Booking, Event
+
+DEFAULT_TYPING_TTL = 6
+
+
+def user_group(user_id):
+    return f'user_{user_id}'
+
+
+def _typing_ttl():
+    return getattr(settings, 'PRESENCE_TYPING_TTL', DEFAULT_TYPING_TTL)
+
+
+@database_sync_to_async
+def _booking_counterpart(booking_id, user_id):
+    """The other party of a booking the user is part of, else None."""
+    parties = (Booking.objects.filter(Q(seeker_id=user_id) | Q(catalyst_id=user_id), pk=booking_id)
+               .values_list('seeker_id', 'catalyst_id').first())
+    if parties is None:
+        return None
+    seeker_id, catalyst_id = parties
+    return catalyst_id if seeker_id == user_id else seeker_id
+
+
+@database_sync_to_async
+def _latest_event_id(user_id):
+    # Same commit-lag hold-back as api.events.replayable (not imported: events imports this module)
+    lag = timedelta(seconds=getattr(settings, 'EVENT_COMMIT_LAG_SECONDS', 2))
+    return (Event.objects.filter(user_id=user_id, created_at__lte=timezone.now() - lag)
+            .order_by('-id').values_list('id', flat=True).first() or 0)
+
+
+class UserSocketConsumer(AsyncJsonWebsocketConsumer):
+
+    async def connect(self):
+        user = self.scope.get('user')
+        if user is None or not user.is_authenticated:
+            await self.close(code=4401)
+            return
+        self.user_id = user.pk
+        self.group = user_group(user.pk)
+        self.counterparts = {}  # booking id -> other party, checked once per connection
+        self.typing_sent = {}  # booking id -> (typing, monotonic time sent)
+
+        await self.channel_layer.group_add(self.group, self.channel_name)
+        await self.accept()
+        await sync_to_async(presence.connect)(self.user_id)
+        await self.send_json({
+            'type': 'hello',
+            'user_id': self.user_id,
+            'heartbeat': presence.heartbeat_seconds(),
+            'cursor': await _latest_event_id(self.user_id),
+        })
+
+    async def disconnect(self, code):
+        if getattr(self, 'user_id', None) is None:
+            return
+        await self.channel_layer.group_discard(self.group, self.channel_name)
+        await sync_to_async(presence.disconnect)(self.user_id)
+
+    async def receive_json(self, content, **kwargs):
+        kind = content.get('type') if isinstance(content, dict) else None
+        if kind == 'heartbeat':
+            await sync_to_async(presence.heartbeat)(self.user_id)
+        elif kind == 'typing':
+            await self.typing(content)
+        else:
+            await self.send_json({'type': 'error', 'error': 'Unknown message type'})
+
+    async def typing(self, content):
+        try:
+            booking_id = int(content.get('booking'))
+        except (TypeError, ValueError):
+            await self.send_json({'type': 'error', 'error': 'booking must be a booking id'})
+            return
+        if booking_id not in self.counterparts:
+            self.counterparts[booking_id] = await _booking_counterpart(booking_id, self.user_id)
+        other = self.counterparts[booking_id]
+        if other is None:
+            await self.send_json({'type': 'error', 'error': 'Not a participant of this booking'})
+            return
+
+        # Clients send on every keystroke; forward state changes, and repeats
+        # only often enough to keep the indicator from expiring on the other side
+        is_typing = bool(content.get('typing', True))
+        ttl = _typing_ttl()
+        now = time.monotonic()
+        last = self.typing_sent.get(booking_id)
+        if last is not None and last[0] == is_typing and now - last[1] < ttl / 2:
+            return
+        self.typing_sent[booking_id] = (is_typing, now)
+        await self.channel_layer.group_send(user_group(other), {
+            'type': 'typing.update',
+            'booking': booking_id,
+            'user_id': self.user_id,
+            'typing': is_typing,
+            'expires_in': ttl,
+        })
+
+    async def typing_update(self, event):
+        await self.send_json({
+            'type': 'typing',
+            'booking': event['booking'],
+            'user_id': event['user_id'],
+            'typing': event['typing'],
+            'expires_in': event['expires_in'],
+        })
+
+    async def event_push(self, event):
+        await self.send_json({'type': 'event', 'event': event['event']})
+
+    async def message_push(self, event):
+        await self.send_json({'type': 'message', 'message': event['message']})
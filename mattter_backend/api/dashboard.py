@@ -0,0 +1,105 @@
+"""
+Catalyst dashboard summary (GET /api/profiles/dashboard_summary/).
+
+Everything the catalyst dashboard header shows, in one response: booking
+counts by status, unread messages, the rating histogram, the latest
+reviews and how complete the profile is. A cache miss costs four queries:
+the profile (whose precomputed rating aggregates give the histogram), one
+conditional aggregate over the catalyst's bookings, one over unread
+messages, and the latest reviews.
+
+The summary is cached per catalyst and dropped by the cache.dashboard
+outbox handler whenever one of their bookings, ratings, messages or their
+profile changes. Bulk updates that skip the outbox (mark_as_read, account
+purges) call invalidate() themselves.
+"""
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Q
+from django.utils import timezone
+
+from . import outbox, ratings
+from .models import Booking, Message, Profile
+
+DEFAULT_CACHE_SECONDS = 300
+DEFAULT_REVIEWS = 3
+
+# Profile fields counted towards completeness, in the order the dashboard prompts for them
+COMPLETENESS_FIELDS = ['bio_short', 'bio', 'specializations', 'portfolio_images', 'hourly_rate', 'address']
+
+
+def _cache_key(user_id):
+    return f'catalyst_dashboard_{user_id}'
+
+
+def invalidate(user_ids):
+    cache.delete_many([_cache_key(user_id) for user_id in set(user_ids)])
+
+
+def completeness(profile):
+    missing = [name for name in COMPLETENESS_FIELDS if not getattr(profile, name)]
+    filled = len(COMPLETENESS_FIELDS) - len(missing)
+    return {'score': round(filled * 100 / len(COMPLETENESS_FIELDS)), 'missing': missing}
+
+
+def booking_counts(user_id):
+    now = timezone.now()
+    return Booking.objects.filter(catalyst_id=user_id).aggregate(
+        total=Count('id'),
+        pending=Count('id', filter=Q(status='REQUESTED')),
+        confirmed=Count('id', filter=Q(status='CONFIRMED')),
+        upcoming=Count('id', filter=Q(status='CONFIRMED', scheduled_time__gte=now)),
+        completed=Count('id', filter=Q(status='COMPLETED')),
+        cancelled=Count('id', filter=Q(status='CANCELLED')),
+    )
+
+
+def unread_counts(user_id):
+    return Message.objects.filter(booking__catalyst_id=user_id, is_read=False).exclude(sender_id=user_id).aggregate(
+        unread=Count('id'),
+        conversations=Count('booking_id', distinct=True),
+    )
+
+
+def build_summary(user_id):
+    profile = Profile.objects.only('id', 'is_active', *COMPLETENESS_FIELDS, *ratings.SUMMARY_FIELDS).get(user_id=user_id)
+    reviews = ratings.reviews_queryset(user_id)[:getattr(settings, 'CATALYST_DASHBOARD_REVIEWS', DEFAULT_REVIEWS)]
+    return {
+        'success': True,
+        'profile_id': profile.id,
+        'is_active': profile.is_active,
+        'bookings': booking_counts(user_id),
+        'messages': unread_counts(user_id),
+        'ratings': ratings.rating_summary(profile),
+        'recent_reviews': [ratings.review_dict(row) for row in reviews],
+        'completeness': completeness(profile),
+        'generated_at': timezone.now(),
+    }
+
+
+def catalyst_summary(user_id):
+    """The cached summary for a catalyst, built on a miss. Raises Profile.DoesNotExist."""
+    key = _cache_key(user_id)
+    summary = cache.get(key)
+    if summary is None:
+        summary = build_summary(user_id)
+        cache.set(key, summary, getattr(settings, 'CATALYST_DASHBOARD_CACHE_SECONDS', DEFAULT_CACHE_SECONDS))
+    return summary
+
+
+@outbox.handler('cache.dashboard', 'booking', 'rating', 'profile', 'message.created')
+def drop_summaries(messages):
+    user_ids = set()
+    booking_ids = set()
+    for message in messages:
+        payload = message.payload
+        if message.topic.startswith('profile.'):
+            user_ids.add(payload['user_id'])
+        elif message.topic.startswith('message.'):
+            booking_ids.add(payload['booking_id'])
+        else:
+            user_ids.add(payload['catalyst_id'])
+    if booking_ids:
+        user_ids.update(Booking.objects.filter(pk__in=booking_ids).values_list('catalyst_id', flat=True))
+    invalidate(user_ids)
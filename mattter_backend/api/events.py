@@ -0,0 +1,166 @@
+"""
+User-facing events: booking changes, new ratings and new reports.
+
+emit() writes one Event row per recipient inside the caller's transaction
+and, once it commits, sends each to the recipient's channel group
+(api.consumers.user_group), so every socket the user has open gets it. A
+push that fails or finds no socket is not lost: the row stays in the log,
+and clients catch up with GET /api/events/?after=<last id seen>. Events
+from a rolled-back transaction are neither stored nor pushed.
+
+Pushes need a channel layer shared by all processes (Redis, see settings);
+with the in-memory layer only sockets in the emitting process get them.
+
+Ids are allocated at insert, not at commit, so a slow transaction can
+commit an id lower than one a client has already seen. Replay therefore
+holds back events younger than EVENT_COMMIT_LAG_SECONDS (they arrive by
+push meanwhile); the cursor never moves past an id that may still appear.
+
+Event types:
+    booking.requested   to both parties, when a seeker creates a booking
+    booking.accepted    to both parties
+    booking.rejected    to both parties
+    booking.cancelled   to both parties, when a booking is removed
+    rating.created      to the rated catalyst
+    report.created      to staff accounts
+
+The log is pruned after EVENT_RETENTION_DAYS by the periodic 'events.prune'
+job.
+"""
+
+import logging
+from datetime import timedelta
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from . import jobs, outbox
+from .consumers import user_group
+from .models import Event, Message, User
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_RETENTION_DAYS = 30
+DEFAULT_COMMIT_LAG_SECONDS = 2
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 500
+
+
+def event_row(event):
+    return {
+        'id': event.id,
+        'type': event.type,
+        'payload': event.payload,
+        'created_at': event.created_at.isoformat().replace('+00:00', 'Z'),
+    }
+
+
+def emit(user_ids, event_type, payload):
+    """Record `event_type` for each user and push it after commit. Returns the Event rows."""
+    events = Event.objects.bulk_create([
+        Event(user_id=user_id, type=event_type, payload=payload)
+        for user_id in dict.fromkeys(user_ids) if user_id is not None
+    ])
+    if events:
+        transaction.on_commit(lambda: push(events))
+    return events
+
+
+def push(events):
+    """Send stored events to their users' sockets. Best effort: the log is the source of truth."""
+    layer = get_channel_layer()
+    if layer is None:
+        return
+    for event in events:
+        try:
+            async_to_sync(layer.group_send)(user_group(event.user_id), {'type': 'event.push', 'event': event_row(event)})
+        except Exception:
+            logger.exception('Could not push event %s to user %s', event.pk, event.user_id)
+
+
+def replayable(user_id):
+    """The user's events old enough that no lower id can still commit (see module docstring)."""
+    lag = timedelta(seconds=getattr(settings, 'EVENT_COMMIT_LAG_SECONDS', DEFAULT_COMMIT_LAG_SECONDS))
+    return Event.objects.filter(user_id=user_id, created_at__lte=timezone.now() - lag)
+
+
+def since(user_id, after=0, limit=DEFAULT_PAGE_SIZE):
+    """The user's replayable events with id > `after`, oldest first, and whether more remain."""
+    rows = list(replayable(user_id).filter(id__gt=after).order_by('id')[:limit + 1])
+    return [event_row(event) for event in rows[:limit]], len(rows) > limit
+
+
+# Domain events
+
+def _booking_payload(booking):
+    return {
+        'booking': booking.pk,
+        'status': booking.status,
+        'seeker_id': booking.seeker_id,
+        'catalyst_id': booking.catalyst_id,
+        'service_id': booking.service_id,
+        'scheduled_time': booking.scheduled_time.isoformat() if booking.scheduled_time else None,
+    }
+
+
+def booking_changed(booking, event_type):
+    return emit([booking.seeker_id, booking.catalyst_id], event_type, _booking_payload(booking))
+
+
+def rating_created(rating):
+    return emit([rating.catalyst_id], 'rating.created', {
+        'rating': rating.pk,
+        'booking': rating.booking_id,
+        'seeker_id': rating.seeker_id,
+        'rating_value': rating.rating,
+    })
+
+
+def report_created(report):
+    staff_ids = User.objects.filter(is_staff=True, is_active=True).values_list('id', flat=True)
+    return emit(staff_ids, 'report.created', {
+        'report': report.pk,
+        'reported_user_id': report.reported_user_id,
+        'source': report.source,
+    })
+
+
+@outbox.handler('push.message', 'message.created')
+def push_messages(messages):
+    """
+    Send new chat messages to both parties' sockets. Not logged as events:
+    the conversation itself is the replay. Redelivered pushes carry the
+    same key, so clients drop duplicates.
+    """
+    layer = get_channel_layer()
+    if layer is None:
+        return
+    keys = {message.payload['id']: message.key for message in messages}
+    rows = Message.objects.filter(pk__in=keys).values(
+        'id', 'booking_id', 'booking__seeker_id', 'booking__catalyst_id', 'sender_id', 'content', 'timestamp',
+    )
+    for row in rows:
+        push = {
+            'type': 'message.push',
+            'message': {
+                'id': row['id'],
+                'key': keys[row['id']],
+                'booking': row['booking_id'],
+                'sender_id': row['sender_id'],
+                'content': row['content'],
+                'timestamp': row['timestamp'].isoformat(),
+            },
+        }
+        for user_id in {row['booking__seeker_id'], row['booking__catalyst_id']}:
+            async_to_sync(layer.group_send)(user_group(user_id), push)
+
+
+@jobs.task('events.prune')
+def prune(days=None):
+    """Delete events older than EVENT_RETENTION_DAYS."""
+    cutoff = timezone.now() - timedelta(days=days or getattr(settings, 'EVENT_RETENTION_DAYS', DEFAULT_RETENTION_DAYS))
+    deleted, _ = Event.objects.filter(created_at__lt=cutoff).delete()
+    return deleted
@@ -0,0 +1,256 @@
+"""
+Seeker home feed (GET /api/profiles/seeker_feed/).
+
+One round trip for what the seeker home page used to fetch in three:
+pending requests, matched catalysts (with the seeker's rating of each) and
+nearby catalysts. The section builders are also what
+BookingViewSet.pending / matched and ProfileViewSet.nearby_catalysts
+serve, so the shapes match. Each is a single projected query.
+
+Sections run concurrently on a small thread pool (SEEKER_FEED_CONCURRENT);
+each pool thread uses its own database connection.
+
+Every section carries a version token. A client passes the tokens it holds
+(?since=pending:<token>,matched:<token>) and gets {"unchanged": true} for
+those sections without their queries running. Booking sections are
+versioned per seeker; the token is dropped by the outbox when one of
+their bookings or ratings, or the profile of a catalyst they booked,
+changes. The nearby token is derived from the catalyst map version and
+the search area. Online flags in `nearby` are as of the last refresh;
+use /api/profiles/presence/ for live presence.
+"""
+
+import hashlib
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from math import radians, sin, cos, sqrt, atan2
+from threading import Lock
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import close_old_connections
+from django.db.models import OuterRef, Subquery
+
+from . import conditional, outbox, presence
+from .models import Booking, Profile, Rating
+
+SECTIONS = ('pending', 'matched', 'nearby')
+DEFAULT_RADIUS = 10000  # meters
+DEFAULT_WORKERS = 4
+VERSION_TIMEOUT = 3600
+EARTH_RADIUS = 6371000  # meters
+
+_executor = None
+_executor_lock = Lock()
+
+
+# Sections
+
+def _catalyst(row, extra=()):
+    profile = None
+    if row['catalyst__profile__id'] is not None:
+        profile = {
+            'id': row['catalyst__profile__id'],
+            'gender': row['catalyst__profile__gender'],
+            'age': row['catalyst__profile__age'],
+            'bio_short': row['catalyst__profile__bio_short'],
+        }
+        for name in extra:
+            profile[name] = row[f'catalyst__profile__{name}']
+    return {'id': row['catalyst_id'], 'username': row['catalyst__username'], 'profile': profile}
+
+
+CATALYST_FIELDS = [
+    'catalyst_id', 'catalyst__username', 'catalyst__profile__id', 'catalyst__profile__gender',
+    'catalyst__profile__age', 'catalyst__profile__bio_short',
+]
+
+
+def pending_bookings(user_id):
+    """The seeker's open booking requests, newest first."""
+    rows = (Booking.objects.filter(seeker_id=user_id, status='REQUESTED').order_by('-created_at', '-id')
+            .values('id', 'created_at', 'notes', *CATALYST_FIELDS))
+    return [{
+        'id': row['id'],
+        'created_at': row['created_at'],
+        'notes': row['notes'],
+        'catalyst': _catalyst(row),
+    } for row in rows]
+
+
+def matched_bookings(user_id):
+    """Confirmed and completed bookings with the seeker's latest rating of each catalyst, in one query."""
+    latest_rating = Rating.objects.filter(seeker_id=user_id, catalyst_id=OuterRef('catalyst_id')).order_by('-created_at', '-id')
+    rows = (Booking.objects.filter(seeker_id=user_id, status__in=['CONFIRMED', 'COMPLETED']).order_by('-created_at', '-id')
+            .annotate(rating_id=Subquery(latest_rating.values('id')[:1]),
+                      rating_value=Subquery(latest_rating.values('rating')[:1]))
+            .values('id', 'status', 'created_at', 'rating_id', 'rating_value', *CATALYST_FIELDS,
+                    'catalyst__profile__specializations'))
+    data = []
+    for row in rows:
+        row['catalyst__profile__specializations'] = (row['catalyst__profile__specializations'] or [])[:3]
+        data.append({
+            'id': row['id'],
+            'status': row['status'],
+            'created_at': row['created_at'],
+            'catalyst': _catalyst(row, extra=('specializations',)),
+            'rating': {'id': row['rating_id'], 'rating': row['rating_value']} if row['rating_id'] else None,
+        })
+    return data
+
+
+def nearby_catalysts(lat, lon, radius=DEFAULT_RADIUS):
+    """Catalysts within `radius` meters of (lat, lon), nearest first, flagged online or not."""
+    catalysts = Profile.objects.listed().filter(
+        role='CATALYST',
+        latitude__isnull=False,
+        longitude__isnull=False
+    ).values_list(
+        'id', 'latitude', 'longitude', 'bio_short', 'specializations', 'hourly_rate', 'average_rating',
+        'rating_count', 'user_id', 'user__username', 'user__first_name', 'user__last_name',
+    )
+
+    lat1 = radians(lat)
+    lon1 = radians(lon)
+    nearby = []
+    for (pk, latitude, longitude, bio_short, specializations, hourly_rate, average_rating,
+         rating_count, user_id, username, first_name, last_name) in catalysts:
+        # Haversine formula
+        lat2 = radians(latitude)
+        dlat = lat2 - lat1
+        dlon = radians(longitude) - lon1
+        a = sin(dlat / 2) ** 2 + cos(lat1) * cos(lat2) * sin(dlon / 2) ** 2
+        distance = EARTH_RADIUS * 2 * atan2(sqrt(a), sqrt(1 - a))
+        if distance <= radius:
+            nearby.append({
+                'id': pk,
+                'user_id': user_id,
+                'name': f'{first_name} {last_name}'.strip() or username,
+                'username': username,
+                'bio': bio_short or '',
+                'latitude': latitude,
+                'longitude': longitude,
+                'specializations': specializations[:3] if specializations else [],
+                'hourly_rate': str(hourly_rate) if hourly_rate else None,
+                'distance': round(distance),
+                'average_rating': float(average_rating),
+                'rating_count': rating_count,
+            })
+
+    nearby.sort(key=lambda c: c['distance'])
+    # One cache read for the whole result
+    online = presence.online_user_ids([c['user_id'] for c in nearby])
+    for c in nearby:
+        c['online'] = c['user_id'] in online
+    return nearby
+
+
+# Versions
+
+def _version_key(user_id):
+    return f'seeker_feed_version_{user_id}'
+
+
+def bookings_version(user_id):
+    """Token that changes whenever the seeker's pending or matched sections may have changed."""
+    key = _version_key(user_id)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, uuid.uuid4().hex[:12], VERSION_TIMEOUT)
+        version = cache.get(key)
+    return version
+
+
+def invalidate(user_ids):
+    cache.delete_many([_version_key(user_id) for user_id in set(user_ids)])
+
+
+def nearby_version(lat, lon, radius):
+    count, version_sum, last_modified = conditional.get_catalyst_map_version()
+    raw = f'{count}:{version_sum}:{last_modified}:{lat}:{lon}:{radius}'
+    return hashlib.md5(raw.encode()).hexdigest()[:12]
+
+
+@outbox.handler('cache.seeker_feed', 'booking', 'rating', 'profile')
+def drop_versions(messages):
+    seeker_ids = set()
+    catalyst_ids = set()
+    for message in messages:
+        payload = message.payload
+        if message.topic.startswith('profile.'):
+            if payload['role'] == 'CATALYST':
+                catalyst_ids.add(payload['user_id'])
+        else:
+            seeker_ids.add(payload['seeker_id'])
+    if catalyst_ids:
+        # Pending and matched embed the catalyst's profile
+        seeker_ids.update(Booking.objects.filter(catalyst_id__in=catalyst_ids).values_list('seeker_id', flat=True).distinct())
+    invalidate(seeker_ids)
+
+
+# Feed
+
+def parse_since(value):
+    """'pending:abc,matched:def' -> {'pending': 'abc', 'matched': 'def'}"""
+    since = {}
+    for part in (value or '').split(','):
+        name, _, token = part.partition(':')
+        if name.strip() in SECTIONS and token.strip():
+            since[name.strip()] = token.strip()
+    return since
+
+
+def _in_thread(func, *args):
+    # Pool threads keep their own connections; drop ones past CONN_MAX_AGE or broken
+    close_old_connections()
+    try:
+        return func(*args)
+    finally:
+        close_old_connections()
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=getattr(settings, 'SEEKER_FEED_WORKERS', DEFAULT_WORKERS),
+                                           thread_name_prefix='seeker-feed')
+    return _executor
+
+
+def build_feed(user_id, sections=SECTIONS, since=None, lat=None, lon=None, radius=DEFAULT_RADIUS):
+    """
+    The requested sections as {name: {'version': token, 'results': [...]}},
+    or {'version': token, 'unchanged': True} where `since` holds the
+    current token. `nearby` needs lat / lon and is skipped without them.
+    """
+    since = since or {}
+    work = {}
+    feed = {}
+    if 'pending' in sections or 'matched' in sections:
+        version = bookings_version(user_id)
+        for name, func in (('pending', pending_bookings), ('matched', matched_bookings)):
+            if name in sections:
+                feed[name] = {'version': version}
+                if since.get(name) != version:
+                    work[name] = (func, user_id)
+    if 'nearby' in sections and lat is not None and lon is not None:
+        version = nearby_version(lat, lon, radius)
+        feed['nearby'] = {'version': version}
+        if since.get('nearby') != version:
+            work['nearby'] = (nearby_catalysts, lat, lon, radius)
+
+    if len(work) > 1 and getattr(settings, 'SEEKER_FEED_CONCURRENT', True):
+        executor = _get_executor()
+        futures = {name: executor.submit(_in_thread, *call) for name, call in work.items()}
+        results = {name: future.result() for name, future in futures.items()}
+    else:
+        results = {name: call[0](*call[1:]) for name, call in work.items()}
+
+    for name, section in feed.items():
+        if name in results:
+            section['results'] = results[name]
+            section['count'] = len(results[name])
+        else:
+            section['unchanged'] = True
+    return feed
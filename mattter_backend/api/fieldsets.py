@@ -0,0 +1,201 @@
+"""
+Sparse fieldsets: ?fields=id,user.username,average_rating.
+
+A dotted name selects a field of a nested serializer; a nested field named
+on its own (`user`) keeps all of its fields. Unknown names are a 400.
+
+SparseFieldsetMixin (serializers) only renders the requested fields.
+SparseFieldsetViewMixin (views) parses and validates ?fields= and passes
+the selection to the serializer. On reads it also narrows the queryset
+to the columns those fields need (.only() plus select_related for
+nested serializers), falling back to whole rows when a field's columns
+can't be worked out. Serializers list such fields in `sparse_sources`
+(e.g. a model property and the columns it reads).
+
+Writes are unaffected: validation sees every field, and only the
+response is trimmed.
+"""
+
+from django.core.exceptions import FieldDoesNotExist
+from rest_framework import exceptions, serializers
+from rest_framework.permissions import SAFE_METHODS
+
+_UNSET = object()
+
+
+def parse_fields(value):
+    """'id,user.username' -> {'id': {}, 'user': {'username': {}}}; None when not given."""
+    if value is None or not value.strip():
+        return None
+    tree = {}
+    for name in value.split(','):
+        name = name.strip()
+        if not name:
+            continue
+        node = tree
+        for part in name.split('.'):
+            node = node.setdefault(part, {})
+    return tree
+
+
+def _nested_serializer(field):
+    return field if isinstance(field, serializers.Serializer) else None
+
+
+def validate_fields(serializer, tree, extra=(), prefix=''):
+    """Raise ValueError naming any requested field `serializer` doesn't have."""
+    unknown = []
+    fields = serializer.fields
+    for name, subtree in tree.items():
+        field = fields.get(name)
+        if field is None or field.write_only:
+            if not (prefix == '' and name in extra and not subtree):
+                unknown.append(prefix + name)
+            continue
+        if subtree:
+            nested = _nested_serializer(field)
+            if nested is None:
+                unknown.extend(f'{prefix}{name}.{child}' for child in subtree)
+                continue
+            try:
+                validate_fields(nested, subtree, prefix=f'{prefix}{name}.')
+            except ValueError as e:
+                unknown.extend(e.args[0])
+    if unknown:
+        raise ValueError(unknown)
+
+
+def prune_data(data, tree):
+    """Trim already-serialized data (dicts, or lists of dicts) to `tree`."""
+    if not tree:
+        return data
+    if isinstance(data, list):
+        return [prune_data(item, tree) for item in data]
+    if not isinstance(data, dict):
+        return data
+    return {name: prune_data(value, tree[name]) for name, value in data.items() if name in tree}
+
+
+def only_paths(serializer, tree, prefix=''):
+    """
+    (only, select_related) lookups covering the fields in `tree` (all
+    readable fields when empty), or None when some field's columns can't be
+    determined.
+    """
+    model = serializer.Meta.model
+    sources = getattr(serializer, 'sparse_sources', {})
+    only, related = [], []
+    for name, field in serializer.fields.items():
+        if field.write_only or (tree and name not in tree):
+            continue
+        if name in sources:
+            only.extend(prefix + column for column in sources[name])
+            continue
+        if field.source == '*' or '.' in field.source:
+            return None
+        nested = _nested_serializer(field)
+        try:
+            model_field = model._meta.get_field(field.source)
+        except FieldDoesNotExist:
+            return None
+        if nested is not None:
+            if not model_field.is_relation or model_field.many_to_many or model_field.one_to_many:
+                return None
+            paths = only_paths(nested, (tree or {}).get(name) or {}, prefix=f'{prefix}{field.source}__')
+            if paths is None:
+                return None
+            related.append(prefix + field.source)
+            only.append(prefix + field.source)
+            only.extend(paths[0])
+            related.extend(paths[1])
+        elif model_field.concrete:
+            only.append(prefix + field.source)
+        else:
+            return None
+    return only, related
+
+
+class SparseFieldsetMixin:
+    """Serializer mixin: render only the fields selected with ?fields= (see module docstring)."""
+
+    # {serializer field: [model columns it reads]} for fields not backed by one column
+    sparse_sources = {}
+
+    sparse_fields = _UNSET
+
+    def _selected_fields(self):
+        if self.sparse_fields is not _UNSET:
+            return self.sparse_fields
+        # Only the top-level serializer reads the request's selection from the context
+        is_root = self.parent is None or (isinstance(self.parent, serializers.ListSerializer) and self.parent.parent is None)
+        return self.context.get('fields') if is_root else None
+
+    @property
+    def _readable_fields(self):
+        tree = self._selected_fields()
+        for field in super()._readable_fields:
+            if not tree:
+                yield field
+            elif field.field_name in tree:
+                if isinstance(field, serializers.Serializer):
+                    field.sparse_fields = tree[field.field_name] or None
+                yield field
+
+
+def requested_fields(request, serializer, extra=()):
+    """
+    The validated ?fields= selection for `serializer`, or None for all fields.
+    `extra` names top-level keys the view adds to the response itself.
+    """
+    tree = parse_fields(request.query_params.get('fields'))
+    if tree:
+        try:
+            validate_fields(serializer, tree, extra=extra)
+        except ValueError as e:
+            raise exceptions.ValidationError({'error': f"Unknown field(s): {', '.join(e.args[0])}"})
+    return tree
+
+
+def narrow_queryset(queryset, serializer, tree, also=()):
+    """
+    `queryset` limited to the columns the selected fields read, plus the
+    columns in `also` the view needs itself (unchanged if unknown).
+    Replaces the queryset's select_related with the joins the fields need.
+    """
+    paths = only_paths(serializer, tree) if tree else None
+    if paths is None:
+        return queryset
+    only, related = paths
+    queryset = queryset.select_related(None)
+    if related:
+        queryset = queryset.select_related(*related)
+    return queryset.only(*only, *also)
+
+
+class SparseFieldsetViewMixin:
+    """
+    View mixin: ?fields= for the view's serializer. Extra top-level names
+    the view adds to the response itself go in `sparse_extra_fields`, or
+    come from get_sparse_extra_fields() when only some actions add them.
+    """
+
+    sparse_extra_fields = ()
+
+    def get_sparse_extra_fields(self):
+        return self.sparse_extra_fields
+
+    def get_sparse_fields(self):
+        if not hasattr(self, '_sparse_fields'):
+            self._sparse_fields = requested_fields(self.request, self.get_serializer_class()(), self.get_sparse_extra_fields())
+        return self._sparse_fields
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context['fields'] = self.get_sparse_fields()
+        return context
+
+    def sparse_queryset(self, queryset):
+        """Narrow a read queryset to the selected fields' columns."""
+        if self.request.method not in SAFE_METHODS:
+            return queryset
+        return narrow_queryset(queryset, self.get_serializer_class()(), self.get_sparse_fields())
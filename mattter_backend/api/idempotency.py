@@ -0,0 +1,153 @@
+"""
+Idempotency keys for create endpoints (bookings, messages, ratings, reports).
+
+A client sends `Idempotency-Key: <unique value>` with a POST and reuses it
+when retrying. The first request claims the key (a unique row per user and
+key), runs, and stores its response in the same transaction as the rows it
+created. A retry gets that response back with `Idempotent-Replayed: true`
+and nothing runs again.
+
+A duplicate that arrives while the first request is still running waits up
+to IDEMPOTENCY_WAIT_SECONDS for it to finish, then gets a 409 with
+Retry-After. Reusing a key for a different request (method, path or body)
+is a 422. A claim whose request crashed is taken over after
+IDEMPOTENCY_LOCK_SECONDS.
+
+Requests that fail with an error (validation, permissions, 5xx) store
+nothing and roll back, so a retry runs again. Keys expire after
+IDEMPOTENCY_KEY_TTL_HOURS and are deleted by the idempotency.prune job.
+"""
+
+import hashlib
+import json
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.response import Response
+
+from . import jobs
+from .models import IdempotencyKey
+
+HEADER = 'Idempotency-Key'
+REPLAYED_HEADER = 'Idempotent-Replayed'
+MAX_KEY_LENGTH = 255
+DEFAULT_TTL_HOURS = 24
+DEFAULT_WAIT_SECONDS = 5
+DEFAULT_LOCK_SECONDS = 60
+POLL_INTERVAL = 0.05
+
+
+def _ttl():
+    return timedelta(hours=getattr(settings, 'IDEMPOTENCY_KEY_TTL_HOURS', DEFAULT_TTL_HOURS))
+
+
+def fingerprint(request):
+    body = json.dumps(request.data, sort_keys=True, default=str)
+    return hashlib.sha256(f'{request.method} {request.path}\n{body}'.encode()).hexdigest()
+
+
+def claim(user_id, key, digest):
+    """
+    (record, claimed). claimed is True when this request owns the key and
+    should run; otherwise `record` is the other request's, finished or
+    (after waiting) still running.
+    """
+    deadline = time.monotonic() + getattr(settings, 'IDEMPOTENCY_WAIT_SECONDS', DEFAULT_WAIT_SECONDS)
+    lock_seconds = getattr(settings, 'IDEMPOTENCY_LOCK_SECONDS', DEFAULT_LOCK_SECONDS)
+    while True:
+        try:
+            with transaction.atomic():
+                return IdempotencyKey.objects.create(user_id=user_id, key=key, fingerprint=digest), True
+        except IntegrityError:
+            pass
+        record = IdempotencyKey.objects.filter(user_id=user_id, key=key).first()
+        if record is None:
+            continue  # released in the meantime
+        now = timezone.now()
+        if record.created_at < now - _ttl():
+            # Expired but not pruned yet: the key is free again
+            IdempotencyKey.objects.filter(pk=record.pk, created_at=record.created_at).delete()
+            continue
+        if record.status_code is not None or record.fingerprint != digest:
+            return record, False
+        if record.created_at < now - timedelta(seconds=lock_seconds):
+            # The request holding the claim never finished; take it over
+            taken = IdempotencyKey.objects.filter(pk=record.pk, status_code__isnull=True,
+                                                  created_at=record.created_at).update(created_at=now)
+            if taken:
+                record.created_at = now
+                return record, True
+            continue
+        if time.monotonic() >= deadline:
+            return record, False
+        time.sleep(POLL_INTERVAL)
+
+
+def release(record):
+    IdempotencyKey.objects.filter(pk=record.pk, status_code__isnull=True).delete()
+
+
+def replay(record):
+    headers = {REPLAYED_HEADER: 'true'}
+    if record.location:
+        headers['Location'] = record.location
+    return Response(record.response, status=record.status_code, headers=headers)
+
+
+def handle(request, key, run):
+    """Run `run()` (returning the view's Response) at most once per user and key."""
+    if not key or len(key) > MAX_KEY_LENGTH:
+        return Response({"error": f"{HEADER} must be 1-{MAX_KEY_LENGTH} characters"},
+                        status=status.HTTP_400_BAD_REQUEST)
+
+    digest = fingerprint(request)
+    record, claimed = claim(request.user.pk, key, digest)
+    if not claimed:
+        if record.fingerprint != digest:
+            return Response({"error": f"{HEADER} was already used for a different request"},
+                            status=status.HTTP_422_UNPROCESSABLE_ENTITY)
+        if record.status_code is None:
+            return Response({"error": f"A request with this {HEADER} is still in progress"},
+                            status=status.HTTP_409_CONFLICT, headers={'Retry-After': '1'})
+        return replay(record)
+
+    stored = False
+    try:
+        with transaction.atomic():
+            response = run()
+            if response.status_code >= 400:
+                # An error response rather than an exception: undo what run() wrote anyway
+                transaction.set_rollback(True)
+            else:
+                # Committed together with whatever the request created
+                IdempotencyKey.objects.filter(pk=record.pk).update(
+                    status_code=response.status_code,
+                    response=response.data,
+                    location=response.get('Location', ''),
+                )
+        stored = response.status_code < 400
+    finally:
+        if not stored:
+            release(record)
+    return response
+
+
+class IdempotentCreateMixin:
+    """ViewSet mixin: honour the Idempotency-Key header on create (see module docstring)."""
+
+    def create(self, request, *args, **kwargs):
+        key = request.headers.get(HEADER)
+        if key is None:
+            return super().create(request, *args, **kwargs)
+        return handle(request, key.strip(), lambda: super(IdempotentCreateMixin, self).create(request, *args, **kwargs))
+
+
+@jobs.task('idempotency.prune')
+def prune():
+    """Delete keys older than IDEMPOTENCY_KEY_TTL_HOURS."""
+    deleted, _ = IdempotencyKey.objects.filter(created_at__lt=timezone.now() - _ttl()).delete()
+    return deleted
@@ -0,0 +1,226 @@
+"""
+Image feature extraction for wardrobe items.
+
+Pure Pillow + numpy, with no Django imports, so these functions can run
+in worker processes started with the `spawn` method without setting up
+Django.
+"""
+
+import numpy as np
+from PIL import Image, ImageOps
+
+FEATURES_VERSION = 2
+
+# Images are decoded once at DECODE_SIZE; colours are clustered at ANALYSIS_SIZE
+DECODE_SIZE = 256
+ANALYSIS_SIZE = 96
+
+COLOR_PALETTE = [
+    ('black', (20, 20, 20)),
+    ('white', (245, 245, 245)),
+    ('grey', (128, 128, 128)),
+    ('navy', (25, 35, 90)),
+    ('blue', (40, 90, 200)),
+    ('light blue', (150, 190, 230)),
+    ('teal', (0, 128, 128)),
+    ('green', (50, 140, 60)),
+    ('olive', (110, 110, 40)),
+    ('yellow', (240, 210, 50)),
+    ('orange', (235, 130, 35)),
+    ('red', (200, 30, 40)),
+    ('maroon', (120, 20, 35)),
+    ('pink', (240, 150, 180)),
+    ('purple', (120, 60, 150)),
+    ('beige', (220, 200, 160)),
+    ('brown', (120, 75, 40)),
+]
+_PALETTE_NAMES = [name for name, _ in COLOR_PALETTE]
+_PALETTE_RGB = np.array([rgb for _, rgb in COLOR_PALETTE], dtype=np.float32)
+
+
+def open_image(path, size=DECODE_SIZE):
+    """Decode, apply EXIF rotation and downscale to at most size x size (RGB)."""
+    with Image.open(path) as img:
+        img.draft('RGB', (size, size))  # cheap JPEG downscale while decoding
+        img = ImageOps.exif_transpose(img).convert('RGB')
+        img.thumbnail((size, size), Image.Resampling.BILINEAR)
+        return img
+
+
+def rgb_array(img, size=ANALYSIS_SIZE):
+    small = img.copy()
+    small.thumbnail((size, size), Image.Resampling.BILINEAR)
+    return np.asarray(small, dtype=np.float32)
+
+
+def foreground_mask(pixels, threshold=40.0):
+    """
+    Mask out a roughly uniform background (product photos on plain backdrops).
+    The background colour is estimated from the border; if removing it would
+    leave too little, everything is kept.
+    """
+    border = np.concatenate([pixels[0], pixels[-1], pixels[:, 0], pixels[:, -1]])
+    background = np.median(border, axis=0)
+    distance = np.sqrt(((pixels - background) ** 2).sum(axis=-1))
+    mask = distance > threshold
+    if mask.mean() < 0.2:
+        return np.ones(pixels.shape[:2], dtype=bool)
+    return mask
+
+
+def kmeans(points, k, iterations=15, seed=0):
+    """
+    Vectorised k-means with k-means++ seeding.
+    Returns (centers, counts) sorted by cluster size, largest first.
+    """
+    rng = np.random.default_rng(seed)
+    n = len(points)
+    k = min(k, n)
+
+    centers = np.empty((k, points.shape[1]), dtype=np.float32)
+    centers[0] = points[rng.integers(n)]
+    closest = ((points - centers[0]) ** 2).sum(axis=1)
+    for i in range(1, k):
+        total = closest.sum()
+        index = rng.choice(n, p=closest / total) if total > 0 else rng.integers(n)
+        centers[i] = points[index]
+        closest = np.minimum(closest, ((points - centers[i]) ** 2).sum(axis=1))
+
+    point_sq = (points ** 2).sum(axis=1)[:, None]
+    for _ in range(iterations):
+        # |p - c|^2 = |p|^2 - 2 p.c + |c|^2, computed for all pairs at once
+        distances = point_sq - 2 * points @ centers.T + (centers ** 2).sum(axis=1)[None, :]
+        labels = distances.argmin(axis=1)
+        counts = np.bincount(labels, minlength=k)
+        sums = np.stack([np.bincount(labels, weights=points[:, c], minlength=k)
+                         for c in range(points.shape[1])], axis=1)
+        updated = np.where(counts[:, None] > 0, sums / np.maximum(counts, 1)[:, None], centers)
+        if np.allclose(updated, centers, atol=0.5):
+            centers = updated.astype(np.float32)
+            break
+        centers = updated.astype(np.float32)
+
+    order = np.argsort(-counts)
+    return centers[order], counts[order]
+
+
+def nearest_color_names(rgb):
+    """Map (n, 3) RGB rows to palette names using the 'redmean' perceptual distance."""
+    rgb = np.atleast_2d(rgb).astype(np.float32)
+    mean_r = (rgb[:, None, 0] + _PALETTE_RGB[None, :, 0]) / 2
+    diff = rgb[:, None, :] - _PALETTE_RGB[None, :, :]
+    distance = ((2 + mean_r / 256) * diff[..., 0] ** 2
+                + 4 * diff[..., 1] ** 2
+                + (2 + (255 - mean_r) / 256) * diff[..., 2] ** 2)
+    return [_PALETTE_NAMES[i] for i in distance.argmin(axis=1)]
+
+
+def _bits_to_hex(bits):
+    return '%016x' % int(''.join('1' if b else '0' for b in bits.ravel()), 2)
+
+
+def _grayscale(img, size):
+    return np.asarray(img.convert('L').resize(size, Image.Resampling.LANCZOS), dtype=np.float32)
+
+
+def _dct_matrix(n):
+    k = np.arange(n)[:, None]
+    i = np.arange(n)[None, :]
+    matrix = np.cos(np.pi * (2 * i + 1) * k / (2 * n)) * np.sqrt(2 / n)
+    matrix[0] /= np.sqrt(2)
+    return matrix.astype(np.float32)
+
+
+_DCT32 = _dct_matrix(32)
+
+
+def perceptual_hashes(img):
+    """64-bit average, difference and DCT (pHash) hashes as 16-char hex strings."""
+    small = _grayscale(img, (8, 8))
+    ahash = small > small.mean()
+
+    wide = _grayscale(img, (9, 8))
+    dhash = wide[:, 1:] > wide[:, :-1]
+
+    gray = _grayscale(img, (32, 32))
+    low = (_DCT32 @ gray @ _DCT32.T)[:8, :8]
+    phash = low > np.median(low.ravel()[1:])  # median without the DC term
+
+    return {'ahash': _bits_to_hex(ahash), 'dhash': _bits_to_hex(dhash), 'phash': _bits_to_hex(phash)}
+
+
+def color_embedding(pixels, mask, bins=4):
+    """
+    Compact visual embedding: a bins**3 RGB histogram of the foreground,
+    square-rooted (Hellinger) and L2-normalised so a dot product is the
+    cosine similarity. Returned as float16 bytes (128 bytes for 4 bins).
+    """
+    points = pixels[mask].reshape(-1, 3)
+    quantised = np.minimum((points * (bins / 256.0)).astype(np.int32), bins - 1)
+    codes = (quantised[:, 0] * bins + quantised[:, 1]) * bins + quantised[:, 2]
+    histogram = np.sqrt(np.bincount(codes, minlength=bins ** 3).astype(np.float32))
+    norm = np.linalg.norm(histogram)
+    if norm > 0:
+        histogram /= norm
+    return histogram.astype(np.float16).tobytes()
+
+
+def category_hints(mask):
+    """Rough garment category guesses from the foreground bounding box shape."""
+    rows = np.flatnonzero(mask.any(axis=1))
+    cols = np.flatnonzero(mask.any(axis=0))
+    if not len(rows) or not len(cols):
+        return [], 1.0
+    aspect = (rows[-1] - rows[0] + 1) / (cols[-1] - cols[0] + 1)
+    if aspect >= 1.6:
+        hints = ['Dress', 'Bottom']
+    elif aspect >= 1.15:
+        hints = ['Top', 'Outerwear', 'Bottom']
+    elif aspect >= 0.75:
+        hints = ['Top', 'Accessory']
+    else:
+        hints = ['Shoes', 'Accessory']
+    return hints, round(float(aspect), 3)
+
+
+def extract_features(path, n_colors=5):
+    """
+    All features for one image: dominant colours, category hints,
+    perceptual hashes and the binary `embedding` (not JSON-serialisable;
+    callers store it separately). Safe to call in a worker process.
+    """
+    img = open_image(path)
+    pixels = rgb_array(img)
+    mask = foreground_mask(pixels)
+    points = pixels[mask].reshape(-1, 3)
+
+    centers, counts = kmeans(points, n_colors)
+    names = nearest_color_names(centers)
+    total = counts.sum() or 1
+
+    dominant = []
+    for center, count, name in zip(centers, counts, names):
+        if count == 0:
+            continue
+        r, g, b = (int(round(v)) for v in center)
+        dominant.append({'hex': f'#{r:02x}{g:02x}{b:02x}', 'name': name, 'share': round(float(count / total), 3)})
+
+    hints, aspect = category_hints(mask)
+
+    return {
+        'version': FEATURES_VERSION,
+        'dominant_colors': dominant,
+        'primary_color': dominant[0]['name'] if dominant else '',
+        'category_hints': hints,
+        'aspect_ratio': aspect,
+        'embedding': color_embedding(pixels, mask),
+        **perceptual_hashes(img),
+    }
+
+
+def safe_extract_features(path):
+    """extract_features() for pool workers: returns (features, None) or (None, error)."""
+    try:
+        return extract_features(path), None
+    except Exception as e:  # corrupt / unsupported image - report it, don't kill the worker
+        return None, f'{type(e).__name__}: {e}'
@@ -0,0 +1,60 @@
+"""
+Conversation inbox: one row per booking the user is part of, with the last
+message, unread count and counterpart, newest activity first.
+
+Everything comes from one query. The last message fields and the unread
+count are correlated subqueries per booking row, served by
+message_booking_time_idx and message_booking_read_idx. Pages are keyset
+paginated on the computed last_activity (InboxCursorPagination).
+"""
+
+from django.db.models import Count, IntegerField, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce, Left
+
+from .models import Booking, Message
+
+SNIPPET_LENGTH = 140
+
+
+def inbox_queryset(user_id):
+    latest = Message.objects.filter(booking=OuterRef('pk')).order_by('-timestamp', '-id')
+    unread = (Message.objects.filter(booking=OuterRef('pk'), is_read=False).exclude(sender_id=user_id)
+              .order_by().values('booking').annotate(count=Count('id')).values('count'))
+    return (
+        Booking.objects.filter(Q(seeker_id=user_id) | Q(catalyst_id=user_id))
+        .annotate(
+            last_message_at=Subquery(latest.values('timestamp')[:1]),
+            last_message=Subquery(latest.annotate(snippet=Left('content', SNIPPET_LENGTH)).values('snippet')[:1]),
+            last_sender_id=Subquery(latest.values('sender_id')[:1]),
+            unread_count=Coalesce(Subquery(unread, output_field=IntegerField()), 0),
+            last_activity=Coalesce(Subquery(latest.values('timestamp')[:1]), 'created_at'),
+        )
+        .values(
+            'id', 'status', 'scheduled_time', 'created_at', 'seeker_id', 'catalyst_id',
+            'seeker__username', 'seeker__first_name', 'seeker__last_name',
+            'catalyst__username', 'catalyst__first_name', 'catalyst__last_name',
+            'last_message_at', 'last_message', 'last_sender_id', 'unread_count', 'last_activity',
+        )
+    )
+
+
+def inbox_row(row, user_id):
+    role = 'catalyst' if row['seeker_id'] == user_id else 'seeker'
+    name = f"{row[role + '__first_name']} {row[role + '__last_name']}".strip()
+    last_message = None
+    if row['last_message_at'] is not None:
+        last_message = {
+            'content': row['last_message'],
+            'timestamp': row['last_message_at'],
+            'sender_id': row['last_sender_id'],
+            'is_mine': row['last_sender_id'] == user_id,
+        }
+    return {
+        'booking_id': row['id'],
+        'status': row['status'],
+        'scheduled_time': row['scheduled_time'],
+        'counterpart': {'id': row[role + '_id'], 'name': name or row[role + '__username'], 'role': role.upper()},
+        'last_message': last_message,
+        'unread_count': row['unread_count'],
+        'last_activity': row['last_activity'],
+    }
@@ -0,0 +1,301 @@
+"""
+Durable background jobs backed by the Job table - no external broker.
+
+Tasks are plain functions registered with @task('name'). enqueue() inserts
+a Job row inside the caller's transaction, so a job exists exactly when
+the work that asked for it was committed. Workers claim rows one at a time:
+with SELECT ... FOR UPDATE SKIP LOCKED where the database supports it
+(PostgreSQL), otherwise with a compare-and-swap UPDATE on the row's status
+(SQLite). A claimed job holds a lease (JOB_LEASE_SECONDS); a worker that
+dies mid-job leaves a RUNNING row whose lease expires and is claimed again.
+
+Failures are retried with exponential backoff until max_attempts, then
+the row is left FAILED with its traceback. Every run records start time,
+queue wait and duration (see stats()).
+
+Workers run as `manage.py run_workers` (thread and process pools), and
+JOBS_IN_PROCESS_WORKERS threads inside the web process, started when the
+WSGI / ASGI application loads, keep single-process deployments and local
+runs working without a separate worker. JOB_SCHEDULE lists periodic tasks;
+one job is enqueued per task per interval however many workers are running.
+"""
+
+import importlib
+import logging
+import os
+import random
+import socket
+import threading
+import time
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, close_old_connections, connection, transaction
+from django.db.models import Avg, Count, F, Max, Q
+from django.utils import timezone
+
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+# Modules whose @task functions workers must know about
+TASK_MODULES = ['api.jobs', 'api.events', 'api.idempotency', 'api.outbox', 'api.ratings', 'api.tagging', 'api.user_deletion', 'api.wardrobe_batch']
+
+DEFAULT_MAX_ATTEMPTS = 5
+DEFAULT_LEASE_SECONDS = 300
+
+_registry = {}
+_tasks_loaded = False
+
+
+def task(name, max_attempts=DEFAULT_MAX_ATTEMPTS, retry_delay=None):
+    """Register a function as the job `name`. `retry_delay` overrides JOB_RETRY_BASE_DELAY (seconds)."""
+    def register(func):
+        _registry[name] = {'func': func, 'max_attempts': max_attempts, 'retry_delay': retry_delay}
+        return func
+    return register
+
+
+def _load_tasks():
+    global _tasks_loaded
+    if not _tasks_loaded:
+        for module in TASK_MODULES:
+            importlib.import_module(module)
+        _tasks_loaded = True
+
+
+def enqueue(name, *args, run_at=None, delay=None, dedupe_key=None, **kwargs):
+    """
+    Queue `name(*args, **kwargs)` to run after the current transaction
+    commits. With `dedupe_key`, returns None instead of queuing a second
+    job while one with the same key is still waiting.
+    """
+    _load_tasks()
+    if name not in _registry:
+        raise ValueError(f'Unknown job {name!r}')
+    if run_at is None:
+        run_at = timezone.now() + timedelta(seconds=delay or 0)
+    if dedupe_key is not None and Job.objects.filter(dedupe_key=dedupe_key, status='QUEUED').exists():
+        return None
+    try:
+        with transaction.atomic():
+            job = Job.objects.create(name=name, args=list(args), kwargs=kwargs, run_at=run_at,
+                                     dedupe_key=dedupe_key, max_attempts=_registry[name]['max_attempts'])
+    except IntegrityError:
+        if dedupe_key is None:
+            raise
+        return None  # lost a race with another enqueue of the same key
+    transaction.on_commit(_wake_in_process_workers)
+    return job
+
+
+# Claiming
+
+def _claimable(now):
+    return Q(status='QUEUED', run_at__lte=now) | Q(status='RUNNING', locked_until__lt=now)
+
+
+def _lease(worker_id, now):
+    return {
+        'status': 'RUNNING',
+        'locked_by': worker_id,
+        'locked_until': now + timedelta(seconds=getattr(settings, 'JOB_LEASE_SECONDS', DEFAULT_LEASE_SECONDS)),
+        'started_at': now,
+        'attempts': F('attempts') + 1,
+    }
+
+
+def claim(worker_id):
+    """Lease the next due job to `worker_id`. Returns the Job or None."""
+    now = timezone.now()
+    if connection.features.has_select_for_update_skip_locked:
+        with transaction.atomic():
+            job = (Job.objects.select_for_update(skip_locked=True).filter(_claimable(now))
+                   .order_by('run_at', 'id').only('id').first())
+            if job is None:
+                return None
+            Job.objects.filter(pk=job.pk).update(**_lease(worker_id, now))
+        return Job.objects.get(pk=job.pk)
+
+    # No row locks: take the first candidate whose status is still what we saw
+    candidates = Job.objects.filter(_claimable(now)).order_by('run_at', 'id').values_list('id', flat=True)[:10]
+    for pk in candidates:
+        if Job.objects.filter(_claimable(now), pk=pk).update(**_lease(worker_id, now)):
+            return Job.objects.get(pk=pk)
+    return None
+
+
+def _retry_delay(job, entry):
+    base = entry['retry_delay'] if entry and entry['retry_delay'] is not None else getattr(settings, 'JOB_RETRY_BASE_DELAY', 10)
+    delay = min(base * 2 ** (job.attempts - 1), getattr(settings, 'JOB_RETRY_MAX_DELAY', 3600))
+    return delay * random.uniform(0.8, 1.2)  # jitter so failed batches don't retry in lockstep
+
+
+def execute(job, worker_id):
+    """Run a claimed job and record the outcome. Returns True on success."""
+    _load_tasks()
+    entry = _registry.get(job.name)
+    started = time.perf_counter()
+    error = None
+    try:
+        if entry is None:
+            raise LookupError(f'Unknown job {job.name!r}')
+        entry['func'](*job.args, **job.kwargs)
+    except Exception:
+        error = traceback.format_exc()
+        logger.exception('Job %s #%s failed (attempt %s/%s)', job.name, job.pk, job.attempts, job.max_attempts)
+    duration_ms = (time.perf_counter() - started) * 1000
+    now = timezone.now()
+
+    # Only the lease holder records the result; a reclaimed job belongs to someone else now
+    mine = Job.objects.filter(pk=job.pk, locked_by=worker_id, status='RUNNING')
+    if error is None:
+        mine.update(status='SUCCEEDED', finished_at=now, duration_ms=duration_ms, locked_until=None, last_error='')
+        logger.info('Job %s #%s succeeded in %.1f ms', job.name, job.pk, duration_ms)
+        return True
+    if entry is not None and job.attempts < job.max_attempts:
+        try:
+            with transaction.atomic():
+                mine.update(status='QUEUED', run_at=now + timedelta(seconds=_retry_delay(job, entry)),
+                            duration_ms=duration_ms, locked_until=None, last_error=error)
+            return False
+        except IntegrityError:
+            # A newer job with the same dedupe key is already queued and will do this work
+            error += '\nNot retried: superseded by a queued job with the same dedupe key'
+    mine.update(status='FAILED', finished_at=now, duration_ms=duration_ms, locked_until=None, last_error=error)
+    return False
+
+
+# Periodic tasks
+
+_schedule_slots = {}
+
+
+def schedule_due():
+    """
+    Enqueue each JOB_SCHEDULE task ({name: interval seconds}) once per
+    interval. The dedupe key names the interval, so workers racing on the
+    same slot queue it only once.
+    """
+    now = time.time()
+    for name, interval in getattr(settings, 'JOB_SCHEDULE', {}).items():
+        slot = int(now // interval)
+        if _schedule_slots.get(name) == slot:
+            continue
+        key = f'periodic:{name}:{slot}'
+        if not Job.objects.filter(dedupe_key=key).exists():
+            enqueue(name, dedupe_key=key)
+        _schedule_slots[name] = slot
+
+
+@task('jobs.prune')
+def prune(days=None):
+    """Delete finished jobs older than JOB_RETENTION_DAYS."""
+    cutoff = timezone.now() - timedelta(days=days or getattr(settings, 'JOB_RETENTION_DAYS', 7))
+    deleted, _ = Job.objects.filter(status__in=['SUCCEEDED', 'FAILED'], finished_at__lt=cutoff).delete()
+    return deleted
+
+
+# Workers
+
+def worker_id(suffix=''):
+    return f'{socket.gethostname()}:{os.getpid()}{suffix}'
+
+
+def work(worker_name, stop, poll_interval=1.0, once=False, schedule=False, wake=None):
+    """
+    Claim and run jobs until `stop` is set (or, with `once`, until nothing
+    is due). `wake` is an Event that cuts the idle wait short.
+    """
+    _load_tasks()
+    while not stop.is_set():
+        try:
+            if schedule:
+                schedule_due()
+            job = claim(worker_name)
+            if job is not None:
+                execute(job, worker_name)
+                continue
+        except Exception:
+            logger.exception('Worker %s failed to claim a job', worker_name)
+        finally:
+            close_old_connections()
+        if once:
+            return
+        if wake is not None:
+            wake.wait(poll_interval)
+            wake.clear()
+        else:
+            stop.wait(poll_interval)
+
+
+def start_threads(count, stop, poll_interval=1.0, once=False, wake=None, name='jobs'):
+    """Start `count` worker threads (the first also schedules periodic tasks) and return them."""
+    threads = []
+    for i in range(count):
+        thread = threading.Thread(
+            target=work, args=(worker_id(f':{name}-{i}'), stop),
+            kwargs={'poll_interval': poll_interval, 'once': once, 'schedule': i == 0 and not once, 'wake': wake},
+            name=f'{name}-{i}', daemon=True,
+        )
+        thread.start()
+        threads.append(thread)
+    return threads
+
+
+_in_process = {'threads': [], 'lock': threading.Lock(), 'stop': threading.Event(), 'wake': threading.Event(),
+               'disabled': False}
+
+
+def disable_in_process_workers():
+    """Called by run_workers, whose own threads already serve the queue."""
+    _in_process['disabled'] = True
+
+
+def start_in_process_workers():
+    """
+    Start the JOBS_IN_PROCESS_WORKERS threads (the first also runs
+    JOB_SCHEDULE) unless they are running or disabled. Only the WSGI / ASGI
+    entry points call this: shells and management commands that enqueue
+    jobs leave them to the workers.
+    """
+    count = getattr(settings, 'JOBS_IN_PROCESS_WORKERS', 0)
+    if not count or _in_process['disabled']:
+        return
+    with _in_process['lock']:
+        if not any(thread.is_alive() for thread in _in_process['threads']):
+            _in_process['threads'] = start_threads(
+                count, _in_process['stop'], getattr(settings, 'JOB_POLL_INTERVAL', 1.0),
+                wake=_in_process['wake'], name='jobs-inprocess',
+            )
+
+
+def _wake_in_process_workers():
+    # Cuts the idle wait short when this process runs workers; a no-op otherwise
+    if _in_process['threads']:
+        _in_process['wake'].set()
+
+
+# Metrics
+
+def stats(hours=24):
+    """Queue depth per status, and per-task run counts and timings over the last `hours`."""
+    since = timezone.now() - timedelta(hours=hours)
+    depth = {row['status']: row['count'] for row in
+             Job.objects.values('status').order_by().annotate(count=Count('id'))}
+    tasks = {}
+    for row in (Job.objects.filter(finished_at__gte=since).values('name', 'status').order_by()
+                .annotate(count=Count('id'), avg_ms=Avg('duration_ms'), max_ms=Max('duration_ms'),
+                          avg_attempts=Avg('attempts'))):
+        entry = tasks.setdefault(row['name'], {'succeeded': 0, 'failed': 0})
+        entry[row['status'].lower()] = row['count']
+        if row['status'] == 'SUCCEEDED':
+            entry.update(avg_ms=round(row['avg_ms'] or 0, 1), max_ms=round(row['max_ms'] or 0, 1),
+                         avg_attempts=round(row['avg_attempts'] or 0, 2))
+    for row in (Job.objects.filter(started_at__gte=since).values('name').order_by()
+                .annotate(avg_wait=Avg(F('started_at') - F('run_at')))):
+        wait = row['avg_wait']
+        if wait is not None and row['name'] in tasks:
+            tasks[row['name']]['avg_wait_ms'] = round(wait.total_seconds() * 1000, 1)
+    return {'queue': depth, 'tasks': tasks, 'hours': hours}
@@ -0,0 +1,109 @@
+"""
+Benchmark login throughput through the full request stack.
+
+Creates throwaway users inside a transaction that is rolled back at the end,
+so it is safe to run against a development database. The cache is shared
+with the running app (and other processes, with REDIS_URL), so only the
+entries the benchmark's logins wrote are deleted afterwards.
+
+Usage:
+    python manage.py bench_login --users 20 --rounds 5
+    python manage.py bench_login --iterations 100000 --password-cache 300
+"""
+
+import time
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from api.auth_views import CustomAuthToken
+from api.cached_auth import token_cache_key
+from api.hashers import hash_passwords, verified_password_key
+from api.models import User, Profile
+
+PASSWORD = 'bench-password-123'
+
+
+class Command(BaseCommand):
+    help = 'Measure login requests/second, latency and queries per login'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=20)
+        parser.add_argument('--rounds', type=int, default=5, help='Logins per user')
+        parser.add_argument('--iterations', type=int, default=None,
+                            help='Override PASSWORD_HASH_ITERATIONS for the run')
+        parser.add_argument('--password-cache', type=int, default=0,
+                            help='LOGIN_PASSWORD_CACHE_TIMEOUT for the run (0 = off)')
+
+    def handle(self, *args, **options):
+        overrides = {
+            'LOGIN_PASSWORD_CACHE_TIMEOUT': options['password_cache'],
+            'ALLOWED_HOSTS': ['*'],
+        }
+        if options['iterations']:
+            overrides['PASSWORD_HASH_ITERATIONS'] = options['iterations']
+
+        # Throttles would reject the benchmark itself
+        throttle_classes = CustomAuthToken.throttle_classes
+        CustomAuthToken.throttle_classes = []
+        try:
+            with override_settings(**overrides), transaction.atomic():
+                self.run(options)
+                transaction.set_rollback(True)
+        finally:
+            CustomAuthToken.throttle_classes = throttle_classes
+
+    def run(self, options):
+        n_users = options['users']
+        usernames = [f'bench_login_{i}' for i in range(n_users)]
+        hashes = hash_passwords([PASSWORD] * n_users)
+        users = User.objects.bulk_create([
+            User(username=name, password=pw_hash) for name, pw_hash in zip(usernames, hashes)
+        ])
+        if any(u.pk is None for u in users):
+            users = list(User.objects.filter(username__in=usernames))
+        Profile.objects.bulk_create([Profile(user=u, role='CATALYST') for u in users])
+
+        client = APIClient()
+        try:
+            self.measure(client, usernames, options)
+        finally:
+            cache.delete_many(self.cache_keys(users, hashes))
+
+    def cache_keys(self, users, initial_hashes):
+        """Cache entries the logins may have written for the benchmark users."""
+        keys = [token_cache_key(key) for key in Token.objects.filter(user__in=users).values_list('key', flat=True)]
+        # Keyed on the stored hash, which a login may have upgraded
+        current = User.objects.filter(pk__in=[u.pk for u in users])
+        for user in [*current, *(User(pk=u.pk, password=h) for u, h in zip(users, initial_hashes))]:
+            keys.append(verified_password_key(user, PASSWORD))
+        return keys
+
+    def measure(self, client, usernames, options):
+        latencies = []
+        query_counts = []
+        started = time.perf_counter()
+        for _ in range(options['rounds']):
+            for name in usernames:
+                t0 = time.perf_counter()
+                with CaptureQueriesContext(connection) as queries:
+                    response = client.post('/api/login/', {'username': name, 'password': PASSWORD}, format='json')
+                latencies.append(time.perf_counter() - t0)
+                query_counts.append(len(queries))
+                if response.status_code != 200:
+                    self.stderr.write(f'Login failed for {name}: {response.status_code} {response.content[:200]}')
+                    return
+        elapsed = time.perf_counter() - started
+
+        latencies.sort()
+        total = len(latencies)
+        self.stdout.write(f'logins:           {total}')
+        self.stdout.write(f'throughput:       {total / elapsed:.1f} logins/s')
+        self.stdout.write(f'latency p50:      {latencies[total // 2] * 1000:.1f} ms')
+        self.stdout.write(f'latency p95:      {latencies[int(total * 0.95) - 1] * 1000:.1f} ms')
+        self.stdout.write(f'queries/login:    first {query_counts[0]}, steady {query_counts[-1]}')
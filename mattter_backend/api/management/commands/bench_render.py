@@ -0,0 +1,98 @@
+"""
+Benchmark JSON rendering and compression for a large all_catalysts payload.
+
+Builds a synthetic response with the same shape as
+ProfileViewSet.all_catalysts (no database needed) and reports render CPU
+and bytes on the wire for each renderer / encoding combination.
+
+Usage:
+    python manage.py bench_render
+    python manage.py bench_render --catalysts 10000 --repeat 20
+"""
+
+import gzip
+import random
+import statistics
+import time
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from rest_framework.renderers import JSONRenderer
+
+from api.renderers import ORJSONRenderer
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - optional dependency
+    brotli = None
+
+
+def build_payload(n):
+    rng = random.Random(42)
+    first_names = ['Aanya', 'Rohan', 'Meera', 'Kabir', 'Isha', 'Arjun', 'Diya', 'Vihaan']
+    last_names = ['Sharma', 'Patel', 'Iyer', 'Khan', 'Reddy', 'Das', 'Nair', 'Gupta']
+    taglines = ['Contemporary styling for everyday confidence', 'Saree draping and fusion wear',
+                'Office wear makeovers', 'Sustainable wardrobe edits', '']
+    return [{
+        'id': i,
+        'user_id': i + 1000,
+        'name': f'{rng.choice(first_names)} {rng.choice(last_names)}',
+        'username': f'catalyst_{i}',
+        'bio': rng.choice(taglines),
+        'gender': rng.choice(['MALE', 'FEMALE', 'OTHERS', None]),
+        'age': rng.randint(21, 60),
+        'latitude': 12.9 + rng.random(),
+        'longitude': 77.5 + rng.random(),
+        'hourly_rate': str(Decimal(rng.randint(200, 5000))) + '.00',
+        'average_rating': round(rng.uniform(0, 5), 2),
+        'rating_count': rng.randint(0, 500),
+    } for i in range(n)]
+
+
+def timed(func, repeat):
+    samples = []
+    result = None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        result = func()
+        samples.append(time.perf_counter() - t0)
+    return result, statistics.median(samples) * 1000
+
+
+class Command(BaseCommand):
+    help = 'Compare render CPU and wire size for a large all_catalysts response'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--catalysts', type=int, default=10000)
+        parser.add_argument('--repeat', type=int, default=10)
+
+    def handle(self, *args, **options):
+        payload = build_payload(options['catalysts'])
+        repeat = options['repeat']
+        context = {}
+
+        renderers = [('JSONRenderer', JSONRenderer()), ('ORJSONRenderer', ORJSONRenderer())]
+        gzip_level = getattr(settings, 'API_GZIP_LEVEL', 6)
+        brotli_quality = getattr(settings, 'API_BROTLI_QUALITY', 4)
+
+        self.stdout.write(f"{options['catalysts']} catalysts, median of {repeat} runs\n")
+        self.stdout.write(f"{'renderer':<16}{'encoding':<12}{'bytes':>12}{'render ms':>12}{'encode ms':>12}{'total ms':>12}")
+
+        for name, renderer in renderers:
+            body, render_ms = timed(lambda: renderer.render(payload, 'application/json', context), repeat)
+            encodings = [('identity', lambda: body),
+                         (f'gzip-{gzip_level}', lambda: gzip.compress(body, compresslevel=gzip_level, mtime=0))]
+            if brotli is not None:
+                encodings.append((f'br-{brotli_quality}',
+                                  lambda: brotli.compress(body, mode=brotli.MODE_TEXT, quality=brotli_quality)))
+
+            for encoding, encode in encodings:
+                encoded, encode_ms = timed(encode, repeat) if encoding != 'identity' else (body, 0.0)
+                self.stdout.write(
+                    f'{name:<16}{encoding:<12}{len(encoded):>12,}{render_ms:>12.2f}'
+                    f'{encode_ms:>12.2f}{render_ms + encode_ms:>12.2f}'
+                )
+
+        if brotli is None:
+            self.stdout.write(self.style.WARNING('brotli is not installed - br rows skipped'))
@@ -0,0 +1,105 @@
+"""
+Benchmark what the write throttles add to the request path.
+
+Times ActionThrottle.allow_request on its own, then POST /api/messages/
+with and without MessageCreateThrottle. Runs inside a transaction that is
+rolled back, so it is safe to run against a development database.
+
+Usage:
+    python manage.py bench_throttles
+    python manage.py bench_throttles --checks 100000 --users 1000 --messages 500
+"""
+
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.settings import api_settings
+from rest_framework.test import APIClient
+
+from api.models import Booking, Report, User
+from api.throttles import MessageCreateThrottle
+from api.views import MessageViewSet
+
+
+class _Request:
+    def __init__(self, user):
+        self.user = user
+
+
+class _View:
+    action = 'create'
+
+
+class Command(BaseCommand):
+    help = 'Measure throttle check cost and its share of a message write'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--checks', type=int, default=50000, help='allow_request calls to time')
+        parser.add_argument('--users', type=int, default=1000, help='Distinct users the checks rotate through')
+        parser.add_argument('--messages', type=int, default=300, help='Messages to POST per variant')
+
+    def handle(self, *args, **options):
+        # Generous limits so the write benchmark measures the check, not rejections
+        rates = {**api_settings.DEFAULT_THROTTLE_RATES, 'message_create': '1000000/min'}
+        overrides = {
+            'ALLOWED_HOSTS': ['*'],
+            'REST_FRAMEWORK': {**settings.REST_FRAMEWORK, 'DEFAULT_THROTTLE_RATES': rates},
+        }
+        with override_settings(**overrides), transaction.atomic():
+            self.run(options)
+            transaction.set_rollback(True)
+
+    def run(self, options):
+        cache.clear()
+        users = [User(pk=pk, username=f'u{pk}') for pk in range(1, options['users'] + 1)]
+        throttle = MessageCreateThrottle()
+        view = _View()
+        requests = [_Request(user) for user in users]
+
+        n = options['checks']
+        t0 = time.perf_counter()
+        for i in range(n):
+            throttle.allow_request(requests[i % len(requests)], view)
+        elapsed = time.perf_counter() - t0
+        self.stdout.write(f'{"allow_request":<24} {n:>7} checks  {elapsed / n * 1e6:7.1f} us/check')
+
+        key = throttle.get_cache_key(requests[(n - 1) % len(requests)], view)
+        self.stdout.write(f'{"record size":<24} {len(cache.get(key)):>7} bytes per user and scope')
+
+        seeker = User.objects.create_user('bench_throttles_seeker')
+        catalyst = User.objects.create_user('bench_throttles_catalyst')
+        booking = Booking.objects.create(seeker=seeker, catalyst=catalyst, status='CONFIRMED', scheduled_time=timezone.now())
+        client = APIClient()
+        client.force_authenticate(seeker)
+
+        throttle_classes = MessageViewSet.throttle_classes
+        try:
+            for label, classes in (('POST without throttle', []), ('POST with throttle', throttle_classes)):
+                MessageViewSet.throttle_classes = classes
+                cache.clear()
+                self.post_messages(label, client, booking, options['messages'])
+        finally:
+            MessageViewSet.throttle_classes = throttle_classes
+
+        flagged = Report.objects.filter(reported_user=seeker, source='AUTOMATED').count()
+        self.stdout.write(f'automated reports filed:  {flagged}')
+
+    def post_messages(self, label, client, booking, n):
+        latencies = []
+        with CaptureQueriesContext(connection) as queries:
+            for i in range(n):
+                t0 = time.perf_counter()
+                response = client.post('/api/messages/', {'booking': booking.pk, 'content': f'message {i}'}, format='json')
+                latencies.append(time.perf_counter() - t0)
+                if response.status_code != 201:
+                    self.stderr.write(f'{label} failed: {response.status_code} {response.content[:200]}')
+                    return
+        latencies.sort()
+        self.stdout.write(f'{label:<24} {n:>7} writes  p50 {latencies[n // 2] * 1000:6.2f} ms  '
+                          f'mean {sum(latencies) / n * 1000:6.2f} ms  {len(queries) / n:.1f} queries/write')
@@ -0,0 +1,119 @@
+"""
+Benchmark wardrobe imports: batch endpoints vs one request per item.
+
+Runs inside a transaction that is rolled back, with MEDIA_ROOT pointed at a
+temporary directory, so it is safe to run against a development database.
+Background image processing is timed separately, since it runs after the
+request returns.
+
+Usage:
+    python manage.py bench_wardrobe_import
+    python manage.py bench_wardrobe_import --items 1000 --images 200 --single 100
+"""
+
+import io
+import json
+import shutil
+import tempfile
+import time
+import zipfile
+
+from django.core.management.base import BaseCommand
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection, transaction
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from PIL import Image
+from rest_framework.test import APIClient
+
+from api.models import User, WardrobeItem
+from api.wardrobe_batch import process_pending_images
+
+CATEGORIES = ['Top', 'Bottom', 'Shoes', 'Dress', 'Accessory']
+
+
+def build_zip(n_images, size=1200):
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w') as archive:
+        for i in range(n_images):
+            image = io.BytesIO()
+            Image.new('RGB', (size, size * 4 // 3), ((i * 37) % 256, (i * 91) % 256, (i * 53) % 256)).save(image, 'JPEG', quality=85)
+            archive.writestr(f'img_{i}.jpg', image.getvalue())
+    return buffer.getvalue()
+
+
+class Command(BaseCommand):
+    help = 'Measure batch create/update/delete throughput for wardrobe items'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--items', type=int, default=1000)
+        parser.add_argument('--images', type=int, default=100, help='Distinct images in the zip (0 = none)')
+        parser.add_argument('--single', type=int, default=100, help='Items to create one request at a time, for comparison')
+
+    def handle(self, *args, **options):
+        media_root = tempfile.mkdtemp(prefix='bench-wardrobe-')
+        overrides = {
+            'MEDIA_ROOT': media_root,
+            'ALLOWED_HOSTS': ['*'],
+            'WARDROBE_TAGGING_ASYNC': False,
+            'WARDROBE_IMAGE_ASYNC': False,
+            'WARDROBE_BATCH_MAX_ITEMS': max(options['items'], 1000),
+        }
+        try:
+            with override_settings(**overrides), transaction.atomic():
+                self.run(options)
+                transaction.set_rollback(True)
+        finally:
+            shutil.rmtree(media_root, ignore_errors=True)
+
+    def request(self, label, n, call):
+        with CaptureQueriesContext(connection) as queries:
+            t0 = time.perf_counter()
+            response = call()
+            elapsed = time.perf_counter() - t0
+        if response.status_code >= 400:
+            self.stderr.write(f'{label} failed: {response.status_code} {response.content[:300]}')
+        self.stdout.write(f'{label:<22} {n:>5} items  {elapsed * 1000:8.0f} ms  '
+                          f'{n / elapsed:8.0f} items/s  {len(queries):>5} queries')
+        return response
+
+    def run(self, options):
+        user = User.objects.create_user('bench_wardrobe_import')
+        client = APIClient()
+        client.force_authenticate(user)
+        n, n_images = options['items'], options['images']
+
+        if options['single']:
+            rows = [{'name': f'single {i}', 'category': CATEGORIES[i % 5]} for i in range(options['single'])]
+            with CaptureQueriesContext(connection) as queries:
+                t0 = time.perf_counter()
+                for row in rows:
+                    client.post('/api/wardrobe/', row, format='json')
+                elapsed = time.perf_counter() - t0
+            self.stdout.write(f'{"single POST":<22} {len(rows):>5} items  {elapsed * 1000:8.0f} ms  '
+                              f'{len(rows) / elapsed:8.0f} items/s  {len(queries):>5} queries')
+
+        rows = [{'name': f'item {i}', 'category': CATEGORIES[i % 5], 'color': 'black', 'brand': 'Bench'}
+                for i in range(n)]
+        data = {'items': json.dumps(rows)}
+        if n_images:
+            for i, row in enumerate(rows):
+                row['image'] = f'img_{i % n_images}.jpg'
+            data = {'items': json.dumps(rows),
+                    'images': SimpleUploadedFile('images.zip', build_zip(n_images), 'application/zip')}
+
+        response = self.request('batch create', n, lambda: client.post('/api/wardrobe/batch/', data, format='multipart'))
+        ids = [result['id'] for result in response.json()['results'] if result['status'] == 'created']
+
+        if n_images:
+            t0 = time.perf_counter()
+            processed, failed = process_pending_images(ids)
+            elapsed = time.perf_counter() - t0
+            self.stdout.write(f'{"background images":<22} {n_images:>5} files  {elapsed * 1000:8.0f} ms  '
+                              f'{n_images / elapsed:8.0f} files/s  ({processed} items done, {failed} failed)')
+
+        updates = [{'id': item_id, 'name': f'renamed {item_id}', 'brand': 'Bench 2'} for item_id in ids]
+        self.request('batch update', len(updates), lambda: client.patch('/api/wardrobe/batch/', {'items': updates}, format='json'))
+        self.request('batch delete', len(ids), lambda: client.delete('/api/wardrobe/batch/', {'ids': ids}, format='json'))
+
+        self.stdout.write(f'remaining items: {WardrobeItem.objects.filter(owner=user).count()}')
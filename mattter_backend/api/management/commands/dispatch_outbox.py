@@ -0,0 +1,46 @@
+"""
+Deliver pending outbox messages (api.outbox).
+
+The periodic outbox.dispatch job already sweeps up messages left behind by
+a crash or failed handlers; run this to replay them right away, e.g. after
+fixing a handler, or to inspect the backlog.
+
+Usage:
+    python manage.py dispatch_outbox
+    python manage.py dispatch_outbox --retry-now   # ignore retry backoff
+    python manage.py dispatch_outbox --stats
+"""
+
+import json
+import time
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from api import outbox
+from api.models import OutboxMessage
+
+
+class Command(BaseCommand):
+    help = 'Deliver undelivered outbox messages to their handlers'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--retry-now', action='store_true', help='Also deliver failed messages still backing off')
+        parser.add_argument('--batch-size', type=int, default=None, help='Messages per batch (default OUTBOX_BATCH_SIZE)')
+        parser.add_argument('--stats', action='store_true', help='Print the backlog and exit')
+
+    def handle(self, *args, **options):
+        if options['stats']:
+            self.stdout.write(json.dumps(outbox.stats(), indent=2, default=str))
+            return
+
+        if options['retry_now']:
+            OutboxMessage.objects.filter(dispatched_at__isnull=True).update(available_at=timezone.now())
+        started = time.perf_counter()
+        dispatched = outbox.dispatch(batch_size=options['batch_size'])
+        remaining = outbox.stats()
+        style = self.style.ERROR if remaining['pending'] else self.style.SUCCESS
+        self.stdout.write(style(
+            f"Dispatched {dispatched} message(s) in {time.perf_counter() - started:.2f}s; "
+            f"{remaining['pending']} still pending"
+        ))
@@ -0,0 +1,118 @@
+"""
+Run EXPLAIN on the hot API queries and fail if any of them falls back to a
+sequential scan of the table it filters on.
+
+Usage:
+    python manage.py explain_hot_queries
+    python manage.py explain_hot_queries --verbose
+"""
+
+import re
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from api.inbox import inbox_queryset
+from api.models import Profile, Booking, Message, Rating, Report, Job, OutboxMessage
+
+
+def hot_queries():
+    """
+    (name, queryset) pairs mirroring the filters used by the API views.
+    The ids are placeholders - only the plan shape matters here.
+    """
+    return [
+        ('catalysts with coordinates (all_catalysts / nearby_catalysts)',
+         Profile.objects.filter(role='CATALYST', latitude__isnull=False, longitude__isnull=False)),
+        ('top catalysts leaderboard (api.ratings.build_ranking)',
+         Profile.objects.filter(role='CATALYST', is_active=True).order_by('-rating_score', 'id')),
+        ('profiles by role (dashboard_stats)',
+         Profile.objects.filter(role='SEEKER')),
+        ('seeker pending bookings (BookingViewSet.pending)',
+         Booking.objects.filter(seeker_id=1, status='REQUESTED')),
+        ('seeker matched bookings (BookingViewSet.matched)',
+         Booking.objects.filter(seeker_id=1, status__in=['CONFIRMED', 'COMPLETED'])),
+        ('catalyst bookings by status (user_details)',
+         Booking.objects.filter(catalyst_id=1, status__in=['CONFIRMED', 'COMPLETED'])),
+        ('catalyst incoming requests',
+         Booking.objects.filter(catalyst_id=1, status='REQUESTED').order_by('-created_at')),
+        ('conversation inbox (MessageViewSet.inbox)',
+         inbox_queryset(1).order_by('-last_activity', '-id')),
+        ('unread messages for booking (mark_as_read)',
+         Message.objects.filter(booking_id=1, is_read=False).exclude(sender_id=1)),
+        ('ratings received by catalyst',
+         Rating.objects.filter(catalyst_id=1).order_by('-created_at')),
+        ('reports against user (user_details)',
+         Report.objects.filter(reported_user_id=1).order_by('-created_at')),
+        ('job claim (api.jobs.claim)',
+         Job.objects.filter(Q(status='QUEUED', run_at__lte=timezone.now())
+                            | Q(status='RUNNING', locked_until__lt=timezone.now())).order_by('run_at', 'id')),
+        ('moderation queue (ReportViewSet.queue)',
+         Report.objects.filter(status='PENDING').order_by('created_at', 'id')),
+        ('outbox sweep (api.outbox.dispatch)',
+         OutboxMessage.objects.filter(dispatched_at__isnull=True, available_at__lte=timezone.now(),
+                                      pk__gt=0).order_by('pk')),
+    ]
+
+
+def find_sequential_scans(plan, table):
+    """Return the plan lines that read `table` without an index."""
+    vendor = connection.vendor
+    offending = []
+    for line in plan.splitlines():
+        if vendor == 'postgresql':
+            if re.search(rf'Seq Scan on {re.escape(table)}\b', line):
+                offending.append(line.strip())
+        elif vendor == 'sqlite':
+            # "SCAN api_profile" is a full scan, "SCAN api_profile USING INDEX ..."
+            # and "SEARCH api_profile USING INDEX ..." are not.
+            if re.search(rf'\bSCAN {re.escape(table)}\b', line) and 'USING' not in line:
+                offending.append(line.strip())
+        else:
+            if 'ALL' in line.split() and table in line:
+                offending.append(line.strip())
+    return offending
+
+
+class Command(BaseCommand):
+    help = 'EXPLAIN the hot API queries and check that each one is served by an index'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--verbose', action='store_true', help='Print the full plan for every query')
+        parser.add_argument(
+            '--allow-seqscan-costing',
+            action='store_true',
+            help="PostgreSQL only: keep the planner's default costing. By default sequential scans are "
+                 "disabled for the check so small dev tables still show whether an index is usable.",
+        )
+
+    def handle(self, *args, **options):
+        failures = []
+
+        with transaction.atomic():
+            if connection.vendor == 'postgresql' and not options['allow_seqscan_costing']:
+                with connection.cursor() as cursor:
+                    cursor.execute('SET LOCAL enable_seqscan = off')
+
+            for name, queryset in hot_queries():
+                table = queryset.model._meta.db_table
+                plan = queryset.explain()
+                offending = find_sequential_scans(plan, table)
+
+                if offending:
+                    failures.append(name)
+                    self.stdout.write(self.style.ERROR(f'SEQ SCAN  {name}'))
+                    for line in offending:
+                        self.stdout.write(f'          {line}')
+                else:
+                    self.stdout.write(self.style.SUCCESS(f'INDEX     {name}'))
+
+                if options['verbose']:
+                    for line in plan.splitlines():
+                        self.stdout.write(f'          {line}')
+
+        if failures:
+            raise CommandError(f'{len(failures)} hot quer{"y" if len(failures) == 1 else "ies"} use a sequential scan')
+        self.stdout.write(self.style.SUCCESS('All hot queries use an index.'))
@@ -0,0 +1,49 @@
+"""
+Purge accounts marked for deletion (User.deleted_at set).
+
+delete_user purges in the background; run this to finish purges that were
+interrupted (e.g. by a restart), or with USER_DELETION_ASYNC=False setups.
+
+Usage:
+    python manage.py purge_users
+    python manage.py purge_users --user 42 --chunk-size 1000
+"""
+
+import time
+
+from django.core.management.base import BaseCommand
+
+from api.models import User
+from api.user_deletion import purge_user
+
+
+class Command(BaseCommand):
+    help = 'Delete the data of every tombstoned user in bounded chunks'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', type=int, action='append', dest='users', help='Only this user id (repeatable)')
+        parser.add_argument('--chunk-size', type=int, default=None, help='Rows per transaction (default USER_DELETION_CHUNK_SIZE)')
+
+    def handle(self, *args, **options):
+        users = User.objects.filter(deleted_at__isnull=False)
+        if options['users']:
+            users = users.filter(pk__in=options['users'])
+        user_ids = list(users.order_by('deleted_at').values_list('pk', flat=True))
+        if not user_ids:
+            self.stdout.write('No users waiting for deletion')
+            return
+
+        failed = 0
+        for user_id in user_ids:
+            started = time.perf_counter()
+            try:
+                progress = purge_user(user_id, options['chunk_size'])
+            except Exception as e:
+                failed += 1
+                self.stderr.write(f'user {user_id}: failed: {e}')
+                continue
+            counts = ', '.join(f'{label} {n}' for label, n in progress['deleted'].items())
+            self.stdout.write(f'user {user_id}: {counts} in {time.perf_counter() - started:.2f}s')
+
+        style = self.style.ERROR if failed else self.style.SUCCESS
+        self.stdout.write(style(f'Purged {len(user_ids) - failed} of {len(user_ids)} user(s)'))
@@ -0,0 +1,37 @@
+"""
+Rebuild catalyst rating aggregates and the top catalysts leaderboard.
+
+Rating saves keep the aggregates up to date incrementally; run this from
+cron to refresh the cached leaderboard, and with --recompute to repair
+aggregates after bulk edits made with update() / raw SQL.
+
+Usage:
+    python manage.py refresh_rankings
+    python manage.py refresh_rankings --recompute
+"""
+
+import time
+
+from django.core.management.base import BaseCommand
+
+from api.ratings import recompute_catalyst_ratings, refresh_ranking
+
+
+class Command(BaseCommand):
+    help = 'Refresh the cached top catalysts ranking (optionally recomputing rating aggregates first)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--recompute', action='store_true',
+                            help='Rebuild every histogram / average / score from the Rating table first')
+
+    def handle(self, *args, **options):
+        if options['recompute']:
+            started = time.perf_counter()
+            count = recompute_catalyst_ratings()
+            self.stdout.write(f'Recomputed ratings for {count} profile(s) in {time.perf_counter() - started:.2f}s')
+
+        started = time.perf_counter()
+        ranking = refresh_ranking()
+        self.stdout.write(self.style.SUCCESS(
+            f"Ranked {len(ranking['catalysts'])} catalyst(s) in {time.perf_counter() - started:.2f}s"
+        ))
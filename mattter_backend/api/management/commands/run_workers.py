@@ -0,0 +1,87 @@
+"""
+Run background job workers (api.jobs).
+
+Each process runs --threads worker threads; with --processes N the command
+supervises N child processes instead and restarts any that exit. Stops
+cleanly on SIGINT / SIGTERM (running jobs finish first).
+
+Usage:
+    python manage.py run_workers
+    python manage.py run_workers --processes 4 --threads 2
+    python manage.py run_workers --once     # queue due periodic tasks, drain due jobs and exit (CI, cron)
+    python manage.py run_workers --stats    # print queue depth and timings
+"""
+
+import json
+import signal
+import subprocess
+import sys
+import threading
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from api import jobs
+
+
+class Command(BaseCommand):
+    help = 'Claim and run queued background jobs'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=None, help='Worker threads per process (default JOB_WORKER_THREADS)')
+        parser.add_argument('--processes', type=int, default=0, help='Run this many child worker processes')
+        parser.add_argument('--poll', type=float, default=None, help='Idle poll interval in seconds')
+        parser.add_argument('--once', action='store_true', help='Exit once no job is due')
+        parser.add_argument('--stats', action='store_true', help='Print job metrics for the last --hours and exit')
+        parser.add_argument('--hours', type=int, default=24)
+
+    def handle(self, *args, **options):
+        if options['stats']:
+            self.stdout.write(json.dumps(jobs.stats(options['hours']), indent=2))
+            return
+
+        # This process is the worker; never start the web-process job threads here too
+        jobs.disable_in_process_workers()
+        stop = threading.Event()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            signal.signal(sig, lambda *_: stop.set())
+
+        threads = options['threads'] or getattr(settings, 'JOB_WORKER_THREADS', 2)
+        poll = options['poll'] or getattr(settings, 'JOB_POLL_INTERVAL', 1.0)
+        if options['processes']:
+            self.supervise(options['processes'], threads, poll, options['once'], stop)
+            return
+
+        started = time.perf_counter()
+        if options['once']:
+            # Long-running workers schedule from their first thread; a one-shot run does it up front
+            jobs.schedule_due()
+        workers = jobs.start_threads(threads, stop, poll, once=options['once'], name='jobs')
+        while any(worker.is_alive() for worker in workers):
+            for worker in workers:
+                worker.join(0.5)
+        if options['once']:
+            self.stdout.write(f'Queue drained in {time.perf_counter() - started:.2f}s')
+
+    def supervise(self, count, threads, poll, once, stop):
+        command = [sys.executable, sys.argv[0], 'run_workers', '--threads', str(threads), '--poll', str(poll)]
+        if once:
+            command.append('--once')
+
+        children = [subprocess.Popen(command) for _ in range(count)]
+        self.stdout.write(f'Started {count} worker process(es) x {threads} thread(s)')
+        while not stop.is_set():
+            for i, child in enumerate(children):
+                if child.poll() is None or once:
+                    continue
+                self.stderr.write(f'Worker process {child.pid} exited with {child.returncode}; restarting')
+                children[i] = subprocess.Popen(command)
+            if once and all(child.poll() is not None for child in children):
+                return
+            stop.wait(1)
+
+        for child in children:
+            child.send_signal(signal.SIGTERM)
+        for child in children:
+            child.wait()
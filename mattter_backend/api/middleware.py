@@ -0,0 +1,144 @@
+"""
+Custom middleware.
+"""
+
+import gzip
+import re
+
+from django.conf import settings
+from django.utils.cache import patch_vary_headers
+from django.utils.deprecation import MiddlewareMixin
+from django.utils.regex_helper import _lazy_re_compile
+
+from whitenoise.base import WhiteNoise
+from whitenoise.middleware import WhiteNoiseMiddleware
+
+from .uploads import VARIANT_NAME_RE
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - optional dependency
+    brotli = None
+
+
+_accept_encoding_re = _lazy_re_compile(r'\s*([^\s;,]+)\s*(?:;\s*q\s*=\s*([0-9.]+))?')
+
+
+def _accepted_encodings(header):
+    """Map of encoding -> q-value from an Accept-Encoding header."""
+    accepted = {}
+    for part in header.split(','):
+        match = _accept_encoding_re.match(part)
+        if not match:
+            continue
+        try:
+            q = float(match.group(2)) if match.group(2) else 1.0
+        except ValueError:
+            continue
+        accepted[match.group(1).lower()] = q
+    return accepted
+
+
+def _choose_encoding(header):
+    """The accepted encoding with the highest q-value, brotli on a tie; None if neither is accepted."""
+    accepted = _accepted_encodings(header)
+    wildcard = accepted.get('*', 0)
+    candidates = ('br', 'gzip') if brotli is not None else ('gzip',)
+    # max() keeps the first of equal keys, so br wins ties
+    encoding = max(candidates, key=lambda name: accepted.get(name, wildcard))
+    return encoding if accepted.get(encoding, wildcard) > 0 else None
+
+
+class APICompressionMiddleware(MiddlewareMixin):
+    """
+    Compress API responses with brotli or gzip, whichever the client prefers.
+
+    Only responses under API_COMPRESSION_PATH_PREFIX that are at least
+    API_COMPRESSION_MIN_SIZE bytes are touched; small bodies aren't worth
+    the CPU. Brotli is used when the `brotli` package is installed.
+    """
+
+    def process_response(self, request, response):
+        if response.streaming or response.has_header('Content-Encoding'):
+            return response
+        if not request.path.startswith(getattr(settings, 'API_COMPRESSION_PATH_PREFIX', '/api/')):
+            return response
+        if len(response.content) < getattr(settings, 'API_COMPRESSION_MIN_SIZE', 1024):
+            return response
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+
+        encoding = _choose_encoding(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+        if encoding == 'br':
+            compressed = brotli.compress(
+                response.content,
+                mode=brotli.MODE_TEXT,
+                quality=getattr(settings, 'API_BROTLI_QUALITY', 4),
+            )
+        elif encoding == 'gzip':
+            compressed = gzip.compress(
+                response.content,
+                compresslevel=getattr(settings, 'API_GZIP_LEVEL', 6),
+                mtime=0,
+            )
+        else:
+            return response
+
+        # Return the uncompressed response if compression doesn't help
+        if len(compressed) >= len(response.content):
+            return response
+
+        response.content = compressed
+        response.headers['Content-Length'] = str(len(compressed))
+        response.headers['Content-Encoding'] = encoding
+
+        # The body is no longer byte-for-byte the entity the strong ETag named
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response.headers['ETag'] = 'W/' + etag
+
+        return response
+
+
+class MediaFilesMiddleware(WhiteNoise):
+    """
+    Serve MEDIA_ROOT before URL routing, using WhiteNoise's file responder
+    (Range requests, conditional GETs, correct content types).
+
+    Content-hash variant files never change, so they get far-future
+    immutable caching and are remembered after the first lookup. Everything
+    else is looked up on each request and cached for MEDIA_MAX_AGE.
+    """
+
+    def __init__(self, get_response=None):
+        self.get_response = get_response
+        super().__init__(
+            application=None,
+            autorefresh=True,  # uploads appear at runtime, so look files up per request
+            max_age=getattr(settings, 'MEDIA_MAX_AGE', 86400),
+            allow_all_origins=True,
+            immutable_file_test=VARIANT_NAME_RE,
+        )
+        self.media_prefix = settings.MEDIA_URL
+        self.add_files(str(settings.MEDIA_ROOT), prefix=self.media_prefix)
+        self._immutable_re = re.compile(VARIANT_NAME_RE)
+
+    def __call__(self, request):
+        path = request.path_info
+        if not path.startswith(self.media_prefix):
+            return self.get_response(request)
+
+        static_file = self.files.get(path)
+        if static_file is None:
+            static_file = self.find_file(path)
+            if static_file is not None and self._immutable_re.search(path):
+                self.files[path] = static_file
+        if static_file is None:
+            return self.get_response(request)
+
+        try:
+            return WhiteNoiseMiddleware.serve(static_file, request)
+        except OSError:
+            # File was removed (e.g. user deletion) after we remembered it
+            self.files.pop(path, None)
+            return self.get_response(request)
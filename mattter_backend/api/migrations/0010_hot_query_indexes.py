@@ -0,0 +1,45 @@
+# Generated by Django 5.2.18 on 2026-10-19 11:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0009_report'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(fields=['seeker', 'status'], name='booking_seeker_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(fields=['catalyst', 'status'], name='booking_catalyst_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(condition=models.Q(('status', 'REQUESTED')), fields=['catalyst', '-created_at'], name='booking_cat_requested_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='message',
+            index=models.Index(fields=['booking', 'is_read'], name='message_booking_read_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='profile',
+            index=models.Index(fields=['role'], name='profile_role_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='profile',
+            index=models.Index(condition=models.Q(('latitude__isnull', False), ('longitude__isnull', False), ('role', 'CATALYST')), fields=['latitude', 'longitude'], name='profile_catalyst_geo_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='rating',
+            index=models.Index(fields=['catalyst', '-created_at'], name='rating_catalyst_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='report',
+            index=models.Index(fields=['reported_user', '-created_at'], name='report_reported_created_idx'),
+        ),
+    ]
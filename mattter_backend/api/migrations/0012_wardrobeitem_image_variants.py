@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-19 11:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0011_profile_updated_at_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='wardrobeitem',
+            name='image_variants',
+            field=models.JSONField(blank=True, default=dict, help_text='Resized variant storage names (full/medium/thumb)'),
+        ),
+    ]
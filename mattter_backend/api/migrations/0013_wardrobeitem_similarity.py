@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-19 11:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0012_wardrobeitem_image_variants'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='wardrobeitem',
+            name='image_embedding',
+            field=models.BinaryField(blank=True, help_text='float16 colour embedding', max_length=128, null=True),
+        ),
+        migrations.AddField(
+            model_name='wardrobeitem',
+            name='image_hash',
+            field=models.BinaryField(blank=True, help_text='64-bit perceptual hash', max_length=8, null=True),
+        ),
+    ]
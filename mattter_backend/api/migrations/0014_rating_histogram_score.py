@@ -0,0 +1,90 @@
+# Generated by Django 5.2.18 on 2026-10-19 12:05
+
+import django.core.validators
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Q, Sum
+
+
+def backfill_rating_aggregates(apps, schema_editor):
+    """Histogram, sum and Bayesian score from existing ratings (same maths as api.ratings)."""
+    Profile = apps.get_model('api', 'Profile')
+    Rating = apps.get_model('api', 'Rating')
+    mean = getattr(settings, 'RATING_PRIOR_MEAN', 3.5)
+    weight = getattr(settings, 'RATING_PRIOR_WEIGHT', 10)
+
+    rows = Rating.objects.values('catalyst_id').order_by().annotate(
+        count=Count('id'), total=Sum('rating'),
+        **{f'stars_{stars}': Count('id', filter=Q(rating=stars)) for stars in range(1, 6)},
+    )
+    profiles = {p.user_id: p for p in Profile.objects.filter(user_id__in=[r['catalyst_id'] for r in rows])}
+    for row in rows:
+        profile = profiles.get(row['catalyst_id'])
+        if profile is None:
+            continue
+        profile.rating_count = row['count']
+        profile.rating_sum = row['total'] or 0
+        for stars in range(1, 6):
+            setattr(profile, f'rating_{stars}', row[f'stars_{stars}'])
+        profile.average_rating = round(profile.rating_sum / profile.rating_count, 2)
+        profile.rating_score = (weight * mean + profile.rating_sum) / (weight + profile.rating_count)
+    Profile.objects.bulk_update(
+        profiles.values(),
+        ['rating_count', 'rating_sum', 'average_rating', 'rating_score'] + [f'rating_{stars}' for stars in range(1, 6)],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0013_wardrobeitem_similarity'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='profile',
+            name='rating_1',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='profile',
+            name='rating_2',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='profile',
+            name='rating_3',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='profile',
+            name='rating_4',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='profile',
+            name='rating_5',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='profile',
+            name='rating_score',
+            field=models.FloatField(default=0, help_text='Bayesian average used for ranking (0 = unrated)'),
+        ),
+        migrations.AddField(
+            model_name='profile',
+            name='rating_sum',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AlterField(
+            model_name='rating',
+            name='rating',
+            field=models.PositiveSmallIntegerField(help_text='Rating from 1-5 stars', validators=[django.core.validators.MinValueValidator(1), django.core.validators.MaxValueValidator(5)]),
+        ),
+        migrations.AddIndex(
+            model_name='profile',
+            index=models.Index(condition=models.Q(('is_active', True), ('role', 'CATALYST')), fields=['-rating_score', 'id'], name='profile_catalyst_score_idx'),
+        ),
+        migrations.RunPython(backfill_rating_aggregates, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.2.18 on 2026-10-19 12:10
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0015_report_status_created_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='report',
+            name='source',
+            field=models.CharField(choices=[('USER', 'User'), ('AUTOMATED', 'Automated')], default='USER', max_length=20),
+        ),
+        migrations.AlterField(
+            model_name='report',
+            name='reporter',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='reports_filed', to=settings.AUTH_USER_MODEL),
+        ),
+    ]
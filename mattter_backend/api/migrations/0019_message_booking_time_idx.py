@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-19 12:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0018_job'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='message',
+            index=models.Index(fields=['booking', '-timestamp', '-id'], name='message_booking_time_idx'),
+        ),
+    ]
@@ -1,15 +1,40 @@
-from django.db import models
+from django.db import models, transaction
+from django.core.serializers.json import DjangoJSONEncoder
+from django.core.validators import MaxValueValidator, MinValueValidator
+from django.db.models import F, Q
 from django.contrib.auth.models import AbstractUser
+from django.utils import timezone
 # from django.contrib.gis.db import models as gis_models
 from django.utils.translation import gettext_lazy as _
 
+class AtomicSaveMixin:
+    """
+    save() runs in a transaction, so what post_save handlers write (the
+    outbox message, rating aggregates) commits or rolls back with the row.
+    """
+
+    def save(self, *args, **kwargs):
+        with transaction.atomic(using=kwargs.get('using')):
+            super().save(*args, **kwargs)
+
+
 class User(AbstractUser):
     """
     Custom User model to allow for future extensibility.
     """
-    pass
+    # Set when an admin deletes the account; the rows are purged in the background (api.user_deletion)
+    deleted_at = models.DateTimeField(null=True, blank=True)
+
+class ProfileQuerySet(models.QuerySet):
+    def listed(self):
+        """
+        Profiles that may appear in listings and search. Deleted accounts
+        are hidden as soon as they are tombstoned, before the purge runs.
+        """
+        return self.filter(user__is_active=True, user__deleted_at__isnull=True)
 
-class Profile(models.Model):
+
+class Profile(AtomicSaveMixin, models.Model):
     """
     Profile model extending User with role-specific fields.
     """
@@ -51,6 +76,52 @@ class Profile(models.Model):
     # Rating fields (for catalysts)
     average_rating = models.DecimalField(max_digits=3, decimal_places=2, default=0.00, help_text="Average rating out of 5")
     rating_count = models.PositiveIntegerField(default=0, help_text="Total number of ratings")
+    # Star histogram and running sum, updated incrementally by api.ratings
+    rating_1 = models.PositiveIntegerField(default=0)
+    rating_2 = models.PositiveIntegerField(default=0)
+    rating_3 = models.PositiveIntegerField(default=0)
+    rating_4 = models.PositiveIntegerField(default=0)
+    rating_5 = models.PositiveIntegerField(default=0)
+    rating_sum = models.PositiveIntegerField(default=0)
+    rating_score = models.FloatField(default=0, help_text="Bayesian average used for ranking (0 = unrated)")
+
+    # Content versioning for ETag / Last-Modified (version is bumped in save())
+    updated_at = models.DateTimeField(auto_now=True)
+    version = models.PositiveIntegerField(default=0, help_text="Incremented on every save")
+
+    objects = ProfileQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['role'], name='profile_role_idx'),
+            # Map / nearby lookups only ever touch catalysts that have coordinates
+            models.Index(
+                fields=['latitude', 'longitude'],
+                name='profile_catalyst_geo_idx',
+                condition=Q(role='CATALYST', latitude__isnull=False, longitude__isnull=False),
+            ),
+            # Leaderboard scan (api.ratings.build_ranking)
+            models.Index(
+                fields=['-rating_score', 'id'],
+                name='profile_catalyst_score_idx',
+                condition=Q(role='CATALYST', is_active=True),
+            ),
+        ]
+
+    def save(self, *args, **kwargs):
+        # Every save is a new content version for ETags. F() so concurrent
+        # saves each bump it; api.signals reads the stored value back.
+        if self._state.adding:
+            self.version = (self.version or 0) + 1
+        else:
+            self.version = F('version') + 1
+            if kwargs.get('update_fields') is not None:
+                kwargs['update_fields'] = {*kwargs['update_fields'], 'version', 'updated_at'}
+        super().save(*args, **kwargs)
+
+    @property
+    def rating_histogram(self):
+        return {str(stars): getattr(self, f'rating_{stars}') for stars in range(1, 6)}
 
     def __str__(self):
         return f"{self.user.username} - {self.role}"
@@ -65,9 +136,14 @@ class WardrobeItem(models.Model):
     color = models.CharField(max_length=50, blank=True)
     brand = models.CharField(max_length=100, blank=True)
     image = models.ImageField(upload_to='wardrobe/', blank=True, null=True)
+    image_variants = models.JSONField(default=dict, blank=True, help_text="Resized variant storage names (full/medium/thumb)")
     
     # AI Tagging placeholders
     ai_tags = models.JSONField(default=dict, blank=True, help_text="Auto-generated tags")
+
+    # Fixed-width similarity features, filled in by tagging (see api.similarity)
+    image_hash = models.BinaryField(max_length=8, null=True, blank=True, editable=False, help_text="64-bit perceptual hash")
+    image_embedding = models.BinaryField(max_length=128, null=True, blank=True, editable=False, help_text="float16 colour embedding")
     
     created_at = models.DateTimeField(auto_now_add=True)
 
@@ -87,7 +163,7 @@ class Service(models.Model):
     def __str__(self):
         return f"{self.name} by {self.catalyst.username}"
 
-class Booking(models.Model):
+class Booking(AtomicSaveMixin, models.Model):
     """
     Booking of a service by a seeker with a catalyst.
     """
@@ -107,17 +183,31 @@ class Booking(models.Model):
     seeker_preferences = models.JSONField(default=dict, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['seeker', 'status'], name='booking_seeker_status_idx'),
+            models.Index(fields=['catalyst', 'status'], name='booking_catalyst_status_idx'),
+            # Incoming requests inbox for catalysts
+            models.Index(
+                fields=['catalyst', '-created_at'],
+                name='booking_cat_requested_idx',
+                condition=Q(status='REQUESTED'),
+            ),
+        ]
+
     def __str__(self):
         return f"Booking: {self.seeker.username} with {self.catalyst.username} ({self.status})"
 
-class Rating(models.Model):
+class Rating(AtomicSaveMixin, models.Model):
     """
     Rating given by a seeker to a catalyst after a booking.
     """
     seeker = models.ForeignKey(User, on_delete=models.CASCADE, related_name='ratings_given')
     catalyst = models.ForeignKey(User, on_delete=models.CASCADE, related_name='ratings_received')
     booking = models.OneToOneField(Booking, on_delete=models.CASCADE, related_name='rating', null=True, blank=True)
-    rating = models.PositiveSmallIntegerField(help_text="Rating from 1-5 stars")
+    rating = models.PositiveSmallIntegerField(
+        validators=[MinValueValidator(1), MaxValueValidator(5)], help_text="Rating from 1-5 stars"
+    )
     review = models.TextField(blank=True, help_text="Optional written review")
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -125,61 +215,21 @@ class Rating(models.Model):
     class Meta:
         unique_together = ('seeker', 'catalyst', 'booking')
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['catalyst', '-created_at'], name='rating_catalyst_created_idx'),
+        ]
 
     def __str__(self):
         return f"{self.seeker.username} rated {self.catalyst.username}: {self.rating}/5"
 
-    def save(self, *args, **kwargs):
-        super().save(*args, **kwargs)
-        # Update catalyst's average rating
-        self.update_catalyst_rating()
-
-    def delete(self, *args, **kwargs):
-        catalyst = self.catalyst
-        super().delete(*args, **kwargs)
-        # Update catalyst's average rating after deletion
-        self.update_catalyst_rating_for_user(catalyst)
-
-    def update_catalyst_rating(self):
-        """Update the catalyst's average rating and count"""
-        try:
-            catalyst_profile = self.catalyst.profile
-        except Exception:
-            # Profile might be deleted or user is being deleted
-            return
-
-        ratings = Rating.objects.filter(catalyst=self.catalyst)
-        count = ratings.count()
-        if count > 0:
-            avg = sum(r.rating for r in ratings) / count
-            catalyst_profile.average_rating = round(avg, 2)
-            catalyst_profile.rating_count = count
-        else:
-            catalyst_profile.average_rating = 0.00
-            catalyst_profile.rating_count = 0
-        catalyst_profile.save()
-
-    @staticmethod
-    def update_catalyst_rating_for_user(catalyst):
-        """Update a specific catalyst's rating"""
-        try:
-            catalyst_profile = catalyst.profile
-        except Exception:
-            # Profile might be deleted or user is being deleted
-            return
-
-        ratings = Rating.objects.filter(catalyst=catalyst)
-        count = ratings.count()
-        if count > 0:
-            avg = sum(r.rating for r in ratings) / count
-            catalyst_profile.average_rating = round(avg, 2)
-            catalyst_profile.rating_count = count
-        else:
-            catalyst_profile.average_rating = 0.00
-            catalyst_profile.rating_count = 0
-        catalyst_profile.save()
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember what was stored so api.ratings can apply a delta on save
+        instance._stored_rating = (instance.__dict__.get('catalyst_id'), instance.__dict__.get('rating'))
+        return instance
 
-class Message(models.Model):
+class Message(AtomicSaveMixin, models.Model):
     """
     Messages between catalyst and seeker for a booking.
     Messages auto-delete after 1 week.
@@ -192,11 +242,16 @@ class Message(models.Model):
 
     class Meta:
         ordering = ['timestamp']
+        indexes = [
+            models.Index(fields=['booking', 'is_read'], name='message_booking_read_idx'),
+            # Last message per conversation (api.inbox)
+            models.Index(fields=['booking', '-timestamp', '-id'], name='message_booking_time_idx'),
+        ]
 
     def __str__(self):
         return f"Message from {self.sender.username} at {self.timestamp}"
 
-class Report(models.Model):
+class Report(AtomicSaveMixin, models.Model):
     """
     Model to store user reports against other users.
     """
@@ -205,16 +260,143 @@ class Report(models.Model):
         ('RESOLVED', 'Resolved'),
         ('DISMISSED', 'Dismissed'),
     )
+    REPORT_SOURCE_CHOICES = (
+        ('USER', 'User'),
+        ('AUTOMATED', 'Automated'),  # raised by api.throttles abuse detection
+    )
 
-    reporter = models.ForeignKey(User, on_delete=models.CASCADE, related_name='reports_filed')
+    # Null for automated reports
+    reporter = models.ForeignKey(User, on_delete=models.CASCADE, related_name='reports_filed', null=True, blank=True)
     reported_user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='reports_received')
     reason = models.TextField()
     status = models.CharField(max_length=20, choices=REPORT_STATUS_CHOICES, default='PENDING')
+    source = models.CharField(max_length=20, choices=REPORT_SOURCE_CHOICES, default='USER')
     created_at = models.DateTimeField(auto_now_add=True)
     resolved_at = models.DateTimeField(null=True, blank=True)
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['reported_user', '-created_at'], name='report_reported_created_idx'),
+            models.Index(fields=['status', 'created_at'], name='report_status_created_idx'),
+        ]
+
+    def __str__(self):
+        reporter = self.reporter.username if self.reporter_id else 'system'
+        return f"Report by {reporter} against {self.reported_user.username}"
+
+
+class Job(models.Model):
+    """
+    A unit of background work (api.jobs). Workers claim queued rows, retry
+    failures with backoff and keep finished rows for timing metrics.
+    """
+    STATUS_CHOICES = (
+        ('QUEUED', 'Queued'),
+        ('RUNNING', 'Running'),
+        ('SUCCEEDED', 'Succeeded'),
+        ('FAILED', 'Failed'),
+    )
+
+    name = models.CharField(max_length=100)
+    args = models.JSONField(default=list, blank=True)
+    kwargs = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='QUEUED')
+    # At most one queued job per key; used to coalesce repeated requests for the same work
+    dedupe_key = models.CharField(max_length=200, null=True, blank=True)
+    run_at = models.DateTimeField(default=timezone.now)
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=5)
+    locked_by = models.CharField(max_length=100, blank=True)
+    locked_until = models.DateTimeField(null=True, blank=True)  # a RUNNING job past this is reclaimed
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    duration_ms = models.FloatField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'run_at'], name='job_status_run_at_idx'),
+            models.Index(fields=['name', 'finished_at'], name='job_name_finished_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['dedupe_key'], condition=Q(status='QUEUED'), name='job_queued_dedupe_key_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.name} #{self.pk} ({self.status})"
+
+
+class Event(models.Model):
+    """
+    A notification for one user (api.events): pushed over their WebSocket
+    when it happens and kept so reconnecting clients can replay what they
+    missed. Ids are the replay cursor.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='events')
+    type = models.CharField(max_length=50)
+    payload = models.JSONField(default=dict, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['id']
+        indexes = [
+            models.Index(fields=['user', 'id'], name='event_user_id_idx'),
+            models.Index(fields=['created_at'], name='event_created_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.type} for {self.user_id} #{self.pk}"
+
+
+class OutboxMessage(models.Model):
+    """
+    A change to a Booking, Rating, Message, Profile or Report, written in
+    the same transaction as the change and delivered to side-effect
+    handlers afterwards (api.outbox).
+    """
+    topic = models.CharField(max_length=50)  # '<model>.<created|updated|deleted>'
+    key = models.CharField(max_length=64, unique=True)  # idempotency key handed to handlers
+    payload = models.JSONField(default=dict, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    available_at = models.DateTimeField(default=timezone.now)  # pushed back after a failed delivery
+    attempts = models.PositiveIntegerField(default=0)
+    handled = models.JSONField(default=list, blank=True)  # handlers that already succeeded
+    dispatched_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['available_at', 'id'], name='outbox_pending_idx', condition=Q(dispatched_at__isnull=True)),
+            models.Index(fields=['dispatched_at'], name='outbox_dispatched_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.topic} #{self.pk}"
+
+
+class IdempotencyKey(models.Model):
+    """
+    A client's Idempotency-Key for a create request (api.idempotency) and
+    the response it got, replayed to retries. status_code is null while the
+    first request is still running.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='idempotency_keys')
+    key = models.CharField(max_length=255)
+    fingerprint = models.CharField(max_length=64)  # sha256 of method, path and body
+    status_code = models.PositiveSmallIntegerField(null=True, blank=True)
+    response = models.JSONField(null=True, blank=True, encoder=DjangoJSONEncoder)
+    location = models.CharField(max_length=255, blank=True)
+    created_at = models.DateTimeField(default=timezone.now)  # reset when a stale claim is taken over
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'key'], name='idempotency_user_key_uniq'),
+        ]
+        indexes = [
+            models.Index(fields=['created_at'], name='idempotency_created_idx'),
+        ]
 
     def __str__(self):
-        return f"Report by {self.reporter.username} against {self.reported_user.username}"
+        return f"{self.key} for {self.user_id}"
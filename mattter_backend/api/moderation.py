@@ -0,0 +1,172 @@
+"""
+Report moderation: the admin queue, bulk status changes and per-user triage.
+
+The queue reads compact rows (report columns plus both users' name fields)
+with one joined query instead of ReportSerializer's nested profiles, and is
+served by report_status_created_idx for the usual "pending, oldest first"
+view. Closing reports is one UPDATE for the whole selection.
+
+Automated reports (source AUTOMATED, no reporter) are raised by
+flag_user(), called from the abuse detection in api.throttles.
+"""
+
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, Max, Min, Q
+from django.utils import timezone
+
+from . import events
+from .models import Report
+
+OPEN = 'PENDING'
+CLOSED_STATUSES = ('RESOLVED', 'DISMISSED')
+STATUSES = (OPEN,) + CLOSED_STATUSES
+SOURCES = ('USER', 'AUTOMATED')
+
+ROW_FIELDS = [
+    'id', 'reason', 'status', 'source', 'created_at', 'resolved_at',
+    'reporter_id', 'reporter__username', 'reporter__first_name', 'reporter__last_name',
+    'reported_user_id', 'reported_user__username', 'reported_user__first_name', 'reported_user__last_name',
+]
+
+
+def parse_filters(params, default_status=OPEN):
+    """
+    Validate queue filters from query params. Returns a dict for
+    filter_reports(); raises ValueError with a message for the client.
+
+        status           PENDING, RESOLVED, DISMISSED or ALL (default: default_status)
+        min_age_hours    only reports at least this old
+        max_age_hours    only reports at most this old
+        reported_user    only reports against this user id
+        source           USER or AUTOMATED
+    """
+    status_value = (params.get('status') or default_status).upper()
+    if status_value != 'ALL' and status_value not in STATUSES:
+        raise ValueError(f"status must be one of {', '.join(STATUSES)} or ALL")
+    filters = {'status': None if status_value == 'ALL' else status_value}
+    for name in ('min_age_hours', 'max_age_hours'):
+        if params.get(name) not in (None, ''):
+            try:
+                filters[name] = float(params[name])
+            except ValueError:
+                raise ValueError(f'{name} must be a number')
+            if filters[name] < 0:
+                raise ValueError(f'{name} must not be negative')
+    if params.get('reported_user') not in (None, ''):
+        try:
+            filters['reported_user'] = int(params['reported_user'])
+        except ValueError:
+            raise ValueError('reported_user must be a user id')
+    if params.get('source'):
+        filters['source'] = params['source'].upper()
+        if filters['source'] not in SOURCES:
+            raise ValueError(f"source must be one of {', '.join(SOURCES)}")
+    return filters
+
+
+def filter_reports(queryset, status=OPEN, min_age_hours=None, max_age_hours=None, reported_user=None, source=None):
+    now = timezone.now()
+    if status:
+        queryset = queryset.filter(status=status)
+    if min_age_hours is not None:
+        queryset = queryset.filter(created_at__lte=now - timedelta(hours=min_age_hours))
+    if max_age_hours is not None:
+        queryset = queryset.filter(created_at__gte=now - timedelta(hours=max_age_hours))
+    if reported_user is not None:
+        queryset = queryset.filter(reported_user_id=reported_user)
+    if source:
+        queryset = queryset.filter(source=source)
+    return queryset
+
+
+def queue_queryset(**filters):
+    """Filtered reports as lean dicts; the caller's paginator orders them."""
+    return filter_reports(Report.objects.order_by(), **filters).values(*ROW_FIELDS)
+
+
+def _name(row, prefix):
+    if row[prefix + '_id'] is None:
+        return 'System'
+    name = f"{row[prefix + '__first_name']} {row[prefix + '__last_name']}".strip()
+    return name or row[prefix + '__username']
+
+
+def report_row(row):
+    return {
+        'id': row['id'],
+        'reason': row['reason'],
+        'status': row['status'],
+        'source': row['source'],
+        'created_at': row['created_at'],
+        'resolved_at': row['resolved_at'],
+        'reporter': {'id': row['reporter_id'], 'name': _name(row, 'reporter')},
+        'reported_user': {'id': row['reported_user_id'], 'name': _name(row, 'reported_user')},
+    }
+
+
+def close_reports(new_status, ids=None, reported_user=None):
+    """
+    Mark pending reports RESOLVED or DISMISSED in a single UPDATE, by id
+    and/or for everything pending against one user. Reports that are no
+    longer pending are left alone. Returns the number of reports closed.
+    """
+    if new_status not in CLOSED_STATUSES:
+        raise ValueError(f"status must be one of {', '.join(CLOSED_STATUSES)}")
+    if ids is None and reported_user is None:
+        raise ValueError('ids or reported_user is required')
+
+    reports = Report.objects.filter(status=OPEN)
+    if ids is not None:
+        reports = reports.filter(id__in=ids)
+    if reported_user is not None:
+        reports = reports.filter(reported_user_id=reported_user)
+    return reports.update(status=new_status, resolved_at=timezone.now())
+
+
+def reports_by_user(**filters):
+    """
+    One row per reported user with report counts, most pending first, so
+    repeat offenders surface at the top of the triage list.
+    """
+    pending = Q(status=OPEN)
+    return filter_reports(Report.objects.order_by(), **filters).values(
+        'reported_user_id', 'reported_user__username', 'reported_user__first_name', 'reported_user__last_name',
+    ).annotate(
+        total=Count('id'),
+        pending=Count('id', filter=pending),
+        automated=Count('id', filter=Q(source='AUTOMATED')),
+        oldest_pending=Min('created_at', filter=pending),
+        latest=Max('created_at'),
+    ).order_by('-pending', '-total', '-latest', 'reported_user_id')
+
+
+def user_group_row(row):
+    return {
+        'reported_user': {'id': row['reported_user_id'], 'name': _name(row, 'reported_user')},
+        'total': row['total'],
+        'pending': row['pending'],
+        'automated': row['automated'],
+        'oldest_pending': row['oldest_pending'],
+        'latest': row['latest'],
+    }
+
+
+def flag_user(user_id, scope, reason, dedupe_seconds):
+    """
+    File an automated report against a user, at most once per scope per
+    `dedupe_seconds`, and never while an automated report for the same
+    scope is still pending. Returns the new Report or None.
+    """
+    if not cache.add(f'abuse_flagged_{scope}_{user_id}', True, dedupe_seconds):
+        return None
+    tag = f'[{scope}]'
+    if Report.objects.filter(reported_user_id=user_id, status=OPEN, source='AUTOMATED',
+                             reason__startswith=tag).exists():
+        return None
+    with transaction.atomic():
+        report = Report.objects.create(reported_user_id=user_id, source='AUTOMATED', reason=f'{tag} {reason}')
+        events.report_created(report)
+    return report
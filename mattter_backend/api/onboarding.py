@@ -0,0 +1,154 @@
+"""
+Bulk onboarding of catalyst accounts.
+
+Rows are processed in chunks: one existence query, parallel password
+hashing, and one bulk INSERT each for users and profiles per chunk.
+"""
+
+from decimal import Decimal, InvalidOperation
+
+from django.db import DatabaseError, transaction
+
+from .hashers import hash_passwords
+from .models import User, Profile
+
+DEFAULT_BATCH_SIZE = 1000
+
+PROFILE_FIELDS = ['gender', 'age', 'bio', 'bio_short', 'latitude', 'longitude',
+                  'address', 'hourly_rate', 'specializations']
+
+STRING_FIELDS = ['username', 'email', 'password', 'first_name', 'last_name',
+                 'gender', 'bio', 'bio_short', 'address']
+
+
+def _clean_row(row):
+    """Validate one import row. Returns (user_kwargs, profile_kwargs, password) or raises ValueError."""
+    if not isinstance(row, dict):
+        raise ValueError('Each row must be an object')
+    for field in STRING_FIELDS:
+        if row.get(field) is not None and not isinstance(row[field], str):
+            raise ValueError(f'{field} must be a string')
+    specializations = row.get('specializations')
+    if specializations is not None and not isinstance(specializations, str) and not (
+            isinstance(specializations, list) and all(isinstance(s, str) for s in specializations)):
+        raise ValueError('specializations must be a string or a list of strings')
+
+    username = (row.get('username') or '').strip()
+    if not username:
+        raise ValueError('username is required')
+
+    user_kwargs = {
+        'username': User.normalize_username(username),
+        'email': User.objects.normalize_email(row.get('email') or ''),
+        'first_name': row.get('first_name') or '',
+        'last_name': row.get('last_name') or '',
+    }
+
+    profile_kwargs = {'role': 'CATALYST'}
+    for field in PROFILE_FIELDS:
+        value = row.get(field)
+        if value in (None, ''):
+            continue
+        if field == 'age':
+            value = int(value)
+        elif field in ('latitude', 'longitude'):
+            value = float(value)
+        elif field == 'hourly_rate':
+            try:
+                value = Decimal(str(value))
+            except InvalidOperation:
+                raise ValueError('hourly_rate must be a number')
+        elif field == 'specializations' and isinstance(value, str):
+            value = [s.strip() for s in value.split(',') if s.strip()]
+        profile_kwargs[field] = value
+
+    if profile_kwargs.get('gender') and profile_kwargs['gender'] not in dict(Profile.GENDER_CHOICES):
+        raise ValueError(f"gender must be one of {list(dict(Profile.GENDER_CHOICES))}")
+
+    return user_kwargs, profile_kwargs, row.get('password') or None
+
+
+def _import_chunk(chunk, results):
+    valid = []
+    seen = set()
+    for index, row in chunk:
+        try:
+            user_kwargs, profile_kwargs, password = _clean_row(row)
+        except (ValueError, TypeError) as e:
+            results[index] = {'row': index, 'status': 'error', 'error': str(e)}
+            continue
+        if user_kwargs['username'] in seen:
+            results[index] = {'row': index, 'username': user_kwargs['username'],
+                              'status': 'skipped', 'error': 'Duplicate username in import'}
+            continue
+        seen.add(user_kwargs['username'])
+        valid.append((index, user_kwargs, profile_kwargs, password))
+
+    existing = set(User.objects.filter(username__in=seen).values_list('username', flat=True))
+    pending = []
+    for entry in valid:
+        index, user_kwargs = entry[0], entry[1]
+        if user_kwargs['username'] in existing:
+            results[index] = {'row': index, 'username': user_kwargs['username'],
+                              'status': 'skipped', 'error': 'Username already exists'}
+        else:
+            pending.append(entry)
+
+    if not pending:
+        return
+
+    hashes = hash_passwords([password for _, _, _, password in pending])
+    users = [User(password=pw_hash, **user_kwargs)
+             for (_, user_kwargs, _, _), pw_hash in zip(pending, hashes)]
+
+    try:
+        with transaction.atomic():
+            users = User.objects.bulk_create(users)
+            if any(u.pk is None for u in users):
+                # Backend can't return ids from a bulk insert - fetch them in one query
+                ids = dict(User.objects.filter(username__in=[u.username for u in users])
+                           .values_list('username', 'id'))
+                for u in users:
+                    u.pk = ids[u.username]
+            Profile.objects.bulk_create([
+                Profile(user=u, **profile_kwargs)
+                for u, (_, _, profile_kwargs, _) in zip(users, pending)
+            ])
+    except DatabaseError:
+        # One bad row (a username registered meanwhile, a value the column
+        # rejects) fails the whole INSERT; retry row by row to find it
+        for entry, pw_hash in zip(pending, hashes):
+            _import_row(entry, pw_hash, results)
+        return
+
+    for u, (index, _, _, _) in zip(users, pending):
+        results[index] = {'row': index, 'username': u.username, 'status': 'created', 'user_id': u.pk}
+
+
+def _import_row(entry, pw_hash, results):
+    index, user_kwargs, profile_kwargs, _ = entry
+    try:
+        with transaction.atomic():
+            user = User.objects.create(password=pw_hash, **user_kwargs)
+            Profile.objects.create(user=user, **profile_kwargs)
+    except DatabaseError as e:
+        results[index] = {'row': index, 'username': user_kwargs['username'],
+                          'status': 'error', 'error': f'Could not save row: {e}'}
+        return
+    results[index] = {'row': index, 'username': user.username, 'status': 'created', 'user_id': user.pk}
+
+
+def import_catalysts(rows, batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Create catalyst users and profiles from an iterable of dicts.
+
+    Each row needs a `username`; `email`, `password`, `first_name`,
+    `last_name` and the catalyst profile fields are optional. Rows without a
+    password get an unusable one. Returns one result dict per row, in order.
+    """
+    rows = list(rows)
+    results = [None] * len(rows)
+    for start in range(0, len(rows), batch_size):
+        chunk = list(enumerate(rows[start:start + batch_size], start=start))
+        _import_chunk(chunk, results)
+    return results
@@ -0,0 +1,234 @@
+"""
+Transactional outbox for side effects of domain changes.
+
+Saving a Booking, Rating, Message, Profile or Report (and deleting any of
+them but Message) writes an OutboxMessage in the same transaction
+(api.signals; the models' saves are atomic, see AtomicSaveMixin). So a
+change and the record that its side effects are owed commit together or
+not at all. Side effects live in handlers registered here:
+
+    @outbox.handler('cache.profile_me', 'profile', 'rating.created')
+    def drop_profile_me(messages): ...
+
+A handler subscribes to whole models ('profile') or single topics
+('rating.created') and receives a batch of messages. Delivery is
+at-least-once: a handler's name is stored on a message only after it
+returns, and a message is marked dispatched once every handler has
+succeeded. Failed handlers are retried with backoff; handlers that already
+succeeded are not called again for that message. A crash between a
+handler's work and that bookkeeping replays the message, so handlers must
+be idempotent; message.key is a stable idempotency key for anything that
+is not naturally so (clients dedupe pushed messages on it).
+
+After commit the new message is dispatched in the same process
+(OUTBOX_DISPATCH_INLINE) or by a queued 'outbox.dispatch' job. Either
+way, the periodic 'outbox.dispatch' job sweeps up anything older than
+OUTBOX_SWEEP_AFTER seconds that is still undelivered: messages whose
+process died after commit, or whose handlers failed. That sweep is the
+crash recovery path; `manage.py dispatch_outbox` runs it by hand.
+
+QuerySet.update(), bulk_create() and raw deletes skip signals and so write
+no outbox messages; code using them invalidates what it touched itself
+(see api.ratings, api.user_deletion).
+"""
+
+import importlib
+import logging
+import random
+import traceback
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+
+from . import jobs
+from .models import OutboxMessage
+
+logger = logging.getLogger(__name__)
+
+# Modules whose @handler functions the dispatcher must know about
+HANDLER_MODULES = ['api.outbox', 'api.dashboard', 'api.events', 'api.feed']
+
+DEFAULT_BATCH_SIZE = 200
+DEFAULT_SWEEP_AFTER = 30
+PROFILE_ME_KEY = 'profile_me_{}'
+ADMIN_STATS_KEY = 'admin_dashboard_stats'
+
+_handlers = {}
+_handlers_loaded = False
+
+
+def handler(name, *topics):
+    """Register `func(messages)` as the handler `name` for the given models or topics."""
+    def register(func):
+        _handlers[name] = {'func': func, 'topics': frozenset(topics)}
+        return func
+    return register
+
+
+def _load_handlers():
+    global _handlers_loaded
+    if not _handlers_loaded:
+        for module in HANDLER_MODULES:
+            importlib.import_module(module)
+        _handlers_loaded = True
+
+
+def _subscribed(entry, topic):
+    return topic in entry['topics'] or topic.split('.', 1)[0] in entry['topics']
+
+
+# Recording
+
+def _payload(instance):
+    model = type(instance).__name__
+    if model == 'Booking':
+        return {'id': instance.pk, 'seeker_id': instance.seeker_id, 'catalyst_id': instance.catalyst_id,
+                'status': instance.status}
+    if model == 'Rating':
+        return {'id': instance.pk, 'seeker_id': instance.seeker_id, 'catalyst_id': instance.catalyst_id,
+                'booking_id': instance.booking_id, 'rating': instance.rating}
+    if model == 'Message':
+        return {'id': instance.pk, 'booking_id': instance.booking_id, 'sender_id': instance.sender_id}
+    if model == 'Profile':
+        return {'id': instance.pk, 'user_id': instance.user_id, 'role': instance.role}
+    if model == 'Report':
+        return {'id': instance.pk, 'reporter_id': instance.reporter_id,
+                'reported_user_id': instance.reported_user_id, 'status': instance.status}
+    return {'id': instance.pk}
+
+
+def record(instance, action):
+    """Write the outbox message for a saved or deleted instance; dispatch it after commit."""
+    message = OutboxMessage.objects.create(
+        topic=f'{type(instance).__name__.lower()}.{action}',
+        key=uuid.uuid4().hex,
+        payload=_payload(instance),
+    )
+    transaction.on_commit(lambda: _after_commit(message.pk))
+    return message
+
+
+def _after_commit(pk):
+    try:
+        if getattr(settings, 'OUTBOX_DISPATCH_INLINE', True):
+            dispatch(ids=[pk])
+        else:
+            jobs.enqueue('outbox.dispatch', older_than=0, dedupe_key='outbox.dispatch')
+    except Exception:
+        # The message is committed; the periodic sweep delivers it
+        logger.exception('Dispatching outbox message %s failed', pk)
+
+
+# Dispatching
+
+def _retry_delay(attempts):
+    base = getattr(settings, 'OUTBOX_RETRY_BASE_DELAY', 10)
+    delay = min(base * 2 ** (attempts - 1), getattr(settings, 'OUTBOX_RETRY_MAX_DELAY', 3600))
+    return delay * random.uniform(0.8, 1.2)
+
+
+def deliver(messages):
+    """Run every handler owed by `messages` and record the outcome. Returns the number fully dispatched."""
+    _load_handlers()
+    errors = {}
+    for name, entry in _handlers.items():
+        batch = [m for m in messages if name not in m.handled and _subscribed(entry, m.topic)]
+        if not batch:
+            continue
+        try:
+            entry['func'](batch)
+        except Exception:
+            logger.exception('Outbox handler %s failed for %d message(s)', name, len(batch))
+            error = f'{name}: {traceback.format_exc()}'
+            for message in batch:
+                errors.setdefault(message.pk, error)
+            continue
+        for message in batch:
+            message.handled = message.handled + [name]
+
+    now = timezone.now()
+    for message in messages:
+        message.attempts += 1
+        if message.pk in errors:
+            message.last_error = errors[message.pk]
+            message.available_at = now + timedelta(seconds=_retry_delay(message.attempts))
+        else:
+            message.dispatched_at = now
+            message.last_error = ''
+    OutboxMessage.objects.bulk_update(messages, ['handled', 'attempts', 'dispatched_at', 'available_at', 'last_error'])
+    return len(messages) - len(errors)
+
+
+def dispatch(ids=None, older_than=None, batch_size=None):
+    """
+    Deliver due, undelivered messages in batches of `batch_size`: the given
+    `ids`, or everything created more than `older_than` seconds ago.
+    Returns the number of messages fully dispatched.
+    """
+    batch_size = batch_size or getattr(settings, 'OUTBOX_BATCH_SIZE', DEFAULT_BATCH_SIZE)
+    now = timezone.now()
+    pending = OutboxMessage.objects.filter(dispatched_at__isnull=True, available_at__lte=now)
+    if ids is not None:
+        pending = pending.filter(pk__in=ids)
+    if older_than:
+        pending = pending.filter(created_at__lte=now - timedelta(seconds=older_than))
+
+    dispatched = 0
+    last_pk = 0
+    while True:
+        messages = list(pending.filter(pk__gt=last_pk).order_by('pk')[:batch_size])
+        if not messages:
+            return dispatched
+        dispatched += deliver(messages)
+        if len(messages) < batch_size:
+            return dispatched
+        last_pk = messages[-1].pk
+
+
+@jobs.task('outbox.dispatch', max_attempts=1)
+def sweep(older_than=None):
+    """Periodic recovery: deliver messages the after-commit dispatch missed or that failed."""
+    if older_than is None:
+        older_than = getattr(settings, 'OUTBOX_SWEEP_AFTER', DEFAULT_SWEEP_AFTER)
+    return dispatch(older_than=older_than)
+
+
+@jobs.task('outbox.prune')
+def prune(days=None):
+    """Delete dispatched messages older than OUTBOX_RETENTION_DAYS."""
+    cutoff = timezone.now() - timedelta(days=days or getattr(settings, 'OUTBOX_RETENTION_DAYS', 3))
+    deleted, _ = OutboxMessage.objects.filter(dispatched_at__lt=cutoff).delete()
+    return deleted
+
+
+def stats():
+    """Undelivered message counts, for monitoring the outbox backlog."""
+    pending = OutboxMessage.objects.filter(dispatched_at__isnull=True)
+    oldest = pending.order_by('created_at').values_list('created_at', flat=True).first()
+    return {
+        'pending': pending.count(),
+        'failing': pending.filter(attempts__gt=0).count(),
+        'oldest_pending': oldest,
+    }
+
+
+# Cache invalidation handlers
+
+@handler('cache.profile_me', 'profile', 'rating')
+def drop_profile_me(messages):
+    """GET /profiles/me/ is cached per user; profile edits and rating aggregates change it."""
+    user_ids = set()
+    for message in messages:
+        payload = message.payload
+        user_ids.add(payload['user_id'] if message.topic.startswith('profile.') else payload['catalyst_id'])
+    cache.delete_many([PROFILE_ME_KEY.format(user_id) for user_id in user_ids])
+
+
+@handler('cache.admin_stats', 'profile', 'booking', 'rating', 'report')
+def drop_admin_stats(messages):
+    """The admin dashboard counts bookings, reports and ratings per user."""
+    cache.delete(ADMIN_STATS_KEY)
@@ -0,0 +1,276 @@
+"""
+Outfit generation over a user's wardrobe.
+
+Items are sorted into slots by `category` and given a colour (the dominant
+colour from ai_tags, else the owner's `color` name). Outfits are either
+top + bottom + shoes or dress + shoes, scored by the mean pairwise colour
+harmony of their pieces.
+
+iter_outfits() yields outfits best first without building the Cartesian
+product, or even the tops x bottoms score matrix: each top gets an upper
+bound from its best bottom plus the best possible shoes (scored in
+chunks), and one best-first heap expands a top into its bottoms, a
+top/bottom pair or dress into its shoes, only while its bound can still
+beat the best outfit waiting to be yielded. Memory grows with the tops
+actually expanded, not with tops x bottoms. Generated results are cached
+per wardrobe version (api.conditional.get_wardrobe_version).
+"""
+
+import colorsys
+import heapq
+import itertools
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models.fields.json import KT
+
+from .conditional import get_wardrobe_version
+from .imaging import COLOR_PALETTE
+from .models import WardrobeItem
+from .uploads import variant_urls
+
+CACHE_TIMEOUT = 60 * 60
+DEFAULT_MAX_RESULTS = 1000
+MIN_PAIR_SCORE = 0.35   # garment pairs that clash this badly are never expanded
+UNKNOWN_SCORE = 0.6     # harmony assumed when a colour is unknown
+HARMONY_CHUNK_CELLS = 1 << 16  # pair scores computed at once, so memory doesn't grow with tops x bottoms
+
+SLOTS = {
+    'top': 'top', 'shirt': 'top', 't-shirt': 'top', 'tee': 'top', 'blouse': 'top',
+    'sweater': 'top', 'hoodie': 'top', 'knitwear': 'top',
+    'bottom': 'bottom', 'pant': 'bottom', 'trouser': 'bottom', 'jean': 'bottom',
+    'skirt': 'bottom', 'short': 'bottom',
+    'shoe': 'shoes', 'sneaker': 'shoes', 'boot': 'shoes', 'heel': 'shoes',
+    'sandal': 'shoes', 'footwear': 'shoes',
+    'dress': 'dress', 'jumpsuit': 'dress',
+}
+
+_NAMED_COLORS = dict(COLOR_PALETTE)
+_NAMED_COLORS.update({'gray': (128, 128, 128), 'cream': (245, 235, 210), 'tan': (210, 180, 140),
+                      'khaki': (195, 176, 145), 'denim': (60, 90, 140), 'burgundy': (128, 0, 32)})
+
+# (hue distance in degrees, width, score): monochrome/analogous, complementary, triadic
+_HUE_TEMPLATES = np.array([(0, 25, 0.9), (180, 25, 0.85), (120, 15, 0.7)], dtype=np.float32)
+
+
+def slot_for(category):
+    key = (category or '').strip().lower()
+    if key.endswith('es') and key[:-2] in SLOTS:
+        key = key[:-2]
+    elif key.endswith('s') and key[:-1] in SLOTS:
+        key = key[:-1]
+    return SLOTS.get(key)
+
+
+def _parse_color(hex_value, name):
+    if hex_value and len(hex_value) == 7 and hex_value.startswith('#'):
+        try:
+            return tuple(int(hex_value[i:i + 2], 16) for i in (1, 3, 5))
+        except ValueError:
+            pass
+    return _NAMED_COLORS.get((name or '').strip().lower())
+
+
+def _hsv(rgb):
+    """(hue degrees, neutral flag, known flag) for an RGB tuple or None."""
+    if rgb is None:
+        return 0.0, 0.0, 0.0
+    h, s, v = colorsys.rgb_to_hsv(*(c / 255 for c in rgb))
+    # Greys, near-black and dark blues (navy, denim) go with everything
+    neutral = s < 0.2 or v < 0.2 or (0.55 <= h <= 0.7 and v < 0.45)
+    return h * 360, float(neutral), 1.0
+
+
+def harmony(a, b):
+    """
+    Pairwise colour harmony between two slot arrays of (hue, neutral, known)
+    rows, as an (len(a), len(b)) matrix in [0, 1].
+    """
+    hue_a, neutral_a, known_a = (a[:, i, None] for i in range(3))
+    hue_b, neutral_b, known_b = (b[None, :, i] for i in range(3))
+
+    distance = np.abs(hue_a - hue_b)
+    distance = np.minimum(distance, 360 - distance)
+    centers, widths, weights = _HUE_TEMPLATES.T
+    fits = weights * np.exp(-0.5 * ((distance[..., None] - centers) / widths) ** 2)
+    score = np.maximum(fits.max(axis=-1), 0.2)
+
+    either_neutral = np.maximum(neutral_a, neutral_b)
+    both_neutral = neutral_a * neutral_b
+    score = np.where(either_neutral > 0, np.where(both_neutral > 0, 0.8, 0.85), score)
+    return np.where(known_a * known_b > 0, score, UNKNOWN_SCORE).astype(np.float32)
+
+
+def load_slots(owner_id):
+    """{slot: (ids array, colour array)} for an owner's items that fit an outfit slot."""
+    rows = WardrobeItem.objects.filter(owner_id=owner_id).order_by('id').values_list(
+        'id', 'category', 'color', KT('ai_tags__dominant_colors__0__hex'),
+    )
+    slots = {}
+    for item_id, category, color, dominant_hex in rows:
+        slot = slot_for(category)
+        if slot:
+            slots.setdefault(slot, []).append((item_id, _hsv(_parse_color(dominant_hex, color))))
+    return {
+        slot: (np.array([r[0] for r in members], dtype=np.int64),
+               np.array([r[1] for r in members], dtype=np.float32))
+        for slot, members in slots.items()
+    }
+
+
+def _row_chunks(a, b):
+    """harmony(a, b) in row chunks of about HARMONY_CHUNK_CELLS scores: yields (start, block)."""
+    step = max(1, HARMONY_CHUNK_CELLS // max(len(b), 1))
+    for start in range(0, len(a), step):
+        yield start, harmony(a[start:start + step], b)
+
+
+def _row_max(a, b):
+    """Best harmony of each row of `a` with any row of `b`."""
+    best = np.empty(len(a), dtype=np.float32)
+    for start, block in _row_chunks(a, b):
+        best[start:start + len(block)] = block.max(axis=1)
+    return best
+
+
+def iter_outfits(slots):
+    """Yield (score, item_ids) best first. See the module docstring."""
+    empty = (np.empty(0, dtype=np.int64), np.empty((0, 3), dtype=np.float32))
+    tops, bottoms, dresses, shoes = (slots.get(s, empty) for s in ('top', 'bottom', 'dress', 'shoes'))
+    has_shoes = len(shoes[0]) > 0
+    if has_shoes:
+        top_shoe_max, bottom_shoe_max = _row_max(tops[1], shoes[1]), _row_max(bottoms[1], shoes[1])
+    else:
+        # Without shoes, a top/bottom pair is a complete outfit; dresses alone aren't outfits
+        top_shoe_max = bottom_shoe_max = None
+
+    def pair_bounds(top_rows, pair):
+        """Upper bounds for top/bottom pairs given their pair harmony (tops x bottoms)."""
+        if has_shoes:
+            pair = (pair + top_shoe_max[top_rows, None] + bottom_shoe_max[None, :]) / 3
+        return pair
+
+    # Everything waiting is a (-key, tiebreak, kind, data) entry whose key
+    # bounds every outfit it can still produce; popping the largest key
+    # therefore yields exact outfits best first.
+    frontier = []
+    counter = itertools.count()
+
+    def push(key, kind, data):
+        heapq.heappush(frontier, (-float(key), next(counter), kind, data))
+
+    def push_outfit(garments, scores):
+        if scores is None:
+            return
+        shoe_order = np.argsort(-scores, kind='stable')
+        push(scores[shoe_order[0]], 'outfit', (garments, scores, shoe_order, 0))
+
+    # One entry per top, bounded by its best pair; its bottoms are scored on expansion
+    for start, block in _row_chunks(tops[1], bottoms[1]):
+        rows = np.arange(start, start + len(block))
+        bounds = np.where(block >= MIN_PAIR_SCORE, pair_bounds(rows, block), -np.inf).max(axis=1, initial=-np.inf)
+        for t in np.flatnonzero(np.isfinite(bounds)):
+            push(bounds[t], 'top', start + t)
+    if has_shoes:
+        for d, bound in enumerate(_row_max(dresses[1], shoes[1])):
+            push(bound, 'dress', d)
+
+    while frontier:
+        neg_key, _, kind, data = heapq.heappop(frontier)
+        if kind == 'outfit':
+            garments, scores, shoe_order, i = data
+            if scores is None:
+                yield round(-neg_key, 4), list(garments)
+                continue
+            yield round(-neg_key, 4), list(garments) + [int(shoes[0][shoe_order[i]])]
+            # Lazily queue the same base with its next-best shoe
+            if i + 1 < len(shoe_order):
+                push(scores[shoe_order[i + 1]], 'outfit', (garments, scores, shoe_order, i + 1))
+        elif kind == 'top':
+            t = data
+            pair = harmony(tops[1][t:t + 1], bottoms[1])[0]
+            valid = np.flatnonzero(pair >= MIN_PAIR_SCORE)
+            bounds = pair_bounds(np.array([t]), pair[None, :])[0][valid]
+            order = np.argsort(-bounds, kind='stable')
+            top_shoes = harmony(tops[1][t:t + 1], shoes[1])[0] if has_shoes else None
+            push(bounds[order[0]], 'pair', (t, pair, valid[order], bounds[order], top_shoes, 0))
+        elif kind == 'pair':
+            t, pair, bottom_order, bounds, top_shoes, i = data
+            b = bottom_order[i]
+            garments = (int(tops[0][t]), int(bottoms[0][b]))
+            if has_shoes:
+                push_outfit(garments, (pair[b] + top_shoes + harmony(bottoms[1][b:b + 1], shoes[1])[0]) / 3)
+            else:
+                push(pair[b], 'outfit', (garments, None, None, 0))
+            # The top's next-best bottom
+            if i + 1 < len(bottom_order):
+                push(bounds[i + 1], 'pair', (t, pair, bottom_order, bounds, top_shoes, i + 1))
+        else:  # dress
+            push_outfit((int(dresses[0][data]),), harmony(dresses[1][data:data + 1], shoes[1])[0])
+
+
+def _cache_key(owner_id, version):
+    return f'outfits_{owner_id}_{version}'
+
+
+def max_results():
+    return getattr(settings, 'OUTFIT_MAX_RESULTS', DEFAULT_MAX_RESULTS)
+
+
+def last_page(page_size):
+    """The last page that can hold outfits under OUTFIT_MAX_RESULTS."""
+    return max(1, -(-max_results() // page_size))
+
+
+def get_outfits(owner_id, limit):
+    """
+    The best `limit` outfits for an owner (capped at OUTFIT_MAX_RESULTS),
+    and whether more can be served. Cached per wardrobe version; a cached
+    prefix long enough for `limit` is served without touching the database.
+    """
+    cap = max_results()
+    limit = min(limit, cap)
+    key = _cache_key(owner_id, get_wardrobe_version(owner_id))
+    cached = cache.get(key)
+    if cached is not None and (cached['exhausted'] or len(cached['outfits']) > limit):
+        outfits = cached['outfits']
+    else:
+        # One extra, so callers know whether another page exists
+        outfits = list(itertools.islice(iter_outfits(load_slots(owner_id)), limit + 1))
+        cache.set(key, {'outfits': outfits, 'exhausted': len(outfits) <= limit}, CACHE_TIMEOUT)
+    # Nothing past the cap is ever served
+    return outfits[:limit], len(outfits) > limit and limit < cap
+
+
+def outfit_page(owner_id, page, page_size, request=None):
+    """One page of outfits with item details; the whole payload is cached per wardrobe version."""
+    version = get_wardrobe_version(owner_id)
+    host = request.get_host() if request is not None else ''
+    key = f'{_cache_key(owner_id, version)}_page_{page}_{page_size}_{host}'
+    payload = cache.get(key)
+    if payload is not None:
+        return payload
+    if page > last_page(page_size):
+        return {'page': page, 'page_size': page_size, 'has_more': False, 'results': []}
+
+    outfits, has_more = get_outfits(owner_id, page * page_size)
+    outfits = outfits[(page - 1) * page_size:]
+    items = WardrobeItem.objects.filter(owner_id=owner_id).only(
+        'id', 'name', 'category', 'color', 'image', 'image_variants',
+    ).in_bulk({item_id for _, ids in outfits for item_id in ids})
+
+    results = []
+    for score, ids in outfits:
+        if all(item_id in items for item_id in ids):
+            results.append({'score': score, 'items': [{
+                'id': items[item_id].id,
+                'name': items[item_id].name,
+                'category': items[item_id].category,
+                'color': items[item_id].color,
+                'image_urls': variant_urls(items[item_id], request),
+            } for item_id in ids]})
+
+    payload = {'page': page, 'page_size': page_size, 'has_more': has_more, 'results': results}
+    cache.set(key, payload, CACHE_TIMEOUT)
+    return payload
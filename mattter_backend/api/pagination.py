@@ -0,0 +1,48 @@
+"""
+Pagination classes for feeds that are read page by page.
+"""
+
+from rest_framework.pagination import CursorPagination, PageNumberPagination
+
+
+class ReviewCursorPagination(CursorPagination):
+    """
+    Keyset pagination for review feeds: each page is an index range scan
+    on (catalyst, -created_at), however deep the client scrolls.
+    """
+    ordering = ('-created_at', '-id')
+    page_size = 10
+    page_size_query_param = 'page_size'
+    max_page_size = 50
+
+
+class ModerationCursorPagination(CursorPagination):
+    """
+    Keyset pagination for the moderation queue, oldest first so reports are
+    handled in arrival order; `?order=newest` flips it. Either way a page is
+    a range scan on report_status_created_idx.
+    """
+    ordering = ('created_at', 'id')
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 200
+
+    def get_ordering(self, request, queryset, view):
+        if request.query_params.get('order') == 'newest':
+            return ('-created_at', '-id')
+        return self.ordering
+
+
+class ModerationGroupPagination(PageNumberPagination):
+    """Page numbers for the grouped triage list (aggregates have no stable keyset)."""
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 200
+
+
+class InboxCursorPagination(CursorPagination):
+    """Keyset pagination for the conversation inbox, most recent activity first."""
+    ordering = ('-last_activity', '-id')
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
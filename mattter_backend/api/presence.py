@@ -0,0 +1,92 @@
+"""
+Who is online, from WebSocket heartbeats (api.consumers).
+
+Presence lives only in the cache, never in the database. Each connected
+user has a presence_<user_id> entry holding the time of their last
+heartbeat; it expires PRESENCE_TTL seconds after the last one, so a
+client or server that disappears without closing its socket drops
+offline on its own. A per-user connection count keeps a user online
+until their last tab or device disconnects.
+
+online_user_ids() answers "which of these users are online" with one
+cache.get_many, cheap enough to annotate map and search results.
+
+Sockets and API requests are served by different processes, so the cache
+must be shared (Redis, via REDIS_URL). With the development local-memory
+cache, presence only works when everything runs in one ASGI process.
+"""
+
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+DEFAULT_HEARTBEAT_SECONDS = 25
+DEFAULT_LOOKUP_MAX = 500
+
+
+def heartbeat_seconds():
+    return getattr(settings, 'PRESENCE_HEARTBEAT_SECONDS', DEFAULT_HEARTBEAT_SECONDS)
+
+
+def _ttl():
+    # Two missed heartbeats before a user counts as gone
+    return getattr(settings, 'PRESENCE_TTL', heartbeat_seconds() * 2 + 5)
+
+
+def _presence_key(user_id):
+    return f'presence_{user_id}'
+
+
+def _connections_key(user_id):
+    return f'presence_connections_{user_id}'
+
+
+def connect(user_id):
+    """Record a new connection for the user and mark them online."""
+    ttl = _ttl()
+    key = _connections_key(user_id)
+    if not cache.add(key, 1, ttl):
+        try:
+            cache.incr(key)
+        except ValueError:  # expired between add and incr
+            cache.set(key, 1, ttl)
+        cache.touch(key, ttl)
+    cache.set(_presence_key(user_id), time.time(), ttl)
+
+
+def heartbeat(user_id):
+    """Extend the user's presence by another PRESENCE_TTL seconds."""
+    ttl = _ttl()
+    cache.set(_presence_key(user_id), time.time(), ttl)
+    cache.touch(_connections_key(user_id), ttl)
+
+
+def disconnect(user_id):
+    """Drop one connection; the user goes offline when it was their last."""
+    key = _connections_key(user_id)
+    try:
+        remaining = cache.decr(key)
+    except ValueError:
+        remaining = 0
+    if remaining <= 0:
+        cache.delete_many([key, _presence_key(user_id)])
+
+
+def last_seen(user_ids):
+    """{user_id: last heartbeat timestamp} for the users that are online."""
+    keys = {_presence_key(user_id): user_id for user_id in user_ids}
+    return {keys[key]: seen for key, seen in cache.get_many(keys).items()}
+
+
+def online_user_ids(user_ids):
+    """The subset of `user_ids` that is online, as a set."""
+    return set(last_seen(user_ids))
+
+
+def is_online(user_id):
+    return cache.get(_presence_key(user_id)) is not None
+
+
+def lookup_max():
+    return getattr(settings, 'PRESENCE_LOOKUP_MAX', DEFAULT_LOOKUP_MAX)
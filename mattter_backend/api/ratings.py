@@ -0,0 +1,258 @@
+"""
+Catalyst rating aggregates and the top catalysts leaderboard.
+
+Each Profile keeps a 1-5 star histogram, the rating sum and count, the
+plain average and a Bayesian score
+
+    rating_score = (PRIOR_WEIGHT * PRIOR_MEAN + rating_sum) / (PRIOR_WEIGHT + rating_count)
+
+which pulls catalysts with few ratings towards the prior, so one 5-star
+review doesn't outrank hundreds of 4.9s. Rating saves and deletes apply a
+delta with a single UPDATE (api.signals); recompute_catalyst_ratings()
+rebuilds everything from the Rating table in one grouped query.
+
+The leaderboard is built from the profile_catalyst_score_idx index scan
+and cached. It is rebuilt by the periodic 'ratings.refresh_ranking' job
+(JOB_SCHEDULE), by a job queued when a reader finds it older than
+TOP_CATALYSTS_REFRESH_SECONDS, or by `manage.py refresh_rankings`.
+"""
+
+import time
+from math import radians, sin, cos, sqrt, atan2
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Case, Count, F, FloatField, Q, Sum, Value, When
+from django.db.models.functions import Cast, Round
+from django.utils import timezone
+
+from . import conditional, jobs
+from .models import Profile, Rating
+
+STARS = range(1, 6)
+RANKING_KEY = 'top_catalysts_ranking'
+REFRESH_LOCK_KEY = 'top_catalysts_refreshing'
+
+
+def _prior():
+    return (getattr(settings, 'RATING_PRIOR_MEAN', 3.5), getattr(settings, 'RATING_PRIOR_WEIGHT', 10))
+
+
+def bayesian_score(rating_sum, rating_count):
+    if not rating_count:
+        return 0.0
+    mean, weight = _prior()
+    return (weight * mean + rating_sum) / (weight + rating_count)
+
+
+def _touch_profiles(user_ids):
+    """update() skips signals: refresh the cached ETag versions ourselves."""
+    for pk, version, updated_at, user_id in Profile.objects.filter(user_id__in=user_ids).values_list(
+            'pk', 'version', 'updated_at', 'user_id'):
+        conditional.store_profile_version(Profile(pk=pk, user_id=user_id, version=version, updated_at=updated_at))
+    conditional.invalidate_catalyst_map_version()
+
+
+def apply_rating_change(catalyst_id, old=None, new=None):
+    """
+    Move one rating of `old` stars to `new` stars on a catalyst's profile
+    (None for a created / deleted rating) in one UPDATE. Values read in the
+    SET clause are the pre-update ones, so the averages use the deltas.
+    """
+    if old == new:
+        # Only the review text changed: bump the version so ETags that embed reviews change
+        Profile.objects.filter(user_id=catalyst_id).update(version=F('version') + 1, updated_at=timezone.now())
+        _touch_profiles([catalyst_id])
+        return
+    if any(value is not None and value not in STARS for value in (old, new)):
+        recompute_catalyst_ratings([catalyst_id])
+        return
+
+    count_delta = (new is not None) - (old is not None)
+    sum_delta = (new or 0) - (old or 0)
+    count = F('rating_count') + count_delta
+    total = F('rating_sum') + sum_delta
+    mean, weight = _prior()
+    is_rated = Q(rating_count__gt=-count_delta)
+
+    changes = {
+        'rating_count': count,
+        'rating_sum': total,
+        'average_rating': Case(
+            When(is_rated, then=Round(Cast(total, FloatField()) / Cast(count, FloatField()), 2)),
+            default=Value(0.0),
+        ),
+        'rating_score': Case(
+            When(is_rated, then=(Value(weight * mean) + Cast(total, FloatField())) / (Value(float(weight)) + Cast(count, FloatField()))),
+            default=Value(0.0),
+        ),
+        'version': F('version') + 1,
+        'updated_at': timezone.now(),
+    }
+    if old is not None:
+        changes[f'rating_{old}'] = F(f'rating_{old}') - 1
+    if new is not None:
+        changes[f'rating_{new}'] = F(f'rating_{new}') + 1
+
+    Profile.objects.filter(user_id=catalyst_id).update(**changes)
+    _touch_profiles([catalyst_id])
+
+
+def recompute_catalyst_ratings(user_ids=None):
+    """
+    Rebuild histogram, sum, average and score from the Rating table for the
+    given catalysts (default: every profile). Returns the number of profiles.
+    """
+    ratings = Rating.objects.all() if user_ids is None else Rating.objects.filter(catalyst_id__in=user_ids)
+    aggregates = {
+        row['catalyst_id']: row for row in ratings.values('catalyst_id').order_by().annotate(
+            count=Count('id'), total=Sum('rating'),
+            **{f'stars_{stars}': Count('id', filter=Q(rating=stars)) for stars in STARS},
+        )
+    }
+
+    profiles = Profile.objects.all() if user_ids is None else Profile.objects.filter(user_id__in=user_ids)
+    profiles = list(profiles.only('id', 'user_id', 'version'))
+    for profile in profiles:
+        row = aggregates.get(profile.user_id, {})
+        profile.rating_count = row.get('count', 0)
+        profile.rating_sum = row.get('total') or 0
+        for stars in STARS:
+            setattr(profile, f'rating_{stars}', row.get(f'stars_{stars}', 0))
+        profile.average_rating = round(profile.rating_sum / profile.rating_count, 2) if profile.rating_count else 0
+        profile.rating_score = bayesian_score(profile.rating_sum, profile.rating_count)
+        profile.version += 1
+        profile.updated_at = timezone.now()
+
+    fields = ['rating_count', 'rating_sum', 'average_rating', 'rating_score', 'version', 'updated_at']
+    with transaction.atomic():
+        Profile.objects.bulk_update(profiles, fields + [f'rating_{stars}' for stars in STARS], batch_size=1000)
+    for profile in profiles:
+        conditional.store_profile_version(profile)
+    conditional.invalidate_catalyst_map_version()
+    return len(profiles)
+
+
+# Reviews feed
+
+def reviews_queryset(catalyst_id):
+    """
+    A catalyst's reviews as lean dicts, newest first: one query joining the
+    reviewer's name fields, served by rating_catalyst_created_idx.
+    """
+    return Rating.objects.filter(catalyst_id=catalyst_id).order_by('-created_at', '-id').values(
+        'id', 'rating', 'review', 'created_at',
+        'seeker__username', 'seeker__first_name', 'seeker__last_name',
+    )
+
+
+def review_dict(row):
+    name = f"{row['seeker__first_name']} {row['seeker__last_name']}".strip()
+    return {
+        'id': row['id'],
+        'rating': row['rating'],
+        'review': row['review'],
+        'reviewer': {'name': name or row['seeker__username']},
+        'created_at': row['created_at'],
+    }
+
+
+def rating_summary(profile):
+    """Summary header from the profile's precomputed aggregates (no Rating query)."""
+    return {
+        'count': profile.rating_count,
+        'average': float(profile.average_rating),
+        'score': round(profile.rating_score, 4),
+        'histogram': profile.rating_histogram,
+    }
+
+
+SUMMARY_FIELDS = ['rating_count', 'average_rating', 'rating_score', *[f'rating_{stars}' for stars in STARS]]
+
+
+# Leaderboard
+
+def build_ranking():
+    """All active catalysts, best Bayesian score first, as compact dicts."""
+    limit = getattr(settings, 'TOP_CATALYSTS_RANKING_SIZE', 10000)
+    catalysts = Profile.objects.listed().filter(role='CATALYST', is_active=True).order_by('-rating_score', 'id').select_related('user').only(
+        'id', 'bio_short', 'gender', 'latitude', 'longitude', 'address', 'hourly_rate', 'specializations',
+        'average_rating', 'rating_count', 'rating_score', *[f'rating_{stars}' for stars in STARS],
+        'user__id', 'user__username', 'user__first_name', 'user__last_name',
+    )[:limit]
+    return [{
+        'id': c.id,
+        'user_id': c.user.id,
+        'name': c.user.get_full_name() or c.user.username,
+        'username': c.user.username,
+        'bio': c.bio_short or '',
+        'gender': c.gender,
+        'latitude': c.latitude,
+        'longitude': c.longitude,
+        'hourly_rate': str(c.hourly_rate) if c.hourly_rate else None,
+        'specializations': c.specializations,
+        'average_rating': float(c.average_rating),
+        'rating_count': c.rating_count,
+        'rating_score': round(c.rating_score, 4),
+        'rating_histogram': c.rating_histogram,
+    } for c in catalysts]
+
+
+@jobs.task('ratings.refresh_ranking', max_attempts=1)
+def refresh_ranking():
+    ranking = {'built_at': time.time(), 'catalysts': build_ranking()}
+    # Outlive the refresh interval so readers serve stale data while a refresh runs
+    cache.set(RANKING_KEY, ranking, getattr(settings, 'TOP_CATALYSTS_REFRESH_SECONDS', 300) * 10)
+    return ranking
+
+
+def invalidate_ranking():
+    """Drop the cached leaderboard, e.g. after a catalyst is removed; the next reader rebuilds it."""
+    cache.delete(RANKING_KEY)
+
+
+def _refresh_in_background():
+    # At most one queued refresh, and readers stop asking for a minute
+    if cache.add(REFRESH_LOCK_KEY, True, 60):
+        jobs.enqueue('ratings.refresh_ranking', dedupe_key='ratings.refresh_ranking')
+
+
+def get_ranking():
+    ranking = cache.get(RANKING_KEY)
+    if ranking is None:
+        return refresh_ranking()
+    if time.time() - ranking['built_at'] > getattr(settings, 'TOP_CATALYSTS_REFRESH_SECONDS', 300):
+        _refresh_in_background()
+    return ranking
+
+
+def _distance_m(lat1, lon1, lat2, lon2):
+    R = 6371000  # Earth's radius in meters
+    dlat = radians(lat2 - lat1)
+    dlon = radians(lon2 - lon1)
+    a = sin(dlat / 2) ** 2 + cos(radians(lat1)) * cos(radians(lat2)) * sin(dlon / 2) ** 2
+    return R * 2 * atan2(sqrt(a), sqrt(1 - a))
+
+
+def top_catalysts(limit=20, specialization=None, lat=None, lon=None, radius=None, min_ratings=0):
+    """Filter the cached ranking. Returns (catalysts, ranking built_at)."""
+    ranking = get_ranking()
+    wanted = specialization.strip().lower() if specialization else None
+    results = []
+    for catalyst in ranking['catalysts']:
+        if catalyst['rating_count'] < min_ratings:
+            continue
+        if wanted and not any(isinstance(s, str) and s.lower() == wanted for s in catalyst['specializations'] or []):
+            continue
+        if lat is not None:
+            if catalyst['latitude'] is None or catalyst['longitude'] is None:
+                continue
+            distance = _distance_m(lat, lon, catalyst['latitude'], catalyst['longitude'])
+            if distance > radius:
+                continue
+            catalyst = {**catalyst, 'distance': round(distance)}  # meters, like nearby_catalysts
+        results.append(catalyst)
+        if len(results) >= limit:
+            break
+    return results, ranking['built_at']
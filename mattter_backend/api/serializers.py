@@ -1,8 +1,11 @@
+from django.conf import settings
 from rest_framework import serializers
+from .fieldsets import SparseFieldsetMixin
 from .models import User, Profile, WardrobeItem, Service, Booking, Message, Rating, Report
+from .uploads import process_image_file, store_incoming, variant_urls
 # from rest_framework_gis.serializers import GeoFeatureModelSerializer
 
-class UserSerializer(serializers.ModelSerializer):
+class UserSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     class Meta:
         model = User
         fields = ['id', 'username', 'email', 'first_name', 'last_name']
@@ -40,8 +43,10 @@ class UserWithProfileSerializer(serializers.ModelSerializer):
         except Profile.DoesNotExist:
             return None
 
-class ProfileSerializer(serializers.ModelSerializer):
+class ProfileSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     user = UserSerializer(read_only=True)
+    rating_histogram = serializers.ReadOnlyField()
+    sparse_sources = {'rating_histogram': [f'rating_{stars}' for stars in range(1, 6)]}
     
     class Meta:
         model = Profile
@@ -49,15 +54,45 @@ class ProfileSerializer(serializers.ModelSerializer):
             'id', 'user', 'role', 'gender', 'age', 'bio', 'bio_short', 'is_active',
             'latitude', 'longitude', 'address',
             'hourly_rate', 'specializations',
-            'average_rating', 'rating_count'
+            'average_rating', 'rating_count', 'rating_score', 'rating_histogram'
         ]
-        read_only_fields = ['id', 'user', 'average_rating', 'rating_count']
+        read_only_fields = ['id', 'user', 'average_rating', 'rating_count', 'rating_score']
 
 class WardrobeItemSerializer(serializers.ModelSerializer):
+    image_urls = serializers.SerializerMethodField()
+
     class Meta:
         model = WardrobeItem
-        fields = '__all__'
-        read_only_fields = ['owner', 'ai_tags']
+        exclude = ['image_hash', 'image_embedding']
+        read_only_fields = ['owner', 'ai_tags', 'image_variants']
+
+    def get_image_urls(self, obj):
+        return variant_urls(obj, self.context.get('request'))
+
+    def _store_image(self, validated_data):
+        upload = validated_data.get('image')
+        if upload and getattr(settings, 'WARDROBE_IMAGE_ASYNC', True):
+            # Stored raw; the view queues the variants job (api.wardrobe_batch), so nothing is decoded here
+            upload.seek(0)
+            try:
+                validated_data['image'], _ = store_incoming(upload.read())
+            except ValueError as e:
+                raise serializers.ValidationError({'image': [str(e)]})
+            validated_data['image_variants'] = {}
+        elif upload:
+            # Replace the raw upload with resized, content-addressed variants
+            variants = process_image_file(upload)
+            validated_data['image'] = variants['full']
+            validated_data['image_variants'] = variants
+        elif 'image' in validated_data:
+            validated_data['image_variants'] = {}
+        return validated_data
+
+    def create(self, validated_data):
+        return super().create(self._store_image(validated_data))
+
+    def update(self, instance, validated_data):
+        return super().update(instance, self._store_image(validated_data))
 
 class ServiceSerializer(serializers.ModelSerializer):
     class Meta:
@@ -206,10 +241,12 @@ class ReportSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Report
-        fields = ['id', 'reporter', 'reported_user', 'reported_user_id', 'reporter_name', 'reported_user_name', 'reason', 'status', 'created_at', 'resolved_at']
-        read_only_fields = ['reporter', 'created_at']
+        fields = ['id', 'reporter', 'reported_user', 'reported_user_id', 'reporter_name', 'reported_user_name', 'reason', 'status', 'source', 'created_at', 'resolved_at']
+        read_only_fields = ['reporter', 'source', 'created_at']
     
     def get_reporter_name(self, obj):
+        if obj.reporter is None:
+            return "System"
         return obj.reporter.get_full_name() or obj.reporter.username
 
     def get_reported_user_name(self, obj):
@@ -0,0 +1,90 @@
+"""
+Model signal handlers.
+"""
+
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from .models import Booking, Message, Profile, Rating, Report, User, WardrobeItem
+from . import conditional, outbox, ratings
+
+# Models whose changes go through the outbox (api.outbox). Message deletes
+# are left out: a delete receiver would stop bulk message cleanup from
+# using Django's fast delete path.
+OUTBOX_SAVE_MODELS = (Booking, Message, Profile, Rating, Report)
+OUTBOX_DELETE_MODELS = (Booking, Profile, Rating, Report)
+
+# User fields rendered alongside profiles (me, catalyst_view, nearby, feeds)
+PROFILE_USER_FIELDS = {'username', 'email', 'first_name', 'last_name'}
+
+
+@receiver(post_save, sender=Profile)
+def cache_profile_version(sender, instance, created, **kwargs):
+    if not created:
+        # Profile.save() bumped the version with F(); read back what was stored
+        instance.refresh_from_db(fields=['version'])
+    conditional.store_profile_version(instance)
+    conditional.invalidate_catalyst_map_version()
+
+
+@receiver(post_save, sender=User)
+def bump_profile_for_user(sender, instance, created, raw=False, update_fields=None, **kwargs):
+    """
+    Profile responses embed the user's name and email, so a change to them
+    is saved as a profile change: new ETag version, and the outbox drops the
+    caches holding the old values. Login (last_login only) is left out.
+    """
+    if created or raw or (update_fields is not None and not PROFILE_USER_FIELDS & set(update_fields)):
+        return
+    profile = Profile.objects.filter(user_id=instance.pk).only('id', 'user_id', 'role', 'version').first()
+    if profile is not None:
+        profile.save(update_fields=['version', 'updated_at'])
+
+
+@receiver(post_delete, sender=Profile)
+def drop_profile_version(sender, instance, **kwargs):
+    conditional.forget_profile_version(instance)
+    conditional.invalidate_catalyst_map_version()
+
+
+@receiver(post_save, sender=WardrobeItem)
+@receiver(post_delete, sender=WardrobeItem)
+def invalidate_wardrobe_version(sender, instance, **kwargs):
+    conditional.invalidate_wardrobe_versions([instance.owner_id])
+
+
+@receiver(post_save, sender=Rating)
+def apply_rating_save(sender, instance, created, **kwargs):
+    stored_catalyst, stored_rating = getattr(instance, '_stored_rating', (None, None))
+    if created:
+        ratings.apply_rating_change(instance.catalyst_id, new=instance.rating)
+    elif stored_catalyst is None or stored_rating is None:
+        # Loaded without the fields we need to compute a delta
+        ratings.recompute_catalyst_ratings([instance.catalyst_id])
+    elif stored_catalyst != instance.catalyst_id:
+        ratings.apply_rating_change(stored_catalyst, old=stored_rating)
+        ratings.apply_rating_change(instance.catalyst_id, new=instance.rating)
+    else:
+        ratings.apply_rating_change(instance.catalyst_id, old=stored_rating, new=instance.rating)
+    instance._stored_rating = (instance.catalyst_id, instance.rating)
+
+
+@receiver(post_delete, sender=Rating)
+def apply_rating_delete(sender, instance, **kwargs):
+    stored_catalyst, stored_rating = getattr(instance, '_stored_rating', (instance.catalyst_id, instance.rating))
+    ratings.apply_rating_change(stored_catalyst or instance.catalyst_id, old=stored_rating or instance.rating)
+
+
+def record_outbox_save(sender, instance, created, raw=False, **kwargs):
+    if not raw:  # fixtures
+        outbox.record(instance, 'created' if created else 'updated')
+
+
+def record_outbox_delete(sender, instance, **kwargs):
+    outbox.record(instance, 'deleted')
+
+
+for model in OUTBOX_SAVE_MODELS:
+    post_save.connect(record_outbox_save, sender=model, dispatch_uid=f'outbox_save_{model.__name__}')
+for model in OUTBOX_DELETE_MODELS:
+    post_delete.connect(record_outbox_delete, sender=model, dispatch_uid=f'outbox_delete_{model.__name__}')
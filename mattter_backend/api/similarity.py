@@ -0,0 +1,218 @@
+"""
+Per-owner visual similarity index for wardrobe items.
+
+Each tagged item carries a 64-bit perceptual hash (`image_hash`) and a
+float16 colour embedding (`image_embedding`). An owner's items are loaded
+into three numpy arrays (ids, hashes, embeddings) with one query, and every
+lookup is a vectorised pass over them:
+
+* duplicates - Hamming distance on the hashes (XOR + popcount)
+* similar    - cosine similarity of the embeddings blended with hash
+               similarity, top-K via argpartition
+
+Indexes are keyed by the owner's wardrobe version
+(api.conditional.get_wardrobe_version), which changes whenever their items
+change. Small indexes stay in process memory; wardrobes with at least
+SIMILARITY_MMAP_THRESHOLD items are also written to SIMILARITY_INDEX_DIR
+as .npy files and memory-mapped, so other workers load them without a
+query and without copying them onto the heap.
+"""
+
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+import numpy as np
+from django.conf import settings
+
+from .conditional import get_wardrobe_version
+from .models import WardrobeItem
+
+HASH_BITS = 64
+EMBEDDING_DIM = 64
+MEMORY_INDEXES = 64  # owners kept in the in-process LRU
+CHUNK_ROWS = 1024    # rows per block when comparing all pairs
+
+# Weight of embedding cosine vs hash similarity in the "similar" score
+EMBEDDING_WEIGHT = 0.6
+# pHash is greyscale, so duplicates must also match in colour
+DUPLICATE_MIN_COSINE = 0.9
+
+if hasattr(np, 'bitwise_count'):
+    def _popcount(values):
+        return np.bitwise_count(values)
+else:  # numpy < 2.0
+    _BYTE_BITS = np.array([bin(i).count('1') for i in range(256)], dtype=np.uint8)
+
+    def _popcount(values):
+        as_bytes = values.view(np.uint8).reshape(values.shape + (8,))
+        return _BYTE_BITS[as_bytes].sum(axis=-1, dtype=np.uint8)
+
+
+class WardrobeIndex:
+    """Arrays for one owner's tagged items. Row i describes item ids[i]."""
+
+    def __init__(self, ids, hashes, embeddings):
+        self.ids = ids
+        self.hashes = hashes
+        self.embeddings = embeddings
+
+    def __len__(self):
+        return len(self.ids)
+
+    def position(self, item_id):
+        matches = np.flatnonzero(self.ids == item_id)
+        return int(matches[0]) if len(matches) else None
+
+    def hamming(self, rows):
+        """(len(rows), n) Hamming distances between `rows` and every item."""
+        return _popcount(self.hashes[rows, None] ^ self.hashes[None, :])
+
+    def similar(self, item_id, k=10):
+        """
+        Top-k most similar items to `item_id`, best first, as
+        (item_id, score, hash_distance) tuples. Excludes the item itself.
+        """
+        row = self.position(item_id)
+        if row is None or len(self) < 2:
+            return []
+
+        distance = self.hamming([row])[0]
+        cosine = self.embeddings.astype(np.float32) @ self.embeddings[row].astype(np.float32)
+        score = EMBEDDING_WEIGHT * cosine + (1 - EMBEDDING_WEIGHT) * (1 - distance / HASH_BITS)
+        score[row] = -np.inf
+
+        k = min(k, len(self) - 1)
+        top = np.argpartition(-score, k - 1)[:k]
+        top = top[np.argsort(-score[top], kind='stable')]
+        return [(int(self.ids[i]), round(float(score[i]), 4), int(distance[i])) for i in top]
+
+    def duplicate_groups(self, max_distance):
+        """
+        Groups of item ids whose hashes are within `max_distance` bits of
+        each other (transitively) and whose colours also match. All pairs
+        are compared in row blocks so memory stays at CHUNK_ROWS x n, and
+        matches are merged with a vectorised union-find.
+        """
+        n = len(self)
+        parent = np.arange(n)
+        for start in range(0, n, CHUNK_ROWS):
+            rows = np.arange(start, min(start + CHUNK_ROWS, n))
+            left, right = np.nonzero(self.hamming(rows) <= max_distance)
+            left = rows[left]
+            keep = right > left  # each unordered pair once, no self pairs
+            left, right = left[keep], right[keep]
+            cosine = np.einsum('ij,ij->i', self.embeddings[left].astype(np.float32),
+                               self.embeddings[right].astype(np.float32))
+            keep = cosine >= DUPLICATE_MIN_COSINE
+            parent = _union(parent, left[keep], right[keep])
+
+        parent = _roots(parent)
+        order = np.argsort(parent, kind='stable')
+        boundaries = np.flatnonzero(np.diff(parent[order])) + 1
+        return [group.tolist() for group in np.split(self.ids[order], boundaries) if len(group) > 1]
+
+
+def _roots(parent):
+    """Path-compress every node straight to its root."""
+    while True:
+        grand = parent[parent]
+        if np.array_equal(grand, parent):
+            return parent
+        parent = grand
+
+
+def _union(parent, a, b):
+    # Parents only ever point at smaller rows, so there are no cycles
+    while len(a):
+        parent = _roots(parent)
+        root_a, root_b = parent[a], parent[b]
+        differ = root_a != root_b
+        if not differ.any():
+            break
+        a, b, root_a, root_b = a[differ], b[differ], root_a[differ], root_b[differ]
+        np.minimum.at(parent, np.maximum(root_a, root_b), np.minimum(root_a, root_b))
+    return parent
+
+
+def _index_dir():
+    return Path(getattr(settings, 'SIMILARITY_INDEX_DIR', Path(settings.BASE_DIR) / 'var' / 'similarity'))
+
+
+def _build(owner_id):
+    rows = list(
+        WardrobeItem.objects
+        .filter(owner_id=owner_id, image_hash__isnull=False, image_embedding__isnull=False)
+        .order_by('id')
+        .values_list('id', 'image_hash', 'image_embedding')
+    )
+    ids = np.fromiter((r[0] for r in rows), dtype=np.int64, count=len(rows))
+    hashes = np.frombuffer(b''.join(bytes(r[1]) for r in rows), dtype='>u8').astype(np.uint64)
+    embeddings = np.frombuffer(b''.join(bytes(r[2]) for r in rows), dtype=np.float16)
+    return WardrobeIndex(ids, hashes, embeddings.reshape(len(rows), EMBEDDING_DIM))
+
+
+def _paths(owner_id, version):
+    base = _index_dir() / f'{owner_id}-{version}'
+    return {name: base.with_name(f'{base.name}.{name}.npy') for name in ('ids', 'hashes', 'embeddings')}
+
+
+def _load_mapped(owner_id, version):
+    paths = _paths(owner_id, version)
+    try:
+        return WardrobeIndex(*(np.load(paths[name], mmap_mode='r') for name in ('ids', 'hashes', 'embeddings')))
+    except (OSError, ValueError):
+        return None
+
+
+def _write_mapped(owner_id, version, index):
+    directory = _index_dir()
+    directory.mkdir(parents=True, exist_ok=True)
+    for stale in directory.glob(f'{owner_id}-*.npy'):
+        stale.unlink(missing_ok=True)
+    for name, path in _paths(owner_id, version).items():
+        # Write then rename, so readers never map a half-written file
+        tmp = path.with_name(f'.{path.name}.{os.getpid()}')
+        with open(tmp, 'wb') as f:
+            np.save(f, getattr(index, name))
+        os.replace(tmp, path)
+
+
+_memory = OrderedDict()
+_memory_lock = threading.Lock()
+
+
+def get_index(owner_id):
+    """The current similarity index for an owner, building it if needed."""
+    version = get_wardrobe_version(owner_id)
+    with _memory_lock:
+        cached = _memory.get(owner_id)
+        if cached is not None and cached[0] == version:
+            _memory.move_to_end(owner_id)
+            return cached[1]
+
+    threshold = getattr(settings, 'SIMILARITY_MMAP_THRESHOLD', 2000)
+    index = _load_mapped(owner_id, version)
+    if index is None:
+        index = _build(owner_id)
+        if len(index) >= threshold:
+            _write_mapped(owner_id, version, index)
+            index = _load_mapped(owner_id, version) or index
+
+    with _memory_lock:
+        _memory[owner_id] = (version, index)
+        _memory.move_to_end(owner_id)
+        while len(_memory) > MEMORY_INDEXES:
+            _memory.popitem(last=False)
+    return index
+
+
+def drop_index(owner_id):
+    """Forget an owner's index, in memory and on disk (e.g. when the owner is deleted)."""
+    with _memory_lock:
+        _memory.pop(owner_id, None)
+    directory = _index_dir()
+    if directory.is_dir():
+        for path in directory.glob(f'{owner_id}-*.npy'):
+            path.unlink(missing_ok=True)
@@ -0,0 +1,135 @@
+"""
+Background AI tagging for wardrobe images.
+
+Uploads enqueue a 'wardrobe.tag' job (api.jobs) for their item ids. The
+job fans the image work out to a process pool running
+api.imaging.extract_features, then writes the results to
+WardrobeItem.ai_tags (and `color`, when the owner left it blank) along
+with the similarity hash and embedding.
+
+The request path never decodes an image: uploads (single items and
+batches) are stored raw and resized by a 'wardrobe.process_images' job
+(api.wardrobe_batch), which queues the tagging. Only with
+WARDROBE_IMAGE_ASYNC off are variants made inline in the request.
+
+The same batch function backs `manage.py tag_wardrobe` for backlogs and
+reprocessing.
+"""
+
+import logging
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from django.conf import settings
+
+from . import conditional, imaging, jobs
+from .models import WardrobeItem
+from .uploads import INCOMING_DIR
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BATCH_SIZE = 100
+
+
+def create_pool(workers=None):
+    # spawn: workers only import api.imaging, never inherit Django state or DB sockets
+    return ProcessPoolExecutor(
+        max_workers=workers or getattr(settings, 'WARDROBE_TAGGING_WORKERS', 2),
+        mp_context=multiprocessing.get_context('spawn'),
+    )
+
+
+def backlog_queryset():
+    """Items with a processed image that have never been tagged."""
+    return (WardrobeItem.objects.exclude(image='').exclude(image__isnull=True)
+            .exclude(image__startswith=INCOMING_DIR).filter(ai_tags={}))
+
+
+def tag_items(item_ids, pool):
+    """
+    Tag a batch of items using `pool`. Returns (tagged, failed) counts.
+    Decoding happens in the pool; this process only does a few queries and
+    one bulk UPDATE per batch.
+
+    Items whose image was replaced (or that were deleted) while the pool
+    worked are skipped; the new image has a job of its own. `color` is only
+    filled in where it is still blank, so an owner's edit in the meantime
+    wins.
+    """
+    items = list(WardrobeItem.objects.filter(id__in=item_ids).exclude(image='')
+                 .only('id', 'owner_id', 'image', 'image_variants', 'ai_tags'))
+    if not items:
+        return 0, 0
+
+    paths = []
+    for item in items:
+        try:
+            # Features are computed at 256px, so the medium variant is plenty and much cheaper to decode
+            name = (item.image_variants or {}).get('medium')
+            paths.append(item.image.storage.path(name) if name else item.image.path)
+        except (ValueError, NotImplementedError):
+            paths.append(None)  # no local file (remote storage / missing) - can't tag here
+
+    results = pool.map(imaging.safe_extract_features, [p for p in paths if p], chunksize=max(1, len(paths) // 8))
+    results = iter(results)
+
+    current_images = dict(WardrobeItem.objects.filter(id__in=[item.id for item in items]).values_list('id', 'image'))
+    tagged = failed = 0
+    updated = []
+    colors = {}
+    for item, path in zip(items, paths):
+        features, error = next(results) if path else (None, 'Image file is not available locally')
+        if current_images.get(item.id) != item.image.name:
+            continue
+        updated.append(item)
+        if features is None:
+            item.ai_tags = {'version': imaging.FEATURES_VERSION, 'error': error}
+            item.image_hash = item.image_embedding = None
+            failed += 1
+        else:
+            item.image_embedding = features.pop('embedding')
+            item.image_hash = bytes.fromhex(features['phash'])
+            item.ai_tags = features
+            if features['primary_color']:
+                colors.setdefault(features['primary_color'], []).append(item.id)
+            tagged += 1
+
+    if not updated:
+        return tagged, failed
+    WardrobeItem.objects.bulk_update(updated, ['ai_tags', 'image_hash', 'image_embedding'])
+    for color, ids in colors.items():
+        WardrobeItem.objects.filter(id__in=ids, color='').update(color=color)
+    conditional.invalidate_wardrobe_versions({item.owner_id for item in updated})
+    return tagged, failed
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+@jobs.task('wardrobe.tag')
+def _tag_batch(item_ids):
+    # One pool per worker process, shared by its worker threads (map() is thread-safe)
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = create_pool()
+        pool = _pool
+    try:
+        tag_items(item_ids, pool)
+    except BrokenProcessPool:
+        with _pool_lock:
+            if _pool is pool:
+                _pool = None
+        raise  # the job is retried with a fresh pool
+
+
+def enqueue_tagging(*item_ids):
+    """Queue items for tagging; the job runs once the current transaction commits."""
+    if not getattr(settings, 'WARDROBE_TAGGING_ASYNC', True) or not item_ids:
+        return
+    batch_size = getattr(settings, 'WARDROBE_TAGGING_BATCH_SIZE', DEFAULT_BATCH_SIZE)
+    for start in range(0, len(item_ids), batch_size):
+        jobs.enqueue('wardrobe.tag', list(item_ids[start:start + batch_size]))
@@ -0,0 +1,50 @@
+"""Helpers for tests that store wardrobe images under a temporary MEDIA_ROOT."""
+
+import io
+import shutil
+import tempfile
+import zipfile
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.test import override_settings
+from PIL import Image
+from rest_framework.test import APITestCase
+
+from api.models import User, WardrobeItem
+
+FAST_HASHERS = ['django.contrib.auth.hashers.MD5PasswordHasher']
+
+
+def png_bytes(color='red'):
+    buffer = io.BytesIO()
+    Image.new('RGB', (8, 8), color).save(buffer, 'PNG')
+    return buffer.getvalue()
+
+
+def zip_upload(members):
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w') as archive:
+        for name, data in members.items():
+            archive.writestr(name, data)
+    buffer.seek(0)
+    buffer.name = 'images.zip'
+    return buffer
+
+
+class MediaTestCase(APITestCase):
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        media = override_settings(MEDIA_ROOT=media_root, PASSWORD_HASHERS=FAST_HASHERS)
+        media.enable()
+        self.addCleanup(media.disable)
+
+        self.owner = User.objects.create_user('wardrobe_owner', password='pw')
+        self.client.force_authenticate(self.owner)
+
+    def stored_item(self, digest, **kwargs):
+        variants = {variant: default_storage.save(f'wardrobe/{digest}_{variant}.webp', ContentFile(b'x'))
+                    for variant in ('full', 'thumb')}
+        return WardrobeItem.objects.create(owner=kwargs.pop('owner', self.owner), name='Shirt', category='Top',
+                                           image=variants['full'], image_variants=variants, **kwargs)
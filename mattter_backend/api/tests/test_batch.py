@@ -0,0 +1,113 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.test import override_settings
+from django.utils import timezone
+from rest_framework.test import APITestCase
+
+from api.models import Booking, Message, Profile, User
+
+URL = '/api/batch/'
+FAST_HASHERS = ['django.contrib.auth.hashers.MD5PasswordHasher']
+
+
+def throttle_rates(**rates):
+    return {**settings.REST_FRAMEWORK, 'DEFAULT_THROTTLE_RATES': {**settings.REST_FRAMEWORK['DEFAULT_THROTTLE_RATES'], **rates}}
+
+
+@override_settings(PASSWORD_HASHERS=FAST_HASHERS, OUTBOX_DISPATCH_INLINE=False, JOBS_IN_PROCESS_WORKERS=0, BATCH_CONCURRENT=False)
+class BatchTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.seeker = User.objects.create_user('batch_seeker', password='pw')
+        self.catalyst = User.objects.create_user('batch_catalyst', password='pw')
+        self.profile = Profile.objects.create(user=self.catalyst, role='CATALYST')
+        self.booking = Booking.objects.create(seeker=self.seeker, catalyst=self.catalyst, scheduled_time=timezone.now())
+        self.client.force_authenticate(self.seeker)
+
+    def batch(self, *requests):
+        response = self.client.post(URL, {'requests': list(requests)}, format='json')
+        self.assertEqual(response.status_code, 200)
+        return response.json()['results']
+
+    def message(self, content):
+        return {'method': 'POST', 'path': '/api/messages/', 'body': {'booking': self.booking.pk, 'content': content}}
+
+    def test_results_keep_request_order_and_ids(self):
+        results = self.batch(
+            {'id': 'before', 'path': '/api/messages/'},
+            self.message('hello'),
+            {'id': 'after', 'path': '/api/messages/'},
+        )
+        self.assertEqual([r['id'] for r in results], ['before', 1, 'after'])
+        self.assertEqual([r['status'] for r in results], [200, 201, 200])
+        # The read after the write sees it
+        self.assertEqual(len(results[0]['body']), 0)
+        self.assertEqual(len(results[2]['body']), 1)
+
+    def test_permission_denied_is_a_per_item_status(self):
+        results = self.batch({'path': '/api/admin-data/dashboard_stats/'}, {'path': '/api/messages/'})
+        self.assertEqual(results[0]['status'], 403)
+        self.assertIn('detail', results[0]['body'])
+        self.assertEqual(results[1]['status'], 200)
+
+    def test_not_modified_from_a_conditional_view(self):
+        path = f'/api/profiles/{self.profile.pk}/catalyst_view/'
+        first, = self.batch({'path': path})
+        self.assertEqual(first['status'], 200)
+        etag = first['headers']['ETag']
+
+        cached, = self.batch({'path': path, 'headers': {'If-None-Match': etag}})
+        self.assertEqual(cached['status'], 304)
+        self.assertIsNone(cached['body'])
+        self.assertEqual(cached['headers']['ETag'], etag)
+
+    def test_client_etag_is_not_forwarded_from_the_batch_request(self):
+        path = f'/api/profiles/{self.profile.pk}/catalyst_view/'
+        etag = self.batch({'path': path})[0]['headers']['ETag']
+        response = self.client.post(URL, {'requests': [{'path': path}]}, format='json', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.json()['results'][0]['status'], 200)
+
+    def test_throttled_write_is_a_per_item_status(self):
+        with override_settings(REST_FRAMEWORK=throttle_rates(message_create='1/min')):
+            results = self.batch(self.message('one'), self.message('two'))
+        self.assertEqual([r['status'] for r in results], [201, 429])
+        self.assertIn('Retry-After', results[1]['headers'])
+        self.assertEqual(Message.objects.count(), 1)
+
+    def test_unknown_routes_and_objects_are_404(self):
+        results = self.batch({'path': '/api/nothing-here/'}, {'path': '/api/profiles/999999/catalyst_view/'},
+                             {'path': '/api/messages/'})
+        self.assertEqual([r['status'] for r in results], [404, 404, 200])
+
+    def test_failed_sub_request_does_not_stop_the_batch(self):
+        results = self.batch({'method': 'POST', 'path': '/api/messages/', 'body': {'content': 'no booking'}},
+                             self.message('ok'))
+        self.assertEqual([r['status'] for r in results], [400, 201])
+
+    def test_invalid_batches_are_rejected(self):
+        for body in ({}, {'requests': []}, {'requests': ['x']},
+                     {'requests': [{'path': '/admin/'}]},
+                     {'requests': [{'path': URL}]},
+                     {'requests': [{'path': '/api/messages/', 'method': 'TRACE'}]},
+                     {'requests': [{'path': '/api/messages/', 'headers': {'Authorization': 'Token x'}}]}):
+            response = self.client.post(URL, body, format='json')
+            self.assertEqual(response.status_code, 400, body)
+            self.assertIn('error', response.json())
+
+    @override_settings(BATCH_MAX_REQUESTS=2)
+    def test_too_many_requests(self):
+        response = self.client.post(URL, {'requests': [{'path': '/api/messages/'}] * 3}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+    def test_requires_authentication(self):
+        self.client.force_authenticate(None)
+        response = self.client.post(URL, {'requests': [{'path': '/api/messages/'}]}, format='json')
+        self.assertEqual(response.status_code, 401)
+
+    def test_stats_are_staff_only(self):
+        self.batch({'path': '/api/messages/'})
+        self.assertEqual(self.client.get(URL).status_code, 403)
+        self.client.force_authenticate(User.objects.create_user('batch_staff', password='pw', is_staff=True))
+        stats = self.client.get(URL).json()['stats']
+        self.assertEqual(stats['batches'], 1)
+        self.assertEqual(stats['requests'], 1)
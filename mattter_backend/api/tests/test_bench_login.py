@@ -0,0 +1,30 @@
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+
+from api.models import User
+
+FAST_HASHERS = ['django.contrib.auth.hashers.MD5PasswordHasher']
+
+
+@override_settings(PASSWORD_HASHERS=FAST_HASHERS, OUTBOX_DISPATCH_INLINE=False, JOBS_IN_PROCESS_WORKERS=0)
+class BenchLoginTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def run_bench(self, *args):
+        out = StringIO()
+        call_command('bench_login', '--users', '3', '--rounds', '2', *args, stdout=out)
+        return out.getvalue()
+
+    def test_leaves_other_cache_entries_alone(self):
+        cache.set('unrelated', 'keep')
+        self.run_bench()
+        self.assertEqual(cache.get('unrelated'), 'keep')
+
+    def test_removes_its_own_entries_and_users(self):
+        self.run_bench('--password-cache', '300')
+        self.assertEqual(list(cache._cache.keys()), [])
+        self.assertFalse(User.objects.filter(username__startswith='bench_login_').exists())
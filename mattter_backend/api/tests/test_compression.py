@@ -0,0 +1,109 @@
+import gzip
+import os
+from datetime import datetime, timezone
+from decimal import Decimal
+from unittest import mock
+
+import brotli
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, override_settings
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APITestCase
+
+from api import middleware
+from api.middleware import APICompressionMiddleware, _choose_encoding
+from api.models import Profile, User
+from api.renderers import ORJSONRenderer
+
+BODY = b'{"catalysts": [' + b','.join(b'{"id": %d, "name": "catalyst"}' % i for i in range(200)) + b']}'
+
+
+class ChooseEncodingTests(SimpleTestCase):
+    def test_negotiation(self):
+        cases = {
+            '': None,
+            'gzip': 'gzip',
+            'gzip, deflate, br': 'br',
+            'br;q=0.5, gzip': 'gzip',
+            'gzip;q=0, br;q=0': None,
+            '*': 'br',
+            '*;q=0.2, gzip;q=0.8': 'gzip',
+            'identity': None,
+            'GZIP;q=0.9': 'gzip',
+            'br;q=0..5, gzip': 'gzip',
+        }
+        for header, expected in cases.items():
+            self.assertEqual(_choose_encoding(header), expected, header)
+
+    def test_without_brotli(self):
+        with mock.patch.object(middleware, 'brotli', None):
+            self.assertEqual(_choose_encoding('br'), None)
+            self.assertEqual(_choose_encoding('br, gzip'), 'gzip')
+
+
+@override_settings(API_COMPRESSION_MIN_SIZE=1024)
+class CompressionMiddlewareTests(SimpleTestCase):
+    def respond(self, path='/api/profiles/', accept='gzip, br', body=BODY, **headers):
+        request = RequestFactory().get(path, HTTP_ACCEPT_ENCODING=accept)
+        response = HttpResponse(body, content_type='application/json', headers=headers)
+        return APICompressionMiddleware(lambda r: response)(request)
+
+    def test_brotli_preferred(self):
+        response = self.respond()
+        self.assertEqual(response['Content-Encoding'], 'br')
+        self.assertEqual(brotli.decompress(response.content), BODY)
+        self.assertEqual(response['Content-Length'], str(len(response.content)))
+        self.assertIn('Accept-Encoding', response['Vary'])
+
+    def test_gzip(self):
+        response = self.respond(accept='gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(response.content), BODY)
+
+    def test_strong_etag_is_weakened(self):
+        self.assertEqual(self.respond(ETag='"v1"')['ETag'], 'W/"v1"')
+        self.assertEqual(self.respond(ETag='W/"v1"')['ETag'], 'W/"v1"')
+
+    def test_left_alone(self):
+        self.assertFalse(self.respond(body=b'{"small": true}').has_header('Content-Encoding'))
+        self.assertFalse(self.respond(path='/admin/').has_header('Content-Encoding'))
+        self.assertFalse(self.respond(accept='identity').has_header('Content-Encoding'))
+        # Incompressible bodies are sent as they are
+        self.assertFalse(self.respond(body=os.urandom(4096)).has_header('Content-Encoding'))
+        self.assertEqual(self.respond(**{'Content-Encoding': 'gzip'}).content, BODY)
+
+
+class ORJSONRendererTests(SimpleTestCase):
+    def test_matches_the_stock_renderer(self):
+        data = {
+            'when': datetime(2026, 10, 19, 12, 30, 5, 123456, tzinfo=timezone.utc),
+            'naive': datetime(2026, 10, 19, 12, 30),
+            'rate': Decimal('45.50'),
+            'text': 'line separator   café',
+            'ids': {1: 'one'},
+            'nested': [None, True, 1.5, []],
+        }
+        self.assertEqual(ORJSONRenderer().render(data), JSONRenderer().render(data))
+
+    def test_none_and_indent(self):
+        self.assertEqual(ORJSONRenderer().render(None), b'')
+        indented = ORJSONRenderer().render({'a': 1}, 'application/json; indent=2')
+        self.assertEqual(indented, b'{\n  "a": 1\n}')
+
+    def test_fallback_without_orjson(self):
+        from api import renderers
+
+        with mock.patch.object(renderers, 'orjson', None):
+            self.assertEqual(ORJSONRenderer().render({'a': Decimal('1.5')}), b'{"a":1.5}')
+
+
+@override_settings(OUTBOX_DISPATCH_INLINE=False, JOBS_IN_PROCESS_WORKERS=0, API_COMPRESSION_MIN_SIZE=256)
+class CompressedEndpointTests(APITestCase):
+    def test_all_catalysts_is_compressed(self):
+        for i in range(10):
+            user = User.objects.create_user(f'compressed_{i}')
+            Profile.objects.create(user=user, role='CATALYST', latitude=52.5, longitude=13.4, bio='x' * 50)
+        plain = self.client.get('/api/profiles/all_catalysts/')
+        response = self.client.get('/api/profiles/all_catalysts/', HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(response.content), plain.content)
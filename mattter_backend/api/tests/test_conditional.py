@@ -0,0 +1,78 @@
+from django.core.cache import cache
+from django.db import transaction
+from django.test import override_settings
+from rest_framework.test import APITestCase
+
+from api import conditional
+from api.models import Profile, User
+
+
+@override_settings(OUTBOX_DISPATCH_INLINE=False, JOBS_IN_PROCESS_WORKERS=0)
+class ProfileVersionTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('etag_user', password='pw', first_name='Ada')
+        self.profile = Profile.objects.create(user=self.user, role='CATALYST')
+        self.url = f'/api/profiles/{self.profile.pk}/catalyst_view/'
+
+    def stored_version(self):
+        return Profile.objects.values_list('version', flat=True).get(pk=self.profile.pk)
+
+    def test_not_modified_until_the_profile_changes(self):
+        etag = self.client.get(self.url)['ETag']
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.profile.bio = 'New bio'
+            self.profile.save()
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_user_name_change_changes_the_etag_but_login_does_not(self):
+        etag = self.client.get(self.url)['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.save(update_fields=['last_login'])
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.first_name = 'Grace'
+            self.user.save()
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['user']['first_name'], 'Grace')
+
+    def test_concurrent_saves_each_bump_the_version(self):
+        first = Profile.objects.get(pk=self.profile.pk)
+        second = Profile.objects.get(pk=self.profile.pk)
+        start = self.stored_version()
+        first.save()
+        second.save()
+        self.assertEqual(self.stored_version(), start + 2)
+        self.assertEqual(second.version, start + 2)
+
+    def test_update_fields_save_stores_the_version(self):
+        start = self.stored_version()
+        self.profile.bio = 'Only bio'
+        self.profile.save(update_fields=['bio'])
+        self.assertEqual(self.stored_version(), start + 1)
+        self.assertEqual(self.profile.version, start + 1)
+
+    def test_cache_is_written_only_after_commit(self):
+        conditional.get_profile_version(pk=self.profile.pk)
+        cached = cache.get(f'profile_version_{self.profile.pk}')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            try:
+                with transaction.atomic():
+                    self.profile.save()
+                    raise RuntimeError('rolled back')
+            except RuntimeError:
+                pass
+        self.assertEqual(cache.get(f'profile_version_{self.profile.pk}'), cached)
+
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            self.profile.save()
+            self.assertEqual(cache.get(f'profile_version_{self.profile.pk}'), cached)
+        self.assertTrue(callbacks)
+        self.assertEqual(cache.get(f'profile_version_{self.profile.pk}')[1], self.stored_version())
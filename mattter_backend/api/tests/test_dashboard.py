@@ -0,0 +1,87 @@
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.test import override_settings
+from django.utils import timezone
+from rest_framework.test import APITestCase
+
+from api import dashboard
+from api.models import Booking, Message, Profile, Rating, User
+
+FAST_HASHERS = ['django.contrib.auth.hashers.MD5PasswordHasher']
+
+
+@override_settings(PASSWORD_HASHERS=FAST_HASHERS, OUTBOX_DISPATCH_INLINE=True, JOBS_IN_PROCESS_WORKERS=0,
+                   CATALYST_DASHBOARD_REVIEWS=2)
+class DashboardSummaryTests(APITestCase):
+    url = '/api/profiles/dashboard_summary/'
+
+    def setUp(self):
+        cache.clear()
+        self.catalyst = User.objects.create_user('dash_catalyst', password='pw')
+        self.profile = Profile.objects.create(user=self.catalyst, role='CATALYST', bio='Stylist', hourly_rate=40)
+        self.seeker = User.objects.create_user('dash_seeker', password='pw')
+        Profile.objects.create(user=self.seeker, role='SEEKER')
+        now = timezone.now()
+        self.booking = self.book('CONFIRMED', now + timedelta(days=1))
+        self.book('CONFIRMED', now - timedelta(days=1))
+        self.book('REQUESTED', now)
+        self.book('COMPLETED', now - timedelta(days=3))
+        Message.objects.create(booking=self.booking, sender=self.seeker, content='hi')
+        Message.objects.create(booking=self.booking, sender=self.seeker, content='there')
+        Message.objects.create(booking=self.booking, sender=self.catalyst, content='mine')
+        for stars, review in ((5, 'great'), (3, 'ok'), (4, 'good')):
+            seeker = User.objects.create_user(f'dash_rater_{stars}', password='pw')
+            Rating.objects.create(seeker=seeker, catalyst=self.catalyst, rating=stars, review=review)
+        self.client.force_authenticate(self.catalyst)
+
+    def book(self, status, when):
+        return Booking.objects.create(seeker=self.seeker, catalyst=self.catalyst, scheduled_time=when, status=status)
+
+    def test_summary(self):
+        with self.assertNumQueries(5):  # role claim lookup + the four documented queries
+            data = self.client.get(self.url).json()
+        self.assertEqual(data['profile_id'], self.profile.pk)
+        self.assertEqual(data['bookings'], {'total': 4, 'pending': 1, 'confirmed': 2, 'upcoming': 1,
+                                            'completed': 1, 'cancelled': 0})
+        self.assertEqual(data['messages'], {'unread': 2, 'conversations': 1})
+        self.assertEqual(data['ratings']['count'], 3)
+        self.assertEqual(data['ratings']['histogram'], {'1': 0, '2': 0, '3': 1, '4': 1, '5': 1})
+        self.assertEqual([r['review'] for r in data['recent_reviews']], ['good', 'ok'])
+        self.assertEqual(data['completeness'], {'score': 33, 'missing': ['bio_short', 'specializations',
+                                                                          'portfolio_images', 'address']})
+
+    def test_cached_until_something_changes(self):
+        first = self.client.get(self.url).json()
+        self.assertEqual(self.client.get(self.url).json()['generated_at'], first['generated_at'])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.book('REQUESTED', timezone.now())
+        self.assertEqual(self.client.get(self.url).json()['bookings']['pending'], 2)
+
+    def test_new_message_and_mark_as_read_invalidate(self):
+        self.client.get(self.url)
+        with self.captureOnCommitCallbacks(execute=True):
+            Message.objects.create(booking=self.booking, sender=self.seeker, content='again')
+        self.assertEqual(self.client.get(self.url).json()['messages']['unread'], 3)
+
+        self.client.post('/api/messages/mark_as_read/', {'booking_id': self.booking.pk}, format='json')
+        self.assertEqual(self.client.get(self.url).json()['messages']['unread'], 0)
+
+    def test_profile_edit_invalidates(self):
+        self.client.get(self.url)
+        self.profile.bio_short = 'Colour'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.profile.save()
+        self.assertNotIn('bio_short', self.client.get(self.url).json()['completeness']['missing'])
+
+    def test_only_catalysts(self):
+        self.client.force_authenticate(self.seeker)
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 403)
+        self.assertIn('error', response.json())
+
+    def test_invalidate_helper(self):
+        dashboard.catalyst_summary(self.catalyst.pk)
+        dashboard.invalidate([self.catalyst.pk])
+        self.assertIsNone(cache.get(f'catalyst_dashboard_{self.catalyst.pk}'))
@@ -0,0 +1,137 @@
+from datetime import timedelta
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.db import transaction
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APITestCase
+
+from api import events
+from api.consumers import user_group
+from api.models import Event, User
+
+FAST_HASHERS = ['django.contrib.auth.hashers.MD5PasswordHasher']
+SETTINGS = dict(PASSWORD_HASHERS=FAST_HASHERS, OUTBOX_DISPATCH_INLINE=False, JOBS_IN_PROCESS_WORKERS=0,
+                EVENT_COMMIT_LAG_SECONDS=0)
+
+
+def age(event_ids, seconds):
+    Event.objects.filter(pk__in=event_ids).update(created_at=timezone.now() - timedelta(seconds=seconds))
+
+
+@override_settings(**SETTINGS)
+class EmitTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('event_user', password='pw')
+        self.other = User.objects.create_user('event_other', password='pw')
+        self.layer = get_channel_layer()
+        self.channel = async_to_sync(self.layer.new_channel)()
+        async_to_sync(self.layer.group_add)(user_group(self.user.pk), self.channel)
+
+    def tearDown(self):
+        async_to_sync(self.layer.flush)()
+
+    def receive(self):
+        return async_to_sync(self.layer.receive)(self.channel)
+
+    def test_one_row_per_distinct_recipient_pushed_after_commit(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            rows = events.emit([self.user.pk, self.user.pk, None, self.other.pk], 'booking.accepted', {'booking': 1})
+        self.assertEqual(sorted(row.user_id for row in rows), sorted([self.user.pk, self.other.pk]))
+        self.assertEqual(len(callbacks), 1)
+
+        for callback in callbacks:
+            callback()
+        message = self.receive()
+        self.assertEqual(message['type'], 'event.push')
+        self.assertEqual(message['event']['type'], 'booking.accepted')
+        self.assertEqual(message['event']['payload'], {'booking': 1})
+        self.assertTrue(message['event']['created_at'].endswith('Z'))
+
+    def test_rolled_back_events_are_neither_stored_nor_pushed(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            try:
+                with transaction.atomic():
+                    events.emit([self.user.pk], 'rating.created', {})
+                    raise RuntimeError
+            except RuntimeError:
+                pass
+        self.assertEqual(callbacks, [])
+        self.assertFalse(Event.objects.exists())
+
+    def test_nothing_to_emit(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.assertEqual(events.emit([None], 'rating.created', {}), [])
+        self.assertEqual(callbacks, [])
+
+    def test_report_goes_to_active_staff(self):
+        from api.models import Report
+
+        staff = User.objects.create_user('event_staff', password='pw', is_staff=True)
+        User.objects.create_user('retired_staff', password='pw', is_staff=True, is_active=False)
+        report = Report.objects.create(reported_user=self.other, reason='spam')
+        rows = events.report_created(report)
+        self.assertEqual([row.user_id for row in rows], [staff.pk])
+
+    def test_prune_drops_old_events(self):
+        old, new = events.emit([self.user.pk, self.other.pk], 'rating.created', {})
+        age([old.pk], 40 * 24 * 3600)
+        self.assertEqual(events.prune(), 1)
+        self.assertEqual(list(Event.objects.values_list('pk', flat=True)), [new.pk])
+
+
+@override_settings(**SETTINGS)
+class ReplayTests(APITestCase):
+    url = '/api/events/'
+
+    def setUp(self):
+        self.user = User.objects.create_user('replay_user', password='pw')
+        self.other = User.objects.create_user('replay_other', password='pw')
+        self.ids = [events.emit([self.user.pk], 'rating.created', {'n': n})[0].pk for n in range(5)]
+        events.emit([self.other.pk], 'rating.created', {'n': 'other'})
+        self.client.force_authenticate(self.user)
+
+    def test_pages_oldest_first_with_a_cursor(self):
+        first = self.client.get(self.url, {'limit': 2}).json()
+        self.assertEqual([e['id'] for e in first['results']], self.ids[:2])
+        self.assertEqual(first['cursor'], self.ids[1])
+        self.assertTrue(first['has_more'])
+
+        rest = self.client.get(self.url, {'after': first['cursor']}).json()
+        self.assertEqual([e['id'] for e in rest['results']], self.ids[2:])
+        self.assertFalse(rest['has_more'])
+
+        empty = self.client.get(self.url, {'after': rest['cursor']}).json()
+        self.assertEqual(empty, {'results': [], 'cursor': rest['cursor'], 'has_more': False})
+
+    def test_only_the_users_own_events(self):
+        payloads = [e['payload']['n'] for e in self.client.get(self.url).json()['results']]
+        self.assertNotIn('other', payloads)
+
+    @override_settings(EVENT_COMMIT_LAG_SECONDS=60)
+    def test_recent_events_are_held_back(self):
+        age(self.ids[:2], 120)
+        data = self.client.get(self.url).json()
+        self.assertEqual([e['id'] for e in data['results']], self.ids[:2])
+        # The cursor never moves past an id that could still commit below it
+        self.assertEqual(data['cursor'], self.ids[1])
+        self.assertEqual(events.replayable(self.user.pk).count(), 2)
+
+    def test_invalid_parameters(self):
+        self.assertEqual(self.client.get(self.url, {'after': 'x'}).status_code, 400)
+        self.assertEqual(self.client.get(self.url, {'limit': '1.5'}).status_code, 400)
+        # Out-of-range values are clamped
+        self.assertEqual(len(self.client.get(self.url, {'limit': 0}).json()['results']), 1)
+        self.assertEqual(len(self.client.get(self.url, {'after': -5}).json()['results']), 5)
+
+    def test_new_rating_is_logged_for_the_catalyst(self):
+        response = self.client.post('/api/ratings/', {'catalyst_id': self.other.pk, 'rating': 5}, format='json')
+        self.assertEqual(response.status_code, 201)
+        event = Event.objects.filter(user=self.other, type='rating.created').latest('id')
+        self.assertEqual(event.payload['rating'], response.json()['id'])
+        self.assertEqual(event.payload['seeker_id'], self.user.pk)
+
+    def test_requires_authentication(self):
+        self.client.force_authenticate(None)
+        self.assertEqual(self.client.get(self.url).status_code, 401)
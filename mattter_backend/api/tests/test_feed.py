@@ -0,0 +1,114 @@
+from django.core.cache import cache
+from django.test import TransactionTestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APITestCase
+
+from api import feed, presence
+from api.models import Booking, Profile, Rating, User
+
+FAST_HASHERS = ['django.contrib.auth.hashers.MD5PasswordHasher']
+SETTINGS = dict(PASSWORD_HASHERS=FAST_HASHERS, OUTBOX_DISPATCH_INLINE=True, JOBS_IN_PROCESS_WORKERS=0)
+
+
+def make_world(test):
+    cache.clear()
+    test.seeker = User.objects.create_user('feed_seeker', password='pw')
+    Profile.objects.create(user=test.seeker, role='SEEKER', latitude=52.52, longitude=13.40)
+    test.near = User.objects.create_user('near_catalyst', password='pw', first_name='Near')
+    Profile.objects.create(user=test.near, role='CATALYST', latitude=52.53, longitude=13.41,
+                           specializations=['a', 'b', 'c', 'd'])
+    test.far = User.objects.create_user('far_catalyst', password='pw')
+    Profile.objects.create(user=test.far, role='CATALYST', latitude=48.85, longitude=2.35)
+    now = timezone.now()
+    test.pending = Booking.objects.create(seeker=test.seeker, catalyst=test.far, scheduled_time=now, notes='soon')
+    test.matched = Booking.objects.create(seeker=test.seeker, catalyst=test.near, scheduled_time=now, status='CONFIRMED')
+    test.rating = Rating.objects.create(seeker=test.seeker, catalyst=test.near, rating=4)
+
+
+@override_settings(**SETTINGS, SEEKER_FEED_CONCURRENT=False)
+class SeekerFeedTests(APITestCase):
+    url = '/api/profiles/seeker_feed/'
+
+    def setUp(self):
+        make_world(self)
+        self.client.force_authenticate(self.seeker)
+
+    def sections(self, **params):
+        response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.json()['sections']
+
+    def test_all_sections(self):
+        presence.connect(self.near.pk)
+        sections = self.sections()
+        self.assertEqual([b['id'] for b in sections['pending']['results']], [self.pending.pk])
+        self.assertEqual(sections['pending']['results'][0]['catalyst']['username'], 'far_catalyst')
+
+        matched, = sections['matched']['results']
+        self.assertEqual(matched['rating'], {'id': self.rating.pk, 'rating': 4})
+        self.assertEqual(matched['catalyst']['profile']['specializations'], ['a', 'b', 'c'])
+
+        # Defaults to the seeker's own location
+        nearby, = sections['nearby']['results']
+        self.assertEqual(nearby['user_id'], self.near.pk)
+        self.assertEqual(nearby['name'], 'Near')
+        self.assertTrue(nearby['online'])
+        self.assertEqual(sections['nearby']['count'], 1)
+
+    def test_matches_the_standalone_endpoints(self):
+        sections = self.sections(sections='pending,matched')
+        self.assertEqual(self.client.get('/api/bookings/pending/').json(), sections['pending']['results'])
+        self.assertEqual(self.client.get('/api/bookings/matched/').json(), sections['matched']['results'])
+
+    def test_unchanged_sections_skip_their_queries(self):
+        sections = self.sections()
+        since = ','.join(f"{name}:{section['version']}" for name, section in sections.items())
+        with self.assertNumQueries(1):  # only the seeker's location
+            again = self.sections(since=since)
+        self.assertEqual(again['pending'], {'version': sections['pending']['version'], 'unchanged': True})
+        self.assertTrue(again['nearby']['unchanged'])
+
+    def test_version_changes_with_bookings_and_booked_catalysts(self):
+        version = self.sections(sections='pending')['pending']['version']
+        with self.captureOnCommitCallbacks(execute=True):
+            Booking.objects.create(seeker=self.seeker, catalyst=self.near, scheduled_time=timezone.now())
+        changed = self.sections(sections='pending', since=f'pending:{version}')['pending']
+        self.assertEqual(changed['count'], 2)
+
+        profile = Profile.objects.get(user=self.far)
+        profile.bio_short = 'Renamed'
+        with self.captureOnCommitCallbacks(execute=True):
+            profile.save()
+        self.assertNotEqual(self.sections(sections='pending')['pending']['version'], changed['version'])
+
+    def test_explicit_location(self):
+        nearby = self.sections(sections='nearby', lat=48.85, lon=2.35, radius=1000)['nearby']['results']
+        self.assertEqual([c['user_id'] for c in nearby], [self.far.pk])
+        self.assertFalse(nearby[0]['online'])
+
+    def test_nearby_needs_a_location(self):
+        Profile.objects.filter(user=self.seeker).update(latitude=None, longitude=None)
+        self.assertNotIn('nearby', self.sections())
+
+    def test_invalid_parameters(self):
+        for params in ({'sections': 'pending,ads'}, {'lat': 'x', 'lon': '1'}, {'lat': '52.5'}):
+            response = self.client.get(self.url, params)
+            self.assertEqual(response.status_code, 400, params)
+            self.assertIn('error', response.json())
+
+    def test_parse_since(self):
+        self.assertEqual(feed.parse_since('pending:abc, nearby:def,bogus:1,matched:'), {'pending': 'abc', 'nearby': 'def'})
+        self.assertEqual(feed.parse_since(None), {})
+
+
+@override_settings(**SETTINGS, SEEKER_FEED_CONCURRENT=True)
+class ConcurrentFeedTests(TransactionTestCase):
+    def setUp(self):
+        make_world(self)
+
+    def test_concurrent_build_matches_sequential(self):
+        concurrent = feed.build_feed(self.seeker.pk, lat=52.52, lon=13.40)
+        with self.settings(SEEKER_FEED_CONCURRENT=False):
+            sequential = feed.build_feed(self.seeker.pk, lat=52.52, lon=13.40)
+        self.assertEqual(concurrent, sequential)
+        self.assertEqual(concurrent['pending']['count'], 1)
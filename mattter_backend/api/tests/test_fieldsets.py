@@ -0,0 +1,102 @@
+from django.core.cache import cache
+from django.db import connection
+from django.test import SimpleTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APITestCase
+
+from api import fieldsets
+from api.models import Profile, User
+from api.serializers import ProfileSerializer
+
+FAST_HASHERS = ['django.contrib.auth.hashers.MD5PasswordHasher']
+
+
+class FieldTreeTests(SimpleTestCase):
+    def test_parse_fields(self):
+        self.assertIsNone(fieldsets.parse_fields(None))
+        self.assertIsNone(fieldsets.parse_fields(' '))
+        self.assertEqual(fieldsets.parse_fields('id, user.username,,user.email,role'),
+                         {'id': {}, 'user': {'username': {}, 'email': {}}, 'role': {}})
+
+    def test_validate_fields_names_every_unknown_field(self):
+        tree = fieldsets.parse_fields('id,nope,user.nope,role.sub,user.username')
+        with self.assertRaises(ValueError) as raised:
+            fieldsets.validate_fields(ProfileSerializer(), tree)
+        self.assertEqual(sorted(raised.exception.args[0]), ['nope', 'role.sub', 'user.nope'])
+
+    def test_extra_names_are_top_level_only(self):
+        fieldsets.validate_fields(ProfileSerializer(), {'is_staff': {}}, extra=('is_staff',))
+        with self.assertRaises(ValueError):
+            fieldsets.validate_fields(ProfileSerializer(), {'is_staff': {'x': {}}}, extra=('is_staff',))
+
+    def test_prune_data(self):
+        data = [{'id': 1, 'bio': 'x', 'user': {'id': 2, 'username': 'a'}}]
+        self.assertEqual(fieldsets.prune_data(data, {'id': {}, 'user': {'username': {}}}),
+                         [{'id': 1, 'user': {'username': 'a'}}])
+        self.assertEqual(fieldsets.prune_data(data, None), data)
+
+    def test_only_paths(self):
+        only, related = fieldsets.only_paths(ProfileSerializer(), {'id': {}, 'user': {'username': {}}, 'rating_histogram': {}})
+        self.assertEqual(sorted(only), sorted(['id', 'user', 'user__username',
+                                               *[f'rating_{s}' for s in range(1, 6)]]))
+        self.assertEqual(related, ['user'])
+
+
+@override_settings(PASSWORD_HASHERS=FAST_HASHERS, OUTBOX_DISPATCH_INLINE=False, JOBS_IN_PROCESS_WORKERS=0)
+class SparseProfileEndpointTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('sparse_user', password='pw', email='sparse@example.com')
+        self.profile = Profile.objects.create(user=self.user, role='CATALYST', bio='Long bio', age=30)
+        self.client.force_authenticate(self.user)
+
+    def test_retrieve_renders_only_the_selected_fields(self):
+        response = self.client.get(f'/api/profiles/{self.profile.pk}/', {'fields': 'id,user.username,rating_histogram'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {
+            'id': self.profile.pk,
+            'user': {'username': 'sparse_user'},
+            'rating_histogram': {str(s): 0 for s in range(1, 6)},
+        })
+
+    def test_list_narrows_the_query(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/profiles/', {'fields': 'id,role'})
+        self.assertEqual(response.json(), [{'id': self.profile.pk, 'role': 'CATALYST'}])
+        profile_query = next(q['sql'] for q in queries.captured_queries if 'FROM "api_profile"' in q['sql'])
+        self.assertNotIn('"bio"', profile_query)
+
+    def test_nested_field_on_its_own_keeps_all_its_fields(self):
+        data = self.client.get(f'/api/profiles/{self.profile.pk}/', {'fields': 'user'}).json()
+        self.assertEqual(set(data), {'user'})
+        self.assertEqual(set(data['user']), {'id', 'username', 'email', 'first_name', 'last_name'})
+
+    def test_unknown_fields_are_a_400(self):
+        for fields in ('nope', 'user.nope', 'bio.length', 'is_staff'):
+            response = self.client.get(f'/api/profiles/{self.profile.pk}/', {'fields': fields})
+            self.assertEqual(response.status_code, 400, fields)
+            self.assertIn('Unknown field(s)', str(response.json()))
+
+    def test_me_trims_the_cached_payload(self):
+        full = self.client.get('/api/profiles/me/').json()
+        self.assertIn('bio', full)
+        sparse = self.client.get('/api/profiles/me/', {'fields': 'id,is_staff'}).json()
+        self.assertEqual(sparse, {'id': self.profile.pk, 'is_staff': False})
+        # The cached copy stays full
+        self.assertEqual(self.client.get('/api/profiles/me/').json().keys(), full.keys())
+
+    def test_writes_validate_every_field(self):
+        response = self.client.patch('/api/profiles/me/?fields=id', {'age': 'old'}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('age', response.json())
+
+        response = self.client.patch('/api/profiles/me/?fields=id,bio', {'bio': 'Short'}, format='json')
+        self.assertEqual(response.json(), {'id': self.profile.pk, 'bio': 'Short'})
+
+    def test_admin_user_details(self):
+        staff = User.objects.create_user('sparse_admin', password='pw', is_staff=True)
+        self.client.force_authenticate(staff)
+        url = '/api/admin-data/user_details/'
+        data = self.client.get(url, {'user_id': self.user.pk, 'fields': 'id,email'}).json()
+        self.assertEqual(data['profile'], {'id': self.profile.pk, 'email': 'sparse@example.com'})
+        self.assertEqual(self.client.get(url, {'user_id': self.user.pk, 'fields': 'secret'}).status_code, 400)
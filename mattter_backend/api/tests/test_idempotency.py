@@ -0,0 +1,110 @@
+from datetime import timedelta
+from types import SimpleNamespace
+
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.response import Response
+from rest_framework.test import APITestCase
+
+from api import idempotency
+from api.models import Booking, IdempotencyKey, Message, User
+
+SETTINGS = dict(OUTBOX_DISPATCH_INLINE=False, JOBS_IN_PROCESS_WORKERS=0, IDEMPOTENCY_WAIT_SECONDS=0)
+
+
+@override_settings(**SETTINGS)
+class IdempotentCreateTests(APITestCase):
+    url = '/api/messages/'
+
+    def setUp(self):
+        self.seeker = User.objects.create_user('idem_seeker', password='pw')
+        catalyst = User.objects.create_user('idem_catalyst', password='pw')
+        self.booking = Booking.objects.create(seeker=self.seeker, catalyst=catalyst, scheduled_time=timezone.now())
+        self.client.force_authenticate(self.seeker)
+
+    def post(self, key, content='hello'):
+        return self.client.post(self.url, {'booking': self.booking.pk, 'content': content}, format='json',
+                                HTTP_IDEMPOTENCY_KEY=key)
+
+    def test_retry_replays_the_first_response(self):
+        first = self.post('k1')
+        self.assertEqual(first.status_code, 201)
+        self.assertNotIn('Idempotent-Replayed', first)
+
+        retry = self.post('k1')
+        self.assertEqual(retry.status_code, 201)
+        self.assertEqual(retry['Idempotent-Replayed'], 'true')
+        self.assertEqual(retry.json()['id'], first.json()['id'])
+        self.assertEqual(Message.objects.count(), 1)
+
+    def test_without_a_key_every_request_runs(self):
+        self.client.post(self.url, {'booking': self.booking.pk, 'content': 'a'}, format='json')
+        self.client.post(self.url, {'booking': self.booking.pk, 'content': 'a'}, format='json')
+        self.assertEqual(Message.objects.count(), 2)
+
+    def test_key_reused_for_a_different_request(self):
+        self.post('k2')
+        response = self.post('k2', content='something else')
+        self.assertEqual(response.status_code, 422)
+        self.assertEqual(Message.objects.count(), 1)
+
+    def test_key_length(self):
+        self.assertEqual(self.post('x' * 256).status_code, 400)
+        self.assertEqual(self.post('   ').status_code, 400)
+
+    def test_failed_request_stores_nothing(self):
+        response = self.client.post(self.url, {'content': 'no booking'}, format='json', HTTP_IDEMPOTENCY_KEY='k3')
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(IdempotencyKey.objects.exists())
+
+    def test_in_progress_duplicate_gets_409(self):
+        request = SimpleNamespace(method='POST', path=self.url, user=self.seeker,
+                                  data={'booking': self.booking.pk, 'content': 'hello'})
+        IdempotencyKey.objects.create(user=self.seeker, key='k4', fingerprint=idempotency.fingerprint(request))
+        response = self.post('k4')
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response['Retry-After'], '1')
+
+    def test_abandoned_claim_is_taken_over(self):
+        request = SimpleNamespace(method='POST', path=self.url, user=self.seeker,
+                                  data={'booking': self.booking.pk, 'content': 'hello'})
+        record = IdempotencyKey.objects.create(user=self.seeker, key='k5', fingerprint=idempotency.fingerprint(request))
+        IdempotencyKey.objects.filter(pk=record.pk).update(created_at=timezone.now() - timedelta(minutes=5))
+        self.assertEqual(self.post('k5').status_code, 201)
+        self.assertEqual(Message.objects.count(), 1)
+
+
+@override_settings(**SETTINGS)
+class HandleTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('idem_user', password='pw')
+        catalyst = User.objects.create_user('idem_other', password='pw')
+        self.booking = Booking.objects.create(seeker=self.user, catalyst=catalyst, scheduled_time=timezone.now())
+        self.request = SimpleNamespace(method='POST', path='/api/messages/', user=self.user, data={'content': 'x'})
+
+    def test_error_response_rolls_back_what_run_wrote(self):
+        def run():
+            Message.objects.create(booking=self.booking, sender=self.user, content='x')
+            return Response({'error': 'conflict'}, status=409)
+
+        response = idempotency.handle(self.request, 'k', run)
+        self.assertEqual(response.status_code, 409)
+        self.assertFalse(Message.objects.exists())
+        self.assertFalse(IdempotencyKey.objects.exists())
+
+    def test_exception_releases_the_key(self):
+        def run():
+            raise RuntimeError('boom')
+
+        with self.assertRaises(RuntimeError):
+            idempotency.handle(self.request, 'k', run)
+        self.assertFalse(IdempotencyKey.objects.exists())
+
+    def test_expired_keys_are_pruned_and_reusable(self):
+        idempotency.handle(self.request, 'k', lambda: Response({'id': 1}, status=201))
+        IdempotencyKey.objects.update(created_at=timezone.now() - timedelta(hours=25))
+
+        response = idempotency.handle(self.request, 'k', lambda: Response({'id': 2}, status=201))
+        self.assertEqual(response.data, {'id': 2})
+        IdempotencyKey.objects.update(created_at=timezone.now() - timedelta(hours=25))
+        self.assertEqual(idempotency.prune(), 1)
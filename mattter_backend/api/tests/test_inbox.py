@@ -0,0 +1,82 @@
+from datetime import timedelta
+
+from django.test import override_settings
+from django.utils import timezone
+from rest_framework.test import APITestCase
+
+from api.inbox import SNIPPET_LENGTH
+from api.models import Booking, Message, User
+
+FAST_HASHERS = ['django.contrib.auth.hashers.MD5PasswordHasher']
+
+
+@override_settings(PASSWORD_HASHERS=FAST_HASHERS, OUTBOX_DISPATCH_INLINE=False, JOBS_IN_PROCESS_WORKERS=0)
+class InboxTests(APITestCase):
+    url = '/api/messages/inbox/'
+
+    def setUp(self):
+        self.seeker = User.objects.create_user('inbox_seeker', password='pw')
+        self.catalyst = User.objects.create_user('inbox_catalyst', password='pw', first_name='Cat', last_name='Alyst')
+        self.other = User.objects.create_user('inbox_other', password='pw')
+        now = timezone.now()
+        self.quiet = Booking.objects.create(seeker=self.seeker, catalyst=self.other, scheduled_time=now)
+        self.busy = Booking.objects.create(seeker=self.seeker, catalyst=self.catalyst, scheduled_time=now)
+        self.unrelated = Booking.objects.create(seeker=self.other, catalyst=self.catalyst, scheduled_time=now)
+        Booking.objects.filter(pk=self.quiet.pk).update(created_at=now - timedelta(days=1))
+        self.message(self.busy, self.catalyst, 'first', minutes=10)
+        self.message(self.busy, self.catalyst, 'x' * 300, minutes=5)
+        self.message(self.busy, self.seeker, 'my reply', minutes=1, is_read=False)
+        self.client.force_authenticate(self.seeker)
+
+    def message(self, booking, sender, content, minutes, is_read=False):
+        message = Message.objects.create(booking=booking, sender=sender, content=content, is_read=is_read)
+        Message.objects.filter(pk=message.pk).update(timestamp=timezone.now() - timedelta(minutes=minutes))
+        return message
+
+    def test_one_row_per_conversation_newest_first(self):
+        with self.assertNumQueries(1):
+            rows = self.client.get(self.url).json()['results']
+        self.assertEqual([r['booking_id'] for r in rows], [self.busy.pk, self.quiet.pk])
+
+        busy = rows[0]
+        self.assertEqual(busy['counterpart'], {'id': self.catalyst.pk, 'name': 'Cat Alyst', 'role': 'CATALYST'})
+        self.assertEqual(busy['last_message']['content'], 'my reply')
+        self.assertTrue(busy['last_message']['is_mine'])
+        # My own unread message doesn't count
+        self.assertEqual(busy['unread_count'], 2)
+
+        quiet = rows[1]
+        self.assertIsNone(quiet['last_message'])
+        self.assertEqual(quiet['unread_count'], 0)
+        self.assertEqual(quiet['counterpart']['name'], 'inbox_other')
+
+    def test_counterpart_from_the_catalyst_side(self):
+        self.client.force_authenticate(self.catalyst)
+        rows = self.client.get(self.url).json()['results']
+        # A booking without messages sorts by its creation time
+        self.assertEqual([r['booking_id'] for r in rows], [self.unrelated.pk, self.busy.pk])
+        self.assertEqual(rows[1]['counterpart']['role'], 'SEEKER')
+        self.assertEqual(rows[1]['unread_count'], 1)
+        self.assertFalse(rows[1]['last_message']['is_mine'])
+
+    def test_snippet_is_truncated(self):
+        Message.objects.filter(content='my reply').delete()
+        row = self.client.get(self.url).json()['results'][0]
+        self.assertEqual(len(row['last_message']['content']), SNIPPET_LENGTH)
+
+    def test_mark_as_read_updates_the_unread_count(self):
+        response = self.client.post('/api/messages/mark_as_read/', {'booking_id': self.busy.pk}, format='json')
+        self.assertEqual(response.json(), {'success': True, 'marked_read': 2})
+        self.assertEqual(self.client.get(self.url).json()['results'][0]['unread_count'], 0)
+        self.assertEqual(self.client.post('/api/messages/mark_as_read/', {}, format='json').status_code, 400)
+
+    def test_cursor_pagination(self):
+        first = self.client.get(self.url, {'page_size': 1}).json()
+        self.assertEqual([r['booking_id'] for r in first['results']], [self.busy.pk])
+        second = self.client.get(first['next']).json()
+        self.assertEqual([r['booking_id'] for r in second['results']], [self.quiet.pk])
+        self.assertIsNone(second['next'])
+
+    def test_requires_authentication(self):
+        self.client.force_authenticate(None)
+        self.assertEqual(self.client.get(self.url).status_code, 401)
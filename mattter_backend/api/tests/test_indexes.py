@@ -0,0 +1,48 @@
+from io import StringIO
+from unittest import mock
+
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test import SimpleTestCase, TestCase
+
+from api.management.commands import explain_hot_queries
+from api.models import Profile
+
+
+class ExplainHotQueriesTests(TestCase):
+    def test_every_hot_query_uses_an_index(self):
+        out = StringIO()
+        call_command('explain_hot_queries', stdout=out)
+        self.assertIn('All hot queries use an index.', out.getvalue())
+        self.assertNotIn('SEQ SCAN', out.getvalue())
+
+    def test_sequential_scan_fails_the_check(self):
+        unindexed = [('profiles by bio', Profile.objects.filter(bio='x'))]
+        out = StringIO()
+        with mock.patch.object(explain_hot_queries, 'hot_queries', return_value=unindexed):
+            with self.assertRaisesMessage(CommandError, '1 hot query use a sequential scan'):
+                call_command('explain_hot_queries', stdout=out)
+        self.assertIn('SEQ SCAN  profiles by bio', out.getvalue())
+
+
+class FindSequentialScansTests(SimpleTestCase):
+    def test_sqlite_plans(self):
+        plan = '\n'.join([
+            '2 0 0 SEARCH api_booking USING INDEX booking_seeker_status_idx (seeker_id=? AND status=?)',
+            '3 0 0 SCAN api_profile USING INDEX profile_role_idx',
+            '4 0 0 SCAN api_message',
+        ])
+        with mock.patch.object(connection, 'vendor', 'sqlite'):
+            self.assertEqual(explain_hot_queries.find_sequential_scans(plan, 'api_message'), ['4 0 0 SCAN api_message'])
+            self.assertEqual(explain_hot_queries.find_sequential_scans(plan, 'api_profile'), [])
+            self.assertEqual(explain_hot_queries.find_sequential_scans(plan, 'api_booking'), [])
+
+    def test_postgresql_plans(self):
+        plan = ('Sort  (cost=1.1..1.2)\n'
+                '  ->  Seq Scan on api_rating  (cost=0.00..1.01)\n'
+                '  ->  Index Scan using report_user_created_idx on api_report')
+        with mock.patch.object(connection, 'vendor', 'postgresql'):
+            self.assertEqual(len(explain_hot_queries.find_sequential_scans(plan, 'api_rating')), 1)
+            self.assertEqual(explain_hot_queries.find_sequential_scans(plan, 'api_report'), [])
+            # Table name prefixes don't match
+            self.assertEqual(explain_hot_queries.find_sequential_scans(plan, 'api_rat'), [])
@@ -0,0 +1,113 @@
+from datetime import timedelta
+
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from api import jobs
+from api.models import Job
+
+
+@override_settings(JOBS_IN_PROCESS_WORKERS=0, JOB_RETRY_BASE_DELAY=10)
+class JobQueueTests(TestCase):
+    def setUp(self):
+        self.calls = []
+        self.failures = 0
+
+        @jobs.task('test.record', max_attempts=2)
+        def record(value):
+            self.calls.append(value)
+            if self.failures:
+                self.failures -= 1
+                raise RuntimeError('task failed')
+
+    def tearDown(self):
+        jobs._registry.pop('test.record', None)
+
+    def run_next(self, worker='worker-1'):
+        job = jobs.claim(worker)
+        self.assertIsNotNone(job)
+        jobs.execute(job, worker)
+        job.refresh_from_db()
+        return job
+
+    def test_enqueue_dedupes_queued_jobs(self):
+        self.assertIsNotNone(jobs.enqueue('test.record', 1, dedupe_key='same'))
+        self.assertIsNone(jobs.enqueue('test.record', 2, dedupe_key='same'))
+        self.assertEqual(Job.objects.count(), 1)
+
+    def test_enqueue_unknown_task(self):
+        with self.assertRaises(ValueError):
+            jobs.enqueue('test.missing')
+
+    def test_enqueue_does_not_start_worker_threads(self):
+        with override_settings(JOBS_IN_PROCESS_WORKERS=1), self.captureOnCommitCallbacks(execute=True):
+            jobs.enqueue('test.record', 1)
+        self.assertEqual(jobs._in_process['threads'], [])
+
+    def test_claim_runs_due_jobs_once(self):
+        jobs.enqueue('test.record', 'later', delay=60)
+        jobs.enqueue('test.record', 'now')
+
+        job = self.run_next()
+        self.assertEqual(job.status, 'SUCCEEDED')
+        self.assertEqual(job.attempts, 1)
+        self.assertEqual(self.calls, ['now'])
+        self.assertIsNone(jobs.claim('worker-1'))  # the other job isn't due yet
+
+    def test_claimed_job_is_not_claimed_again(self):
+        job = jobs.enqueue('test.record', 1)
+        self.assertEqual(jobs.claim('worker-1').pk, job.pk)
+        self.assertIsNone(jobs.claim('worker-2'))
+
+    def test_expired_lease_is_reclaimed(self):
+        job = jobs.enqueue('test.record', 1)
+        jobs.claim('worker-1')
+        Job.objects.filter(pk=job.pk).update(locked_until=timezone.now() - timedelta(seconds=1))
+
+        reclaimed = jobs.claim('worker-2')
+        self.assertEqual(reclaimed.pk, job.pk)
+        self.assertEqual(reclaimed.attempts, 2)
+        # The first worker no longer holds the lease, so its result is ignored
+        jobs.execute(job, 'worker-1')
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'RUNNING')
+        self.assertEqual(job.locked_by, 'worker-2')
+
+    def test_failure_is_retried_with_backoff_then_failed(self):
+        self.failures = 2
+        jobs.enqueue('test.record', 1)
+
+        with self.assertLogs('api.jobs', level='ERROR'):
+            job = self.run_next()
+        self.assertEqual(job.status, 'QUEUED')
+        self.assertGreater(job.run_at, timezone.now() + timedelta(seconds=5))
+        self.assertIn('task failed', job.last_error)
+
+        Job.objects.filter(pk=job.pk).update(run_at=timezone.now())
+        with self.assertLogs('api.jobs', level='ERROR'):
+            job = self.run_next()
+        self.assertEqual(job.status, 'FAILED')
+        self.assertEqual(job.attempts, 2)
+        self.assertEqual(self.calls, [1, 1])
+
+    def test_retry_superseded_by_queued_duplicate(self):
+        self.failures = 1
+        jobs.enqueue('test.record', 1, dedupe_key='same')
+        job = jobs.claim('worker-1')
+        newer = jobs.enqueue('test.record', 2, dedupe_key='same')
+        self.assertIsNotNone(newer)  # the first one is RUNNING, not QUEUED
+
+        with self.assertLogs('api.jobs', level='ERROR'):
+            jobs.execute(job, 'worker-1')
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'FAILED')
+        self.assertIn('superseded', job.last_error)
+
+    def test_schedule_due_enqueues_once_per_interval(self):
+        jobs._schedule_slots.clear()
+        with override_settings(JOB_SCHEDULE={'test.record': 3600}):
+            jobs.schedule_due()
+            jobs._schedule_slots.clear()  # as if another worker process
+            jobs.schedule_due()
+        self.assertEqual(Job.objects.filter(name='test.record').count(), 1)
+        jobs._schedule_slots.clear()
@@ -0,0 +1,102 @@
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APITestCase
+from rest_framework.throttling import SimpleRateThrottle
+
+from api.cached_auth import get_user_role, token_cache_key
+from api.hashers import check_password_cached
+from api.models import Profile, User
+
+FAST_HASHERS = ['django.contrib.auth.hashers.MD5PasswordHasher']
+SETTINGS = dict(PASSWORD_HASHERS=FAST_HASHERS, OUTBOX_DISPATCH_INLINE=False, JOBS_IN_PROCESS_WORKERS=0)
+
+
+@override_settings(**SETTINGS)
+@mock.patch.object(SimpleRateThrottle, 'THROTTLE_RATES', {'login_ip': '1000/min', 'login_user': '1000/min'})
+class LoginTests(APITestCase):
+    url = '/api/login/'
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('login_user', password='secret-pw')
+        Profile.objects.create(user=self.user, role='CATALYST')
+
+    def login(self, username='login_user', password='secret-pw'):
+        return self.client.post(self.url, {'username': username, 'password': password}, format='json')
+
+    def test_returns_token_and_role(self):
+        response = self.login()
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(data['token'], Token.objects.get(user=self.user).key)
+        self.assertEqual(data['user']['role'], 'CATALYST')
+        # The same token on the next login
+        self.assertEqual(self.login().json()['token'], data['token'])
+
+    def test_existing_token_login_is_one_query(self):
+        Token.objects.create(user=self.user)
+        with self.assertNumQueries(1):
+            self.assertEqual(self.login().status_code, 200)
+
+    def test_warms_the_token_cache(self):
+        token = self.login().json()['token']
+        self.assertEqual(cache.get(token_cache_key(token))['role'], 'CATALYST')
+        with self.assertNumQueries(1):  # the messages query only, no auth lookup
+            response = self.client.get('/api/messages/', HTTP_AUTHORIZATION=f'Token {token}')
+        self.assertEqual(response.status_code, 200)
+
+    def test_rejections(self):
+        self.assertEqual(self.login(password='wrong').status_code, 400)
+        self.assertEqual(self.login(username='nobody').status_code, 400)
+        self.assertEqual(self.client.post(self.url, {'username': 'login_user'}, format='json').status_code, 400)
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.login().status_code, 400)
+
+    def test_invalid_token_is_cached(self):
+        self.assertEqual(self.client.get('/api/messages/', HTTP_AUTHORIZATION='Token bogus').status_code, 401)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get('/api/messages/', HTTP_AUTHORIZATION='Token bogus').status_code, 401)
+
+
+@override_settings(**SETTINGS)
+class PasswordCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('cached_pw', password='secret-pw')
+
+    def test_disabled_by_default(self):
+        with mock.patch.object(User, 'check_password', return_value=True) as check:
+            check_password_cached(self.user, 'secret-pw')
+            check_password_cached(self.user, 'secret-pw')
+        self.assertEqual(check.call_count, 2)
+
+    @override_settings(LOGIN_PASSWORD_CACHE_TIMEOUT=60)
+    def test_repeat_checks_skip_the_hasher(self):
+        self.assertTrue(check_password_cached(self.user, 'secret-pw'))
+        with mock.patch.object(User, 'check_password') as check:
+            self.assertTrue(check_password_cached(self.user, 'secret-pw'))
+        check.assert_not_called()
+        self.assertFalse(check_password_cached(self.user, 'wrong'))
+
+    @override_settings(LOGIN_PASSWORD_CACHE_TIMEOUT=60)
+    def test_password_change_invalidates_the_entry(self):
+        check_password_cached(self.user, 'secret-pw')
+        self.user.set_password('new-pw')
+        self.user.save()
+        self.assertFalse(check_password_cached(self.user, 'secret-pw'))
+        self.assertTrue(check_password_cached(self.user, 'new-pw'))
+
+
+class UserRoleTests(TestCase):
+    def test_uses_the_claim_then_the_profile(self):
+        user = User.objects.create_user('role_user')
+        Profile.objects.create(user=user, role='SEEKER')
+        user.role = 'CATALYST'
+        with self.assertNumQueries(0):
+            self.assertEqual(get_user_role(user), 'CATALYST')
+        del user.role
+        self.assertEqual(get_user_role(user), 'SEEKER')
@@ -0,0 +1,141 @@
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APITestCase
+
+from api import moderation
+from api.models import Report, User
+
+FAST_HASHERS = ['django.contrib.auth.hashers.MD5PasswordHasher']
+SETTINGS = dict(PASSWORD_HASHERS=FAST_HASHERS, OUTBOX_DISPATCH_INLINE=False, JOBS_IN_PROCESS_WORKERS=0)
+
+
+class ParseFiltersTests(TestCase):
+    def test_defaults_and_values(self):
+        self.assertEqual(moderation.parse_filters({}), {'status': 'PENDING'})
+        self.assertEqual(moderation.parse_filters({}, default_status='ALL'), {'status': None})
+        self.assertEqual(
+            moderation.parse_filters({'status': 'resolved', 'min_age_hours': '1.5', 'reported_user': '7', 'source': 'automated'}),
+            {'status': 'RESOLVED', 'min_age_hours': 1.5, 'reported_user': 7, 'source': 'AUTOMATED'},
+        )
+
+    def test_invalid_values(self):
+        for params in ({'status': 'OPEN'}, {'min_age_hours': 'x'}, {'max_age_hours': '-1'},
+                       {'reported_user': 'bob'}, {'source': 'BOT'}):
+            with self.assertRaises(ValueError, msg=params):
+                moderation.parse_filters(params)
+
+
+@override_settings(**SETTINGS)
+class ModerationQueueTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.admin = User.objects.create_user('moderator', password='pw', is_staff=True)
+        self.reporter = User.objects.create_user('reporter', password='pw', first_name='Rita', last_name='Reporter')
+        self.offender = User.objects.create_user('offender', password='pw')
+        self.other = User.objects.create_user('other_offender', password='pw')
+        now = timezone.now()
+        self.old = self.report(self.offender, 'spam', now - timedelta(hours=48))
+        self.recent = self.report(self.offender, 'rude', now - timedelta(hours=1))
+        self.automated = self.report(self.offender, '[message_create] flood', now - timedelta(hours=2), reporter=None,
+                                     source='AUTOMATED')
+        self.closed = self.report(self.other, 'old news', now - timedelta(hours=5), status='RESOLVED')
+        self.client.force_authenticate(self.admin)
+
+    def report(self, user, reason, created_at, reporter='default', **fields):
+        report = Report.objects.create(reported_user=user, reason=reason,
+                                       reporter=self.reporter if reporter == 'default' else reporter, **fields)
+        Report.objects.filter(pk=report.pk).update(created_at=created_at)
+        return report
+
+    def ids(self, response):
+        self.assertEqual(response.status_code, 200, response.content)
+        return [row['id'] for row in response.json()['results']]
+
+    def test_queue_is_pending_oldest_first(self):
+        self.assertEqual(self.ids(self.client.get('/api/reports/queue/')), [self.old.pk, self.automated.pk, self.recent.pk])
+        self.assertEqual(self.ids(self.client.get('/api/reports/queue/', {'order': 'newest'})),
+                         [self.recent.pk, self.automated.pk, self.old.pk])
+
+    def test_queue_rows(self):
+        with self.assertNumQueries(1):
+            rows = self.client.get('/api/reports/queue/').json()['results']
+        self.assertEqual(rows[0]['reporter'], {'id': self.reporter.pk, 'name': 'Rita Reporter'})
+        self.assertEqual(rows[0]['reported_user'], {'id': self.offender.pk, 'name': 'offender'})
+        self.assertEqual(rows[1]['reporter'], {'id': None, 'name': 'System'})
+
+    def test_queue_filters(self):
+        self.assertEqual(self.ids(self.client.get('/api/reports/queue/', {'min_age_hours': 24})), [self.old.pk])
+        self.assertEqual(self.ids(self.client.get('/api/reports/queue/', {'max_age_hours': 1.5})), [self.recent.pk])
+        self.assertEqual(self.ids(self.client.get('/api/reports/queue/', {'source': 'AUTOMATED'})), [self.automated.pk])
+        self.assertEqual(self.ids(self.client.get('/api/reports/queue/', {'status': 'ALL', 'reported_user': self.other.pk})),
+                         [self.closed.pk])
+        self.assertEqual(self.client.get('/api/reports/queue/', {'status': 'bogus'}).status_code, 400)
+
+    def test_queue_pages_with_a_cursor(self):
+        first = self.client.get('/api/reports/queue/', {'page_size': 2}).json()
+        self.assertEqual(len(first['results']), 2)
+        second = self.client.get(first['next']).json()
+        self.assertEqual([r['id'] for r in second['results']], [self.recent.pk])
+        self.assertIsNone(second['next'])
+
+    def test_by_user(self):
+        data = self.client.get('/api/reports/by_user/').json()
+        rows = data['results']
+        self.assertEqual([r['reported_user']['id'] for r in rows], [self.offender.pk, self.other.pk])
+        self.assertEqual((rows[0]['total'], rows[0]['pending'], rows[0]['automated']), (3, 3, 1))
+        self.assertEqual((rows[1]['total'], rows[1]['pending']), (1, 0))
+        self.assertIsNone(rows[1]['oldest_pending'])
+        self.assertEqual(self.client.get('/api/reports/by_user/', {'source': 'nope'}).status_code, 400)
+
+    def test_bulk_resolve_by_ids(self):
+        response = self.client.post('/api/reports/bulk_resolve/', {'ids': [self.old.pk, self.closed.pk]}, format='json')
+        self.assertEqual(response.json(), {'success': True, 'status': 'RESOLVED', 'updated': 1})
+        self.old.refresh_from_db()
+        self.assertEqual(self.old.status, 'RESOLVED')
+        self.assertIsNotNone(self.old.resolved_at)
+
+    def test_bulk_dismiss_everything_against_a_user(self):
+        response = self.client.post('/api/reports/bulk_dismiss/', {'reported_user': self.offender.pk}, format='json')
+        self.assertEqual(response.json()['updated'], 3)
+        self.assertFalse(Report.objects.filter(reported_user=self.offender, status='PENDING').exists())
+
+    def test_bulk_validation(self):
+        url = '/api/reports/bulk_resolve/'
+        for body in ({}, {'ids': 'all'}, {'ids': ['1']}, {'reported_user': 'offender'}):
+            response = self.client.post(url, body, format='json')
+            self.assertEqual(response.status_code, 400, body)
+            self.assertIn('error', response.json())
+        with self.settings(REPORT_BULK_MAX_IDS=2):
+            self.assertEqual(self.client.post(url, {'ids': [1, 2, 3]}, format='json').status_code, 400)
+
+    def test_staff_only_except_create(self):
+        self.client.force_authenticate(self.reporter)
+        self.assertEqual(self.client.get('/api/reports/queue/').status_code, 403)
+        self.assertEqual(self.client.post('/api/reports/bulk_resolve/', {'ids': [self.old.pk]}, format='json').status_code, 403)
+        response = self.client.post('/api/reports/', {'reported_user_id': self.other.pk, 'reason': 'spam', 'status': 'RESOLVED'},
+                                    format='json')
+        self.assertEqual(response.status_code, 201, response.content)
+        self.assertEqual(Report.objects.get(pk=response.json()['id']).status, 'PENDING')
+
+
+@override_settings(**SETTINGS)
+class FlagUserTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('flagged', password='pw')
+
+    def test_at_most_one_pending_automated_report_per_scope(self):
+        first = moderation.flag_user(self.user.pk, 'message_create', '300 attempts', 3600)
+        self.assertEqual(first.reason, '[message_create] 300 attempts')
+        self.assertIsNone(moderation.flag_user(self.user.pk, 'message_create', 'again', 3600))
+        cache.clear()
+        # Still pending: no second report even after the dedupe window
+        self.assertIsNone(moderation.flag_user(self.user.pk, 'message_create', 'again', 3600))
+        self.assertIsNotNone(moderation.flag_user(self.user.pk, 'booking_create', 'bookings', 3600))
+
+        moderation.close_reports('DISMISSED', ids=[first.pk])
+        cache.clear()
+        self.assertIsNotNone(moderation.flag_user(self.user.pk, 'message_create', 'again', 3600))
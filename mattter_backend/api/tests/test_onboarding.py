@@ -0,0 +1,95 @@
+from unittest import mock
+
+from django.test import override_settings
+from rest_framework.test import APITestCase
+
+from api import hashers
+from api.models import Profile, User
+
+FAST_HASHERS = ['django.contrib.auth.hashers.MD5PasswordHasher']
+
+
+@override_settings(PASSWORD_HASHERS=FAST_HASHERS, OUTBOX_DISPATCH_INLINE=False, JOBS_IN_PROCESS_WORKERS=0)
+class CatalystImportTests(APITestCase):
+    url = '/api/admin-data/import_catalysts/'
+
+    def setUp(self):
+        self.admin = User.objects.create_user('import_admin', password='pw', is_staff=True)
+        self.client.force_authenticate(self.admin)
+
+    def test_imports_rows_and_reports_errors_per_row(self):
+        User.objects.create_user('taken', password='pw')
+        response = self.client.post(self.url, [
+            {'username': 'cat_a', 'password': 'secret', 'age': '31', 'specializations': 'color, fit'},
+            {'username': 'taken'},
+            {'username': 'cat_a'},
+            {'email': 'no-username@example.com'},
+        ], format='json')
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual([r['status'] for r in response.data['results']], ['created', 'skipped', 'skipped', 'error'])
+        user = User.objects.get(username='cat_a')
+        self.assertTrue(user.check_password('secret'))
+        self.assertEqual(user.profile.role, 'CATALYST')
+        self.assertEqual(user.profile.specializations, ['color', 'fit'])
+
+    def test_wrong_types_are_row_errors(self):
+        response = self.client.post(self.url, [
+            1,
+            {'username': 123},
+            {'username': 'cat_b', 'email': ['a@example.com']},
+            {'username': 'cat_c', 'specializations': [1, 2]},
+            {'username': 'cat_d', 'age': {'years': 3}},
+            {'username': 'cat_e'},
+        ], format='json')
+
+        self.assertEqual(response.status_code, 201)
+        results = response.data['results']
+        self.assertEqual([r['status'] for r in results], ['error'] * 5 + ['created'])
+        self.assertEqual(results[1]['error'], 'username must be a string')
+        self.assertEqual(response.data['summary'], {'created': 1, 'skipped': 0, 'error': 5})
+
+    def test_row_the_database_rejects_does_not_fail_the_chunk(self):
+        # age is a PositiveIntegerField: the CHECK constraint fails the bulk INSERT
+        response = self.client.post(self.url, [
+            {'username': 'cat_ok'},
+            {'username': 'cat_bad', 'age': -1},
+            {'username': 'cat_ok2'},
+        ], format='json')
+
+        self.assertEqual([r['status'] for r in response.data['results']], ['created', 'error', 'created'])
+        self.assertTrue(response.data['results'][1]['error'].startswith('Could not save row'))
+        self.assertEqual(set(Profile.objects.filter(role='CATALYST').values_list('user__username', flat=True)),
+                         {'cat_ok', 'cat_ok2'})
+
+    def test_requires_admin(self):
+        self.client.force_authenticate(User.objects.create_user('not_admin', password='pw'))
+        self.assertEqual(self.client.post(self.url, [{'username': 'x'}], format='json').status_code, 403)
+
+
+@override_settings(PASSWORD_HASHERS=FAST_HASHERS, OUTBOX_DISPATCH_INLINE=False, JOBS_IN_PROCESS_WORKERS=0)
+class RegisterTests(APITestCase):
+    url = '/api/register/'
+
+    def test_register_hashes_on_the_pool(self):
+        with mock.patch('api.auth_views.hash_passwords', wraps=hashers.hash_passwords) as hash_passwords:
+            response = self.client.post(self.url, {'username': 'new_user', 'password': 'secret', 'age': '25'},
+                                        format='json')
+
+        self.assertEqual(response.status_code, 201)
+        hash_passwords.assert_called_once_with(['secret'])
+        user = User.objects.get(username='new_user')
+        self.assertTrue(user.check_password('secret'))
+        self.assertEqual(user.profile.age, 25)
+        self.assertEqual(response.data['token'], user.auth_token.key)
+
+    def test_duplicate_username(self):
+        User.objects.create_user('dup', password='pw')
+        response = self.client.post(self.url, {'username': 'dup', 'password': 'secret'}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data, {'error': 'Username already exists'})
+
+    def test_missing_password_and_bad_age(self):
+        self.assertEqual(self.client.post(self.url, {'username': 'x'}, format='json').status_code, 400)
+        response = self.client.post(self.url, {'username': 'x', 'password': 'p', 'age': 'old'}, format='json')
+        self.assertEqual(response.data, {'error': 'Age must be a number'})
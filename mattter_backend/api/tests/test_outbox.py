@@ -0,0 +1,78 @@
+from datetime import timedelta
+
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from api import outbox
+from api.models import Booking, Message, OutboxMessage, User
+
+
+@override_settings(OUTBOX_DISPATCH_INLINE=False, JOBS_IN_PROCESS_WORKERS=0)
+class OutboxRecoveryTests(TestCase):
+    def setUp(self):
+        seeker = User.objects.create_user('outbox_seeker', password='pw')
+        catalyst = User.objects.create_user('outbox_catalyst', password='pw')
+        self.booking = Booking.objects.create(seeker=seeker, catalyst=catalyst, scheduled_time=timezone.now())
+        self.sender = seeker
+        self.calls = {'test.ok': [], 'test.flaky': []}
+        self.flaky_failures = 0
+
+        @outbox.handler('test.ok', 'message.created')
+        def ok(messages):
+            self.calls['test.ok'].extend(message.pk for message in messages)
+
+        @outbox.handler('test.flaky', 'message')
+        def flaky(messages):
+            self.calls['test.flaky'].extend(message.pk for message in messages)
+            if self.flaky_failures:
+                self.flaky_failures -= 1
+                raise RuntimeError('handler down')
+
+    def tearDown(self):
+        for name in self.calls:
+            outbox._handlers.pop(name, None)
+
+    def create_message(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            Message.objects.create(booking=self.booking, sender=self.sender, content='hello')
+        return OutboxMessage.objects.get(topic='message.created')
+
+    def test_sweep_delivers_message_left_pending_after_commit(self):
+        # Not dispatched inline: as if the process died right after commit
+        message = self.create_message()
+        self.assertIsNone(message.dispatched_at)
+        self.assertEqual(self.calls['test.ok'], [])
+
+        # Too recent for the sweep
+        self.assertEqual(outbox.sweep(), 0)
+        OutboxMessage.objects.filter(pk=message.pk).update(created_at=timezone.now() - timedelta(minutes=5))
+        outbox.sweep()
+
+        message.refresh_from_db()
+        self.assertIsNotNone(message.dispatched_at)
+        self.assertEqual(self.calls['test.ok'], [message.pk])
+        self.assertIn('test.ok', message.handled)
+
+    def test_failed_handler_is_retried_alone(self):
+        self.flaky_failures = 1
+        message = self.create_message()
+
+        with self.assertLogs('api.outbox', level='ERROR'):
+            outbox.dispatch(ids=[message.pk])
+        message.refresh_from_db()
+        self.assertIsNone(message.dispatched_at)
+        self.assertIn('test.ok', message.handled)
+        self.assertNotIn('test.flaky', message.handled)
+        self.assertTrue(message.last_error.startswith('test.flaky'))
+
+        # Backing off: not due yet
+        outbox.dispatch(ids=[message.pk])
+        self.assertEqual(self.calls['test.flaky'], [message.pk])
+
+        OutboxMessage.objects.filter(pk=message.pk).update(available_at=timezone.now())
+        outbox.dispatch(ids=[message.pk])
+        message.refresh_from_db()
+        self.assertIsNotNone(message.dispatched_at)
+        self.assertEqual(message.attempts, 2)
+        self.assertEqual(self.calls['test.ok'], [message.pk])
+        self.assertEqual(self.calls['test.flaky'], [message.pk, message.pk])
@@ -0,0 +1,93 @@
+import itertools
+from unittest import mock
+
+import numpy as np
+from django.core.cache import cache
+from django.test import SimpleTestCase, override_settings
+from rest_framework.test import APITestCase
+
+from api import outfits
+from api.conditional import get_wardrobe_version
+from api.models import User, WardrobeItem
+
+
+def random_slots(rng, sizes):
+    slots = {}
+    for offset, (slot, size) in enumerate(sizes.items()):
+        colours = np.stack([rng.uniform(0, 360, size), rng.random(size) < 0.2, rng.random(size) < 0.9], axis=1)
+        slots[slot] = (np.arange(size, dtype=np.int64) + 1000 * offset, colours.astype(np.float32))
+    return slots
+
+
+def brute_force(slots):
+    """Every outfit's score, by scoring the full product."""
+    tops, bottoms, dresses, shoes = (slots[s] for s in ('top', 'bottom', 'dress', 'shoes'))
+    tb, ts = outfits.harmony(tops[1], bottoms[1]), outfits.harmony(tops[1], shoes[1])
+    bs, ds = outfits.harmony(bottoms[1], shoes[1]), outfits.harmony(dresses[1], shoes[1])
+    scores = []
+    for t, b in zip(*np.nonzero(tb >= outfits.MIN_PAIR_SCORE)):
+        scores.extend((tb[t, b] + ts[t] + bs[b]) / 3)
+    scores.extend(ds.ravel())
+    return sorted((round(float(score), 4) for score in scores), reverse=True)
+
+
+class IterOutfitsTests(SimpleTestCase):
+    def test_yields_every_outfit_best_first(self):
+        rng = np.random.default_rng(7)
+        for _ in range(5):
+            slots = random_slots(rng, {'top': 6, 'bottom': 5, 'dress': 3, 'shoes': 4})
+            generated = list(outfits.iter_outfits(slots))
+            self.assertEqual([score for score, _ in generated], brute_force(slots))
+            self.assertEqual(len({tuple(ids) for _, ids in generated}), len(generated))
+
+    def test_chunking_does_not_change_results(self):
+        slots = random_slots(np.random.default_rng(3), {'top': 40, 'bottom': 30, 'dress': 5, 'shoes': 6})
+        expected = list(itertools.islice(outfits.iter_outfits(slots), 200))
+        with mock.patch.object(outfits, 'HARMONY_CHUNK_CELLS', 7):
+            self.assertEqual(list(itertools.islice(outfits.iter_outfits(slots), 200)), expected)
+
+    def test_without_shoes_pairs_are_outfits(self):
+        slots = random_slots(np.random.default_rng(5), {'top': 3, 'bottom': 3, 'dress': 2})
+        generated = list(outfits.iter_outfits(slots))
+        self.assertTrue(generated)
+        self.assertTrue(all(len(ids) == 2 for _, ids in generated))
+
+    def test_empty_wardrobe(self):
+        self.assertEqual(list(outfits.iter_outfits({})), [])
+
+
+@override_settings(OUTFIT_MAX_RESULTS=5, OUTBOX_DISPATCH_INLINE=False, JOBS_IN_PROCESS_WORKERS=0)
+class OutfitEndpointTests(APITestCase):
+    url = '/api/wardrobe/outfits/'
+
+    def setUp(self):
+        cache.clear()
+        self.owner = User.objects.create_user('outfit_owner', password='pw')
+        self.client.force_authenticate(self.owner)
+        for category, colors in (('Top', ['black', 'white', 'red']), ('Bottom', ['navy', 'khaki']),
+                                 ('Shoes', ['white', 'brown'])):
+            for color in colors:
+                WardrobeItem.objects.create(owner=self.owner, name=f'{color} {category}', category=category, color=color)
+
+    def test_pages_end_at_the_cap(self):
+        first = self.client.get(self.url, {'page_size': 3}).data
+        self.assertEqual(len(first['results']), 3)
+        self.assertTrue(first['has_more'])
+
+        second = self.client.get(self.url, {'page': 2, 'page_size': 3}).data
+        self.assertEqual(len(second['results']), 2)
+        self.assertFalse(second['has_more'])
+
+        past = self.client.get(self.url, {'page': 50, 'page_size': 3}).data
+        self.assertEqual((past['page'], past['results'], past['has_more']), (3, [], False))
+
+    def test_bad_paging_params(self):
+        response = self.client.get(self.url, {'page': 'x'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_wardrobe_version_changes_only_on_commit(self):
+        version = get_wardrobe_version(self.owner.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            WardrobeItem.objects.create(owner=self.owner, name='Skirt', category='Skirt', color='black')
+            self.assertEqual(get_wardrobe_version(self.owner.pk), version)
+        self.assertNotEqual(get_wardrobe_version(self.owner.pk), version)
@@ -0,0 +1,144 @@
+from unittest import mock
+
+from asgiref.sync import sync_to_async
+from channels.layers import get_channel_layer
+from channels.routing import URLRouter
+from channels.testing import WebsocketCommunicator
+from django.core.cache import cache
+from django.test import SimpleTestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APITestCase
+
+from api import events, presence
+from api.consumers import user_group
+from api.models import Booking, User
+from api.routing import TokenAuthMiddleware, websocket_urlpatterns
+
+FAST_HASHERS = ['django.contrib.auth.hashers.MD5PasswordHasher']
+SETTINGS = dict(PASSWORD_HASHERS=FAST_HASHERS, OUTBOX_DISPATCH_INLINE=False, JOBS_IN_PROCESS_WORKERS=0,
+                PRESENCE_HEARTBEAT_SECONDS=10, PRESENCE_TTL=30, PRESENCE_TYPING_TTL=6, EVENT_COMMIT_LAG_SECONDS=0)
+
+
+@override_settings(**SETTINGS)
+class PresenceTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_online_until_the_last_connection_closes(self):
+        presence.connect(1)
+        presence.connect(1)
+        self.assertTrue(presence.is_online(1))
+        presence.disconnect(1)
+        self.assertTrue(presence.is_online(1))
+        presence.disconnect(1)
+        self.assertFalse(presence.is_online(1))
+
+    def test_disconnect_without_connect(self):
+        presence.disconnect(2)
+        self.assertFalse(presence.is_online(2))
+
+    def test_lookup(self):
+        presence.connect(1)
+        presence.connect(3)
+        self.assertEqual(presence.online_user_ids([1, 2, 3]), {1, 3})
+        self.assertEqual(set(presence.last_seen([1, 2])), {1})
+
+    def test_heartbeat_extends_presence(self):
+        with mock.patch.object(cache, 'set', wraps=cache.set) as cache_set, \
+                mock.patch.object(cache, 'touch', wraps=cache.touch) as touch:
+            presence.heartbeat(1)
+        self.assertEqual(cache_set.call_args.args[2], 30)
+        touch.assert_called_once_with('presence_connections_1', 30)
+        self.assertTrue(presence.is_online(1))
+
+
+@override_settings(**SETTINGS)
+class PresenceEndpointTests(APITestCase):
+    url = '/api/profiles/presence/'
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_authenticate(User.objects.create_user('presence_viewer', password='pw'))
+        presence.connect(5)
+
+    def test_get_and_post(self):
+        data = self.client.get(self.url, {'ids': '5,6,5'}).json()
+        self.assertEqual(data['online'], [5])
+        self.assertEqual(list(data['last_seen']), ['5'])
+        self.assertEqual(self.client.post(self.url, {'ids': [6, 5]}, format='json').json()['online'], [5])
+
+    def test_invalid_ids(self):
+        self.assertEqual(self.client.get(self.url, {'ids': '1,x'}).status_code, 400)
+        self.assertEqual(self.client.post(self.url, {'ids': {'a': 1}}, format='json').status_code, 400)
+        with self.settings(PRESENCE_LOOKUP_MAX=2):
+            self.assertEqual(self.client.get(self.url, {'ids': '1,2,3'}).status_code, 400)
+
+
+@override_settings(**SETTINGS)
+class UserSocketTests(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+        self.seeker = User.objects.create_user('socket_seeker', password='pw')
+        self.catalyst = User.objects.create_user('socket_catalyst', password='pw')
+        self.stranger = User.objects.create_user('socket_stranger', password='pw')
+        self.booking = Booking.objects.create(seeker=self.seeker, catalyst=self.catalyst, scheduled_time=timezone.now())
+        self.application = TokenAuthMiddleware(URLRouter(websocket_urlpatterns))
+
+    async def open(self, user):
+        token = await sync_to_async(lambda: Token.objects.get_or_create(user=user)[0].key)()
+        socket = WebsocketCommunicator(self.application, f'/ws/?token={token}')
+        connected, _ = await socket.connect()
+        self.assertTrue(connected)
+        hello = await socket.receive_json_from()
+        self.assertEqual(hello['type'], 'hello')
+        return socket, hello
+
+    async def test_rejects_missing_and_invalid_tokens(self):
+        for path in ('/ws/', '/ws/?token=bogus'):
+            socket = WebsocketCommunicator(self.application, path)
+            connected, code = await socket.connect()
+            self.assertFalse(connected)
+            self.assertEqual(code, 4401)
+
+    async def test_hello_marks_the_user_online(self):
+        event, = await sync_to_async(events.emit)([self.seeker.pk], 'rating.created', {})
+        socket, hello = await self.open(self.seeker)
+        self.assertEqual(hello, {'type': 'hello', 'user_id': self.seeker.pk, 'heartbeat': 10, 'cursor': event.pk})
+        self.assertTrue(presence.is_online(self.seeker.pk))
+        await socket.disconnect()
+        self.assertFalse(presence.is_online(self.seeker.pk))
+
+    async def test_typing_reaches_the_other_party(self):
+        seeker, _ = await self.open(self.seeker)
+        catalyst, _ = await self.open(self.catalyst)
+
+        await seeker.send_json_to({'type': 'typing', 'booking': self.booking.pk})
+        self.assertEqual(await catalyst.receive_json_from(), {
+            'type': 'typing', 'booking': self.booking.pk, 'user_id': self.seeker.pk, 'typing': True, 'expires_in': 6,
+        })
+        # Repeats within half the TTL are dropped; a state change is not
+        await seeker.send_json_to({'type': 'typing', 'booking': self.booking.pk})
+        await seeker.send_json_to({'type': 'typing', 'booking': self.booking.pk, 'typing': False})
+        self.assertFalse((await catalyst.receive_json_from())['typing'])
+        self.assertTrue(await catalyst.receive_nothing())
+        await seeker.disconnect()
+        await catalyst.disconnect()
+
+    async def test_errors(self):
+        stranger, _ = await self.open(self.stranger)
+        await stranger.send_json_to({'type': 'typing', 'booking': self.booking.pk})
+        self.assertEqual(await stranger.receive_json_from(), {'type': 'error', 'error': 'Not a participant of this booking'})
+        await stranger.send_json_to({'type': 'typing', 'booking': 'x'})
+        self.assertEqual((await stranger.receive_json_from())['error'], 'booking must be a booking id')
+        await stranger.send_json_to({'type': 'dance'})
+        self.assertEqual((await stranger.receive_json_from())['error'], 'Unknown message type')
+        await stranger.disconnect()
+
+    async def test_heartbeat_and_pushed_events(self):
+        socket, _ = await self.open(self.seeker)
+        await socket.send_json_to({'type': 'heartbeat'})
+        self.assertTrue(await socket.receive_nothing())
+        await get_channel_layer().group_send(user_group(self.seeker.pk), {'type': 'event.push', 'event': {'id': 1}})
+        self.assertEqual(await socket.receive_json_from(), {'type': 'event', 'event': {'id': 1}})
+        await socket.disconnect()
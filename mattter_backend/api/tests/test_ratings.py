@@ -0,0 +1,254 @@
+import random
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+from django.test import TestCase, TransactionTestCase, override_settings
+from rest_framework.test import APITestCase
+
+from api import ratings
+from api.models import Job, Profile, Rating, User
+
+FAST_HASHERS = ['django.contrib.auth.hashers.MD5PasswordHasher']
+SETTINGS = dict(PASSWORD_HASHERS=FAST_HASHERS, OUTBOX_DISPATCH_INLINE=False, JOBS_IN_PROCESS_WORKERS=0,
+                RATING_PRIOR_MEAN=3.5, RATING_PRIOR_WEIGHT=10)
+AGGREGATE_FIELDS = ['rating_count', 'rating_sum', 'average_rating', 'rating_score', *[f'rating_{s}' for s in ratings.STARS]]
+
+
+def aggregates(profile):
+    profile.refresh_from_db()
+    return {name: getattr(profile, name) for name in AGGREGATE_FIELDS}
+
+
+@override_settings(**SETTINGS)
+class IncrementalAggregateTests(TestCase):
+    def setUp(self):
+        self.catalyst = User.objects.create_user('rated_catalyst', password='pw')
+        self.profile = Profile.objects.create(user=self.catalyst, role='CATALYST')
+        self.seekers = [User.objects.create_user(f'rating_seeker_{i}', password='pw') for i in range(6)]
+
+    def assert_matches_recompute(self):
+        incremental = aggregates(self.profile)
+        ratings.recompute_catalyst_ratings([self.catalyst.pk])
+        self.assertEqual(incremental, aggregates(self.profile))
+
+    def test_create_update_delete_apply_deltas(self):
+        first = Rating.objects.create(seeker=self.seekers[0], catalyst=self.catalyst, rating=5)
+        Rating.objects.create(seeker=self.seekers[1], catalyst=self.catalyst, rating=3)
+        values = aggregates(self.profile)
+        self.assertEqual(values['rating_count'], 2)
+        self.assertEqual(values['rating_sum'], 8)
+        self.assertEqual(float(values['average_rating']), 4.0)
+        self.assertAlmostEqual(values['rating_score'], (10 * 3.5 + 8) / 12)
+        self.assertEqual(self.profile.rating_histogram, {'1': 0, '2': 0, '3': 1, '4': 0, '5': 1})
+
+        first.rating = 1
+        first.save()
+        aggregates(self.profile)
+        self.assertEqual(self.profile.rating_histogram, {'1': 1, '2': 0, '3': 1, '4': 0, '5': 0})
+        self.assert_matches_recompute()
+
+        first.delete()
+        values = aggregates(self.profile)
+        self.assertEqual((values['rating_count'], values['rating_sum']), (1, 3))
+        self.assert_matches_recompute()
+
+    def test_last_rating_deleted_resets_to_unrated(self):
+        rating = Rating.objects.create(seeker=self.seekers[0], catalyst=self.catalyst, rating=4)
+        rating.delete()
+        values = aggregates(self.profile)
+        self.assertEqual(values['rating_count'], 0)
+        self.assertEqual(float(values['average_rating']), 0)
+        self.assertEqual(values['rating_score'], 0)
+
+    def test_random_edits_match_a_full_recompute(self):
+        rng = random.Random(7)
+        rows = []
+        for seeker in self.seekers:
+            rows.append(Rating.objects.create(seeker=seeker, catalyst=self.catalyst, rating=rng.randint(1, 5)))
+        for row in rng.sample(rows, 3):
+            row.rating = rng.randint(1, 5)
+            row.save()
+        rows[0].delete()
+        self.assert_matches_recompute()
+
+    def test_moving_a_rating_to_another_catalyst(self):
+        other = User.objects.create_user('other_catalyst', password='pw')
+        other_profile = Profile.objects.create(user=other, role='CATALYST')
+        rating = Rating.objects.create(seeker=self.seekers[0], catalyst=self.catalyst, rating=5)
+        rating.catalyst = other
+        rating.save()
+        self.assertEqual(aggregates(self.profile)['rating_count'], 0)
+        self.assertEqual(aggregates(other_profile)['rating_5'], 1)
+
+    def test_review_text_edit_bumps_the_version(self):
+        rating = Rating.objects.create(seeker=self.seekers[0], catalyst=self.catalyst, rating=5)
+        self.profile.refresh_from_db()
+        version = self.profile.version
+        rating.review = 'Great eye for colour'
+        rating.save()
+        self.profile.refresh_from_db()
+        self.assertEqual(self.profile.version, version + 1)
+        self.assertEqual(self.profile.rating_count, 1)
+
+    def test_recompute_repairs_update_edits(self):
+        Rating.objects.create(seeker=self.seekers[0], catalyst=self.catalyst, rating=2)
+        Rating.objects.filter(catalyst=self.catalyst).update(rating=5)  # skips the signals
+        self.assertEqual(aggregates(self.profile)['rating_2'], 1)
+        out = StringIO()
+        call_command('refresh_rankings', '--recompute', stdout=out)
+        self.assertEqual(aggregates(self.profile)['rating_5'], 1)
+        self.assertEqual(aggregates(self.profile)['rating_2'], 0)
+        self.assertIn('Recomputed ratings', out.getvalue())
+
+    def test_bayesian_score(self):
+        self.assertEqual(ratings.bayesian_score(0, 0), 0.0)
+        # One 5-star rating doesn't outrank many 4.9s
+        self.assertLess(ratings.bayesian_score(5, 1), ratings.bayesian_score(490, 100))
+
+
+@override_settings(**SETTINGS)
+class TopCatalystsTests(APITestCase):
+    url = '/api/profiles/top_catalysts/'
+
+    def setUp(self):
+        cache.clear()
+        self.one_five = self.catalyst('one_five', [5], specializations=['Streetwear'], latitude=52.52, longitude=13.40)
+        self.many_fours = self.catalyst('many_fours', [4] * 20, specializations=['Formal'], latitude=48.85, longitude=2.35)
+        self.unrated = self.catalyst('unrated', [])
+
+    def catalyst(self, name, stars, **fields):
+        user = User.objects.create_user(name, password='pw')
+        profile = Profile.objects.create(user=user, role='CATALYST', **fields)
+        for i, value in enumerate(stars):
+            seeker, _ = User.objects.get_or_create(username=f'{name}_rater_{i}')
+            Rating.objects.create(seeker=seeker, catalyst=user, rating=value)
+        return profile
+
+    def ids(self, response):
+        self.assertEqual(response.status_code, 200)
+        return [c['id'] for c in response.json()['catalysts']]
+
+    def test_ranked_by_bayesian_score(self):
+        self.assertEqual(self.ids(self.client.get(self.url)), [self.many_fours.pk, self.one_five.pk, self.unrated.pk])
+
+    def test_filters(self):
+        self.assertEqual(self.ids(self.client.get(self.url, {'specialization': 'streetwear'})), [self.one_five.pk])
+        self.assertEqual(self.ids(self.client.get(self.url, {'min_ratings': 2})), [self.many_fours.pk])
+        nearby = self.client.get(self.url, {'lat': 52.5, 'lon': 13.4, 'radius': 50000}).json()['catalysts']
+        self.assertEqual([c['id'] for c in nearby], [self.one_five.pk])
+        self.assertIn('distance', nearby[0])
+        self.assertEqual(len(self.ids(self.client.get(self.url, {'limit': 1}))), 1)
+
+    def test_invalid_parameters(self):
+        self.assertEqual(self.client.get(self.url, {'limit': 'x'}).status_code, 400)
+        self.assertEqual(self.client.get(self.url, {'lat': 52.5}).status_code, 400)
+
+    def test_serves_the_cached_ranking_until_refreshed(self):
+        self.client.get(self.url)
+        Profile.objects.filter(pk=self.unrated.pk).update(rating_score=5.0, rating_count=1)
+        self.assertEqual(self.ids(self.client.get(self.url))[0], self.many_fours.pk)
+        ratings.refresh_ranking()
+        self.assertEqual(self.ids(self.client.get(self.url))[0], self.unrated.pk)
+
+    def test_stale_ranking_queues_one_refresh(self):
+        ranking = ratings.refresh_ranking()
+        cache.set(ratings.RANKING_KEY, {**ranking, 'built_at': ranking['built_at'] - 3600})
+        self.client.get(self.url)
+        self.client.get(self.url)
+        self.assertEqual(Job.objects.filter(name='ratings.refresh_ranking').count(), 1)
+
+
+@override_settings(**SETTINGS)
+class ReviewFeedTests(APITestCase):
+    def setUp(self):
+        catalyst = User.objects.create_user('feed_catalyst', password='pw')
+        self.profile = Profile.objects.create(user=catalyst, role='CATALYST')
+        for i in range(5):
+            seeker = User.objects.create_user(f'feed_seeker_{i}', password='pw', first_name=f'Seeker{i}')
+            Rating.objects.create(seeker=seeker, catalyst=catalyst, rating=i + 1, review=f'review {i}')
+        self.url = f'/api/profiles/{self.profile.pk}/reviews/'
+
+    def test_pages_newest_first_with_a_cursor(self):
+        first = self.client.get(self.url, {'page_size': 2}).json()
+        self.assertEqual([r['review'] for r in first['results']], ['review 4', 'review 3'])
+        self.assertEqual(first['results'][0]['reviewer'], {'name': 'Seeker4'})
+        self.assertNotIn('summary', first)
+
+        seen = [r['id'] for r in first['results']]
+        next_url = first['next']
+        while next_url:
+            page = self.client.get(next_url).json()
+            seen += [r['id'] for r in page['results']]
+            next_url = page['next']
+        self.assertEqual(len(seen), 5)
+        self.assertEqual(len(set(seen)), 5)
+
+    def test_summary_comes_from_the_profile_aggregates(self):
+        with self.assertNumQueries(2):
+            summary = self.client.get(self.url, {'summary': 'true'}).json()['summary']
+        self.assertEqual(summary['count'], 5)
+        self.assertEqual(summary['average'], 3.0)
+        self.assertEqual(summary['histogram'], {str(s): 1 for s in ratings.STARS})
+
+    def test_etag_changes_when_a_review_changes(self):
+        response = self.client.get(self.url)
+        etag = response['ETag']
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        self.assertNotEqual(self.client.get(self.url, {'page_size': 2})['ETag'], etag)
+
+        rating = Rating.objects.filter(catalyst=self.profile.user).first()
+        rating.review = 'edited'
+        with self.captureOnCommitCallbacks(execute=True):
+            rating.save()
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_unknown_profile(self):
+        self.assertEqual(self.client.get('/api/profiles/999999/reviews/').status_code, 404)
+
+    def test_catalyst_view_embeds_latest_reviews(self):
+        with self.settings(CATALYST_VIEW_REVIEWS=2):
+            data = self.client.get(f'/api/profiles/{self.profile.pk}/catalyst_view/').json()
+        self.assertEqual([r['review'] for r in data['reviews']], ['review 4', 'review 3'])
+        self.assertEqual(data['rating_summary']['count'], 5)
+        self.assertTrue(data['reviews_url'].endswith(self.url))
+
+
+@override_settings(**SETTINGS)
+class RatingBackfillMigrationTests(TransactionTestCase):
+    before = [('api', '0013_wardrobeitem_similarity')]
+    after = [('api', '0014_rating_histogram_score')]
+
+    def tearDown(self):
+        executor = MigrationExecutor(connection)
+        executor.migrate(executor.loader.graph.leaf_nodes())
+
+    def test_backfills_aggregates_from_existing_ratings(self):
+        executor = MigrationExecutor(connection)
+        executor.migrate(self.before)
+        apps = executor.loader.project_state(self.before).apps
+        OldUser = apps.get_model('api', 'User')
+        OldProfile = apps.get_model('api', 'Profile')
+        OldRating = apps.get_model('api', 'Rating')
+        catalyst = OldUser.objects.create(username='backfill_catalyst')
+        OldUser.objects.create(username='unrated_catalyst')
+        profile = OldProfile.objects.create(user=catalyst, role='CATALYST')
+        unrated = OldProfile.objects.create(user=OldUser.objects.get(username='unrated_catalyst'), role='CATALYST')
+        for i, stars in enumerate([5, 4, 4, 1]):
+            seeker = OldUser.objects.create(username=f'backfill_seeker_{i}')
+            OldRating.objects.create(seeker=seeker, catalyst=catalyst, rating=stars)
+
+        executor = MigrationExecutor(connection)
+        executor.migrate(self.after)
+        apps = executor.loader.project_state(self.after).apps
+        NewProfile = apps.get_model('api', 'Profile')
+        profile = NewProfile.objects.get(pk=profile.pk)
+        self.assertEqual(profile.rating_count, 4)
+        self.assertEqual(profile.rating_sum, 14)
+        self.assertEqual([getattr(profile, f'rating_{s}') for s in ratings.STARS], [1, 0, 0, 2, 1])
+        self.assertEqual(float(profile.average_rating), 3.5)
+        self.assertAlmostEqual(profile.rating_score, (10 * 3.5 + 14) / 14)
+        unrated = NewProfile.objects.get(pk=unrated.pk)
+        self.assertEqual((unrated.rating_count, unrated.rating_score), (0, 0))
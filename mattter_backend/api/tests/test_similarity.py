@@ -0,0 +1,172 @@
+import os
+import shutil
+import tempfile
+from unittest import mock
+
+import numpy as np
+from django.core.cache import cache
+from django.test import SimpleTestCase, override_settings
+from rest_framework.test import APITestCase
+
+from api import similarity
+from api.models import User, WardrobeItem
+from api.similarity import EMBEDDING_DIM, HASH_BITS, WardrobeIndex
+
+FAST_HASHERS = ['django.contrib.auth.hashers.MD5PasswordHasher']
+
+
+def random_index(n, seed=0, clusters=None):
+    """Random index; with `clusters`, items come in near-identical groups of that size."""
+    rng = np.random.default_rng(seed)
+    hashes = rng.integers(0, 2 ** 63, size=n, dtype=np.int64).astype(np.uint64)
+    embeddings = rng.random((n, EMBEDDING_DIM)).astype(np.float32)
+    if clusters:
+        for start in range(0, n, clusters):
+            hashes[start:start + clusters] = hashes[start] ^ np.uint64(rng.integers(0, 4))
+            embeddings[start:start + clusters] = embeddings[start] + rng.random(EMBEDDING_DIM) * 0.01
+    embeddings /= np.linalg.norm(embeddings, axis=1, keepdims=True)
+    return WardrobeIndex(np.arange(1, n + 1, dtype=np.int64) * 10, hashes, embeddings.astype(np.float16))
+
+
+def brute_force_groups(index, max_distance):
+    parent = list(range(len(index)))
+
+    def root(i):
+        while parent[i] != i:
+            i = parent[i]
+        return i
+
+    for i in range(len(index)):
+        for j in range(i + 1, len(index)):
+            distance = bin(int(index.hashes[i]) ^ int(index.hashes[j])).count('1')
+            cosine = float(index.embeddings[i].astype(np.float32) @ index.embeddings[j].astype(np.float32))
+            if distance <= max_distance and cosine >= similarity.DUPLICATE_MIN_COSINE:
+                parent[max(root(i), root(j))] = min(root(i), root(j))
+    groups = {}
+    for i in range(len(index)):
+        groups.setdefault(root(i), []).append(int(index.ids[i]))
+    return sorted(sorted(g) for g in groups.values() if len(g) > 1)
+
+
+class WardrobeIndexTests(SimpleTestCase):
+    def test_similar_matches_a_full_sort(self):
+        index = random_index(50)
+        item_id = int(index.ids[7])
+        results = index.similar(item_id, k=5)
+        self.assertEqual(len(results), 5)
+        self.assertNotIn(item_id, [r[0] for r in results])
+
+        scores = []
+        for i, other in enumerate(index.ids):
+            if other == item_id:
+                continue
+            distance = bin(int(index.hashes[7]) ^ int(index.hashes[i])).count('1')
+            cosine = float(index.embeddings[i].astype(np.float32) @ index.embeddings[7].astype(np.float32))
+            score = similarity.EMBEDDING_WEIGHT * cosine + (1 - similarity.EMBEDDING_WEIGHT) * (1 - distance / HASH_BITS)
+            scores.append((score, int(other), distance))
+        expected = sorted(scores, reverse=True)[:5]
+        self.assertEqual([r[0] for r in results], [e[1] for e in expected])
+        self.assertEqual([r[2] for r in results], [e[2] for e in expected])
+
+    def test_similar_edge_cases(self):
+        index = random_index(3)
+        self.assertEqual(index.similar(999), [])
+        self.assertEqual(len(index.similar(int(index.ids[0]), k=10)), 2)
+        self.assertEqual(random_index(1).similar(10), [])
+
+    def test_duplicate_groups_match_brute_force(self):
+        index = random_index(60, seed=3, clusters=3)
+        expected = brute_force_groups(index, 6)
+        self.assertTrue(expected)
+        self.assertEqual(sorted(sorted(g) for g in index.duplicate_groups(6)), expected)
+        # Same result when rows are compared in small blocks
+        with mock.patch.object(similarity, 'CHUNK_ROWS', 7):
+            self.assertEqual(sorted(sorted(g) for g in index.duplicate_groups(6)), expected)
+
+    def test_groups_are_transitive(self):
+        embeddings = np.tile(np.eye(1, EMBEDDING_DIM, dtype=np.float16), (3, 1))
+        # a-b and b-c are 4 bits apart, a-c is 8
+        hashes = np.array([0, 0b1111, 0b11111111], dtype=np.uint64)
+        index = WardrobeIndex(np.array([1, 2, 3]), hashes, embeddings)
+        self.assertEqual(index.duplicate_groups(4), [[1, 2, 3]])
+        self.assertEqual(index.duplicate_groups(3), [])
+
+    def test_different_colours_are_not_duplicates(self):
+        embeddings = np.eye(2, EMBEDDING_DIM, dtype=np.float16)
+        index = WardrobeIndex(np.array([1, 2]), np.array([5, 5], dtype=np.uint64), embeddings)
+        self.assertEqual(index.duplicate_groups(0), [])
+
+
+@override_settings(PASSWORD_HASHERS=FAST_HASHERS, OUTBOX_DISPATCH_INLINE=False, JOBS_IN_PROCESS_WORKERS=0)
+class SimilarityEndpointTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        similarity._memory.clear()
+        index_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, index_dir, ignore_errors=True)
+        settings = override_settings(SIMILARITY_INDEX_DIR=index_dir)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.index_dir = index_dir
+
+        self.owner = User.objects.create_user('similar_owner', password='pw')
+        self.client.force_authenticate(self.owner)
+        base = np.zeros(EMBEDDING_DIM, dtype=np.float16)
+        base[0] = 1
+        shifted = np.zeros(EMBEDDING_DIM, dtype=np.float16)
+        shifted[1] = 1
+        self.original = self.item('Original', 0, base)
+        self.copy = self.item('Copy', 0b11, base)
+        self.other = self.item('Other', 2 ** 64 - 1, shifted)
+        self.untagged = WardrobeItem.objects.create(owner=self.owner, name='Untagged', category='Top')
+
+    def item(self, name, phash, embedding, owner=None):
+        return WardrobeItem.objects.create(
+            owner=owner or self.owner, name=name, category='Top',
+            image_hash=int(phash).to_bytes(8, 'big'), image_embedding=embedding.tobytes(),
+        )
+
+    def test_similar(self):
+        data = self.client.get(f'/api/wardrobe/{self.original.pk}/similar/').json()
+        self.assertTrue(data['tagged'])
+        self.assertEqual([r['id'] for r in data['results']], [self.copy.pk, self.other.pk])
+        self.assertEqual(data['results'][0]['hash_distance'], 2)
+        self.assertEqual(len(self.client.get(f'/api/wardrobe/{self.original.pk}/similar/', {'k': 1}).json()['results']), 1)
+
+    def test_untagged_item(self):
+        data = self.client.get(f'/api/wardrobe/{self.untagged.pk}/similar/').json()
+        self.assertEqual(data, {'item': self.untagged.pk, 'tagged': False, 'results': []})
+
+    def test_duplicates(self):
+        data = self.client.get('/api/wardrobe/duplicates/').json()
+        self.assertEqual(data['group_count'], 1)
+        self.assertEqual(data['duplicate_count'], 1)
+        self.assertEqual(sorted(i['id'] for i in data['groups'][0]), [self.original.pk, self.copy.pk])
+        self.assertEqual(self.client.get('/api/wardrobe/duplicates/', {'max_distance': 1}).json()['group_count'], 0)
+
+    def test_invalid_parameters_and_other_owners(self):
+        self.assertEqual(self.client.get(f'/api/wardrobe/{self.original.pk}/similar/', {'k': 'x'}).status_code, 400)
+        self.assertEqual(self.client.get('/api/wardrobe/duplicates/', {'max_distance': 'x'}).status_code, 400)
+        stranger = User.objects.create_user('similar_stranger', password='pw')
+        self.client.force_authenticate(stranger)
+        self.assertEqual(self.client.get(f'/api/wardrobe/{self.original.pk}/similar/').status_code, 404)
+        self.assertEqual(self.client.get('/api/wardrobe/duplicates/').json()['group_count'], 0)
+
+    def test_index_is_rebuilt_when_the_wardrobe_changes(self):
+        first = similarity.get_index(self.owner.pk)
+        self.assertIs(similarity.get_index(self.owner.pk), first)
+        self.assertEqual(len(first), 3)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.other.delete()
+        self.assertEqual(len(similarity.get_index(self.owner.pk)), 2)
+
+    @override_settings(SIMILARITY_MMAP_THRESHOLD=2)
+    def test_large_wardrobes_are_memory_mapped(self):
+        index = similarity.get_index(self.owner.pk)
+        self.assertIsInstance(index.ids, np.memmap)
+        similarity._memory.clear()
+        with self.assertNumQueries(0):
+            self.assertEqual(list(similarity.get_index(self.owner.pk).ids), list(index.ids))
+
+        similarity.drop_index(self.owner.pk)
+        self.assertEqual(os.listdir(self.index_dir), [])
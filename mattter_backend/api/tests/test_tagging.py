@@ -0,0 +1,92 @@
+import io
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import override_settings
+from PIL import Image
+
+from api import tagging, wardrobe_batch
+from api.models import Job, WardrobeItem
+
+from .media import MediaTestCase
+
+
+def photo(color=(200, 30, 30)):
+    buffer = io.BytesIO()
+    image = Image.new('RGB', (64, 64), (245, 245, 245))
+    image.paste(color, (16, 16, 48, 48))
+    image.save(buffer, 'JPEG')
+    return SimpleUploadedFile('photo.jpg', buffer.getvalue(), content_type='image/jpeg')
+
+
+@override_settings(JOBS_IN_PROCESS_WORKERS=0, OUTBOX_DISPATCH_INLINE=False,
+                   WARDROBE_IMAGE_ASYNC=True, WARDROBE_TAGGING_ASYNC=True)
+class UploadTaggingTests(MediaTestCase):
+    def create(self, **data):
+        with mock.patch('api.serializers.process_image_file') as process:
+            response = self.client.post('/api/wardrobe/', {'name': 'Shirt', 'category': 'Top', **data},
+                                        format='multipart')
+        process.assert_not_called()  # nothing is decoded in the request
+        return response
+
+    def test_upload_is_processed_then_tagged_in_the_background(self):
+        response = self.create(image=photo())
+        self.assertEqual(response.status_code, 201)
+        item = WardrobeItem.objects.get(pk=response.data['id'])
+        self.assertTrue(item.image.name.startswith('wardrobe/incoming/'))
+        self.assertEqual(item.image_variants, {})
+        self.assertTrue(Job.objects.filter(name='wardrobe.process_images', args=[[item.pk]]).exists())
+        self.assertFalse(Job.objects.filter(name='wardrobe.tag').exists())
+
+        wardrobe_batch.process_pending_images([item.pk])
+        item.refresh_from_db()
+        self.assertEqual(item.image.name, item.image_variants['full'])
+        self.assertTrue(Job.objects.filter(name='wardrobe.tag', args=[[item.pk]]).exists())
+
+        with ThreadPoolExecutor(1) as pool:
+            self.assertEqual(tagging.tag_items([item.pk], pool), (1, 0))
+        item.refresh_from_db()
+        self.assertEqual(item.ai_tags['version'], tagging.imaging.FEATURES_VERSION)
+        self.assertEqual(len(item.image_hash), 8)
+        self.assertTrue(item.color)
+
+    def test_not_an_image(self):
+        response = self.client.post('/api/wardrobe/', {
+            'name': 'Shirt', 'category': 'Top', 'image': SimpleUploadedFile('x.jpg', b'not an image'),
+        }, format='multipart')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('image', response.data)
+
+
+@override_settings(JOBS_IN_PROCESS_WORKERS=0, OUTBOX_DISPATCH_INLINE=False,
+                   WARDROBE_IMAGE_ASYNC=False, WARDROBE_TAGGING_ASYNC=True)
+class TagItemsTests(MediaTestCase):
+    def upload(self, **data):
+        response = self.client.post('/api/wardrobe/', {'name': 'Shirt', 'category': 'Top', 'image': photo(), **data},
+                                    format='multipart')
+        self.assertEqual(response.status_code, 201)
+        return WardrobeItem.objects.get(pk=response.data['id'])
+
+    def test_owner_colour_is_kept(self):
+        item = self.upload(color='green')
+        self.assertEqual(set(item.image_variants), {'full', 'medium', 'thumb'})
+        with ThreadPoolExecutor(1) as pool:
+            tagging.tag_items([item.pk], pool)
+        item.refresh_from_db()
+        self.assertEqual(item.color, 'green')
+        self.assertIn('dominant_colors', item.ai_tags)
+
+    def test_item_whose_image_was_replaced_is_skipped(self):
+        item = self.upload()
+        real_map = ThreadPoolExecutor.map
+
+        def replace_while_tagging(pool, *args, **kwargs):
+            results = list(real_map(pool, *args, **kwargs))
+            WardrobeItem.objects.filter(pk=item.pk).update(image='wardrobe/other.webp')
+            return results
+
+        with ThreadPoolExecutor(1) as pool, mock.patch.object(ThreadPoolExecutor, 'map', replace_while_tagging):
+            self.assertEqual(tagging.tag_items([item.pk], pool), (0, 0))
+        item.refresh_from_db()
+        self.assertEqual(item.ai_tags, {})
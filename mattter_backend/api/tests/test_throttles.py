@@ -0,0 +1,136 @@
+from types import SimpleNamespace
+from unittest import mock
+
+from django.conf import settings
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APITestCase
+from rest_framework.throttling import SimpleRateThrottle
+
+from api.models import Booking, Message, Report, User
+from api.throttles import MessageCreateThrottle, parse_rate
+
+FAST_HASHERS = ['django.contrib.auth.hashers.MD5PasswordHasher']
+SETTINGS = dict(PASSWORD_HASHERS=FAST_HASHERS, OUTBOX_DISPATCH_INLINE=False, JOBS_IN_PROCESS_WORKERS=0)
+
+
+def rates(**overrides):
+    return {**settings.REST_FRAMEWORK, 'DEFAULT_THROTTLE_RATES': {**settings.REST_FRAMEWORK['DEFAULT_THROTTLE_RATES'], **overrides}}
+
+
+class Clock:
+    def __init__(self, now=1_000_000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+@override_settings(**SETTINGS, REST_FRAMEWORK=rates(message_create='3/min'), ABUSE_FLAG_THRESHOLDS={'message_create': '5/hour'})
+class ActionThrottleTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('throttled', password='pw')
+        self.clock = Clock()
+        self.view = SimpleNamespace(action='create')
+
+    def attempt(self, user=None, view=None):
+        throttle = MessageCreateThrottle()
+        throttle.timer = self.clock
+        allowed = throttle.allow_request(SimpleNamespace(user=user or self.user), view or self.view)
+        return allowed, throttle.wait()
+
+    def test_parse_rate(self):
+        self.assertEqual(parse_rate('30/min'), (30, 60))
+        self.assertEqual(parse_rate('20/hour'), (20, 3600))
+        self.assertIsNone(parse_rate(None))
+
+    def test_burst_then_refill(self):
+        self.assertEqual([self.attempt()[0] for _ in range(3)], [True, True, True])
+        allowed, wait = self.attempt()
+        self.assertFalse(allowed)
+        self.assertAlmostEqual(wait, 20)  # one token every 60 / 3 seconds
+
+        self.clock.now += 10
+        self.assertFalse(self.attempt()[0])
+        self.clock.now += 20
+        self.assertTrue(self.attempt()[0])
+        self.assertFalse(self.attempt()[0])
+
+    def test_only_throttles_listed_actions_of_regular_users(self):
+        staff = User.objects.create_user('staff', password='pw', is_staff=True)
+        anonymous = SimpleNamespace(is_authenticated=False, is_staff=False)
+        for _ in range(5):
+            self.assertTrue(self.attempt(user=staff)[0])
+            self.assertTrue(self.attempt(user=anonymous)[0])
+            self.assertTrue(self.attempt(view=SimpleNamespace(action='list'))[0])
+        self.assertTrue(self.attempt()[0])
+
+    def test_buckets_are_per_user(self):
+        other = User.objects.create_user('other', password='pw')
+        for _ in range(3):
+            self.attempt()
+        self.assertFalse(self.attempt()[0])
+        self.assertTrue(self.attempt(user=other)[0])
+
+    def test_sustained_attempts_flag_the_account_once(self):
+        for _ in range(4):
+            self.attempt()
+        self.assertFalse(Report.objects.exists())
+        for _ in range(10):
+            self.attempt()
+        report = Report.objects.get()
+        self.assertEqual(report.reported_user, self.user)
+        self.assertEqual(report.source, 'AUTOMATED')
+        self.assertTrue(report.reason.startswith('[message_create]'))
+
+    def test_attempts_in_an_old_window_no_longer_count(self):
+        for _ in range(4):
+            self.attempt()
+        self.clock.now += 2 * 3600
+        self.attempt()
+        self.assertFalse(Report.objects.exists())
+
+
+@override_settings(**SETTINGS)
+class ThrottledEndpointTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.seeker = User.objects.create_user('endpoint_seeker', password='pw')
+        catalyst = User.objects.create_user('endpoint_catalyst', password='pw')
+        self.booking = Booking.objects.create(seeker=self.seeker, catalyst=catalyst, scheduled_time=timezone.now())
+
+    @override_settings(REST_FRAMEWORK=rates(message_create='2/min'))
+    def test_message_create_is_rejected_before_saving(self):
+        self.client.force_authenticate(self.seeker)
+        codes = [self.client.post('/api/messages/', {'booking': self.booking.pk, 'content': 'hi'}, format='json').status_code
+                 for _ in range(3)]
+        self.assertEqual(codes, [201, 201, 429])
+        self.assertEqual(Message.objects.count(), 2)
+        # Reads aren't throttled
+        self.assertEqual(self.client.get('/api/messages/').status_code, 200)
+
+    @override_settings(REST_FRAMEWORK=rates(message_create='1/min'))
+    def test_retry_after_header(self):
+        self.client.force_authenticate(self.seeker)
+        self.client.post('/api/messages/', {'booking': self.booking.pk, 'content': 'hi'}, format='json')
+        response = self.client.post('/api/messages/', {'booking': self.booking.pk, 'content': 'hi'}, format='json')
+        self.assertEqual(response.status_code, 429)
+        self.assertGreaterEqual(int(response['Retry-After']), 59)
+
+    # SimpleRateThrottle reads its rates once, at import
+    @mock.patch.object(SimpleRateThrottle, 'THROTTLE_RATES', {'login_user': '2/min', 'login_ip': '100/min'})
+    def test_login_is_throttled_per_username(self):
+        codes = [self.client.post('/api/login/', {'username': 'endpoint_seeker', 'password': 'wrong'}).status_code
+                 for _ in range(3)]
+        self.assertEqual(codes, [400, 400, 429])
+        # Differently-cased username shares the bucket; another account doesn't
+        self.assertEqual(self.client.post('/api/login/', {'username': 'Endpoint_Seeker', 'password': 'pw'}).status_code, 429)
+        self.assertEqual(self.client.post('/api/login/', {'username': 'endpoint_catalyst', 'password': 'pw'}).status_code, 200)
+
+    @mock.patch.object(SimpleRateThrottle, 'THROTTLE_RATES', {'login_user': '100/min', 'login_ip': '2/min'})
+    def test_login_is_throttled_per_ip(self):
+        self.client.post('/api/login/', {'username': 'a', 'password': 'x'})
+        self.client.post('/api/login/', {'username': 'b', 'password': 'x'})
+        self.assertEqual(self.client.post('/api/login/', {'username': 'endpoint_seeker', 'password': 'pw'}).status_code, 429)
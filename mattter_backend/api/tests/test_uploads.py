@@ -0,0 +1,146 @@
+import io
+from unittest import mock
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import RequestFactory, override_settings
+from PIL import Image
+
+from api import uploads
+from api.middleware import MediaFilesMiddleware
+from api.models import WardrobeItem
+
+from .media import MediaTestCase, png_bytes
+
+SIZES = {'full': 64, 'medium': 32, 'thumb': 16}
+
+
+def image_bytes(size=(100, 50), mode='RGB', fmt='PNG'):
+    buffer = io.BytesIO()
+    Image.new(mode, size, (10, 20, 30, 0) if mode == 'RGBA' else 'blue').save(buffer, fmt)
+    return buffer.getvalue()
+
+
+@override_settings(WARDROBE_IMAGE_SIZES=SIZES, WARDROBE_IMAGE_FORMAT='WEBP', OUTBOX_DISPATCH_INLINE=False,
+                   JOBS_IN_PROCESS_WORKERS=0)
+class ProcessImageTests(MediaTestCase):
+    def open_variant(self, name):
+        with default_storage.open(name, 'rb') as f:
+            img = Image.open(f)
+            img.load()
+        return img
+
+    def test_variants_are_capped_and_content_addressed(self):
+        names = uploads.process_image_file(SimpleUploadedFile('a.png', image_bytes()))
+        self.assertEqual(set(names), set(SIZES))
+        for variant, name in names.items():
+            self.assertRegex('/' + name, uploads.VARIANT_NAME_RE)
+            img = self.open_variant(name)
+            self.assertEqual(img.format, 'WEBP')
+            self.assertEqual(max(img.size), SIZES[variant])
+        self.assertEqual(self.open_variant(names['thumb']).size, (16, 8))
+
+    def test_small_images_are_not_upscaled(self):
+        names = uploads.process_image_file(SimpleUploadedFile('a.png', image_bytes(size=(20, 10))))
+        self.assertEqual(self.open_variant(names['full']).size, (20, 10))
+        self.assertEqual(self.open_variant(names['thumb']).size, (16, 8))
+
+    def test_identical_uploads_share_files_without_decoding(self):
+        data = image_bytes()
+        first = uploads.process_image_file(SimpleUploadedFile('a.png', data))
+        with mock.patch.object(uploads, '_open') as decode:
+            second = uploads.process_image_file(SimpleUploadedFile('b.png', data))
+        decode.assert_not_called()
+        self.assertEqual(first, second)
+
+    def test_transparency_is_kept(self):
+        names = uploads.process_image_file(SimpleUploadedFile('a.png', image_bytes(mode='RGBA')))
+        self.assertEqual(self.open_variant(names['full']).mode, 'RGBA')
+
+    def test_store_incoming(self):
+        name, created = uploads.store_incoming(png_bytes())
+        self.assertTrue(name.startswith(uploads.INCOMING_DIR) and name.endswith('.png'))
+        self.assertTrue(created)
+        self.assertEqual(uploads.store_incoming(png_bytes()), (name, False))
+        with self.assertRaisesMessage(ValueError, 'Not a valid image'):
+            uploads.store_incoming(b'not an image')
+        with self.assertRaisesMessage(ValueError, 'Unsupported image format'):
+            uploads.store_incoming(image_bytes(fmt='BMP'))
+
+    def test_variant_urls(self):
+        item = self.stored_item('abc')
+        self.assertEqual(uploads.variant_urls(item), {v: default_storage.url(n) for v, n in item.image_variants.items()})
+        legacy = WardrobeItem(image='wardrobe/old.jpg', image_variants={})
+        self.assertEqual(uploads.variant_urls(legacy, RequestFactory().get('/')),
+                         {'full': 'http://testserver/media/wardrobe/old.jpg'})
+        self.assertEqual(uploads.variant_urls(WardrobeItem(image_variants={})), {})
+
+    def test_delete_media_keeps_files_other_items_use(self):
+        shared = self.stored_item('shared')
+        WardrobeItem.objects.create(owner=self.owner, name='Copy', category='Top',
+                                    image=shared.image.name, image_variants=shared.image_variants)
+        alone = self.stored_item('alone')
+        media = uploads.item_media(WardrobeItem.objects.filter(pk__in=[shared.pk, alone.pk]))
+        WardrobeItem.objects.filter(pk__in=[shared.pk, alone.pk]).delete()
+
+        self.assertEqual(uploads.delete_media(media), 2)
+        self.assertTrue(default_storage.exists(shared.image_variants['thumb']))
+        self.assertFalse(default_storage.exists(alone.image_variants['thumb']))
+
+    @override_settings(WARDROBE_IMAGE_ASYNC=False)
+    def test_synchronous_upload_returns_variant_urls(self):
+        upload = SimpleUploadedFile('shirt.png', image_bytes(), content_type='image/png')
+        response = self.client.post('/api/wardrobe/', {'name': 'Shirt', 'category': 'Top', 'image': upload})
+        self.assertEqual(response.status_code, 201, response.content)
+        data = response.json()
+        self.assertEqual(set(data['image_urls']), set(SIZES))
+        self.assertNotIn('image_hash', data)
+        item = WardrobeItem.objects.get(pk=data['id'])
+        self.assertEqual(item.image.name, item.image_variants['full'])
+
+    def test_invalid_upload_is_a_400(self):
+        upload = SimpleUploadedFile('shirt.png', b'garbage', content_type='image/png')
+        response = self.client.post('/api/wardrobe/', {'name': 'Shirt', 'category': 'Top', 'image': upload})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('image', response.json())
+
+
+@override_settings(MEDIA_MAX_AGE=60)
+class MediaServingTests(MediaTestCase):
+    def setUp(self):
+        super().setUp()
+        self.variant = default_storage.save('wardrobe/ab/cd/abcdef0123456789abcd_thumb.webp', ContentFile(b'0123456789'))
+        self.plain = default_storage.save('portfolio/photo.jpg', ContentFile(b'photo'))
+        self.fallthrough = mock.Mock(return_value='routed')
+        self.middleware = MediaFilesMiddleware(self.fallthrough)
+
+    def get(self, path, **headers):
+        return self.middleware(RequestFactory().get(path, **headers))
+
+    def test_variants_are_immutable(self):
+        response = self.get(f'/media/{self.variant}')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('immutable', response['Cache-Control'])
+        self.assertEqual(b''.join(response.streaming_content), b'0123456789')
+
+    def test_other_media_uses_max_age(self):
+        response = self.get(f'/media/{self.plain}')
+        self.assertEqual(response['Cache-Control'], 'max-age=60, public')
+
+    def test_range_and_conditional_requests(self):
+        response = self.get(f'/media/{self.variant}', HTTP_RANGE='bytes=2-4')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(b''.join(response.streaming_content), b'234')
+
+        etag = self.get(f'/media/{self.variant}')['ETag']
+        self.assertEqual(self.get(f'/media/{self.variant}', HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+    def test_missing_files_and_other_paths_fall_through(self):
+        self.assertEqual(self.get('/media/wardrobe/missing.webp'), 'routed')
+        self.assertEqual(self.get('/api/profiles/'), 'routed')
+
+    def test_file_deleted_after_first_lookup(self):
+        self.get(f'/media/{self.variant}')
+        default_storage.delete(self.variant)
+        self.assertEqual(self.get(f'/media/{self.variant}'), 'routed')
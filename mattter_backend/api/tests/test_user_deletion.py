@@ -0,0 +1,73 @@
+from django.core.cache import cache
+from django.test import override_settings
+from django.utils import timezone
+from rest_framework.test import APITestCase
+
+from api import jobs
+from api.models import Booking, Job, Message, Profile, Rating, User
+from api.user_deletion import get_progress, purge_user
+
+
+@override_settings(OUTBOX_DISPATCH_INLINE=False, JOBS_IN_PROCESS_WORKERS=0, USER_DELETION_ASYNC=True)
+class UserDeletionTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.admin = User.objects.create_user('deletion_admin', password='pw', is_staff=True)
+        self.seeker = User.objects.create_user('deletion_seeker', password='pw')
+        Profile.objects.create(user=self.seeker, role='SEEKER')
+        self.catalyst = User.objects.create_user('deletion_catalyst', password='pw')
+        self.kept = User.objects.create_user('kept_catalyst', password='pw')
+        for user in (self.catalyst, self.kept):
+            Profile.objects.create(user=user, role='CATALYST', latitude=51.5, longitude=-0.12,
+                                   bio='Colour analysis', specializations=['colour'])
+        booking = Booking.objects.create(seeker=self.seeker, catalyst=self.catalyst, scheduled_time=timezone.now())
+        Message.objects.create(booking=booking, sender=self.seeker, content='hi')
+        Rating.objects.create(booking=booking, seeker=self.seeker, catalyst=self.catalyst, rating=5)
+
+    def listed_usernames(self):
+        self.client.force_authenticate(None)
+        all_catalysts = {c['username'] for c in self.client.get('/api/profiles/all_catalysts/').data}
+        nearby = {c['username'] for c in self.client.get(
+            '/api/profiles/nearby_catalysts/', {'lat': 51.5, 'lon': -0.12}).data['catalysts']}
+        top = {c['username'] for c in self.client.get('/api/profiles/top_catalysts/').data['catalysts']}
+        self.client.force_authenticate(self.seeker)
+        search = {p['user']['username'] for p in self.client.get('/api/profiles/', {'search': 'Colour'}).data}
+        return all_catalysts, nearby, top, search
+
+    def delete(self, user):
+        self.client.force_authenticate(self.admin)
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.delete('/api/admin-data/delete_user/', QUERY_STRING=f'user_id={user.pk}')
+
+    def test_tombstoned_catalyst_disappears_from_listings_before_the_purge(self):
+        both = {'deletion_catalyst', 'kept_catalyst'}
+        self.assertEqual(self.listed_usernames(), (both, both, both, both))
+
+        response = self.delete(self.catalyst)
+        self.assertEqual(response.status_code, 202)
+        self.assertTrue(User.objects.filter(pk=self.catalyst.pk).exists())  # not purged yet
+        self.assertEqual(self.listed_usernames(), ({'kept_catalyst'},) * 4)
+
+    def test_purge_removes_everything_and_reports_progress(self):
+        self.delete(self.catalyst)
+        self.assertEqual(get_progress(self.catalyst.pk)['status'], 'queued')
+        job = Job.objects.get(name='users.purge')
+
+        jobs.execute(jobs.claim('test'), 'test')
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'SUCCEEDED')
+        self.assertFalse(User.objects.filter(pk=self.catalyst.pk).exists())
+        self.assertFalse(Booking.objects.exists())
+        self.assertFalse(Message.objects.exists())
+        self.assertFalse(Rating.objects.exists())
+        progress = get_progress(self.catalyst.pk)
+        self.assertEqual(progress['status'], 'done')
+        self.assertEqual(progress['deleted']['messages'], 1)
+
+    def test_purge_refuses_users_not_marked_for_deletion(self):
+        self.assertEqual(purge_user(self.kept.pk)['status'], 'failed')
+        self.assertTrue(User.objects.filter(pk=self.kept.pk).exists())
+
+    def test_delete_requires_user_id(self):
+        self.client.force_authenticate(self.admin)
+        self.assertEqual(self.client.delete('/api/admin-data/delete_user/').status_code, 400)
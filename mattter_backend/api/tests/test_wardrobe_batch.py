@@ -0,0 +1,115 @@
+import json
+from unittest import mock
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.test import override_settings
+
+from api import wardrobe_batch
+from api.models import Job, User, WardrobeItem
+
+from .media import MediaTestCase, png_bytes, zip_upload
+
+
+@override_settings(JOBS_IN_PROCESS_WORKERS=0, OUTBOX_DISPATCH_INLINE=False, WARDROBE_IMAGE_ASYNC=True)
+class BatchCreateTests(MediaTestCase):
+    url = '/api/wardrobe/batch/'
+
+    def post(self, items, images=None):
+        data = {'items': json.dumps(items)}
+        if images is not None:
+            data['images'] = zip_upload(images)
+        return self.client.post(self.url, data, format='multipart')
+
+    def test_creates_rows_and_queues_image_processing(self):
+        response = self.post([
+            {'name': 'Shirt', 'category': 'Top', 'image': 'shirt.png'},
+            {'name': 'Jeans', 'category': 'Bottom'},
+            {'name': 'Missing', 'category': 'Top', 'image': 'nope.png'},
+            {'category': 'Top'},
+            'not a row',
+        ], images={'photos/shirt.png': png_bytes()})
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual([r['status'] for r in response.data['results']],
+                         ['created', 'created', 'error', 'error', 'error'])
+        shirt = WardrobeItem.objects.get(pk=response.data['results'][0]['id'])
+        self.assertTrue(shirt.image.name.startswith('wardrobe/incoming/'))
+        self.assertTrue(Job.objects.filter(name='wardrobe.process_images', args=[[shirt.pk]]).exists())
+
+        with mock.patch('api.wardrobe_batch.enqueue_tagging'):
+            self.assertEqual(wardrobe_batch.process_pending_images([shirt.pk]), (1, 0))
+        shirt.refresh_from_db()
+        self.assertEqual(set(shirt.image_variants), {'full', 'medium', 'thumb'})
+        self.assertEqual(default_storage.listdir('wardrobe/incoming')[1], [])
+
+    def test_failed_transaction_deletes_stored_images(self):
+        with mock.patch.object(WardrobeItem.objects, 'bulk_create', side_effect=RuntimeError('db down')), \
+                self.assertRaises(RuntimeError):
+            self.post([{'name': 'Shirt', 'category': 'Top', 'image': 'shirt.png'}],
+                      images={'shirt.png': png_bytes()})
+        self.assertFalse(WardrobeItem.objects.exists())
+        self.assertEqual(default_storage.listdir('wardrobe/incoming')[1], [])
+
+    def test_archive_over_the_size_cap_is_rejected(self):
+        with override_settings(WARDROBE_BATCH_MAX_ARCHIVE_BYTES=100):
+            response = self.post([{'name': 'Shirt', 'category': 'Top', 'image': 'a.png'}],
+                                 images={'a.png': png_bytes(), 'b.bin': b'\0' * 200})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data, {'error': 'images archive is too large once uncompressed'})
+
+    def test_not_a_zip(self):
+        response = self.client.post(self.url, {'items': '[{"name": "a", "category": "Top"}]',
+                                               'images': ContentFile(b'plain', name='x.zip')}, format='multipart')
+        self.assertEqual(response.status_code, 400)
+
+
+@override_settings(JOBS_IN_PROCESS_WORKERS=0, OUTBOX_DISPATCH_INLINE=False)
+class BatchUpdateDeleteTests(MediaTestCase):
+    url = '/api/wardrobe/batch/'
+
+    def test_update_rejects_non_integer_ids_per_row(self):
+        item = self.stored_item('a' * 20)
+        response = self.client.patch(self.url, {'items': [
+            {'id': [item.pk], 'name': 'x'},
+            {'id': {'pk': item.pk}, 'name': 'x'},
+            {'id': item.pk, 'name': 'Renamed'},
+            {'id': item.pk, 'name': 'Twice'},
+            {'id': 999999, 'name': 'x'},
+        ]}, format='json')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([r.get('error') for r in response.data['results']],
+                         ['id must be an integer', 'id must be an integer', None, 'Duplicate id in batch', 'Item not found'])
+        item.refresh_from_db()
+        self.assertEqual(item.name, 'Renamed')
+
+    def test_delete_removes_rows_and_unshared_media(self):
+        other = User.objects.create_user('other_owner', password='pw')
+        doomed = self.stored_item('b' * 20)
+        shared = self.stored_item('c' * 20)
+        WardrobeItem.objects.create(owner=other, name='Copy', category='Top',
+                                    image=shared.image.name, image_variants=shared.image_variants)
+        foreign = self.stored_item('d' * 20, owner=other)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.delete(self.url, {'ids': [doomed.pk, shared.pk, [1], {'a': 1}, foreign.pk]},
+                                          format='json')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([r['status'] for r in response.data['results']],
+                         ['deleted', 'deleted', 'error', 'error', 'error'])
+        self.assertFalse(WardrobeItem.objects.filter(pk__in=[doomed.pk, shared.pk]).exists())
+        self.assertTrue(WardrobeItem.objects.filter(pk=foreign.pk).exists())
+        for name in doomed.image_variants.values():
+            self.assertFalse(default_storage.exists(name))
+        for name in list(shared.image_variants.values()) + list(foreign.image_variants.values()):
+            self.assertTrue(default_storage.exists(name))
+
+    def test_single_delete_removes_media(self):
+        item = self.stored_item('e' * 20)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.delete(f'/api/wardrobe/{item.pk}/')
+        self.assertEqual(response.status_code, 204)
+        for name in item.image_variants.values():
+            self.assertFalse(default_storage.exists(name))
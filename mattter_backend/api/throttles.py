@@ -0,0 +1,152 @@
+"""
+Throttles for CPU-heavy and write-heavy endpoints.
+
+DRF runs throttles in APIView.initial(), before the handler, so a rejected
+login attempt never reaches password hashing and a rejected message never
+reaches the database.
+
+ActionThrottle subclasses rate-limit one user's writes per scope with a
+token bucket (rate "N/period" from DEFAULT_THROTTLE_RATES: bursts of up to
+N, refilled at N per period) and count every attempt, allowed or not, in a
+sliding window. An account whose attempts reach its ABUSE_FLAG_THRESHOLDS
+entry is reported to the moderation queue (api.moderation.flag_user).
+Both live in one fixed-size packed record per user and scope, so a check
+is one cache get and one set; like DRF's own throttles, concurrent
+requests may race between the two.
+"""
+
+import hashlib
+import struct
+import time
+
+from django.conf import settings
+from django.core.cache import cache as default_cache
+from rest_framework.settings import api_settings
+from rest_framework.throttling import BaseThrottle, SimpleRateThrottle
+
+from . import moderation
+
+
+class LoginIPThrottle(SimpleRateThrottle):
+    """Limits login attempts per client IP (rate: DEFAULT_THROTTLE_RATES['login_ip'])."""
+    scope = 'login_ip'
+
+    def get_cache_key(self, request, view):
+        return self.cache_format % {
+            'scope': self.scope,
+            'ident': self.get_ident(request),
+        }
+
+
+class LoginUsernameThrottle(SimpleRateThrottle):
+    """
+    Limits login attempts per target username, so a distributed attack on one
+    account is slowed down even when it rotates IPs.
+    """
+    scope = 'login_user'
+
+    def get_cache_key(self, request, view):
+        username = request.data.get('username') if hasattr(request.data, 'get') else None
+        if not username:
+            return None
+        return self.cache_format % {
+            'scope': self.scope,
+            # Hashed so arbitrary user input is always a safe cache key
+            'ident': hashlib.sha256(str(username).strip().lower().encode()).hexdigest()[:32],
+        }
+
+
+# tokens, last refill (epoch seconds), attempt window index, previous and current window counts
+_RECORD = struct.Struct('<fdIII')
+
+
+def parse_rate(rate):
+    """'30/min' -> (30, 60); None -> None."""
+    if rate is None:
+        return None
+    num, period = rate.split('/')
+    return int(num), {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}[period[0]]
+
+
+class ActionThrottle(BaseThrottle):
+    """
+    Token bucket per authenticated user for the viewset actions in
+    `actions`, plus sliding-window abuse detection. Staff are exempt.
+    """
+    scope = None
+    actions = ('create',)
+    cache = default_cache
+    timer = time.time
+
+    def __init__(self):
+        self.rate = parse_rate(api_settings.DEFAULT_THROTTLE_RATES.get(self.scope))
+        self.flag_rate = parse_rate(getattr(settings, 'ABUSE_FLAG_THRESHOLDS', {}).get(self.scope))
+        self.wait_seconds = None
+
+    def get_cache_key(self, request, view):
+        if getattr(view, 'action', None) not in self.actions:
+            return None
+        user = request.user
+        if not user or not user.is_authenticated or user.is_staff:
+            return None
+        return f'throttle_{self.scope}_{user.pk}'
+
+    def allow_request(self, request, view):
+        if self.rate is None:
+            return True
+        key = self.get_cache_key(request, view)
+        if key is None:
+            return True
+
+        capacity, period = self.rate
+        flag_limit, flag_period = self.flag_rate or (0, period)
+        now = self.timer()
+        window = int(now // flag_period)
+        record = self.cache.get(key)
+        if record is None:
+            tokens, last, last_window, previous, current = capacity, now, window, 0, 0
+        else:
+            tokens, last, last_window, previous, current = _RECORD.unpack(record)
+
+        # Refill, then spend a token if there is one
+        tokens = min(capacity, tokens + (now - last) * capacity / period)
+        allowed = tokens >= 1
+        if allowed:
+            tokens -= 1
+        else:
+            self.wait_seconds = (1 - tokens) * period / capacity
+
+        # Attempts in the current and previous fixed windows, weighted into a sliding window
+        if window != last_window:
+            previous = current if window == last_window + 1 else 0
+            current = 0
+        current += 1
+        attempts = previous * (1 - (now % flag_period) / flag_period) + current
+
+        self.cache.set(key, _RECORD.pack(tokens, now, window, previous, current), max(period, 2 * flag_period))
+
+        if flag_limit and attempts >= flag_limit:
+            self.flag(request.user, attempts, flag_period)
+        return allowed
+
+    def flag(self, user, attempts, flag_period):
+        moderation.flag_user(
+            user.pk, self.scope,
+            f'{int(attempts)} {self.scope.replace("_", " ")} attempts in the last {flag_period // 60} minutes',
+            flag_period,
+        )
+
+    def wait(self):
+        return self.wait_seconds
+
+
+class MessageCreateThrottle(ActionThrottle):
+    scope = 'message_create'
+
+
+class BookingCreateThrottle(ActionThrottle):
+    scope = 'booking_create'
+
+
+class ReportCreateThrottle(ActionThrottle):
+    scope = 'report_create'
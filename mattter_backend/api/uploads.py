@@ -0,0 +1,168 @@
+"""
+Wardrobe image upload pipeline.
+
+An upload is read in chunks (hashing as it goes), decoded once, capped to
+a maximum size and re-encoded into full / medium / thumb variants. The
+variants are stored under content-hash filenames, so identical uploads
+share files and every URL can be cached forever. Because files are
+shared, deleting an item only deletes the files no other item uses
+(delete_media).
+"""
+
+import hashlib
+import io
+import logging
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps
+
+from .models import WardrobeItem
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SIZES = {'full': 2048, 'medium': 800, 'thumb': 256}
+UPLOAD_DIR = 'wardrobe'
+# Raw batch uploads wait here until they are processed in the background
+INCOMING_DIR = f'{UPLOAD_DIR}/incoming/'
+INCOMING_FORMATS = {'JPEG': 'jpg', 'PNG': 'png', 'WEBP': 'webp', 'GIF': 'gif', 'MPO': 'jpg'}
+
+# Matches names produced by variant_name(); used to mark media as immutable
+VARIANT_NAME_RE = r'/[0-9a-f]{20}_[a-z]+\.(webp|jpg|png)$'
+
+
+def _settings():
+    sizes = getattr(settings, 'WARDROBE_IMAGE_SIZES', DEFAULT_SIZES)
+    fmt = getattr(settings, 'WARDROBE_IMAGE_FORMAT', 'WEBP').upper()
+    quality = getattr(settings, 'WARDROBE_IMAGE_QUALITY', 80)
+    return sizes, fmt, quality
+
+
+def _extension(fmt):
+    return {'WEBP': 'webp', 'JPEG': 'jpg', 'PNG': 'png'}[fmt]
+
+
+def content_hash(upload):
+    """sha256 of an uploaded file, read in chunks so large files never sit in memory."""
+    digest = hashlib.sha256()
+    for chunk in upload.chunks():
+        digest.update(chunk)
+    upload.seek(0)
+    return digest.hexdigest()[:20]
+
+
+def variant_name(digest, variant, fmt):
+    # Two-level fan-out keeps directories small
+    return f'{UPLOAD_DIR}/{digest[:2]}/{digest[2:4]}/{digest}_{variant}.{_extension(fmt)}'
+
+
+def _open(upload, max_size):
+    source = upload.temporary_file_path() if hasattr(upload, 'temporary_file_path') else upload
+    img = Image.open(source)
+    img.draft('RGB', (max_size, max_size))  # JPEG: decode at reduced scale directly
+    img = ImageOps.exif_transpose(img)
+    has_alpha = img.mode in ('RGBA', 'LA') or (img.mode == 'P' and 'transparency' in img.info)
+    return img.convert('RGBA' if has_alpha else 'RGB')
+
+
+def _encode(img, fmt, quality):
+    buffer = io.BytesIO()
+    if fmt == 'WEBP':
+        img.save(buffer, 'WEBP', quality=quality, method=4)
+    elif fmt == 'JPEG':
+        img.convert('RGB').save(buffer, 'JPEG', quality=quality, optimize=True, progressive=True)
+    else:
+        img.save(buffer, 'PNG', optimize=True)
+    return buffer.getvalue()
+
+
+def process_image_file(upload):
+    """
+    Store resized variants for an uploaded image. Returns a dict of
+    variant -> storage name. Re-uploading the same bytes reuses the
+    existing files.
+    """
+    sizes, fmt, quality = _settings()
+    digest = content_hash(upload)
+    names = {variant: variant_name(digest, variant, fmt) for variant in sizes}
+
+    missing = [variant for variant, name in names.items() if not default_storage.exists(name)]
+    if not missing:
+        return names
+
+    # Largest first: each smaller variant is resized from the previous one
+    img = _open(upload, max(sizes.values()))
+    for variant in sorted(sizes, key=sizes.get, reverse=True):
+        size = sizes[variant]
+        if img.width > size or img.height > size:
+            img = img.copy()
+            img.thumbnail((size, size), Image.Resampling.LANCZOS)
+        if variant in missing:
+            names[variant] = default_storage.save(names[variant], ContentFile(_encode(img, fmt, quality)))
+
+    return names
+
+
+def store_incoming(data):
+    """
+    Store raw image bytes for background processing. Returns the storage
+    name and whether this call created the file (identical bytes share one
+    file). Only the header is parsed here; raises ValueError if the bytes
+    aren't a supported image.
+    """
+    try:
+        with Image.open(io.BytesIO(data)) as img:
+            extension = INCOMING_FORMATS.get(img.format)
+    except (OSError, Image.DecompressionBombError):
+        raise ValueError('Not a valid image')
+    if extension is None:
+        raise ValueError('Unsupported image format')
+
+    digest = hashlib.sha256(data).hexdigest()[:20]
+    name = f'{INCOMING_DIR}{digest}.{extension}'
+    if default_storage.exists(name):
+        return name, False
+    return default_storage.save(name, ContentFile(data)), True
+
+
+def process_stored_image(name):
+    """process_image_file() for a file already in storage (e.g. from store_incoming)."""
+    with default_storage.open(name, 'rb') as f:
+        return process_image_file(f)
+
+
+def variant_urls(item, request=None):
+    """Absolute URLs for an item's image variants (legacy items only have 'full')."""
+    names = item.image_variants or ({'full': item.image.name} if item.image else {})
+    urls = {}
+    for variant, name in names.items():
+        url = default_storage.url(name)
+        urls[variant] = request.build_absolute_uri(url) if request is not None else url
+    return urls
+
+
+def item_media(queryset):
+    """(image, variants) of the items in `queryset` that have an image, for delete_media()."""
+    rows = queryset.filter(image__isnull=False).exclude(image='')
+    return [(image, variants or {}) for image, variants in rows.values_list('image', 'image_variants')]
+
+
+def delete_media(names):
+    """
+    Delete the files of deleted items (item_media() pairs) that no
+    remaining item points at. Returns the number of files deleted.
+    """
+    full_names = {variants.get('full', image) for image, variants in names}
+    still_used = set(WardrobeItem.objects.filter(image__in=full_names).values_list('image', flat=True))
+    deleted = 0
+    for image, variants in names:
+        if variants.get('full', image) in still_used:
+            continue
+        for name in set(variants.values()) | {image}:
+            try:
+                default_storage.delete(name)
+                deleted += 1
+            except Exception:
+                logger.exception('Could not delete media file %s', name)
+    return deleted
@@ -1,8 +1,9 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from rest_framework.authtoken.views import obtain_auth_token
-from .views import ProfileViewSet, WardrobeItemViewSet, ServiceViewSet, BookingViewSet, MessageViewSet, RatingViewSet, AdminDataViewSet, ReportViewSet
+from .views import ProfileViewSet, WardrobeItemViewSet, ServiceViewSet, BookingViewSet, MessageViewSet, RatingViewSet, AdminDataViewSet, ReportViewSet, EventViewSet
 from .auth_views import RegisterView, CustomAuthToken
+from .batch import BatchView
 
 router = DefaultRouter()
 router.register(r'profiles', ProfileViewSet, basename='profile')
@@ -13,9 +14,11 @@ router.register(r'messages', MessageViewSet, basename='message')
 router.register(r'ratings', RatingViewSet, basename='rating')
 router.register(r'admin-data', AdminDataViewSet, basename='admin-data')
 router.register(r'reports', ReportViewSet, basename='report')
+router.register(r'events', EventViewSet, basename='event')
 
 urlpatterns = [
     path('', include(router.urls)),
     path('login/', CustomAuthToken.as_view(), name='api_token_auth'),
     path('register/', RegisterView.as_view(), name='register'),
+    path('batch/', BatchView.as_view(), name='batch'),
 ]
@@ -0,0 +1,212 @@
+"""
+Background deletion of user accounts.
+
+tombstone_user() runs in the request. It stamps User.deleted_at, deactivates
+the user and their profile and revokes their tokens, so the account
+disappears at once. purge_user() then removes everything that references
+the user in bounded chunks, each in its own short transaction. A chunk
+selects the next ids in primary key order and deletes them with a raw
+DELETE, so Django's collector never loads a whole cascade into memory.
+Raw deletes skip signals, so caches are invalidated explicitly and the
+affected catalysts' rating aggregates are recomputed once at the end.
+
+Progress is kept in the cache under user_deletion_<id> (see get_progress).
+Purges run as 'users.purge' jobs (api.jobs). A purge that dies part way
+is retried by the job queue, or resumed by `manage.py purge_users`: every
+step only deletes what is still there.
+"""
+
+import logging
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+
+from . import conditional, dashboard, jobs, ratings, similarity
+from .cached_auth import token_cache_key
+from .models import Booking, Event, IdempotencyKey, Message, Profile, Rating, Report, Service, User, WardrobeItem
+from .uploads import delete_media, item_media
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CHUNK_SIZE = 500
+PROGRESS_TIMEOUT = 60 * 60 * 24
+ADMIN_STATS_KEY = 'admin_dashboard_stats'
+
+
+def _progress_key(user_id):
+    return f'user_deletion_{user_id}'
+
+
+def get_progress(user_id):
+    """
+    Deletion progress for a user: the cached record while a purge is queued,
+    running or recently finished, else derived from the database.
+    """
+    progress = cache.get(_progress_key(user_id))
+    if progress is not None:
+        return progress
+    deleted_at = User.objects.filter(pk=user_id).values_list('deleted_at', flat=True).first()
+    if deleted_at is None:
+        exists = User.objects.filter(pk=user_id).exists()
+        return None if exists else {'user_id': int(user_id), 'status': 'done', 'deleted': {}}
+    return {'user_id': int(user_id), 'status': 'queued', 'deleted': {}, 'tombstoned_at': deleted_at}
+
+
+def _save_progress(progress):
+    cache.set(_progress_key(progress['user_id']), progress, PROGRESS_TIMEOUT)
+
+
+def _revoke_tokens(user_ids):
+    keys = list(Token.objects.filter(user_id__in=user_ids).values_list('key', flat=True))
+    Token.objects.filter(key__in=keys).delete()
+    cache.delete_many([token_cache_key(key) for key in keys] + [f'profile_me_{user_id}' for user_id in user_ids])
+
+
+def tombstone_user(user):
+    """Hide a user immediately and queue the purge. Safe to call twice."""
+    now = timezone.now()
+    with transaction.atomic():
+        User.objects.filter(pk=user.pk, deleted_at__isnull=True).update(deleted_at=now, is_active=False)
+        profile = Profile.objects.filter(user_id=user.pk).first()
+        if profile is not None and profile.is_active:
+            profile.is_active = False
+            profile.save()  # signals refresh the profile ETag and catalyst map versions
+        _revoke_tokens([user.pk])
+        progress = {'user_id': user.pk, 'status': 'queued', 'deleted': {},
+                    'tombstoned_at': user.deleted_at or now}
+        _save_progress(progress)
+        enqueue_user_deletion(user.pk)
+    if profile is not None and profile.role == 'CATALYST':
+        ratings.invalidate_ranking()
+    cache.delete(ADMIN_STATS_KEY)
+    return progress
+
+
+def _delete_chunks(queryset, label, progress, chunk_size, before_delete=None):
+    """
+    Delete the rows of `queryset` in pk order, `chunk_size` at a time.
+    `before_delete(ids)` runs in the chunk's transaction first, e.g. to
+    remove rows that reference the chunk.
+    """
+    model = queryset.model
+    last_pk = 0
+    while True:
+        ids = list(queryset.filter(pk__gt=last_pk).order_by('pk').values_list('pk', flat=True)[:chunk_size])
+        if not ids:
+            return
+        with transaction.atomic():
+            if before_delete is not None:
+                before_delete(ids)
+            deleted = model.objects.filter(pk__in=ids)._raw_delete(model.objects.db)
+        progress['deleted'][label] = progress['deleted'].get(label, 0) + deleted
+        _save_progress(progress)
+        last_pk = ids[-1]
+
+
+def purge_user(user_id, chunk_size=None):
+    """Delete a tombstoned user and everything that references them. Returns the progress record."""
+    chunk_size = chunk_size or getattr(settings, 'USER_DELETION_CHUNK_SIZE', DEFAULT_CHUNK_SIZE)
+    progress = cache.get(_progress_key(user_id)) or {'user_id': user_id, 'deleted': {}}
+    progress.update(status='running', started_at=timezone.now(), error=None)
+    _save_progress(progress)
+
+    if not User.objects.filter(pk=user_id, deleted_at__isnull=False).exists():
+        if User.objects.filter(pk=user_id).exists():
+            progress.update(status='failed', error='User is not marked for deletion')
+        else:
+            progress['status'] = 'done'
+        _save_progress(progress)
+        return progress
+
+    rated_catalysts = set()
+    booked_catalysts = set()
+
+    def collect_rated(rating_filter):
+        rated_catalysts.update(Rating.objects.filter(rating_filter).values_list('catalyst_id', flat=True))
+
+    def before_ratings(ids):
+        collect_rated(Q(pk__in=ids))
+
+    def before_bookings(ids):
+        # Rows created against these bookings since their own steps ran
+        Message.objects.filter(booking_id__in=ids)._raw_delete(Message.objects.db)
+        booked_catalysts.update(Booking.objects.filter(pk__in=ids).values_list('catalyst_id', flat=True))
+        collect_rated(Q(booking_id__in=ids))
+        Rating.objects.filter(booking_id__in=ids)._raw_delete(Rating.objects.db)
+
+    def before_services(ids):
+        Booking.objects.filter(service_id__in=ids).update(service=None)
+
+    media = []
+
+    def before_wardrobe(ids):
+        media.extend(item_media(WardrobeItem.objects.filter(pk__in=ids)))
+
+    steps = [
+        ('messages', Message.objects.filter(Q(booking__seeker_id=user_id) | Q(booking__catalyst_id=user_id) | Q(sender_id=user_id)), None),
+        ('ratings', Rating.objects.filter(Q(seeker_id=user_id) | Q(catalyst_id=user_id)), before_ratings),
+        ('bookings', Booking.objects.filter(Q(seeker_id=user_id) | Q(catalyst_id=user_id)), before_bookings),
+        ('services', Service.objects.filter(catalyst_id=user_id), before_services),
+        ('wardrobe_items', WardrobeItem.objects.filter(owner_id=user_id), before_wardrobe),
+        ('reports', Report.objects.filter(Q(reporter_id=user_id) | Q(reported_user_id=user_id)), None),
+        ('events', Event.objects.filter(user_id=user_id), None),
+        ('idempotency_keys', IdempotencyKey.objects.filter(user_id=user_id), None),
+    ]
+    try:
+        for label, queryset, before_delete in steps:
+            progress['step'] = label
+            _delete_chunks(queryset, label, progress, chunk_size, before_delete)
+            if label == 'wardrobe_items' and media:
+                progress['deleted']['media_files'] = progress['deleted'].get('media_files', 0) + delete_media(media)
+                media.clear()
+
+        progress['step'] = 'account'
+        profile = Profile.objects.filter(user_id=user_id).first()
+        with transaction.atomic():
+            _revoke_tokens([user_id])
+            # Everything heavy is gone, so the collector only finds the profile and auth rows
+            User.objects.filter(pk=user_id).delete()
+        if profile is not None:
+            conditional.forget_profile_version(profile)
+        progress['deleted']['users'] = 1
+
+        rated_catalysts.discard(user_id)
+        if rated_catalysts:
+            ratings.recompute_catalyst_ratings(sorted(rated_catalysts))
+        dashboard.invalidate(booked_catalysts | rated_catalysts)
+        conditional.invalidate_wardrobe_versions([user_id])
+        conditional.invalidate_catalyst_map_version()
+        similarity.drop_index(user_id)
+        ratings.invalidate_ranking()
+        cache.delete(ADMIN_STATS_KEY)
+    except Exception as e:
+        logger.exception('Deleting user %s failed at step %s', user_id, progress.get('step'))
+        progress.update(status='failed', error=str(e))
+        _save_progress(progress)
+        raise
+
+    progress.update(status='done', step=None, finished_at=timezone.now(), recomputed_catalysts=len(rated_catalysts))
+    _save_progress(progress)
+    return progress
+
+
+@jobs.task('users.purge')
+def purge_users(user_ids, chunk_size=None):
+    """purge_user() for each id. A failure fails the job, which is retried and resumes where it stopped."""
+    for user_id in user_ids:
+        started = time.perf_counter()
+        progress = purge_user(user_id, chunk_size)
+        logger.info('Deleted user %s in %.2fs: %s', user_id, time.perf_counter() - started, progress['deleted'])
+
+
+def enqueue_user_deletion(*user_ids):
+    """Queue tombstoned users for purging once the current transaction commits."""
+    if getattr(settings, 'USER_DELETION_ASYNC', True):
+        jobs.enqueue('users.purge', list(user_ids))
+    else:
+        transaction.on_commit(lambda: purge_users(user_ids))
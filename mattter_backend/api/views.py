@@ -1,26 +1,51 @@
 from rest_framework import viewsets, permissions, filters
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
 from rest_framework import status
 # from django.contrib.gis.geos import Point
 # from django.contrib.gis.db.models.functions import Distance
+from datetime import datetime, timezone as dt_timezone
+from django.conf import settings
+from django.db import IntegrityError, transaction
 from django.utils import timezone
+from django.utils.decorators import method_decorator
+from django.views.decorators.http import condition
+from . import conditional, dashboard, events, feed, fieldsets, moderation, presence, ratings, similarity
+from .idempotency import IdempotentCreateMixin
 from .models import User, Profile, WardrobeItem, Service, Booking, Message, Rating, Report
+from .cached_auth import get_user_role
+from .pagination import (
+    InboxCursorPagination, ModerationCursorPagination, ModerationGroupPagination, ReviewCursorPagination,
+)
+from .renderers import FAST_RENDERER_CLASSES
+from .outfits import last_page, outfit_page
+from .tagging import enqueue_tagging
+from .uploads import INCOMING_DIR, delete_media, item_media
+from .wardrobe_batch import enqueue_image_processing
+from .throttles import BookingCreateThrottle, MessageCreateThrottle, ReportCreateThrottle
 from .serializers import (
     UserSerializer, ProfileSerializer, WardrobeItemSerializer, 
     ServiceSerializer, BookingSerializer, MessageSerializer, RatingSerializer,
     ReportSerializer
 )
 
-class ProfileViewSet(viewsets.ModelViewSet):
+class ProfileViewSet(fieldsets.SparseFieldsetViewMixin, viewsets.ModelViewSet):
     queryset = Profile.objects.all()
     serializer_class = ProfileSerializer
     permission_classes = [permissions.IsAuthenticated]
     filter_backends = [filters.SearchFilter]
     search_fields = ['specializations', 'bio']
+    # Added by `me` on top of the serializer's fields
+    sparse_extra_fields = ('is_staff', 'is_superuser')
+
+    def get_sparse_extra_fields(self):
+        return self.sparse_extra_fields if self.action == 'me' else ()
 
     def get_queryset(self):
         queryset = super().get_queryset()
+        if self.action == 'list':
+            queryset = queryset.listed()
         
         # Location-based filtering using Haversine formula
         lat = self.request.query_params.get('lat')
@@ -65,24 +90,27 @@ class ProfileViewSet(viewsets.ModelViewSet):
         if role:
             queryset = queryset.filter(role=role)
             
-        return queryset
+        return self.sparse_queryset(queryset)
 
     def retrieve(self, request, *args, **kwargs):
         """Override retrieve to optimize single profile fetches"""
-        profile = Profile.objects.select_related('user').get(pk=kwargs['pk'])
+        profile = self.sparse_queryset(Profile.objects.select_related('user')).get(pk=kwargs['pk'])
         serializer = self.get_serializer(profile)
         return Response(serializer.data)
 
     @action(detail=True, methods=['GET'], permission_classes=[permissions.AllowAny], url_path='catalyst_view')
+    @method_decorator(condition(etag_func=conditional.profile_etag, last_modified_func=conditional.profile_last_modified))
     def catalyst_view(self, request, pk=None):
         """Ultra-optimized endpoint for viewing catalyst profiles - bypasses slow serializers"""
         try:
             profile = Profile.objects.select_related('user').only(
                 'id', 'role', 'gender', 'age', 'bio', 'bio_short', 'address',
                 'latitude', 'longitude', 'hourly_rate', 'specializations',
-                'average_rating', 'rating_count', 'portfolio_images',
+                'portfolio_images', *ratings.SUMMARY_FIELDS,
                 'user__id', 'user__username', 'user__email', 'user__first_name', 'user__last_name'
             ).get(pk=pk)
+            # Latest few reviews in one join; the rest come from the reviews feed
+            latest_reviews = ratings.reviews_queryset(profile.user.id)[:settings.CATALYST_VIEW_REVIEWS]
             
             # Manual dict construction - super fast
             data = {
@@ -108,13 +136,42 @@ class ProfileViewSet(viewsets.ModelViewSet):
                 'rating_count': profile.rating_count,
                 'portfolio_images': profile.portfolio_images or [],  # Include images directly
                 'is_active': profile.is_active,
+                'rating_summary': ratings.rating_summary(profile),
+                'reviews': [ratings.review_dict(row) for row in latest_reviews],
+                'reviews_url': request.build_absolute_uri(f'/api/profiles/{profile.id}/reviews/'),
             }
             
             return Response(data)
         except Profile.DoesNotExist:
             return Response({'error': 'Profile not found'}, status=status.HTTP_404_NOT_FOUND)
 
+    @action(detail=True, methods=['GET'], permission_classes=[permissions.AllowAny], renderer_classes=FAST_RENDERER_CLASSES)
+    @method_decorator(condition(etag_func=conditional.reviews_etag, last_modified_func=conditional.profile_last_modified))
+    def reviews(self, request, pk=None):
+        """
+        Public review feed for a catalyst, newest first, with cursor pagination.
+        Query params: cursor, page_size (default 10, max 50),
+        summary=true to include count / average / histogram
+        """
+        try:
+            profile = Profile.objects.only('id', 'user_id', *ratings.SUMMARY_FIELDS).get(pk=pk)
+        except (Profile.DoesNotExist, ValueError):
+            return Response({'error': 'Profile not found'}, status=status.HTTP_404_NOT_FOUND)
+
+        paginator = ReviewCursorPagination()
+        page = paginator.paginate_queryset(ratings.reviews_queryset(profile.user_id), request, view=self)
+        data = {}
+        if request.query_params.get('summary') in ('1', 'true', 'True'):
+            data['summary'] = ratings.rating_summary(profile)
+        data.update({
+            'next': paginator.get_next_link(),
+            'previous': paginator.get_previous_link(),
+            'results': [ratings.review_dict(row) for row in page],
+        })
+        return Response(data)
+
     @action(detail=True, methods=['GET'], permission_classes=[permissions.AllowAny])
+    @method_decorator(condition(etag_func=conditional.profile_etag, last_modified_func=conditional.profile_last_modified))
     def portfolio_images(self, request, pk=None):
         """Separate endpoint for lazy-loading portfolio images"""
         try:
@@ -124,6 +181,7 @@ class ProfileViewSet(viewsets.ModelViewSet):
             return Response({'portfolio_images': []}, status=status.HTTP_404_NOT_FOUND)
 
     @action(detail=False, methods=['GET', 'PATCH'])
+    @method_decorator(condition(etag_func=conditional.me_etag, last_modified_func=conditional.me_last_modified))
     def me(self, request):
         if request.user.is_authenticated:
             from django.core.cache import cache
@@ -136,7 +194,7 @@ class ProfileViewSet(viewsets.ModelViewSet):
                     # Add dynamic staff fields
                     cached_data['is_staff'] = request.user.is_staff
                     cached_data['is_superuser'] = request.user.is_superuser
-                    return Response(cached_data)
+                    return Response(fieldsets.prune_data(cached_data, self.get_sparse_fields()))
             
             # Fetch profile with optimized query
             profile, created = Profile.objects.select_related('user').get_or_create(user=request.user)
@@ -150,26 +208,82 @@ class ProfileViewSet(viewsets.ModelViewSet):
                     data['is_superuser'] = request.user.is_superuser
                     # Invalidate cache after update
                     cache.delete(cache_key)
-                    return Response(data)
+                    return Response(fieldsets.prune_data(data, self.get_sparse_fields()))
                 return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
             else:
-                serializer = self.get_serializer(profile)
+                # Cache the full shape; ?fields= is applied to the response
+                serializer = ProfileSerializer(profile, context=self.get_serializer_context() | {'fields': None})
                 data = serializer.data
                 data['is_staff'] = request.user.is_staff
                 data['is_superuser'] = request.user.is_superuser
                 # Cache the profile data for 5 minutes
                 cache.set(cache_key, data, 300)
-                return Response(data)
+                return Response(fieldsets.prune_data(data, self.get_sparse_fields()))
         return Response({"detail": "Not authenticated"}, status=401)
 
-    @action(detail=False, methods=['GET'], permission_classes=[permissions.AllowAny])
+    @action(detail=False, methods=['GET'], renderer_classes=FAST_RENDERER_CLASSES)
+    def dashboard_summary(self, request):
+        """
+        Catalyst dashboard header in one call: booking counts, unread
+        messages, rating histogram, latest reviews and profile completeness.
+        Cached per catalyst and refreshed when any of them changes.
+        """
+        if get_user_role(request.user) != 'CATALYST':
+            return Response({"error": "Only catalysts have a dashboard summary"}, status=status.HTTP_403_FORBIDDEN)
+        try:
+            return Response(dashboard.catalyst_summary(request.user.pk))
+        except Profile.DoesNotExist:
+            return Response({"error": "Profile not found"}, status=status.HTTP_404_NOT_FOUND)
+
+    @action(detail=False, methods=['GET'], renderer_classes=FAST_RENDERER_CLASSES)
+    def seeker_feed(self, request):
+        """
+        Seeker home page in one call: pending requests, matched catalysts and
+        nearby catalysts, built concurrently.
+        Query params: sections (default pending,matched,nearby), lat, lon,
+        radius (meters, default 10000; lat / lon default to the seeker's
+        profile location), since=<section>:<version>,... to skip sections
+        the client already has.
+        """
+        params = request.query_params
+        sections = [name.strip() for name in params.get('sections', ','.join(feed.SECTIONS)).split(',') if name.strip()]
+        unknown = [name for name in sections if name not in feed.SECTIONS]
+        if unknown:
+            return Response(
+                {"error": f"Unknown section(s): {', '.join(unknown)}. Choose from {', '.join(feed.SECTIONS)}"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        try:
+            lat = float(params['lat']) if params.get('lat') else None
+            lon = float(params['lon']) if params.get('lon') else None
+            radius = float(params.get('radius', feed.DEFAULT_RADIUS))
+        except ValueError:
+            return Response({"error": "Invalid numeric parameter"}, status=status.HTTP_400_BAD_REQUEST)
+        if (lat is None) != (lon is None):
+            return Response(
+                {"error": "Latitude and longitude must be given together"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if lat is None and 'nearby' in sections:
+            lat, lon = Profile.objects.filter(user=request.user).values_list('latitude', 'longitude').first() or (None, None)
+
+        sections_data = feed.build_feed(
+            request.user.pk, sections=sections, since=feed.parse_since(params.get('since')),
+            lat=lat, lon=lon, radius=radius,
+        )
+        return Response({'success': True, 'sections': sections_data})
+
+    @action(detail=False, methods=['GET'], permission_classes=[permissions.AllowAny], renderer_classes=FAST_RENDERER_CLASSES)
+    @method_decorator(condition(etag_func=conditional.catalyst_map_etag, last_modified_func=conditional.catalyst_map_last_modified))
     def all_catalysts(self, request):
         """
         Get all catalysts with location data for map display.
-        Returns SAME structure as nearby_catalysts for consistency.
+        Returns SAME structure as nearby_catalysts for consistency, except
+        for `online`: this response is cached by ETag, so map clients look
+        presence up separately with the user ids (see presence).
         """
         try:
-            catalysts = Profile.objects.filter(
+            catalysts = Profile.objects.listed().filter(
                 role='CATALYST',
                 latitude__isnull=False,
                 longitude__isnull=False
@@ -198,7 +312,40 @@ class ProfileViewSet(viewsets.ModelViewSet):
         except Exception as e:
             return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
-    @action(detail=False, methods=['GET'], permission_classes=[permissions.AllowAny])
+    @action(detail=False, methods=['GET'], permission_classes=[permissions.AllowAny], renderer_classes=FAST_RENDERER_CLASSES)
+    def top_catalysts(self, request):
+        """
+        Catalysts ranked by Bayesian-adjusted rating, from a periodically refreshed cache.
+        Query params: limit (default 20, max 100), specialization, min_ratings,
+        lat + lon + radius (meters, default 10000) to restrict to a region
+        """
+        params = request.query_params
+        try:
+            limit = min(max(int(params.get('limit', 20)), 1), 100)
+            min_ratings = max(int(params.get('min_ratings', 0)), 0)
+            lat = float(params['lat']) if params.get('lat') else None
+            lon = float(params['lon']) if params.get('lon') else None
+            radius = float(params.get('radius', 10000))
+        except ValueError:
+            return Response({"error": "Invalid numeric parameter"}, status=status.HTTP_400_BAD_REQUEST)
+        if (lat is None) != (lon is None):
+            return Response(
+                {"error": "Latitude and longitude must be given together"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        catalysts, built_at = ratings.top_catalysts(
+            limit=limit, specialization=params.get('specialization'),
+            lat=lat, lon=lon, radius=radius, min_ratings=min_ratings,
+        )
+        return Response({
+            'success': True,
+            'count': len(catalysts),
+            'ranked_at': datetime.fromtimestamp(built_at, tz=dt_timezone.utc),
+            'catalysts': catalysts
+        })
+
+    @action(detail=False, methods=['GET'], permission_classes=[permissions.AllowAny], renderer_classes=FAST_RENDERER_CLASSES)
     def nearby_catalysts(self, request):
         """
         Get nearby catalysts based on user location.
@@ -214,59 +361,11 @@ class ProfileViewSet(viewsets.ModelViewSet):
             )
         
         try:
-            from math import radians, sin, cos, sqrt, atan2
-            
             user_lat = float(lat)
             user_lon = float(lon)
             radius = float(request.query_params.get('radius', 10000))  # Default 10km
-            
-            # Optimized query: select_related for user, only fetch needed fields
-            catalysts = Profile.objects.filter(
-                role='CATALYST',
-                latitude__isnull=False,
-                longitude__isnull=False
-            ).select_related('user').only(
-                'id', 'latitude', 'longitude', 'bio_short', 'specializations',
-                'hourly_rate', 'average_rating', 'rating_count',
-                'user__id', 'user__username', 'user__first_name', 'user__last_name'
-            )
-            
-            # Calculate distance for each catalyst and filter by radius
-            nearby_catalysts = []
-            R = 6371000  # Earth's radius in meters
-            lat1 = radians(user_lat)
-            lon1 = radians(user_lon)
-            
-            for catalyst in catalysts:
-                # Haversine formula
-                lat2 = radians(catalyst.latitude)
-                lon2 = radians(catalyst.longitude)
-                
-                dlat = lat2 - lat1
-                dlon = lon2 - lon1
-                
-                a = sin(dlat/2)**2 + cos(lat1) * cos(lat2) * sin(dlon/2)**2
-                c = 2 * atan2(sqrt(a), sqrt(1-a))
-                distance = R * c
-                
-                if distance <= radius:
-                    nearby_catalysts.append({
-                        'id': catalyst.id,
-                        'name': catalyst.user.get_full_name() or catalyst.user.username,
-                        'username': catalyst.user.username,
-                        'bio': catalyst.bio_short or '',  # Use short bio only
-                        'latitude': catalyst.latitude,
-                        'longitude': catalyst.longitude,
-                        'specializations': catalyst.specializations[:3] if catalyst.specializations else [],  # Limit to 3
-                        'hourly_rate': str(catalyst.hourly_rate) if catalyst.hourly_rate else None,
-                        'distance': round(distance),
-                        'average_rating': float(catalyst.average_rating),
-                        'rating_count': catalyst.rating_count,
-                    })
-            
-            # Sort by distance
-            nearby_catalysts.sort(key=lambda x: x['distance'])
-            
+
+            nearby_catalysts = feed.nearby_catalysts(user_lat, user_lon, radius)
             return Response({
                 'success': True,
                 'count': len(nearby_catalysts),
@@ -284,6 +383,37 @@ class ProfileViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
 
+    @action(detail=False, methods=['GET', 'POST'], permission_classes=[permissions.IsAuthenticated], renderer_classes=FAST_RENDERER_CLASSES)
+    def presence(self, request):
+        """
+        Which of the given users are online (connected to the WebSocket).
+        GET ?ids=1,2,3 or POST {"ids": [1, 2, 3]} for long lists, up to
+        PRESENCE_LOOKUP_MAX user ids. Answered from the cache only.
+        """
+        raw = request.data.get('ids') if request.method == 'POST' else request.query_params.get('ids', '')
+        if isinstance(raw, str):
+            raw = [part for part in raw.split(',') if part.strip()]
+        if not isinstance(raw, list):
+            return Response({"error": "ids must be a list of user ids"}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            user_ids = list(dict.fromkeys(int(user_id) for user_id in raw))
+        except (TypeError, ValueError):
+            return Response({"error": "ids must be a list of user ids"}, status=status.HTTP_400_BAD_REQUEST)
+        if len(user_ids) > presence.lookup_max():
+            return Response(
+                {"error": f"At most {presence.lookup_max()} ids per request"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        seen = presence.last_seen(user_ids)
+        return Response({
+            'success': True,
+            'online': [user_id for user_id in user_ids if user_id in seen],
+            'last_seen': {
+                user_id: datetime.fromtimestamp(timestamp, tz=dt_timezone.utc) for user_id, timestamp in seen.items()
+            },
+        })
+
     @action(detail=False, methods=['GET'], permission_classes=[permissions.IsAuthenticated])
     def get_preferences(self, request):
         """
@@ -419,8 +549,145 @@ class WardrobeItemViewSet(viewsets.ModelViewSet):
     def get_queryset(self):
         return WardrobeItem.objects.filter(owner=self.request.user)
 
+    def _queue_image_work(self, item):
+        # Raw uploads are resized first; processing queues the tagging itself
+        if item.image.name.startswith(INCOMING_DIR):
+            enqueue_image_processing(item.id)
+        else:
+            enqueue_tagging(item.id)
+
     def perform_create(self, serializer):
-        serializer.save(owner=self.request.user)
+        item = serializer.save(owner=self.request.user)
+        if item.image:
+            self._queue_image_work(item)
+
+    def perform_update(self, serializer):
+        image_changed = 'image' in serializer.validated_data
+        if image_changed:
+            item = serializer.save(ai_tags={}, image_hash=None, image_embedding=None)
+        else:
+            item = serializer.save()
+        if image_changed and item.image:
+            self._queue_image_work(item)
+
+    def perform_destroy(self, instance):
+        media = item_media(WardrobeItem.objects.filter(pk=instance.pk))
+        instance.delete()
+        transaction.on_commit(lambda: delete_media(media))
+
+    @action(detail=False, methods=['POST', 'PATCH', 'DELETE'], url_path='batch')
+    def batch(self, request):
+        """
+        Create (POST), update (PATCH) or delete (DELETE) many items at once.
+        POST/PATCH body: {"items": [...]} as JSON, or multipart with `items`
+        (a JSON string) and an optional `images` zip; a row's `image` names
+        a file in the zip. PATCH rows need `id`. DELETE body: {"ids": [...]}.
+        Images are processed in the background; results are per row.
+        """
+        import json
+        from .wardrobe_batch import ZipImages, batch_create, batch_update, batch_delete
+
+        key = 'ids' if request.method == 'DELETE' else 'items'
+        rows = request.data if isinstance(request.data, list) else request.data.get(key)
+        if isinstance(rows, str):
+            try:
+                rows = json.loads(rows)
+            except ValueError:
+                rows = None
+        if not isinstance(rows, list) or not rows:
+            return Response({"error": f"Provide a non-empty list of {key}"}, status=status.HTTP_400_BAD_REQUEST)
+        if len(rows) > settings.WARDROBE_BATCH_MAX_ITEMS:
+            return Response(
+                {"error": f"At most {settings.WARDROBE_BATCH_MAX_ITEMS} {key} per request"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        if request.method == 'DELETE':
+            results = batch_delete(request.user, rows)
+        else:
+            images = None
+            if request.FILES.get('images'):
+                try:
+                    images = ZipImages(request.FILES['images'])
+                except ValueError as e:
+                    return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+            operation = batch_create if request.method == 'POST' else batch_update
+            results = operation(request.user, rows, images=images,
+                                batch_size=settings.WARDROBE_BATCH_SIZE,
+                                context=self.get_serializer_context())
+
+        summary = {}
+        for result in results:
+            summary[result['status']] = summary.get(result['status'], 0) + 1
+        created = request.method == 'POST' and summary.get('created')
+        return Response({
+            'success': 'error' not in summary,
+            'summary': summary,
+            'results': results
+        }, status=status.HTTP_201_CREATED if created else status.HTTP_200_OK)
+
+    @action(detail=False, methods=['GET'])
+    def outfits(self, request):
+        """
+        Outfit suggestions built from the user's wardrobe, best first.
+        Query params: page (default 1), page_size (default 20, max 50)
+        """
+        try:
+            page = max(int(request.query_params.get('page', 1)), 1)
+            page_size = min(max(int(request.query_params.get('page_size', 20)), 1), 50)
+        except ValueError:
+            return Response({"error": "page and page_size must be integers"}, status=status.HTTP_400_BAD_REQUEST)
+        # Past the last page there is only the empty page that ends the listing
+        page = min(page, last_page(page_size) + 1)
+        return Response(outfit_page(request.user.id, page, page_size, request))
+
+    @action(detail=True, methods=['GET'])
+    def similar(self, request, pk=None):
+        """
+        Items in the same wardrobe that look like this one.
+        Query params: k (optional, default 10, max 100)
+        """
+        item = self.get_object()
+        try:
+            k = min(max(int(request.query_params.get('k', 10)), 1), 100)
+        except ValueError:
+            return Response({"error": "k must be an integer"}, status=status.HTTP_400_BAD_REQUEST)
+
+        matches = similarity.get_index(item.owner_id).similar(item.id, k)
+        items = WardrobeItem.objects.in_bulk([item_id for item_id, _, _ in matches])
+        results = []
+        for item_id, score, distance in matches:
+            if item_id in items:
+                data = self.get_serializer(items[item_id]).data
+                data['similarity'] = score
+                data['hash_distance'] = distance
+                results.append(data)
+        return Response({'item': item.id, 'tagged': item.image_hash is not None, 'results': results})
+
+    @action(detail=False, methods=['GET'])
+    def duplicates(self, request):
+        """
+        Groups of near-identical photos in the user's wardrobe.
+        Query params: max_distance (optional, pHash bits, 0-16)
+        """
+        default = getattr(settings, 'WARDROBE_DUPLICATE_MAX_DISTANCE', 6)
+        try:
+            max_distance = min(max(int(request.query_params.get('max_distance', default)), 0), 16)
+        except ValueError:
+            return Response({"error": "max_distance must be an integer"}, status=status.HTTP_400_BAD_REQUEST)
+
+        groups = similarity.get_index(request.user.id).duplicate_groups(max_distance)
+        items = WardrobeItem.objects.filter(owner=request.user).in_bulk([i for group in groups for i in group])
+        data = [
+            [self.get_serializer(items[item_id]).data for item_id in group if item_id in items]
+            for group in groups
+        ]
+        return Response({
+            'max_distance': max_distance,
+            'group_count': len(data),
+            'duplicate_count': sum(len(group) - 1 for group in data),
+            'groups': data,
+        })
 
 class ServiceViewSet(viewsets.ModelViewSet):
     queryset = Service.objects.all()
@@ -430,15 +697,17 @@ class ServiceViewSet(viewsets.ModelViewSet):
     def perform_create(self, serializer):
         serializer.save(catalyst=self.request.user)
 
-class BookingViewSet(viewsets.ModelViewSet):
+class BookingViewSet(IdempotentCreateMixin, viewsets.ModelViewSet):
     serializer_class = BookingSerializer
     permission_classes = [permissions.IsAuthenticated]
+    throttle_classes = [BookingCreateThrottle]
+    renderer_classes = FAST_RENDERER_CLASSES
 
     def get_queryset(self):
         user = self.request.user
         queryset = None
         
-        if hasattr(user, 'profile') and user.profile.role == 'CATALYST':
+        if get_user_role(user) == 'CATALYST':
             queryset = Booking.objects.filter(catalyst=user)
         else:
             queryset = Booking.objects.filter(seeker=user)
@@ -463,7 +732,9 @@ class BookingViewSet(viewsets.ModelViewSet):
         return queryset
 
     def perform_create(self, serializer):
-        serializer.save(seeker=self.request.user)
+        with transaction.atomic():
+            booking = serializer.save(seeker=self.request.user)
+            events.booking_changed(booking, 'booking.requested')
     
     @action(detail=True, methods=['POST'], permission_classes=[permissions.IsAuthenticated])
     def accept_request(self, request, pk=None):
@@ -489,7 +760,9 @@ class BookingViewSet(viewsets.ModelViewSet):
         
         # Update status to CONFIRMED
         booking.status = 'CONFIRMED'
-        booking.save()
+        with transaction.atomic():
+            booking.save()
+            events.booking_changed(booking, 'booking.accepted')
         
         serializer = self.get_serializer(booking)
         return Response({
@@ -522,7 +795,9 @@ class BookingViewSet(viewsets.ModelViewSet):
         
         # Update status to CANCELLED
         booking.status = 'CANCELLED'
-        booking.save()
+        with transaction.atomic():
+            booking.save()
+            events.booking_changed(booking, 'booking.rejected')
         
         serializer = self.get_serializer(booking)
         return Response({
@@ -563,7 +838,9 @@ class BookingViewSet(viewsets.ModelViewSet):
         
         # Mark as CANCELLED instead of deleting from database
         booking.status = 'CANCELLED'
-        booking.save()
+        with transaction.atomic():
+            booking.save()
+            events.booking_changed(booking, 'booking.cancelled')
         
         return Response({
             "success": True,
@@ -577,32 +854,7 @@ class BookingViewSet(viewsets.ModelViewSet):
         Ultra-lightweight: only essential fields.
         """
         try:
-            bookings = Booking.objects.filter(
-                seeker=request.user, 
-                status='REQUESTED'
-            ).select_related('catalyst__profile').only(
-                'id', 'created_at', 'notes', 'catalyst__id', 'catalyst__username',
-                'catalyst__profile__id', 'catalyst__profile__gender', 
-                'catalyst__profile__age', 'catalyst__profile__bio_short'
-            )
-            
-            data = [{
-                'id': b.id,
-                'created_at': b.created_at,
-                'notes': b.notes,
-                'catalyst': {
-                    'id': b.catalyst.id,
-                    'username': b.catalyst.username,
-                    'profile': {
-                        'id': b.catalyst.profile.id,
-                        'gender': b.catalyst.profile.gender,
-                        'age': b.catalyst.profile.age,
-                        'bio_short': b.catalyst.profile.bio_short,
-                    }
-                }
-            } for b in bookings]
-            
-            return Response(data)
+            return Response(feed.pending_bookings(request.user.pk))
         except Exception as e:
             return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
@@ -613,49 +865,17 @@ class BookingViewSet(viewsets.ModelViewSet):
         Returns all needed data in one call.
         """
         try:
-            # Get matched bookings
-            bookings = Booking.objects.filter(
-                seeker=request.user,
-                status__in=['CONFIRMED', 'COMPLETED']
-            ).select_related('catalyst__profile').only(
-                'id', 'status', 'created_at', 'catalyst__id', 'catalyst__username',
-                'catalyst__profile__id', 'catalyst__profile__gender',
-                'catalyst__profile__age', 'catalyst__profile__bio_short',
-                'catalyst__profile__specializations'
-            )
-            
-            # Get all ratings for this seeker in one query
-            ratings = Rating.objects.filter(seeker=request.user).select_related('catalyst')
-            ratings_map = {r.catalyst.id: {'id': r.id, 'rating': r.rating} for r in ratings}
-            
-            data = [{
-                'id': b.id,
-                'status': b.status,
-                'created_at': b.created_at,
-                'catalyst': {
-                    'id': b.catalyst.id,
-                    'username': b.catalyst.username,
-                    'profile': {
-                        'id': b.catalyst.profile.id,
-                        'gender': b.catalyst.profile.gender,
-                        'age': b.catalyst.profile.age,
-                        'bio_short': b.catalyst.profile.bio_short,
-                        'specializations': b.catalyst.profile.specializations[:3] if b.catalyst.profile.specializations else [],
-                    }
-                },
-                'rating': ratings_map.get(b.catalyst.id)
-            } for b in bookings]
-            
-            return Response(data)
+            return Response(feed.matched_bookings(request.user.pk))
         except Exception as e:
             return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
-class MessageViewSet(viewsets.ModelViewSet):
+class MessageViewSet(IdempotentCreateMixin, viewsets.ModelViewSet):
     """
     API endpoint for messages between catalyst and seeker.
     """
     serializer_class = MessageSerializer
     permission_classes = [permissions.IsAuthenticated]
+    throttle_classes = [MessageCreateThrottle]
 
     def get_queryset(self):
         """
@@ -682,6 +902,22 @@ class MessageViewSet(viewsets.ModelViewSet):
         """
         serializer.save(sender=self.request.user)
 
+    @action(detail=False, methods=['GET'])
+    def inbox(self, request):
+        """
+        One row per conversation (booking): counterpart, last message
+        snippet, unread count. Most recent activity first, cursor paginated.
+        """
+        from .inbox import inbox_queryset, inbox_row
+
+        paginator = InboxCursorPagination()
+        page = paginator.paginate_queryset(inbox_queryset(request.user.id), request, view=self)
+        return Response({
+            'results': [inbox_row(row, request.user.id) for row in page],
+            'next': paginator.get_next_link(),
+            'previous': paginator.get_previous_link(),
+        })
+
     @action(detail=False, methods=['POST'], permission_classes=[permissions.IsAuthenticated])
     def mark_as_read(self, request):
         """
@@ -702,13 +938,16 @@ class MessageViewSet(viewsets.ModelViewSet):
         
         # Mark them as read
         count = messages.update(is_read=True)
+        if count:
+            # update() writes no outbox message; the reader's unread total changed
+            dashboard.invalidate([request.user.pk])
         
         return Response({
             "success": True,
             "marked_read": count
         })
 
-class RatingViewSet(viewsets.ModelViewSet):
+class RatingViewSet(IdempotentCreateMixin, viewsets.ModelViewSet):
     """
     API endpoint for ratings.
     """
@@ -720,7 +959,8 @@ class RatingViewSet(viewsets.ModelViewSet):
         Return ratings given by the user or received by the user (if catalyst).
         """
         user = self.request.user
-        queryset = Rating.objects.all()
+        # RatingSerializer nests both users
+        queryset = Rating.objects.select_related('seeker', 'catalyst')
         
         # Filter by catalyst if specified
         catalyst_id = self.request.query_params.get('catalyst_id')
@@ -735,7 +975,17 @@ class RatingViewSet(viewsets.ModelViewSet):
         return queryset
 
     def perform_create(self, serializer):
-        serializer.save(seeker=self.request.user)
+        try:
+            with transaction.atomic():
+                rating = serializer.save(seeker=self.request.user)
+                events.rating_created(rating)
+        except IntegrityError:
+            # unique (seeker, catalyst, booking): usually a retried submit
+            raise ValidationError({"error": "You have already rated this booking"})
+
+
+# User fields user_details adds to the profile payload
+USER_DETAIL_FIELDS = ('username', 'email', 'first_name', 'last_name', 'date_joined')
 
 
 class AdminDataViewSet(viewsets.ViewSet):
@@ -744,7 +994,7 @@ class AdminDataViewSet(viewsets.ViewSet):
     """
     permission_classes = [permissions.IsAuthenticated, permissions.IsAdminUser]
 
-    @action(detail=False, methods=['GET'])
+    @action(detail=False, methods=['GET'], renderer_classes=FAST_RENDERER_CLASSES)
     def dashboard_stats(self, request):
         try:
             from django.db.models import Count, Prefetch
@@ -789,7 +1039,7 @@ class AdminDataViewSet(viewsets.ViewSet):
                 })
             
             # 1. Get all catalysts with stats (one query)
-            catalysts_qs = Profile.objects.filter(role='CATALYST').select_related('user')
+            catalysts_qs = Profile.objects.filter(role='CATALYST', user__deleted_at__isnull=True).select_related('user')
             catalysts_data = []
             
             for cat in catalysts_qs:
@@ -807,7 +1057,7 @@ class AdminDataViewSet(viewsets.ViewSet):
                 })
 
             # 2. Get all seekers (one query)
-            seekers_qs = Profile.objects.filter(role='SEEKER').exclude(user__email='admin@mattter.com').select_related('user')
+            seekers_qs = Profile.objects.filter(role='SEEKER', user__deleted_at__isnull=True).exclude(user__email='admin@mattter.com').select_related('user')
             seekers_data = []
 
             for seeker in seekers_qs:
@@ -843,9 +1093,12 @@ class AdminDataViewSet(viewsets.ViewSet):
         """
         Permanently delete a user account.
         Query param: user_id
+
+        The account is deactivated and hidden immediately; its data is
+        deleted in the background (see deletion_status for progress).
         """
-        import django.db.transaction as transaction
-        
+        from .user_deletion import tombstone_user
+
         user_id = request.query_params.get('user_id')
         if not user_id:
             return Response(
@@ -854,23 +1107,23 @@ class AdminDataViewSet(viewsets.ViewSet):
             )
         
         try:
-            with transaction.atomic():
-                user = User.objects.get(id=user_id)
-                # prevent deleting the admin user if one exists with that email (though distinct from hardcoded frontend auth, better safe)
-                if user.email == 'admin@mattter.com':
-                     return Response(
-                        {"error": "Cannot delete root admin account"},
-                        status=status.HTTP_403_FORBIDDEN
-                    )
+            user = User.objects.get(id=user_id)
+            # prevent deleting the admin user if one exists with that email (though distinct from hardcoded frontend auth, better safe)
+            if user.email == 'admin@mattter.com':
+                 return Response(
+                    {"error": "Cannot delete root admin account"},
+                    status=status.HTTP_403_FORBIDDEN
+                )
 
-                user.delete()
+            progress = tombstone_user(user)
             
             return Response({
                 "success": True, 
-                "message": "User deleted successfully"
-            })
+                "message": "User deletion started",
+                "deletion": progress,
+            }, status=status.HTTP_202_ACCEPTED)
             
-        except User.DoesNotExist:
+        except (User.DoesNotExist, ValueError):
             return Response(
                 {"error": "User not found"},
                 status=status.HTTP_404_NOT_FOUND
@@ -881,9 +1134,57 @@ class AdminDataViewSet(viewsets.ViewSet):
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
 
+    @action(detail=False, methods=['GET'])
+    def deletion_status(self, request):
+        """
+        Progress of a user deletion started with delete_user.
+        Query param: user_id
+        """
+        from .user_deletion import get_progress
+
+        user_id = request.query_params.get('user_id')
+        if not user_id or not user_id.isdigit():
+            return Response({"error": "user_id is required"}, status=status.HTTP_400_BAD_REQUEST)
+        progress = get_progress(int(user_id))
+        if progress is None:
+            return Response({"error": "User is not being deleted"}, status=status.HTTP_404_NOT_FOUND)
+        return Response(progress)
+
+    @action(detail=False, methods=['POST'])
+    def import_catalysts(self, request):
+        """
+        Bulk-onboard catalyst accounts.
+        Body: JSON list of rows (or {"catalysts": [...]}), or a multipart CSV upload in `file`.
+        Each row needs `username`; other columns map onto User/Profile fields.
+        """
+        import csv
+        import io
+        from .onboarding import import_catalysts
+
+        upload = request.FILES.get('file')
+        if upload:
+            rows = list(csv.DictReader(io.TextIOWrapper(upload.file, encoding='utf-8-sig')))
+        elif isinstance(request.data, list):
+            rows = request.data
+        else:
+            rows = request.data.get('catalysts')
 
+        if not isinstance(rows, list) or not rows:
+            return Response(
+                {"error": "Provide a non-empty list of catalysts or a CSV file"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
 
+        results = import_catalysts(rows, batch_size=settings.CATALYST_IMPORT_BATCH_SIZE)
+        summary = {key: 0 for key in ('created', 'skipped', 'error')}
+        for result in results:
+            summary[result['status']] += 1
 
+        return Response({
+            'success': summary['error'] == 0,
+            'summary': summary,
+            'results': results
+        }, status=status.HTTP_201_CREATED if summary['created'] else status.HTTP_200_OK)
 
     @action(detail=False, methods=['GET'])
     def user_details(self, request):
@@ -898,12 +1199,16 @@ class AdminDataViewSet(viewsets.ViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
+        # ?fields= narrows the profile payload, including the user fields added below
+        fields = fieldsets.requested_fields(request, ProfileSerializer(), extra=USER_DETAIL_FIELDS)
+
         try:
             user = User.objects.get(id=user_id)
-            profile = Profile.objects.get(user=user)
+            # role picks the match history below
+            profile = fieldsets.narrow_queryset(Profile.objects.all(), ProfileSerializer(), fields, also=['role']).get(user=user)
             
             # Serialize profile data
-            profile_serializer = ProfileSerializer(profile)
+            profile_serializer = ProfileSerializer(profile, context={'fields': fields})
             profile_data = profile_serializer.data
             
             # Add extra user info not in profile serializer
@@ -912,6 +1217,7 @@ class AdminDataViewSet(viewsets.ViewSet):
             profile_data['first_name'] = user.first_name
             profile_data['last_name'] = user.last_name
             profile_data['date_joined'] = user.date_joined
+            profile_data = fieldsets.prune_data(profile_data, fields)
             
             # Fetch reports filed AGAINST this user
             reports = Report.objects.filter(reported_user=user).select_related('reporter')
@@ -919,7 +1225,7 @@ class AdminDataViewSet(viewsets.ViewSet):
             for report in reports:
                 reports_data.append({
                     'id': report.id,
-                    'reporter_name': report.reporter.username,
+                    'reporter_name': report.reporter.username if report.reporter else 'System',
                     'reason': report.reason,
                     'status': report.status,
                     'created_at': report.created_at,
@@ -983,9 +1289,10 @@ class AdminDataViewSet(viewsets.ViewSet):
             )
 
 
-class ReportViewSet(viewsets.ModelViewSet):
-    queryset = Report.objects.all()
+class ReportViewSet(IdempotentCreateMixin, viewsets.ModelViewSet):
+    queryset = Report.objects.select_related('reporter__profile', 'reported_user__profile')
     serializer_class = ReportSerializer
+    throttle_classes = [ReportCreateThrottle]
 
     def get_permissions(self):
         if self.action == 'create':
@@ -994,7 +1301,9 @@ class ReportViewSet(viewsets.ModelViewSet):
 
     def perform_create(self, serializer):
         # Force status to PENDING for new reports
-        serializer.save(reporter=self.request.user, status='PENDING')
+        with transaction.atomic():
+            report = serializer.save(reporter=self.request.user, status='PENDING')
+            events.report_created(report)
 
     def perform_update(self, serializer):
         # Update resolved_at if status changes to RESOLVED
@@ -1005,3 +1314,85 @@ class ReportViewSet(viewsets.ModelViewSet):
             serializer.save(resolved_at=timezone.now())
         else:
             serializer.save()
+
+    @action(detail=False, methods=['GET'])
+    def queue(self, request):
+        """
+        Moderation queue as compact rows, pending and oldest first by default.
+        Filters: status (PENDING/RESOLVED/DISMISSED/ALL), min_age_hours,
+        max_age_hours, reported_user; order=newest; cursor paginated.
+        """
+        try:
+            filters = moderation.parse_filters(request.query_params)
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        paginator = ModerationCursorPagination()
+        page = paginator.paginate_queryset(moderation.queue_queryset(**filters), request, view=self)
+        return Response({
+            'results': [moderation.report_row(row) for row in page],
+            'next': paginator.get_next_link(),
+            'previous': paginator.get_previous_link(),
+        })
+
+    @action(detail=False, methods=['GET'])
+    def by_user(self, request):
+        """Reports grouped by reported user with total/pending counts, most pending first."""
+        try:
+            filters = moderation.parse_filters(request.query_params, default_status='ALL')
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        paginator = ModerationGroupPagination()
+        page = paginator.paginate_queryset(moderation.reports_by_user(**filters), request, view=self)
+        return paginator.get_paginated_response([moderation.user_group_row(row) for row in page])
+
+    def _close_reports(self, request, new_status):
+        ids = request.data.get('ids')
+        reported_user = request.data.get('reported_user')
+        if ids is not None and (not isinstance(ids, list) or not all(isinstance(i, int) for i in ids)):
+            return Response({"error": "ids must be a list of report ids"}, status=status.HTTP_400_BAD_REQUEST)
+        if ids is not None and len(ids) > getattr(settings, 'REPORT_BULK_MAX_IDS', 1000):
+            return Response({"error": "Too many ids in one request"}, status=status.HTTP_400_BAD_REQUEST)
+        if reported_user is not None and not isinstance(reported_user, int):
+            return Response({"error": "reported_user must be a user id"}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            updated = moderation.close_reports(new_status, ids=ids, reported_user=reported_user)
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({'success': True, 'status': new_status, 'updated': updated})
+
+    @action(detail=False, methods=['POST'])
+    def bulk_resolve(self, request):
+        """Resolve pending reports by `ids` and/or every pending report against `reported_user`."""
+        return self._close_reports(request, 'RESOLVED')
+
+    @action(detail=False, methods=['POST'])
+    def bulk_dismiss(self, request):
+        """Dismiss pending reports by `ids` and/or every pending report against `reported_user`."""
+        return self._close_reports(request, 'DISMISSED')
+
+
+class EventViewSet(viewsets.ViewSet):
+    """
+    The signed-in user's event log (api.events), for catching up after a
+    WebSocket reconnect. GET /api/events/?after=<last id seen>&limit=100
+    returns events oldest first; pass the returned cursor as `after` until
+    has_more is false.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+    renderer_classes = FAST_RENDERER_CLASSES
+
+    def list(self, request):
+        try:
+            after = max(int(request.query_params.get('after', 0)), 0)
+            limit = min(max(int(request.query_params.get('limit', events.DEFAULT_PAGE_SIZE)), 1), events.MAX_PAGE_SIZE)
+        except ValueError:
+            return Response({"error": "after and limit must be integers"}, status=status.HTTP_400_BAD_REQUEST)
+
+        results, has_more = events.since(request.user.pk, after=after, limit=limit)
+        return Response({
+            'results': results,
+            'cursor': results[-1]['id'] if results else after,
+            'has_more': has_more,
+        })
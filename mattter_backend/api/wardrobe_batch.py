@@ -0,0 +1,288 @@
+"""
+Batch create / update / delete for wardrobe items.
+
+Rows are validated with one reusable WardrobeItemSerializer instance per
+call (partial for updates) and written with bulk_create / bulk_update in chunks inside one
+transaction. Images come from an optional zip archive: each row's `image`
+names a member of the zip. The request only stores the raw bytes under
+INCOMING_DIR; resizing into variants and AI tagging happen in
+background jobs (api.jobs) once the transaction commits.
+
+Every function returns one result dict per row, in order, like
+api.onboarding.import_catalysts.
+"""
+
+import logging
+import posixpath
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import connections, transaction
+from rest_framework import serializers
+
+from . import conditional, jobs
+from .models import WardrobeItem
+from .serializers import WardrobeItemSerializer
+from .tagging import enqueue_tagging
+from .uploads import INCOMING_DIR, delete_media, item_media, process_stored_image, store_incoming
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BATCH_SIZE = 500
+MAX_IMAGE_BYTES = 20 * 1024 * 1024
+MAX_ARCHIVE_BYTES = 200 * 1024 * 1024
+
+# Fields a batch row may set; `image` is handled separately
+WRITABLE_FIELDS = ['name', 'category', 'color', 'brand']
+IMAGE_RESET = {'ai_tags': {}, 'image_variants': {}, 'image_hash': None, 'image_embedding': None}
+
+
+class ZipImages:
+    """Lazy access to the images in an uploaded zip, by path or bare filename."""
+
+    def __init__(self, upload):
+        try:
+            self.archive = zipfile.ZipFile(upload)
+        except zipfile.BadZipFile:
+            raise ValueError('images must be a zip archive')
+        self.members = {}
+        total = 0
+        for info in self.archive.infolist():
+            if info.is_dir():
+                continue
+            total += info.file_size
+            self.members[info.filename] = info
+            self.members.setdefault(posixpath.basename(info.filename), info)
+        # Sizes come from the archive headers, so this is checked before anything is inflated
+        if total > getattr(settings, 'WARDROBE_BATCH_MAX_ARCHIVE_BYTES', MAX_ARCHIVE_BYTES):
+            raise ValueError('images archive is too large once uncompressed')
+        self.stored = {}
+        self.created = []
+
+    def store(self, name):
+        """Store the named member for background processing; returns the storage name."""
+        info = self.members.get(name)
+        if info is None:
+            raise ValueError(f"'{name}' is not in the images archive")
+        if info.filename not in self.stored:
+            # file_size comes from the archive header; read() also stops at it
+            if info.file_size > getattr(settings, 'WARDROBE_BATCH_MAX_IMAGE_BYTES', MAX_IMAGE_BYTES):
+                raise ValueError(f"'{name}' is too large")
+            name, created = store_incoming(self.archive.read(info))
+            self.stored[info.filename] = name
+            if created:
+                self.created.append(name)
+        return self.stored[info.filename]
+
+    def discard(self):
+        """Delete the files this archive stored (the rows referencing them were rolled back)."""
+        for name in self.created:
+            try:
+                default_storage.delete(name)
+            except OSError:
+                logger.warning('Could not delete orphaned upload %s', name)
+        self.created = []
+
+
+@contextmanager
+def _discard_on_error(images):
+    """Wraps the write transaction: drop newly stored images if it fails."""
+    try:
+        yield
+    except BaseException:
+        if images is not None:
+            images.discard()
+        raise
+
+
+def _error(index, error):
+    if isinstance(error, serializers.ValidationError):
+        error = error.detail
+    elif isinstance(error, Exception):
+        error = str(error)
+    return {'row': index, 'status': 'error', 'error': error}
+
+
+def _image_for(row, images):
+    """Storage name for a row's image reference, or None if it has none."""
+    reference = row.get('image')
+    if not reference:
+        return None
+    if images is None:
+        raise ValueError('Row references an image but no images archive was uploaded')
+    return images.store(reference)
+
+
+def batch_create(owner, rows, images=None, batch_size=DEFAULT_BATCH_SIZE, context=None):
+    results = [None] * len(rows)
+    child = WardrobeItemSerializer(context=context or {})
+    pending = []
+    for index, row in enumerate(rows):
+        if not isinstance(row, dict):
+            results[index] = _error(index, 'Each row must be an object')
+            continue
+        try:
+            data = child.run_validation({k: v for k, v in row.items() if k in WRITABLE_FIELDS})
+            image = _image_for(row, images)
+        except (serializers.ValidationError, ValueError) as e:
+            results[index] = _error(index, e)
+            continue
+        pending.append((index, WardrobeItem(owner=owner, image=image, **data)))
+
+    items = [item for _, item in pending]
+    with _discard_on_error(images), transaction.atomic():
+        if connections[WardrobeItem.objects.db].features.can_return_rows_from_bulk_insert:
+            created = WardrobeItem.objects.bulk_create(items, batch_size=batch_size)
+        else:
+            # Rows have no natural key to fetch ids back by, so insert one at a time
+            for item in items:
+                item.save()
+            created = items
+        conditional.invalidate_wardrobe_versions([owner.id])
+        enqueue_image_processing(*[item.pk for item in created if item.image])
+
+    for (index, _), item in zip(pending, created):
+        results[index] = {'row': index, 'status': 'created', 'id': item.pk}
+    return results
+
+
+def batch_update(owner, rows, images=None, batch_size=DEFAULT_BATCH_SIZE, context=None):
+    results = [None] * len(rows)
+    ids = [row.get('id') for row in rows if isinstance(row, dict)]
+    items = WardrobeItem.objects.filter(owner=owner).in_bulk([i for i in ids if isinstance(i, int)])
+
+    child = WardrobeItemSerializer(partial=True, context=context or {})
+    changed_items = []
+    changed_fields = set()
+    new_images = []
+    seen = set()
+    for index, row in enumerate(rows):
+        if not isinstance(row, dict):
+            results[index] = _error(index, 'Each row must be an object')
+            continue
+        if not isinstance(row.get('id'), int):
+            results[index] = _error(index, 'id must be an integer')
+            continue
+        item = items.get(row['id'])
+        if item is None:
+            results[index] = _error(index, 'Item not found')
+            continue
+        if item.pk in seen:
+            results[index] = _error(index, 'Duplicate id in batch')
+            continue
+        seen.add(item.pk)
+
+        try:
+            updates = dict(child.run_validation({k: v for k, v in row.items() if k in WRITABLE_FIELDS}))
+            image = _image_for(row, images)
+        except (serializers.ValidationError, ValueError) as e:
+            results[index] = _error(index, e)
+            continue
+
+        if image is not None:
+            updates.update(IMAGE_RESET, image=image)
+            new_images.append(item.pk)
+        elif 'image' in row:  # explicit null / "" removes the image
+            updates.update(IMAGE_RESET, image=None)
+        for field, value in updates.items():
+            setattr(item, field, value)
+        changed_fields.update(updates)
+        changed_items.append(item)
+        results[index] = {'row': index, 'status': 'updated', 'id': item.pk}
+
+    if changed_items:
+        with _discard_on_error(images), transaction.atomic():
+            WardrobeItem.objects.bulk_update(changed_items, sorted(changed_fields), batch_size=batch_size)
+            conditional.invalidate_wardrobe_versions([owner.id])
+            enqueue_image_processing(*new_images)
+    return results
+
+
+def batch_delete(owner, ids):
+    results = []
+    valid = [i for i in ids if isinstance(i, int)]
+    existing = set(WardrobeItem.objects.filter(owner=owner, id__in=valid).values_list('id', flat=True))
+    if existing:
+        with transaction.atomic():
+            queryset = WardrobeItem.objects.filter(id__in=existing)
+            media = item_media(queryset)
+            queryset.delete()
+            transaction.on_commit(lambda: delete_media(media))
+    for index, item_id in enumerate(ids):
+        if not isinstance(item_id, int):
+            results.append(_error(index, 'id must be an integer'))
+        elif item_id in existing:
+            results.append({'row': index, 'status': 'deleted', 'id': item_id})
+        else:
+            results.append(_error(index, 'Item not found'))
+    return results
+
+
+def pending_images_queryset():
+    """Items whose uploaded image hasn't been processed yet."""
+    return WardrobeItem.objects.filter(image__startswith=INCOMING_DIR)
+
+
+@jobs.task('wardrobe.process_images')
+def process_pending_images(item_ids, workers=None):
+    """
+    Turn stored raw uploads into variants for the given items, then queue
+    them for tagging. Each distinct file is processed once, on a thread
+    pool (Pillow releases the GIL while resizing and encoding).
+    Returns (processed, failed) counts.
+    """
+    items = list(pending_images_queryset().filter(id__in=item_ids).only('id', 'owner_id', 'image'))
+    if not items:
+        return 0, 0
+
+    raw_names = sorted({item.image.name for item in items})
+    workers = workers or getattr(settings, 'WARDROBE_IMAGE_WORKERS', 4)
+
+    def process(name):
+        try:
+            return process_stored_image(name)
+        except Exception:
+            logger.exception('Could not process uploaded image %s', name)
+            return None
+
+    with ThreadPoolExecutor(max_workers=min(workers, len(raw_names))) as pool:
+        variants = dict(zip(raw_names, pool.map(process, raw_names)))
+
+    processed = []
+    for item in items:
+        item_variants = variants[item.image.name]
+        if item_variants is None:
+            item.image = None
+            item.image_variants = {}
+            item.ai_tags = {'error': 'Image could not be processed'}
+        else:
+            item.image = item_variants['full']
+            item.image_variants = item_variants
+            processed.append(item.pk)
+
+    WardrobeItem.objects.bulk_update(items, ['image', 'image_variants', 'ai_tags'])
+    conditional.invalidate_wardrobe_versions({item.owner_id for item in items})
+
+    # Raw files are content-addressed and may be shared with rows still pending
+    still_used = set(WardrobeItem.objects.filter(image__in=raw_names).values_list('image', flat=True))
+    for name in raw_names:
+        if name not in still_used:
+            default_storage.delete(name)
+
+    enqueue_tagging(*processed)
+    return len(processed), len(items) - len(processed)
+
+
+def enqueue_image_processing(*item_ids):
+    """Queue items with raw uploads for processing once the current transaction commits."""
+    if not item_ids:
+        return
+    if getattr(settings, 'WARDROBE_IMAGE_ASYNC', True):
+        batch_size = getattr(settings, 'WARDROBE_IMAGE_BATCH_SIZE', 50)
+        for start in range(0, len(item_ids), batch_size):
+            jobs.enqueue('wardrobe.process_images', list(item_ids[start:start + batch_size]))
+    else:
+        transaction.on_commit(lambda: process_pending_images(item_ids))
@@ -2,6 +2,7 @@ from pathlib import Path
 import os
 from dotenv import load_dotenv
 import dj_database_url
+from corsheaders.defaults import default_headers
 
 # Load environment variables from .env file
 load_dotenv()
@@ -49,7 +50,9 @@ INSTALLED_APPS = [
 MIDDLEWARE = [
     'corsheaders.middleware.CorsMiddleware', # CORS
     'django.middleware.security.SecurityMiddleware',
+    'api.middleware.APICompressionMiddleware',  # gzip/brotli for large API responses
     'whitenoise.middleware.WhiteNoiseMiddleware',  # Whitenoise for static files
+    'api.middleware.MediaFilesMiddleware',  # Uploaded media with range requests + long-lived caching
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -97,6 +100,24 @@ DATABASES = {
 
 AUTH_USER_MODEL = 'api.User'
 
+# Password hashing - PBKDF2 work factor is tunable per environment.
+# Django's stock PBKDF2 hasher is left out because it shares the algorithm
+# name with the configurable one and would shadow it when verifying.
+PASSWORD_HASHERS = [
+    'api.hashers.ConfigurablePBKDF2PasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+    'django.contrib.auth.hashers.Argon2PasswordHasher',
+    'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',
+    'django.contrib.auth.hashers.ScryptPasswordHasher',
+]
+PASSWORD_HASH_ITERATIONS = int(os.getenv('PASSWORD_HASH_ITERATIONS')) if os.getenv('PASSWORD_HASH_ITERATIONS') else None
+PASSWORD_HASH_WORKERS = int(os.getenv('PASSWORD_HASH_WORKERS', '4'))
+# Seconds to remember a successful password check (0 = always verify with the hasher)
+LOGIN_PASSWORD_CACHE_TIMEOUT = int(os.getenv('LOGIN_PASSWORD_CACHE_TIMEOUT', '0'))
+
+# Admin bulk catalyst import
+CATALYST_IMPORT_BATCH_SIZE = int(os.getenv('CATALYST_IMPORT_BATCH_SIZE', '1000'))
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
@@ -134,6 +155,103 @@ STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
 
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
+# Cache lifetime for media that isn't content-addressed (legacy uploads)
+MEDIA_MAX_AGE = int(os.getenv('MEDIA_MAX_AGE', '86400'))
+
+# Wardrobe image variants (api.uploads) - longest edge in pixels
+WARDROBE_IMAGE_SIZES = {'full': 2048, 'medium': 800, 'thumb': 256}
+WARDROBE_IMAGE_FORMAT = 'WEBP'
+WARDROBE_IMAGE_QUALITY = int(os.getenv('WARDROBE_IMAGE_QUALITY', '80'))
+
+# Wardrobe similarity index (api.similarity)
+SIMILARITY_INDEX_DIR = BASE_DIR / 'var' / 'similarity'
+SIMILARITY_MMAP_THRESHOLD = 2000  # wardrobes at least this big are memory-mapped from disk
+WARDROBE_DUPLICATE_MAX_DISTANCE = 6  # pHash bits
+OUTFIT_MAX_RESULTS = 1000  # outfits generated per wardrobe version (api.outfits)
+
+# Catalyst ranking (api.ratings): Bayesian prior and leaderboard cache
+RATING_PRIOR_MEAN = 3.5
+RATING_PRIOR_WEIGHT = 10  # ratings' worth of prior; higher = more ratings needed to rank well
+TOP_CATALYSTS_REFRESH_SECONDS = 300
+TOP_CATALYSTS_RANKING_SIZE = 10000
+CATALYST_VIEW_REVIEWS = 3  # latest reviews embedded in catalyst_view
+CATALYST_DASHBOARD_REVIEWS = 3  # latest reviews in dashboard_summary (api.dashboard)
+CATALYST_DASHBOARD_CACHE_SECONDS = 300
+
+# Seeker home feed (api.feed): sections are built on a thread pool, one DB connection per thread
+SEEKER_FEED_CONCURRENT = os.getenv('SEEKER_FEED_CONCURRENT', 'True') == 'True'
+SEEKER_FEED_WORKERS = 4
+
+# Request batching (api.batch): reads in a batch run concurrently on BATCH_WORKERS threads
+BATCH_MAX_REQUESTS = 20
+BATCH_CONCURRENT = os.getenv('BATCH_CONCURRENT', 'True') == 'True'
+BATCH_WORKERS = 4
+
+# Background jobs (api.jobs). Deployments run `manage.py run_workers` (the
+# Procfile worker), so the web process only runs job threads of its own in
+# development, or when JOBS_IN_PROCESS_WORKERS is set for a single-process setup.
+JOBS_IN_PROCESS_WORKERS = int(os.getenv('JOBS_IN_PROCESS_WORKERS', '1' if DEBUG else '0'))
+JOB_WORKER_THREADS = int(os.getenv('JOB_WORKER_THREADS', '2'))  # per run_workers process
+JOB_POLL_INTERVAL = 1.0  # seconds an idle worker waits before looking again
+JOB_LEASE_SECONDS = 600  # a RUNNING job not finished by then is handed to another worker
+JOB_RETRY_BASE_DELAY = 10  # seconds; doubles per attempt
+JOB_RETRY_MAX_DELAY = 3600
+JOB_RETENTION_DAYS = 7
+JOB_SCHEDULE = {  # periodic task -> interval in seconds
+    'ratings.refresh_ranking': 300,
+    'jobs.prune': 60 * 60,
+    'events.prune': 60 * 60 * 24,
+    'outbox.dispatch': 30,
+    'outbox.prune': 60 * 60 * 6,
+    'idempotency.prune': 60 * 60,
+}
+
+# User event log (api.events), replayed by clients after a reconnect
+EVENT_RETENTION_DAYS = 30
+EVENT_COMMIT_LAG_SECONDS = 2  # replay holds back events this new; their ids may still be committing out of order
+
+# Transactional outbox (api.outbox). Messages are dispatched right after
+# commit; the periodic outbox.dispatch job redelivers anything still
+# pending OUTBOX_SWEEP_AFTER seconds later (crashes, failed handlers).
+OUTBOX_DISPATCH_INLINE = os.getenv('OUTBOX_DISPATCH_INLINE', 'True') == 'True'
+OUTBOX_SWEEP_AFTER = 30
+OUTBOX_BATCH_SIZE = 200
+OUTBOX_RETRY_BASE_DELAY = 10  # seconds; doubles per failed delivery
+OUTBOX_RETRY_MAX_DELAY = 3600
+OUTBOX_RETENTION_DAYS = 3
+
+# Idempotency-Key handling on create endpoints (api.idempotency)
+IDEMPOTENCY_KEY_TTL_HOURS = 24
+IDEMPOTENCY_WAIT_SECONDS = 5  # a concurrent duplicate waits this long before getting a 409
+IDEMPOTENCY_LOCK_SECONDS = 60  # an unfinished claim older than this is taken over
+
+# Account deletion (api.user_deletion): rows deleted per transaction
+USER_DELETION_ASYNC = os.getenv('USER_DELETION_ASYNC', 'True') == 'True'
+USER_DELETION_CHUNK_SIZE = 500
+
+# Moderation (api.moderation)
+REPORT_BULK_MAX_IDS = 1000  # report ids per bulk_resolve / bulk_dismiss request
+
+# API response compression (api.middleware.APICompressionMiddleware)
+API_COMPRESSION_PATH_PREFIX = '/api/'
+API_COMPRESSION_MIN_SIZE = int(os.getenv('API_COMPRESSION_MIN_SIZE', '1024'))  # bytes
+API_BROTLI_QUALITY = int(os.getenv('API_BROTLI_QUALITY', '4'))
+API_GZIP_LEVEL = int(os.getenv('API_GZIP_LEVEL', '6'))
+
+# Wardrobe AI tagging (api.tagging)
+WARDROBE_TAGGING_ASYNC = os.getenv('WARDROBE_TAGGING_ASYNC', 'True') == 'True'
+WARDROBE_TAGGING_WORKERS = int(os.getenv('WARDROBE_TAGGING_WORKERS', '2'))
+WARDROBE_TAGGING_BATCH_SIZE = int(os.getenv('WARDROBE_TAGGING_BATCH_SIZE', '100'))
+
+# Wardrobe batch endpoints (api.wardrobe_batch). WARDROBE_IMAGE_ASYNC also
+# covers single-item uploads: images are resized by a background job.
+WARDROBE_BATCH_MAX_ITEMS = 1000
+WARDROBE_BATCH_SIZE = 500  # rows per bulk INSERT / UPDATE
+WARDROBE_BATCH_MAX_IMAGE_BYTES = 20 * 1024 * 1024
+WARDROBE_BATCH_MAX_ARCHIVE_BYTES = 200 * 1024 * 1024  # all members together, uncompressed
+WARDROBE_IMAGE_ASYNC = os.getenv('WARDROBE_IMAGE_ASYNC', 'True') == 'True'
+WARDROBE_IMAGE_WORKERS = int(os.getenv('WARDROBE_IMAGE_WORKERS', '4'))
+WARDROBE_IMAGE_BATCH_SIZE = 50
 
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.0/ref/settings/#default-auto-field
@@ -150,24 +268,76 @@ REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticatedOrReadOnly',
     ],
+    'DEFAULT_THROTTLE_RATES': {
+        'login_ip': os.getenv('LOGIN_IP_RATE', '20/min'),
+        'login_user': os.getenv('LOGIN_USER_RATE', '10/min'),
+        # Per-user token buckets for writes (api.throttles.ActionThrottle)
+        'message_create': os.getenv('MESSAGE_CREATE_RATE', '30/min'),
+        'booking_create': os.getenv('BOOKING_CREATE_RATE', '20/hour'),
+        'report_create': os.getenv('REPORT_CREATE_RATE', '10/hour'),
+    },
+}
+
+# Attempts (allowed or throttled) per sliding window that auto-flag an
+# account into the moderation queue (api.moderation.flag_user)
+ABUSE_FLAG_THRESHOLDS = {
+    'message_create': '300/hour',
+    'booking_create': '60/hour',
+    'report_create': '30/day',
 }
 
 # CORS
 CORS_ALLOWED_ORIGINS = os.getenv('CORS_ALLOWED_ORIGINS', '').split(',') if os.getenv('CORS_ALLOWED_ORIGINS') else []
 CORS_ALLOW_ALL_ORIGINS = not CORS_ALLOWED_ORIGINS 
-
-# Channels
-CHANNEL_LAYERS = {
-    "default": {
-        "BACKEND": "channels.layers.InMemoryChannelLayer"
+CORS_ALLOW_HEADERS = (*default_headers, 'idempotency-key')
+CORS_EXPOSE_HEADERS = ['Idempotent-Replayed']
+
+# Shared Redis for the cache and the channel layer; unset in development
+REDIS_URL = os.getenv('REDIS_URL')
+
+# Channels. Event and message pushes (api.events) are sent from whichever
+# process committed the change - another web worker or run_workers - so
+# the layer must be shared: Redis when REDIS_URL is set. The in-memory layer
+# only reaches sockets in the same process (single-process development).
+if REDIS_URL:
+    CHANNEL_LAYERS = {
+        "default": {
+            "BACKEND": "channels_redis.core.RedisChannelLayer",
+            "CONFIG": {"hosts": [REDIS_URL]},
+        }
+    }
+else:
+    CHANNEL_LAYERS = {
+        "default": {
+            "BACKEND": "channels.layers.InMemoryChannelLayer"
+        }
     }
-}
 
-# Caching - Use local memory cache for development
-CACHES = {
-    'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
-        'LOCATION': 'unique-snowflake',
-        'TIMEOUT': 300,  # 5 minutes default
+# Presence over WebSockets (api.presence, api.consumers). Clients heartbeat
+# every PRESENCE_HEARTBEAT_SECONDS; a user is offline after PRESENCE_TTL
+# seconds without one. Typing indicators expire after PRESENCE_TYPING_TTL.
+# Presence lives in the default cache: without REDIS_URL (local memory) it
+# only sees sockets held by the same process, so production needs Redis.
+PRESENCE_HEARTBEAT_SECONDS = int(os.getenv('PRESENCE_HEARTBEAT_SECONDS', '25'))
+PRESENCE_TTL = PRESENCE_HEARTBEAT_SECONDS * 2 + 5
+PRESENCE_TYPING_TTL = 6
+PRESENCE_LOOKUP_MAX = 500  # user ids per /api/profiles/presence/ request
+
+# Caching - Redis when REDIS_URL is set (shared by every process; needed for
+# presence and cross-process invalidation), local memory for development
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+            'TIMEOUT': 300,  # 5 minutes default
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'unique-snowflake',
+            'TIMEOUT': 300,  # 5 minutes default
+        }
     }
-}
@@ -5,3 +5,8 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'mattter_backend.settings')
 
 application = get_wsgi_application()
+
+# Background job threads (and the JOB_SCHEDULE timer) for this process; see api.jobs
+from api import jobs  # noqa: E402
+
+jobs.start_in_process_workers()